@@ -1,279 +1,563 @@
 import base64
-import io
+import hashlib
+import importlib.util
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack
+from urllib.parse import urlencode
 import dash
-from dash import dcc, html, Input, Output, State, dash_table
-import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import os
+from dash import dcc, html, Input, Output, State, dash_table
+from flask import Response, abort, request
 
-app = dash.Dash(__name__)
-app.title = "BrainyStats - Gráficos de Control"
-
-# 🎨 Paleta de colores profesional
-colors = {
-    'bg_primary': '#0A2540',
-    'bg_secondary': '#0D3A5F',
-    'bg_card': '#FFFFFF',
-    'accent_gold': '#D4AF37',
-    'accent_gold_light': '#F4E5C3',
-    'green_primary': '#1B5E20',
-    'green_secondary': '#2E7D32',
-    'text_primary': '#1A1A1A',
-    'text_secondary': '#546E7A',
-    'text_light': '#FFFFFF',
-    'success': '#4CAF50',
-    'warning': '#FF9800',
-    'danger': '#E53935',
-    'chart_line1': '#2196F3',
-    'chart_line2': '#FF6F00',
-    'border': '#E0E0E0',
-    'shadow': 'rgba(0, 0, 0, 0.15)'
-}
-
-# 📊 Constantes de gráficos de control
-CONTROL_CHART_CONSTANTS = {
-    2: {'A2': 1.880, 'D3': 0, 'D4': 3.267, 'd2': 1.128, 'A3': 2.659, 'B3': 0, 'B4': 3.267, 'c4': 0.7979},
-    3: {'A2': 1.023, 'D3': 0, 'D4': 2.574, 'd2': 1.693, 'A3': 1.954, 'B3': 0, 'B4': 2.568, 'c4': 0.8862},
-    4: {'A2': 0.729, 'D3': 0, 'D4': 2.282, 'd2': 2.059, 'A3': 1.628, 'B3': 0, 'B4': 2.266, 'c4': 0.9213},
-    5: {'A2': 0.577, 'D3': 0, 'D4': 2.114, 'd2': 2.326, 'A3': 1.427, 'B3': 0, 'B4': 2.089, 'c4': 0.9400},
-    6: {'A2': 0.483, 'D3': 0, 'D4': 2.004, 'd2': 2.534, 'A3': 1.287, 'B3': 0.030, 'B4': 1.970, 'c4': 0.9515},
-    7: {'A2': 0.419, 'D3': 0.076, 'D4': 1.924, 'd2': 2.704, 'A3': 1.182, 'B3': 0.118, 'B4': 1.882, 'c4': 0.9594},
-    8: {'A2': 0.373, 'D3': 0.136, 'D4': 1.864, 'd2': 2.847, 'A3': 1.099, 'B3': 0.185, 'B4': 1.815, 'c4': 0.9650},
-    9: {'A2': 0.337, 'D3': 0.184, 'D4': 1.816, 'd2': 2.970, 'A3': 1.032, 'B3': 0.239, 'B4': 1.761, 'c4': 0.9693},
-    10: {'A2': 0.308, 'D3': 0.223, 'D4': 1.777, 'd2': 3.078, 'A3': 0.975, 'B3': 0.284, 'B4': 1.716, 'c4': 0.9727},
-    11: {'A2': 0.285, 'D3': 0.256, 'D4': 1.744, 'd2': 3.173, 'A3': 0.927, 'B3': 0.321, 'B4': 1.679, 'c4': 0.9754},
-    12: {'A2': 0.266, 'D3': 0.283, 'D4': 1.717, 'd2': 3.258, 'A3': 0.886, 'B3': 0.354, 'B4': 1.646, 'c4': 0.9776},
-    15: {'A2': 0.223, 'D3': 0.348, 'D4': 1.652, 'd2': 3.472, 'A3': 0.789, 'B3': 0.428, 'B4': 1.572, 'c4': 0.9823},
-    20: {'A2': 0.180, 'D3': 0.414, 'D4': 1.586, 'd2': 3.735, 'A3': 0.680, 'B3': 0.510, 'B4': 1.490, 'c4': 0.9869},
-    25: {'A2': 0.153, 'D3': 0.459, 'D4': 1.541, 'd2': 3.931, 'A3': 0.606, 'B3': 0.565, 'B4': 1.435, 'c4': 0.9896}
-}
+from autocorrelacion import residuos_ar
+from corrida_corta import subgrupos_corrida_corta
+from estadisticas_historicas import analizar_estadisticas, guardar_estadisticas, leer_estadisticas
+from figures import (
+    colors,
+    etiquetas_grafico,
+    figura_arl,
+    figura_autocorrelacion,
+    figura_comparacion,
+    figura_control,
+    figura_distribucion,
+    figura_escenarios_capacidad,
+    figura_grafico_rs,
+    figura_grafico_x,
+    figura_vacia,
+    figuras_analisis,
+    precargar_plantillas,
+)
+from gage_rr import anova_gage_rr, arreglo_gage
+from historial_analisis import (
+    buscar_analisis,
+    cargar_analisis,
+    guardar_analisis,
+    huella_datos,
+    recortes_historial,
+    series_guardadas,
+)
+from ingestion import MODOS_SUBGRUPO, leer_formato_largo, subgrupos_formato_largo
+from multivariado import arreglo_multivariado, hotelling_t2
+from report_export import csv_subgrupos, generar_paquete_zip, guardar_lote, leer_lote, parquet_subgrupos
+from seguimiento_archivo import (
+    DIRECTORIO_SEGUIMIENTO,
+    avanzar_monitor,
+    iniciar_monitor,
+    ruta_seguimiento,
+    seguir_archivo,
+)
+from simulacion_arl import DESPLAZAMIENTOS, SERIES_POR_DESPLAZAMIENTO, simular_arl
+from solicitudes_analisis import registrar_solicitud, solicitud_vigente
+from spc_core import (
+    a_subgrupos,
+    analizar_archivos,
+    analizar_subgrupos,
+    barrido_capacidad,
+    calcular_limites_imr,
+    filas_a_subgrupos,
+    parse_contents,
+)
+from vista_previa import BYTES_MINIMOS_VISTA_PREVIA, estimar_vista_previa
 
 # 🖼️ Logos
 logo_unimag = 'logo_unimag.png'
 logo_ing = 'logo_ing_industrial.png'
 logo_brainystats = 'logo_brainystats.png'
 
+# Columnas visibles de la tabla de historial de análisis
+COLUMNAS_HISTORIAL = [('fecha', 'Fecha'), ('proceso', 'Proceso'), ('chart_type', 'Gráfico'), ('subgrupos', 'Subgrupos'),
+                      ('CLx', 'CL'), ('Cp', 'Cp'), ('Cpk', 'Cpk'), ('estado', 'Estado')]
+
+# Segundos sin teclear en USL/LSL antes de enviar el valor
+DEBOUNCE_ESPECIFICACIONES = 0.6
+
 def encode_image(image_file):
     if not os.path.exists(image_file):
         return None
-    encoded = base64.b64encode(open(image_file, 'rb').read()).decode()
+    with open(image_file, 'rb') as f:
+        encoded = base64.b64encode(f.read()).decode()
     return f"data:image/png;base64,{encoded}"
 
-logo_unimag_base64 = encode_image(logo_unimag)
-logo_ing_base64 = encode_image(logo_ing)
-logo_brainystats_base64 = encode_image(logo_brainystats)
-
 # 🌐 Layout principal
-app.layout = html.Div(style={
-    'background': f'linear-gradient(180deg, {colors["bg_primary"]} 0%, {colors["bg_secondary"]} 100%)',
-    'minHeight': '100vh',
-    'padding': '0',
-    'fontFamily': "'Inter', 'Segoe UI', 'Roboto', sans-serif"
-}, children=[
-
-    # Header
-    html.Div(style={
-        'position': 'relative',
-        'background': f'linear-gradient(135deg, {colors["bg_primary"]} 0%, {colors["bg_secondary"]} 100%)',
-        'paddingTop': '40px',
-        'paddingBottom': '60px',
-        'paddingLeft': '40px',
-        'paddingRight': '40px',
-        'marginBottom': '0',
-        'borderBottom': f'4px solid {colors["accent_gold"]}',
-        'boxShadow': f'0 4px 20px {colors["shadow"]}'
+def build_layout():
+    logo_unimag_base64 = encode_image(logo_unimag)
+    logo_ing_base64 = encode_image(logo_ing)
+    logo_brainystats_base64 = encode_image(logo_brainystats)
+
+    return html.Div(style={
+        'background': f'linear-gradient(180deg, {colors["bg_primary"]} 0%, {colors["bg_secondary"]} 100%)',
+        'minHeight': '100vh',
+        'padding': '0',
+        'fontFamily': "'Inter', 'Segoe UI', 'Roboto', sans-serif"
     }, children=[
+
+        # Header
         html.Div(style={
-            'position': 'absolute',
-            'top': '0',
-            'left': '0',
-            'right': '0',
-            'height': '8px',
-            'background': f'linear-gradient(90deg, {colors["green_primary"]} 0%, {colors["green_secondary"]} 100%)'
-        }),
-        
-        html.Div(style={
-            'display': 'flex',
-            'justifyContent': 'space-between',
-            'alignItems': 'center',
-            'flexWrap': 'wrap',
-            'gap': '20px',
-            'maxWidth': '1400px',
-            'margin': '0 auto'
+            'position': 'relative',
+            'background': f'linear-gradient(135deg, {colors["bg_primary"]} 0%, {colors["bg_secondary"]} 100%)',
+            'paddingTop': '40px',
+            'paddingBottom': '60px',
+            'paddingLeft': '40px',
+            'paddingRight': '40px',
+            'marginBottom': '0',
+            'borderBottom': f'4px solid {colors["accent_gold"]}',
+            'boxShadow': f'0 4px 20px {colors["shadow"]}'
         }, children=[
-            html.Div(style={'display': 'flex', 'gap': '20px', 'alignItems': 'center'}, children=[
-                html.Img(src=logo_unimag_base64, style={'height': '80px'}) if logo_unimag_base64 else html.Div(),
-                html.Img(src=logo_brainystats_base64, style={'height': '80px'}) if logo_brainystats_base64 else html.Div(),
-            ]),
+            html.Div(style={
+                'position': 'absolute',
+                'top': '0',
+                'left': '0',
+                'right': '0',
+                'height': '8px',
+                'background': f'linear-gradient(90deg, {colors["green_primary"]} 0%, {colors["green_secondary"]} 100%)'
+            }),
+        
+            html.Div(style={
+                'display': 'flex',
+                'justifyContent': 'space-between',
+                'alignItems': 'center',
+                'flexWrap': 'wrap',
+                'gap': '20px',
+                'maxWidth': '1400px',
+                'margin': '0 auto'
+            }, children=[
+                html.Div(style={'display': 'flex', 'gap': '20px', 'alignItems': 'center'}, children=[
+                    html.Img(src=logo_unimag_base64, style={'height': '80px'}) if logo_unimag_base64 else html.Div(),
+                    html.Img(src=logo_brainystats_base64, style={'height': '80px'}) if logo_brainystats_base64 else html.Div(),
+                ]),
             
-            html.Div(style={'flex': '1', 'textAlign': 'center'}, children=[
-                html.H1("Gráficos de Control", style={
-                    'color': colors['text_light'],
-                    'fontSize': '42px',
-                    'fontWeight': '700',
-                    'margin': '0',
-                    'letterSpacing': '1px',
-                    'textTransform': 'uppercase'
-                }),
-                html.Div(style={
-                    'height': '3px',
-                    'width': '150px',
-                    'background': f'linear-gradient(90deg, {colors["accent_gold"]} 0%, {colors["accent_gold_light"]} 100%)',
-                    'margin': '15px auto',
-                    'borderRadius': '2px'
-                }),
-                html.P("Control Estadístico de Procesos", style={
-                    'color': colors['accent_gold_light'],
-                    'fontSize': '16px',
-                    'marginTop': '5px',
-                    'fontWeight': '500',
-                    'letterSpacing': '2px',
-                    'textTransform': 'uppercase'
-                }),
-                html.P("Universidad del Magdalena • Ingeniería Industrial", style={
-                    'color': 'rgba(255,255,255,0.7)',
-                    'fontSize': '14px',
-                    'marginTop': '8px',
-                    'fontWeight': '400'
-                }),
-            ]),
+                html.Div(style={'flex': '1', 'textAlign': 'center'}, children=[
+                    html.H1("Gráficos de Control", style={
+                        'color': colors['text_light'],
+                        'fontSize': '42px',
+                        'fontWeight': '700',
+                        'margin': '0',
+                        'letterSpacing': '1px',
+                        'textTransform': 'uppercase'
+                    }),
+                    html.Div(style={
+                        'height': '3px',
+                        'width': '150px',
+                        'background': f'linear-gradient(90deg, {colors["accent_gold"]} 0%, {colors["accent_gold_light"]} 100%)',
+                        'margin': '15px auto',
+                        'borderRadius': '2px'
+                    }),
+                    html.P("Control Estadístico de Procesos", style={
+                        'color': colors['accent_gold_light'],
+                        'fontSize': '16px',
+                        'marginTop': '5px',
+                        'fontWeight': '500',
+                        'letterSpacing': '2px',
+                        'textTransform': 'uppercase'
+                    }),
+                    html.P("Universidad del Magdalena • Ingeniería Industrial", style={
+                        'color': 'rgba(255,255,255,0.7)',
+                        'fontSize': '14px',
+                        'marginTop': '8px',
+                        'fontWeight': '400'
+                    }),
+                ]),
             
-            html.Img(src=logo_ing_base64, style={'height': '80px', 'filter': 'brightness(0) invert(1)'}) if logo_ing_base64 else html.Div(),
-        ])
-    ]),
+                html.Img(src=logo_ing_base64, style={'height': '80px', 'filter': 'brightness(0) invert(1)'}) if logo_ing_base64 else html.Div(),
+            ])
+        ]),
 
-    # Contenedor principal
-    html.Div(style={'padding': '40px', 'maxWidth': '1400px', 'margin': '0 auto'}, children=[
+        # Contenedor principal
+        html.Div(style={'padding': '40px', 'maxWidth': '1400px', 'margin': '0 auto'}, children=[
         
-        # Panel de configuración
-        html.Div(style={
-            'backgroundColor': colors['bg_card'],
-            'borderRadius': '12px',
-            'padding': '40px',
-            'marginBottom': '30px',
-            'boxShadow': f'0 8px 32px {colors["shadow"]}',
-            'border': f'1px solid {colors["border"]}',
-        }, children=[
-            html.Div(style={'borderLeft': f'5px solid {colors["accent_gold"]}', 'paddingLeft': '20px', 'marginBottom': '35px'}, children=[
-                html.H3("Configuración del Análisis", style={
-                    'color': colors['text_primary'],
-                    'margin': '0',
-                    'fontSize': '28px',
-                    'fontWeight': '700'
-                })
-            ]),
+            # Panel de configuración
+            html.Div(style={
+                'backgroundColor': colors['bg_card'],
+                'borderRadius': '12px',
+                'padding': '40px',
+                'marginBottom': '30px',
+                'boxShadow': f'0 8px 32px {colors["shadow"]}',
+                'border': f'1px solid {colors["border"]}',
+            }, children=[
+                html.Div(style={'borderLeft': f'5px solid {colors["accent_gold"]}', 'paddingLeft': '20px', 'marginBottom': '35px'}, children=[
+                    html.H3("Configuración del Análisis", style={
+                        'color': colors['text_primary'],
+                        'margin': '0',
+                        'fontSize': '28px',
+                        'fontWeight': '700'
+                    })
+                ]),
             
-            # Método de entrada
-            html.Label("Método de entrada de datos", style={
-                'color': colors['text_primary'],
-                'fontSize': '15px',
-                'fontWeight': '600',
-                'marginBottom': '15px',
-                'display': 'block',
-                'textTransform': 'uppercase',
-                'letterSpacing': '0.5px'
-            }),
-            dcc.RadioItems(
-                id='input-method',
-                options=[
-                    {'label': ' Subir archivo CSV/Excel', 'value': 'upload'},
-                    {'label': ' Entrada manual', 'value': 'manual'}
-                ],
-                value='upload',
-                inline=True,
-                style={'marginBottom': '30px'},
-                labelStyle={
+                # Método de entrada
+                html.Label("Método de entrada de datos", style={
                     'color': colors['text_primary'],
-                    'marginRight': '30px',
                     'fontSize': '15px',
-                    'cursor': 'pointer',
-                    'display': 'inline-flex',
-                    'alignItems': 'center',
-                    'fontWeight': '500'
-                }
-            ),
+                    'fontWeight': '600',
+                    'marginBottom': '15px',
+                    'display': 'block',
+                    'textTransform': 'uppercase',
+                    'letterSpacing': '0.5px'
+                }),
+                dcc.RadioItems(
+                    id='input-method',
+                    options=[
+                        {'label': ' Subir archivo CSV/Excel', 'value': 'upload'},
+                        {'label': ' Entrada manual', 'value': 'manual'},
+                        {'label': ' Formato largo (timestamp, máquina, valor)', 'value': 'long'},
+                        {'label': ' Seguir archivo de máquina', 'value': 'follow'}
+                    ],
+                    value='upload',
+                    inline=True,
+                    style={'marginBottom': '30px'},
+                    labelStyle={
+                        'color': colors['text_primary'],
+                        'marginRight': '30px',
+                        'fontSize': '15px',
+                        'cursor': 'pointer',
+                        'display': 'inline-flex',
+                        'alignItems': 'center',
+                        'fontWeight': '500'
+                    }
+                ),
 
-            # Upload
-            html.Div(id='upload-div', children=[
-                dcc.Upload(
-                    id='upload-data',
-                    children=html.Div([
-                        html.Div("📁", style={'fontSize': '60px', 'marginBottom': '15px', 'opacity': '0.7'}),
-                        html.Div('Arrastra tu archivo aquí', style={
-                            'fontSize': '20px',
-                            'fontWeight': '600',
+                # Upload
+                html.Div(id='upload-div', children=[
+                    dcc.Upload(
+                        id='upload-data',
+                        children=html.Div([
+                            html.Div("📁", style={'fontSize': '60px', 'marginBottom': '15px', 'opacity': '0.7'}),
+                            html.Div('Arrastra tus archivos aquí', style={
+                                'fontSize': '20px',
+                                'fontWeight': '600',
+                                'color': colors['text_primary'],
+                                'marginBottom': '8px'
+                            }),
+                            html.Div('o haz clic para seleccionar', style={
+                                'fontSize': '14px',
+                                'color': colors['text_secondary'],
+                                'fontWeight': '400'
+                            }),
+                            html.Div('CSV o XLSX', style={
+                                'fontSize': '13px',
+                                'color': colors['text_light'],
+                                'marginTop': '20px',
+                                'padding': '8px 24px',
+                                'background': colors['accent_gold'],
+                                'borderRadius': '6px',
+                                'display': 'inline-block',
+                                'fontWeight': '600',
+                                'letterSpacing': '1px'
+                            })
+                        ], style={'textAlign': 'center'}),
+                        style={
+                            'width': '100%',
+                            'minHeight': '220px',
+                            'borderRadius': '8px',
+                            'border': f'2px dashed {colors["border"]}',
+                            'background': '#FAFAFA',
+                            'display': 'flex',
+                            'alignItems': 'center',
+                            'justifyContent': 'center',
+                            'cursor': 'pointer',
+                            'transition': 'all 0.3s ease',
+                        },
+                        multiple=True
+                    ),
+                
+                    # 📝 Instrucciones de formato
+                    html.Div(style={
+                        'marginTop': '20px',
+                        'padding': '20px',
+                        'backgroundColor': '#F0F7FF',
+                        'borderRadius': '8px',
+                        'border': '1px solid #BBDEFB'
+                    }, children=[
+                        html.Div("📋 Formato del archivo:", style={
+                            'fontWeight': '700',
+                            'fontSize': '14px',
                             'color': colors['text_primary'],
-                            'marginBottom': '8px'
+                            'marginBottom': '12px',
+                            'textTransform': 'uppercase',
+                            'letterSpacing': '0.5px'
                         }),
-                        html.Div('o haz clic para seleccionar', style={
+                        html.Ul([
+                            html.Li("Cada COLUMNA representa una medición (x1, x2, x3, ...)", style={'marginBottom': '8px', 'fontSize': '13px'}),
+                            html.Li("Cada FILA representa un subgrupo/muestra", style={'marginBottom': '8px', 'fontSize': '13px'}),
+                            html.Li("NO incluir encabezados ni nombres de columnas", style={'marginBottom': '8px', 'fontSize': '13px', 'fontWeight': '600'}),
+                            html.Li("Solo valores numéricos", style={'marginBottom': '8px', 'fontSize': '13px'}),
+                            html.Li("Para I-MR (n = 1): una lectura por fila, en orden de producción", style={'marginBottom': '8px', 'fontSize': '13px'}),
+                            html.Li("Varios archivos a la vez (máquinas, turnos...) se analizan en paralelo y se comparan", style={'fontSize': '13px'}),
+                        ], style={'paddingLeft': '20px', 'margin': '0', 'color': colors['text_primary']}),
+                        html.Div(style={'marginTop': '15px', 'padding': '12px', 'backgroundColor': 'white', 'borderRadius': '6px', 'fontFamily': 'monospace', 'fontSize': '12px'}, children=[
+                            html.Div("Ejemplo CSV:", style={'fontWeight': '700', 'marginBottom': '8px', 'color': colors['text_primary']}),
+                            html.Pre("10.2,10.1,10.3,10.0,10.2\n10.3,10.2,10.4,10.1,10.3\n10.1,10.0,10.2,10.1,10.1", 
+                                    style={'margin': '0', 'color': '#1565C0'})
+                        ])
+                    ]),
+                
+                    html.Div(id='output-data-upload', style={'marginTop': '20px'})
+                ]),
+
+                # Formato largo
+                html.Div(id='long-div', style={'display': 'none'}, children=[
+                    html.Div(style={'marginTop': '20px', 'padding': '20px', 'backgroundColor': '#F0F7FF', 'borderRadius': '8px', 'border': '1px solid #BBDEFB'}, children=[
+                        html.Div("📋 Formato largo:", style={
+                            'fontWeight': '700',
                             'fontSize': '14px',
-                            'color': colors['text_secondary'],
-                            'fontWeight': '400'
+                            'color': colors['text_primary'],
+                            'marginBottom': '12px',
+                            'textTransform': 'uppercase',
+                            'letterSpacing': '0.5px'
                         }),
-                        html.Div('CSV o XLSX', style={
-                            'fontSize': '13px',
-                            'color': colors['text_light'],
-                            'marginTop': '20px',
-                            'padding': '8px 24px',
-                            'background': colors['accent_gold'],
-                            'borderRadius': '6px',
-                            'display': 'inline-block',
-                            'fontWeight': '600',
-                            'letterSpacing': '1px'
-                        })
-                    ], style={'textAlign': 'center'}),
-                    style={
+                        html.Ul([
+                            html.Li("Una FILA por lectura, CON encabezados (p. ej. timestamp, maquina, lote, valor)", style={'marginBottom': '8px', 'fontSize': '13px'}),
+                            html.Li("La columna de tiempo se reconoce por su nombre (timestamp, fecha, time...)", style={'marginBottom': '8px', 'fontSize': '13px'}),
+                            html.Li("El valor es la única columna numérica aparte de tiempo, lote y máquina, o la que se indique", style={'fontSize': '13px'}),
+                        ], style={'paddingLeft': '20px', 'margin': '0', 'color': colors['text_primary']}),
+                    ]),
+                    html.Div(style={'display': 'grid', 'gridTemplateColumns': '1fr 1fr', 'gap': '20px', 'marginTop': '20px'}, children=[
+                        html.Div([
+                            html.Label("Formar subgrupos por", style={'fontSize': '13px', 'fontWeight': '600', 'color': colors['text_primary'], 'marginBottom': '8px', 'display': 'block'}),
+                            dcc.Dropdown(
+                                id='modo-subgrupo',
+                                options=[{'label': etiqueta, 'value': modo} for modo, etiqueta in MODOS_SUBGRUPO.items()],
+                                value='conteo',
+                                clearable=False
+                            )
+                        ]),
+                        html.Div([
+                            html.Label("Parámetro (n, ventana '1h', turnos '6,14,22')", style={'fontSize': '13px', 'fontWeight': '600', 'color': colors['text_primary'], 'marginBottom': '8px', 'display': 'block'}),
+                            dcc.Input(id='parametro-subgrupo', type='text', value='5', style={
+                                'width': '100%',
+                                'padding': '10px',
+                                'borderRadius': '6px',
+                                'border': f'1px solid {colors["border"]}',
+                                'fontSize': '14px'
+                            })
+                        ]),
+                        html.Div([
+                            html.Label("Columna de valor (si hay varias numéricas)", style={'fontSize': '13px', 'fontWeight': '600', 'color': colors['text_primary'], 'marginBottom': '8px', 'display': 'block'}),
+                            dcc.Input(id='columna-valor', type='text', placeholder='Ej: valor', style={
+                                'width': '100%',
+                                'padding': '10px',
+                                'borderRadius': '6px',
+                                'border': f'1px solid {colors["border"]}',
+                                'fontSize': '14px'
+                            })
+                        ]),
+                        html.Div([
+                            html.Label("Columna de lote (modo lote)", style={'fontSize': '13px', 'fontWeight': '600', 'color': colors['text_primary'], 'marginBottom': '8px', 'display': 'block'}),
+                            dcc.Input(id='columna-lote', type='text', placeholder='Ej: lote', style={
+                                'width': '100%',
+                                'padding': '10px',
+                                'borderRadius': '6px',
+                                'border': f'1px solid {colors["border"]}',
+                                'fontSize': '14px'
+                            })
+                        ]),
+                        html.Div([
+                            html.Label("Filtrar máquina (columna=valor)", style={'fontSize': '13px', 'fontWeight': '600', 'color': colors['text_primary'], 'marginBottom': '8px', 'display': 'block'}),
+                            dcc.Input(id='filtro-maquina', type='text', placeholder='Ej: maquina=M2', style={
+                                'width': '100%',
+                                'padding': '10px',
+                                'borderRadius': '6px',
+                                'border': f'1px solid {colors["border"]}',
+                                'fontSize': '14px'
+                            })
+                        ]),
+                    ])
+                ]),
+
+                # Seguimiento de archivo
+                html.Div(id='follow-div', style={'display': 'none'}, children=[
+                    html.Label(f"Archivo CSV en la carpeta '{DIRECTORIO_SEGUIMIENTO}' del servidor (una línea por subgrupo)", style={
+                        'color': colors['text_primary'],
+                        'fontSize': '15px',
+                        'fontWeight': '600',
+                        'marginBottom': '12px',
+                        'display': 'block'
+                    }),
+                    dcc.Input(id='archivo-seguido', type='text', placeholder='Ej: cmm_linea1.csv', debounce=True, style={
                         'width': '100%',
-                        'minHeight': '220px',
-                        'borderRadius': '8px',
-                        'border': f'2px dashed {colors["border"]}',
-                        'background': '#FAFAFA',
-                        'display': 'flex',
-                        'alignItems': 'center',
-                        'justifyContent': 'center',
+                        'padding': '10px',
+                        'borderRadius': '6px',
+                        'border': f'1px solid {colors["border"]}',
+                        'fontSize': '14px'
+                    }),
+                    html.Div("Se leen solo las líneas nuevas cada 5 segundos. Los límites salen de lo que tiene el archivo "
+                             "al empezar a seguirlo y los subgrupos nuevos se evalúan contra ellos; "
+                             "Generar Análisis los recalcula con todo el archivo.",
+                             style={'fontSize': '13px', 'color': colors['text_secondary'], 'marginTop': '10px'}),
+                    dcc.Interval(id='intervalo-seguimiento', interval=5000, disabled=True),
+                    dcc.Store(id='version-seguimiento')
+                ]),
+
+                # Manual
+                html.Div(id='manual-div', style={'display': 'none'}, children=[
+                    html.Div([
+                        html.Label("Número de mediciones por subgrupo", style={
+                            'color': colors['text_primary'],
+                            'fontSize': '15px',
+                            'fontWeight': '600',
+                            'marginBottom': '12px',
+                            'display': 'block',
+                            'textTransform': 'uppercase',
+                            'letterSpacing': '0.5px'
+                        }),
+                        html.Div(style={'display': 'flex', 'gap': '15px', 'alignItems': 'center'}, children=[
+                            dcc.Input(
+                                id='num-mediciones',
+                                type='number',
+                                value=5,
+                                min=1,
+                                max=25,
+                                step=1,
+                                style={
+                                    'width': '120px',
+                                    'padding': '12px',
+                                    'borderRadius': '6px',
+                                    'border': f'1px solid {colors["border"]}',
+                                    'background': colors['bg_card'],
+                                    'color': colors['text_primary'],
+                                    'fontSize': '15px',
+                                    'fontWeight': '500'
+                                }
+                            ),
+                            html.Button('Actualizar tabla', id='update-table', n_clicks=0, style={
+                                'background': colors['accent_gold'],
+                                'color': colors['text_light'],
+                                'border': 'none',
+                                'padding': '12px 28px',
+                                'borderRadius': '6px',
+                                'fontSize': '14px',
+                                'fontWeight': '600',
+                                'cursor': 'pointer',
+                                'boxShadow': f'0 4px 12px {colors["shadow"]}',
+                                'transition': 'transform 0.2s ease',
+                                'textTransform': 'uppercase',
+                                'letterSpacing': '0.5px'
+                            }),
+                        ]),
+                    ], style={'marginBottom': '25px'}),
+
+                    dash_table.DataTable(
+                        id='manual-table',
+                        editable=True,
+                        row_deletable=True,
+                        style_table={'overflowX': 'auto', 'borderRadius': '8px', 'overflow': 'hidden', 'border': f'1px solid {colors["border"]}'},
+                        style_cell={
+                            'textAlign': 'center',
+                            'padding': '14px',
+                            'backgroundColor': colors['bg_card'],
+                            'color': colors['text_primary'],
+                            'border': f'1px solid {colors["border"]}',
+                            'fontWeight': '500',
+                            'fontSize': '14px'
+                        },
+                        style_header={
+                            'backgroundColor': colors['bg_primary'],
+                            'color': colors['text_light'],
+                            'fontWeight': '700',
+                            'border': 'none',
+                            'fontSize': '14px',
+                            'textTransform': 'uppercase',
+                            'letterSpacing': '0.5px'
+                        },
+                        style_data_conditional=[{
+                            'if': {'row_index': 'odd'},
+                            'backgroundColor': '#F9F9F9'
+                        }]
+                    ),
+
+                    html.Button('Agregar subgrupo', id='add-row', n_clicks=0, style={
+                        'marginTop': '18px',
+                        'background': 'transparent',
+                        'color': colors['text_primary'],
+                        'border': f'2px solid {colors["accent_gold"]}',
+                        'padding': '10px 24px',
+                        'borderRadius': '6px',
+                        'fontSize': '14px',
+                        'fontWeight': '600',
                         'cursor': 'pointer',
                         'transition': 'all 0.3s ease',
-                    },
-                    multiple=False
-                ),
-                
-                # 📝 Instrucciones de formato
-                html.Div(style={
-                    'marginTop': '20px',
-                    'padding': '20px',
-                    'backgroundColor': '#F0F7FF',
-                    'borderRadius': '8px',
-                    'border': '1px solid #BBDEFB'
-                }, children=[
-                    html.Div("📋 Formato del archivo:", style={
-                        'fontWeight': '700',
-                        'fontSize': '14px',
+                        'textTransform': 'uppercase',
+                        'letterSpacing': '0.5px'
+                    })
+                ]),
+
+                # Límites de Especificación (USL/LSL)
+                html.Div(style={'marginTop': '30px', 'padding': '25px', 'backgroundColor': '#F5F5F5', 'borderRadius': '8px', 'border': f'1px solid {colors["border"]}'}, children=[
+                    html.Label("Límites de Especificación (Opcionales)", style={
                         'color': colors['text_primary'],
-                        'marginBottom': '12px',
+                        'fontSize': '15px',
+                        'fontWeight': '600',
+                        'marginBottom': '15px',
+                        'display': 'block',
                         'textTransform': 'uppercase',
                         'letterSpacing': '0.5px'
                     }),
-                    html.Ul([
-                        html.Li("Cada COLUMNA representa una medición (x1, x2, x3, ...)", style={'marginBottom': '8px', 'fontSize': '13px'}),
-                        html.Li("Cada FILA representa un subgrupo/muestra", style={'marginBottom': '8px', 'fontSize': '13px'}),
-                        html.Li("NO incluir encabezados ni nombres de columnas", style={'marginBottom': '8px', 'fontSize': '13px', 'fontWeight': '600'}),
-                        html.Li("Solo valores numéricos", style={'fontSize': '13px'}),
-                    ], style={'paddingLeft': '20px', 'margin': '0', 'color': colors['text_primary']}),
-                    html.Div(style={'marginTop': '15px', 'padding': '12px', 'backgroundColor': 'white', 'borderRadius': '6px', 'fontFamily': 'monospace', 'fontSize': '12px'}, children=[
-                        html.Div("Ejemplo CSV:", style={'fontWeight': '700', 'marginBottom': '8px', 'color': colors['text_primary']}),
-                        html.Pre("10.2,10.1,10.3,10.0,10.2\n10.3,10.2,10.4,10.1,10.3\n10.1,10.0,10.2,10.1,10.1", 
-                                style={'margin': '0', 'color': '#1565C0'})
+                    html.P("Para calcular Cpk y Ppk, ingresa los límites de especificación de tu proceso", style={
+                        'fontSize': '13px',
+                        'color': colors['text_secondary'],
+                        'marginBottom': '15px',
+                        'fontWeight': '500'
+                    }),
+                    html.Div(style={'display': 'grid', 'gridTemplateColumns': '1fr 1fr', 'gap': '20px'}, children=[
+                        html.Div([
+                            html.Label("USL (Upper Specification Limit)", style={
+                                'fontSize': '13px',
+                                'fontWeight': '600',
+                                'color': colors['text_primary'],
+                                'marginBottom': '8px',
+                                'display': 'block'
+                            }),
+                            dcc.Input(
+                                id='usl-input',
+                                type='number',
+                                placeholder='Ej: 105.5',
+                                debounce=DEBOUNCE_ESPECIFICACIONES,
+                                style={
+                                    'width': '100%',
+                                    'padding': '12px',
+                                    'borderRadius': '6px',
+                                    'border': f'1px solid {colors["border"]}',
+                                    'background': colors['bg_card'],
+                                    'color': colors['text_primary'],
+                                    'fontSize': '14px',
+                                    'fontWeight': '500'
+                                }
+                            )
+                        ]),
+                        html.Div([
+                            html.Label("LSL (Lower Specification Limit)", style={
+                                'fontSize': '13px',
+                                'fontWeight': '600',
+                                'color': colors['text_primary'],
+                                'marginBottom': '8px',
+                                'display': 'block'
+                            }),
+                            dcc.Input(
+                                id='lsl-input',
+                                type='number',
+                                placeholder='Ej: 94.5',
+                                debounce=DEBOUNCE_ESPECIFICACIONES,
+                                style={
+                                    'width': '100%',
+                                    'padding': '12px',
+                                    'borderRadius': '6px',
+                                    'border': f'1px solid {colors["border"]}',
+                                    'background': colors['bg_card'],
+                                    'color': colors['text_primary'],
+                                    'fontSize': '14px',
+                                    'fontWeight': '500'
+                                }
+                            )
+                        ])
                     ])
                 ]),
-                
-                html.Div(id='output-data-upload', style={'marginTop': '20px'})
-            ]),
 
-            # Manual
-            html.Div(id='manual-div', style={'display': 'none'}, children=[
-                html.Div([
-                    html.Label("Número de mediciones por subgrupo", style={
+                # Tipo de gráfico
+                html.Div(style={'marginTop': '30px'}, children=[
+                    html.Label("Tipo de gráfico", style={
                         'color': colors['text_primary'],
                         'fontSize': '15px',
                         'fontWeight': '600',
@@ -282,681 +566,1366 @@ app.layout = html.Div(style={
                         'textTransform': 'uppercase',
                         'letterSpacing': '0.5px'
                     }),
-                    html.Div(style={'display': 'flex', 'gap': '15px', 'alignItems': 'center'}, children=[
-                        dcc.Input(
-                            id='num-mediciones',
-                            type='number',
-                            value=5,
-                            min=2,
-                            max=25,
-                            step=1,
-                            style={
-                                'width': '120px',
-                                'padding': '12px',
-                                'borderRadius': '6px',
-                                'border': f'1px solid {colors["border"]}',
-                                'background': colors['bg_card'],
-                                'color': colors['text_primary'],
-                                'fontSize': '15px',
-                                'fontWeight': '500'
-                            }
-                        ),
-                        html.Button('Actualizar tabla', id='update-table', n_clicks=0, style={
-                            'background': colors['accent_gold'],
-                            'color': colors['text_light'],
-                            'border': 'none',
-                            'padding': '12px 28px',
+                    dcc.Dropdown(
+                        id='chart-type',
+                        options=[
+                            {'label': 'X̄-R (Promedio y Rango)', 'value': 'XR'},
+                            {'label': 'X̄-S (Promedio y Desviación)', 'value': 'XS'},
+                            {'label': 'I-MR (Individuales y Rango Móvil)', 'value': 'IMR'},
+                            {'label': 'Z̄-W Corrida corta (1ª columna = número de parte)', 'value': 'ZW'}
+                        ],
+                        value='XR',
+                        style={
+                            'backgroundColor': colors['bg_card'],
                             'borderRadius': '6px',
-                            'fontSize': '14px',
-                            'fontWeight': '600',
-                            'cursor': 'pointer',
-                            'boxShadow': f'0 4px 12px {colors["shadow"]}',
-                            'transition': 'transform 0.2s ease',
-                            'textTransform': 'uppercase',
-                            'letterSpacing': '0.5px'
-                        }),
+                            'fontWeight': '500'
+                        }
+                    ),
+                    dcc.Checklist(
+                        id='limites-revisados',
+                        options=[{'label': ' Límites revisados (excluir puntos fuera de control y recalcular)', 'value': 'revisados'},
+                                 {'label': ' Límites robustos (medianas de los estadísticos por subgrupo; tienen prioridad sobre los revisados)',
+                                  'value': 'robustos'}],
+                        value=[],
+                        style={'marginTop': '15px', 'fontSize': '14px', 'color': colors['text_primary']}
+                    ),
+                    dcc.Checklist(
+                        id='recalculo-automatico',
+                        options=[{'label': ' Recalcular automáticamente al cambiar el tipo de gráfico o las especificaciones', 'value': 'auto'}],
+                        value=[],
+                        style={'marginTop': '10px', 'fontSize': '14px', 'color': colors['text_primary']}
+                    ),
+                    dcc.Store(id='id-sesion', storage_type='session'),
+                    dcc.Store(id='solicitud-automatica'),
+                ]),
+
+                # Botón generar
+                html.Button('Generar Análisis', id='generate-button', n_clicks=0, style={
+                    'marginTop': '35px',
+                    'width': '100%',
+                    'background': f'linear-gradient(135deg, {colors["accent_gold"]} 0%, {colors["accent_gold_light"]} 100%)',
+                    'color': colors['text_primary'],
+                    'border': 'none',
+                    'padding': '18px',
+                    'borderRadius': '8px',
+                    'fontSize': '16px',
+                    'fontWeight': '700',
+                    'cursor': 'pointer',
+                    'boxShadow': f'0 6px 20px {colors["shadow"]}',
+                    'transition': 'transform 0.2s ease',
+                    'textTransform': 'uppercase',
+                    'letterSpacing': '1.5px'
+                }),
+            ]),
+
+            # Exportación masiva de reportes
+            html.Div(style={
+                'backgroundColor': colors['bg_card'],
+                'borderRadius': '12px',
+                'padding': '30px 40px',
+                'marginBottom': '30px',
+                'boxShadow': f'0 8px 32px {colors["shadow"]}',
+                'border': f'1px solid {colors["border"]}',
+            }, children=[
+                html.Div(style={'borderLeft': f'5px solid {colors["accent_gold"]}', 'paddingLeft': '20px', 'marginBottom': '20px'}, children=[
+                    html.H3("Exportación Masiva de Reportes", style={
+                        'color': colors['text_primary'],
+                        'margin': '0',
+                        'fontSize': '24px',
+                        'fontWeight': '700'
+                    })
+                ]),
+                html.P("Un archivo por característica. Se usan el tipo de gráfico y los límites de especificación configurados arriba; "
+                       "el paquete zip incluye un reporte HTML y un CSV por característica, más un resumen general.", style={
+                    'fontSize': '13px',
+                    'color': colors['text_secondary'],
+                    'marginBottom': '15px',
+                    'fontWeight': '500'
+                }),
+                dcc.Upload(
+                    id='upload-lote',
+                    children=html.Div([
+                        html.Span("📦 ", style={'fontSize': '22px'}),
+                        html.Span("Arrastra o selecciona varios archivos CSV/XLSX", style={'fontSize': '15px', 'fontWeight': '600', 'color': colors['text_primary']})
                     ]),
-                ], style={'marginBottom': '25px'}),
+                    style={
+                        'width': '100%',
+                        'padding': '30px 0',
+                        'borderRadius': '8px',
+                        'border': f'2px dashed {colors["border"]}',
+                        'background': '#FAFAFA',
+                        'textAlign': 'center',
+                        'cursor': 'pointer'
+                    },
+                    multiple=True
+                ),
+                html.Div(id='enlace-lote', style={'marginTop': '20px'})
+            ]),
+
+            # Estudio Gage R&R
+            html.Div(style={
+                'backgroundColor': colors['bg_card'],
+                'borderRadius': '8px',
+                'padding': '40px',
+                'marginBottom': '30px',
+                'boxShadow': f'0 8px 32px {colors["shadow"]}',
+                'border': f'1px solid {colors["border"]}',
+            }, children=[
+                html.Div(style={'borderLeft': f'5px solid {colors["accent_gold"]}', 'paddingLeft': '20px', 'marginBottom': '20px'}, children=[
+                    html.H3("Estudio Gage R&R (Sistema de Medición)", style={
+                        'color': colors['text_primary'],
+                        'margin': '0',
+                        'fontSize': '24px',
+                        'fontWeight': '700'
+                    })
+                ]),
+                html.P("CSV/XLSX con encabezados y una fila por medición: parte, operador y valor (ANOVA cruzado, mismos ensayos por celda).", style={
+                    'fontSize': '13px',
+                    'color': colors['text_secondary'],
+                    'marginBottom': '15px',
+                    'fontWeight': '500'
+                }),
+                html.Div(style={'display': 'grid', 'gridTemplateColumns': '2fr 1fr', 'gap': '20px', 'alignItems': 'center'}, children=[
+                    dcc.Upload(
+                        id='upload-gage',
+                        children=html.Div([
+                            html.Span("📏 ", style={'fontSize': '22px'}),
+                            html.Span("Arrastra o selecciona el estudio", style={'fontSize': '15px', 'fontWeight': '600', 'color': colors['text_primary']})
+                        ]),
+                        style={
+                            'width': '100%',
+                            'padding': '30px 0',
+                            'borderRadius': '8px',
+                            'border': f'2px dashed {colors["border"]}',
+                            'background': '#FAFAFA',
+                            'textAlign': 'center',
+                            'cursor': 'pointer'
+                        }
+                    ),
+                    dcc.Input(id='tolerancia-gage', type='number', placeholder='Tolerancia (USL - LSL, opcional)', style={
+                        'width': '100%',
+                        'padding': '12px',
+                        'borderRadius': '6px',
+                        'border': f'1px solid {colors["border"]}',
+                        'fontSize': '14px'
+                    })
+                ]),
+                html.Div(id='resultado-gage', style={'marginTop': '20px'})
+            ]),
+
+            # Gráfico multivariado T² de Hotelling
+            html.Div(style={
+                'backgroundColor': colors['bg_card'],
+                'borderRadius': '8px',
+                'padding': '40px',
+                'marginBottom': '30px',
+                'boxShadow': f'0 8px 32px {colors["shadow"]}',
+                'border': f'1px solid {colors["border"]}',
+            }, children=[
+                html.Div(style={'borderLeft': f'5px solid {colors["accent_gold"]}', 'paddingLeft': '20px', 'marginBottom': '20px'}, children=[
+                    html.H3("Gráfico Multivariado T² de Hotelling", style={
+                        'color': colors['text_primary'],
+                        'margin': '0',
+                        'fontSize': '24px',
+                        'fontWeight': '700'
+                    })
+                ]),
+                html.P("CSV/XLSX con encabezados: una columna numérica por característica (p. ej. diámetro y redondez) y una fila por pieza. "
+                       "Las filas consecutivas forman los subgrupos.", style={
+                    'fontSize': '13px',
+                    'color': colors['text_secondary'],
+                    'marginBottom': '15px',
+                    'fontWeight': '500'
+                }),
+                html.Div(style={'display': 'grid', 'gridTemplateColumns': '2fr 1fr', 'gap': '20px', 'alignItems': 'center'}, children=[
+                    dcc.Upload(
+                        id='upload-multivariado',
+                        children=html.Div([
+                            html.Span("🧮 ", style={'fontSize': '22px'}),
+                            html.Span("Arrastra o selecciona las mediciones", style={'fontSize': '15px', 'fontWeight': '600', 'color': colors['text_primary']})
+                        ]),
+                        style={
+                            'width': '100%',
+                            'padding': '30px 0',
+                            'borderRadius': '8px',
+                            'border': f'2px dashed {colors["border"]}',
+                            'background': '#FAFAFA',
+                            'textAlign': 'center',
+                            'cursor': 'pointer'
+                        }
+                    ),
+                    dcc.Input(id='tamano-multivariado', type='number', min=1, value=1, placeholder='Tamaño de subgrupo', style={
+                        'width': '100%',
+                        'padding': '12px',
+                        'borderRadius': '6px',
+                        'border': f'1px solid {colors["border"]}',
+                        'fontSize': '14px'
+                    })
+                ]),
+                html.Div(id='resultado-multivariado', style={'marginTop': '20px'})
+            ]),
+
+            # Simulador ARL / curva OC
+            html.Div(style={
+                'backgroundColor': colors['bg_card'],
+                'borderRadius': '8px',
+                'padding': '40px',
+                'marginBottom': '30px',
+                'boxShadow': f'0 8px 32px {colors["shadow"]}',
+                'border': f'1px solid {colors["border"]}',
+            }, children=[
+                html.Div(style={'borderLeft': f'5px solid {colors["accent_gold"]}', 'paddingLeft': '20px', 'marginBottom': '20px'}, children=[
+                    html.H3("Simulador ARL y Curva OC", style={
+                        'color': colors['text_primary'],
+                        'margin': '0',
+                        'fontSize': '24px',
+                        'fontWeight': '700'
+                    })
+                ]),
+                html.P("Simulación Monte Carlo con el tipo de gráfico configurado arriba: cuántos subgrupos tarda en detectarse un "
+                       "desplazamiento de la media (ARL) y la probabilidad de no detectarlo en el primer subgrupo (β). "
+                       "Con desplazamiento 0 el ARL es la frecuencia de falsas alarmas.", style={
+                    'fontSize': '13px',
+                    'color': colors['text_secondary'],
+                    'marginBottom': '15px',
+                    'fontWeight': '500'
+                }),
+                html.Div(style={'display': 'grid', 'gridTemplateColumns': '1fr 2fr 1fr 2fr auto', 'gap': '20px', 'alignItems': 'center'}, children=[
+                    dcc.Input(id='n-arl', type='number', min=1, max=25, value=5, placeholder='n', style={
+                        'width': '100%',
+                        'padding': '10px',
+                        'borderRadius': '6px',
+                        'border': f'1px solid {colors["border"]}',
+                        'fontSize': '14px'
+                    }),
+                    dcc.Input(id='desplazamientos-arl', type='text', value=', '.join(f'{d:g}' for d in DESPLAZAMIENTOS),
+                              placeholder='Desplazamientos en σ', style={
+                        'width': '100%',
+                        'padding': '10px',
+                        'borderRadius': '6px',
+                        'border': f'1px solid {colors["border"]}',
+                        'fontSize': '14px'
+                    }),
+                    dcc.Input(id='series-arl', type='number', min=100, max=200000, value=SERIES_POR_DESPLAZAMIENTO, style={
+                        'width': '100%',
+                        'padding': '10px',
+                        'borderRadius': '6px',
+                        'border': f'1px solid {colors["border"]}',
+                        'fontSize': '14px'
+                    }),
+                    dcc.Checklist(
+                        id='reglas-arl',
+                        options=[{'label': f' Regla {r}', 'value': r} for r in range(1, 6)],
+                        value=[1, 2, 3, 4, 5],
+                        inline=True,
+                        style={'fontSize': '14px', 'color': colors['text_primary']}
+                    ),
+                    html.Button('Simular', id='simular-arl', n_clicks=0, style={
+                        'padding': '10px 25px',
+                        'background': colors['bg_primary'],
+                        'color': colors['text_light'],
+                        'border': 'none',
+                        'borderRadius': '6px',
+                        'cursor': 'pointer',
+                        'fontWeight': '600'
+                    })
+                ]),
+                dcc.Loading(html.Div(id='resultado-arl', style={'marginTop': '20px'}))
+            ]),
 
+            # Historial de análisis
+            html.Div(style={
+                'backgroundColor': colors['bg_card'],
+                'borderRadius': '8px',
+                'padding': '40px',
+                'marginBottom': '30px',
+                'boxShadow': f'0 8px 32px {colors["shadow"]}',
+                'border': f'1px solid {colors["border"]}',
+            }, children=[
+                html.Div(style={'borderLeft': f'5px solid {colors["accent_gold"]}', 'paddingLeft': '20px', 'marginBottom': '20px'}, children=[
+                    html.H3("Historial de Análisis", style={
+                        'color': colors['text_primary'],
+                        'margin': '0',
+                        'fontSize': '24px',
+                        'fontWeight': '700'
+                    })
+                ]),
+                html.P("Cada análisis generado se guarda con sus límites y capacidad. Selecciona una fila para volver a abrirlo sin recalcular.", style={
+                    'fontSize': '13px',
+                    'color': colors['text_secondary'],
+                    'marginBottom': '15px',
+                    'fontWeight': '500'
+                }),
+                html.Div(style={'display': 'grid', 'gridTemplateColumns': '1fr 1.4fr 1fr auto', 'gap': '20px', 'alignItems': 'center'}, children=[
+                    dcc.Input(id='proceso-historial', type='text', placeholder='Proceso (archivo, prefijo)', style={
+                        'width': '100%',
+                        'padding': '10px',
+                        'borderRadius': '6px',
+                        'border': f'1px solid {colors["border"]}',
+                        'fontSize': '14px'
+                    }),
+                    dcc.DatePickerRange(id='fechas-historial', display_format='YYYY-MM-DD', clearable=True),
+                    dcc.Dropdown(
+                        id='estado-historial',
+                        options=[
+                            {'label': 'Todos', 'value': 'todos'},
+                            {'label': 'Fuera de control', 'value': 'fuera'},
+                            {'label': 'En control', 'value': 'control'}
+                        ],
+                        value='todos',
+                        clearable=False
+                    ),
+                    html.Button('Buscar', id='buscar-historial', n_clicks=0, style={
+                        'padding': '10px 25px',
+                        'background': colors['bg_primary'],
+                        'color': colors['text_light'],
+                        'border': 'none',
+                        'borderRadius': '6px',
+                        'cursor': 'pointer',
+                        'fontWeight': '600'
+                    })
+                ]),
                 dash_table.DataTable(
-                    id='manual-table',
-                    editable=True,
-                    row_deletable=True,
-                    style_table={'overflowX': 'auto', 'borderRadius': '8px', 'overflow': 'hidden', 'border': f'1px solid {colors["border"]}'},
+                    id='tabla-historial',
+                    columns=[{'name': nombre, 'id': id_} for id_, nombre in COLUMNAS_HISTORIAL],
+                    data=[],
+                    row_selectable='single',
+                    selected_rows=[],
+                    page_size=15,
+                    style_table={'overflowX': 'auto', 'marginTop': '20px', 'borderRadius': '8px', 'border': f'1px solid {colors["border"]}'},
                     style_cell={
                         'textAlign': 'center',
-                        'padding': '14px',
+                        'padding': '10px',
                         'backgroundColor': colors['bg_card'],
                         'color': colors['text_primary'],
                         'border': f'1px solid {colors["border"]}',
-                        'fontWeight': '500',
-                        'fontSize': '14px'
+                        'fontSize': '13px'
                     },
                     style_header={
                         'backgroundColor': colors['bg_primary'],
                         'color': colors['text_light'],
                         'fontWeight': '700',
                         'border': 'none',
-                        'fontSize': '14px',
-                        'textTransform': 'uppercase',
-                        'letterSpacing': '0.5px'
+                        'fontSize': '13px',
+                        'textTransform': 'uppercase'
                     },
-                    style_data_conditional=[{
-                        'if': {'row_index': 'odd'},
-                        'backgroundColor': '#F9F9F9'
-                    }]
+                    style_data_conditional=[
+                        {'if': {'filter_query': '{estado} = "Fuera de control"', 'column_id': 'estado'}, 'color': colors['danger'], 'fontWeight': '700'}
+                    ]
                 ),
-
-                html.Button('Agregar subgrupo', id='add-row', n_clicks=0, style={
-                    'marginTop': '18px',
-                    'background': 'transparent',
-                    'color': colors['text_primary'],
-                    'border': f'2px solid {colors["accent_gold"]}',
-                    'padding': '10px 24px',
-                    'borderRadius': '6px',
-                    'fontSize': '14px',
-                    'fontWeight': '600',
-                    'cursor': 'pointer',
-                    'transition': 'all 0.3s ease',
-                    'textTransform': 'uppercase',
-                    'letterSpacing': '0.5px'
+                html.P(id='aviso-historial', style={
+                    'fontSize': '13px',
+                    'color': colors['text_secondary'],
+                    'marginTop': '10px'
                 })
             ]),
 
-            # Límites de Especificación (USL/LSL)
-            html.Div(style={'marginTop': '30px', 'padding': '25px', 'backgroundColor': '#F5F5F5', 'borderRadius': '8px', 'border': f'1px solid {colors["border"]}'}, children=[
-                html.Label("Límites de Especificación (Opcionales)", style={
-                    'color': colors['text_primary'],
-                    'fontSize': '15px',
-                    'fontWeight': '600',
-                    'marginBottom': '15px',
-                    'display': 'block',
-                    'textTransform': 'uppercase',
-                    'letterSpacing': '0.5px'
-                }),
-                html.P("Para calcular Cpk y Ppk, ingresa los límites de especificación de tu proceso", style={
-                    'fontSize': '13px',
-                    'color': colors['text_secondary'],
-                    'marginBottom': '15px',
-                    'fontWeight': '500'
-                }),
-                html.Div(style={'display': 'grid', 'gridTemplateColumns': '1fr 1fr', 'gap': '20px'}, children=[
-                    html.Div([
-                        html.Label("USL (Upper Specification Limit)", style={
-                            'fontSize': '13px',
-                            'fontWeight': '600',
-                            'color': colors['text_primary'],
-                            'marginBottom': '8px',
-                            'display': 'block'
-                        }),
-                        dcc.Input(
-                            id='usl-input',
-                            type='number',
-                            placeholder='Ej: 105.5',
-                            style={
-                                'width': '100%',
-                                'padding': '12px',
-                                'borderRadius': '6px',
-                                'border': f'1px solid {colors["border"]}',
-                                'background': colors['bg_card'],
-                                'color': colors['text_primary'],
-                                'fontSize': '14px',
-                                'fontWeight': '500'
-                            }
-                        )
+            # Vista previa aproximada: visible solo mientras corre el análisis completo
+            html.Div(id='vista-previa', style={'display': 'none'}),
+
+            # Área de resultados
+            # Cada pestaña se calcula y se envía solo cuando se abre
+            html.Div(id='results-area', style={'display': 'none'}, children=[
+                html.Div(id='alerta-principal'),
+                dcc.Store(id='clave-resultados'),
+                dcc.Store(id='pestanas-cargadas'),
+                dcc.Tabs(id='pestanas-resultados', value='grafico-x', style={'marginBottom': '20px'}, children=[
+                    dcc.Tab(label='Gráfico X̄ / I', value='grafico-x', children=[
+                        dcc.Graph(id='chart-xbar', config={'displayModeBar': False})
+                    ]),
+                    dcc.Tab(label='Gráfico R / S / MR', value='grafico-rs', children=[
+                        dcc.Graph(id='chart-rs', config={'displayModeBar': False})
+                    ]),
+                    dcc.Tab(label='Estadísticas', value='estadisticas', children=[
+                        html.Div(id='estadisticas-proceso', style={'paddingTop': '20px'})
+                    ]),
+                    dcc.Tab(label='Patrones', value='patrones', children=[
+                        html.Div(id='analisis-avanzado', style={'paddingTop': '20px'})
+                    ]),
+                    dcc.Tab(label='Recomendaciones', value='recomendaciones', children=[
+                        html.Div(id='recomendaciones', style={'paddingTop': '20px'})
+                    ]),
+                    # Se recalcula al abrirse o al cambiar los controles, sin pasar por `contenido_pestana`
+                    dcc.Tab(label='Escenarios Cpk', value='escenarios', children=[
+                        html.Div(style={'display': 'flex', 'gap': '30px', 'alignItems': 'center', 'paddingTop': '20px'}, children=[
+                            dcc.RadioItems(
+                                id='metrica-escenarios',
+                                options=[
+                                    {'label': ' Cpk', 'value': 'Cpk'},
+                                    {'label': ' Ppk', 'value': 'Ppk'},
+                                    {'label': ' PPM (within)', 'value': 'ppm_within'},
+                                    {'label': ' PPM (total)', 'value': 'ppm_total'}
+                                ],
+                                value='Cpk',
+                                inline=True,
+                                labelStyle={'marginRight': '20px', 'fontSize': '14px', 'color': colors['text_primary']}
+                            ),
+                            dcc.Dropdown(
+                                id='puntos-escenarios',
+                                options=[{'label': f'Malla {p} × {p}', 'value': p} for p in (50, 100, 250, 500)],
+                                value=100,
+                                clearable=False,
+                                style={'width': '180px', 'fontSize': '14px'}
+                            )
+                        ]),
+                        dcc.Loading(html.Div(id='mapa-escenarios', style={'paddingTop': '10px'}))
                     ]),
-                    html.Div([
-                        html.Label("LSL (Lower Specification Limit)", style={
-                            'fontSize': '13px',
-                            'fontWeight': '600',
-                            'color': colors['text_primary'],
-                            'marginBottom': '8px',
-                            'display': 'block'
-                        }),
-                        dcc.Input(
-                            id='lsl-input',
-                            type='number',
-                            placeholder='Ej: 94.5',
-                            style={
-                                'width': '100%',
-                                'padding': '12px',
-                                'borderRadius': '6px',
-                                'border': f'1px solid {colors["border"]}',
-                                'background': colors['bg_card'],
-                                'color': colors['text_primary'],
-                                'fontSize': '14px',
-                                'fontWeight': '500'
-                            }
-                        )
-                    ])
                 ])
-            ]),
+            ])
+        ])
+    ])
 
-            # Tipo de gráfico
-            html.Div(style={'marginTop': '30px'}, children=[
-                html.Label("Tipo de gráfico", style={
-                    'color': colors['text_primary'],
-                    'fontSize': '15px',
-                    'fontWeight': '600',
-                    'marginBottom': '12px',
-                    'display': 'block',
-                    'textTransform': 'uppercase',
-                    'letterSpacing': '0.5px'
-                }),
-                dcc.Dropdown(
-                    id='chart-type',
-                    options=[
-                        {'label': 'X̄-R (Promedio y Rango)', 'value': 'XR'},
-                        {'label': 'X̄-S (Promedio y Desviación)', 'value': 'XS'}
-                    ],
-                    value='XR',
-                    style={
-                        'backgroundColor': colors['bg_card'],
-                        'borderRadius': '6px',
-                        'fontWeight': '500'
-                    }
-                ),
-            ]),
+# Callbacks
+def update_manual_table(n_clicks, num_mediciones):
+    if num_mediciones < 1:
+        num_mediciones = 1
+    if num_mediciones > 25:
+        num_mediciones = 25
+    
+    cols = [{'name': 'Subgrupo', 'id': 'Subgrupo', 'editable': True, 'type': 'text'}] + \
+           [{'name': f'x{i+1}', 'id': f'x{i+1}', 'editable': True, 'type': 'numeric'} for i in range(num_mediciones)]
+    data = [{'Subgrupo': i+1, **{f'x{j+1}': None for j in range(num_mediciones)}} for i in range(10)]
+    return cols, data
+
+def add_row(n_clicks, rows):
+    if n_clicks > 0 and rows:
+        new_row = {'Subgrupo': len(rows)+1}
+        for k in rows[0].keys():
+            if k != 'Subgrupo':
+                new_row[k] = None
+        rows.append(new_row)
+    return rows
+
+def toggle_input_method(method):
+    oculto, visible = {'display': 'none'}, {'display': 'block'}
+    if method == 'upload':
+        return visible, oculto, oculto, oculto, True
+    elif method == 'long':
+        return visible, oculto, visible, oculto, True
+    elif method == 'follow':
+        return oculto, oculto, oculto, visible, False
+    else:
+        return oculto, visible, oculto, oculto, True
+
+def preparar_lote(contents_list, filenames, chart_type, USL, LSL):
+    if not contents_list:
+        return ""
+    archivos = [(nombre, base64.b64decode(contents.split(',')[1])) for contents, nombre in zip(contents_list, filenames)]
+    lote = guardar_lote(archivos)
+    parametros = urlencode({k: v for k, v in (('chart_type', chart_type), ('usl', USL), ('lsl', LSL)) if v is not None})
+    return html.A(f"⬇ Descargar paquete de {len(archivos)} reportes", href=f"/exportar/reportes/{lote}?{parametros}", style={
+        'display': 'inline-block',
+        'background': colors['accent_gold'],
+        'color': colors['text_light'],
+        'padding': '12px 28px',
+        'borderRadius': '6px',
+        'fontSize': '14px',
+        'fontWeight': '600',
+        'textDecoration': 'none',
+        'textTransform': 'uppercase',
+        'letterSpacing': '0.5px'
+    })
+
+def _respuesta_paquete(datasets):
+    chart_type = request.values.get('chart_type', 'XR')
+    USL = request.values.get('usl', type=float)
+    LSL = request.values.get('lsl', type=float)
+
+    return Response(generar_paquete_zip(datasets, chart_type, USL, LSL), mimetype='application/zip',
+                    headers={'Content-Disposition': 'attachment; filename="reportes_spc.zip"'})
+
+def exportar_lote(lote):
+    datasets = leer_lote(lote)
+    if datasets is None:
+        abort(404)
+    return _respuesta_paquete(datasets)
+
+def exportar_reportes():
+    """POST multipart con uno o más campos `archivos` (para uso desde scripts)"""
+    # Se pasan a un lote de a uno para no tener todos los archivos en memoria a la vez
+    lote = guardar_lote((f.filename, f.read()) for f in request.files.getlist('archivos'))
+    return _respuesta_paquete(leer_lote(lote))
+
+def exportar_subgrupos(id_analisis):
+    """
+    Tabla por subgrupo de un análisis del historial (?formato=csv|parquet).
+    Se entrega en bloques de filas, sin armar el archivo completo en memoria.
+    """
+    formato = request.values.get('formato', 'csv')
+    if formato not in ('csv', 'parquet'):
+        return {'error': "formato debe ser 'csv' o 'parquet'"}, 400
+    if formato == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        return {'error': 'La exportación a Parquet requiere pyarrow'}, 501
+    # Las series se leen del historial por tramos mientras se entrega la respuesta;
+    # la conexión se cierra al terminar (o al cortarse) la descarga
+    pila = ExitStack()
+    try:
+        resultado = pila.enter_context(series_guardadas(id_analisis))
+    except sqlite3.Error:
+        resultado = None
+    if resultado is None:
+        pila.close()
+        abort(404)
+    if formato == 'csv':
+        contenido, mimetype = csv_subgrupos(resultado), 'text/csv'
+    else:
+        contenido, mimetype = parquet_subgrupos(resultado), 'application/vnd.apache.parquet'
+    respuesta = Response(contenido, mimetype=mimetype,
+                         headers={'Content-Disposition': f'attachment; filename="subgrupos_{id_analisis}.{formato}"'})
+    respuesta.call_on_close(pila.close)
+    return respuesta
+
+def guardar_historial(caracteristica):
+    """POST multipart con un archivo `archivo` en formato largo; agrega sus subgrupos al historial"""
+    archivo = request.files.get('archivo')
+    if archivo is None:
+        abort(400)
+    try:
+        df = leer_formato_largo(archivo.read(), archivo.filename)
+        if df is None:
+            abort(400)
+        subgroups, inicio = subgrupos_formato_largo(df, request.values.get('modo', 'conteo'),
+                                                    request.values.get('parametro', 5),
+                                                    columna_valor=request.values.get('columna_valor'),
+                                                    columna_lote=request.values.get('columna_lote'))
+        if inicio is None:
+            raise ValueError("El historial requiere una columna de tiempo")
+        agregados = guardar_estadisticas(inicio, subgroups, caracteristica)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    return {'caracteristica': caracteristica, 'subgrupos': agregados}
+
+def consultar_historial(caracteristica):
+    """Límites, puntos y figuras de un periodo del historial (?desde=&hasta=&nivel=&chart_type=)"""
+    from plotly.io.json import to_json_plotly
+
+    try:
+        nivel, registros = leer_estadisticas(caracteristica, request.values.get('desde'),
+                                             request.values.get('hasta'), request.values.get('nivel'))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    if registros is None:
+        abort(404)
+    USL = request.values.get('usl', type=float)
+    LSL = request.values.get('lsl', type=float)
+    resultado = analizar_estadisticas(registros, request.values.get('chart_type', 'XR'), USL, LSL)
+    if resultado is None:
+        return {'error': 'Datos insuficientes en el periodo'}, 404
+    fig_x, fig_rs = figuras_analisis(resultado, USL, LSL)
+    resultado.update({'nivel': nivel, 'figura_x': fig_x, 'figura_rs': fig_rs})
+    return Response(to_json_plotly(resultado), mimetype='application/json')
+
+def estudio_gage(contents, tolerancia, filename):
+    """Tabla de componentes de varianza, %GRR, ndc y veredicto de un estudio Gage R&R"""
+    if contents is None:
+        return ""
+    try:
+        df = leer_formato_largo(base64.b64decode(contents.split(',')[1]), filename)
+        if df is None or df.shape[1] < 3:
+            raise ValueError("El archivo debe tener columnas de parte, operador y valor")
+        datos, partes, operadores = arreglo_gage(df)
+        resultado = anova_gage_rr(datos, tolerancia)
+    except ValueError as e:
+        return html.P(f"⚠️ {e}", style={'color': colors['danger'], 'fontWeight': '600'})
+
+    nombres = [('repetibilidad', 'Repetibilidad (EV)'), ('reproducibilidad', 'Reproducibilidad (AV)'),
+               ('operador', '  Operador'), ('interaccion', '  Operador × Parte'), ('grr', 'Gage R&R total'),
+               ('parte', 'Parte a parte (PV)'), ('total', 'Variación total (TV)')]
+    filas = []
+    for clave, nombre in nombres:
+        fila = {
+            'fuente': nombre,
+            'varianza': round(float(resultado['varianzas'][clave]), 6),
+            'contribucion': round(float(resultado['contribucion'][clave]), 2),
+            'estudio': round(float(resultado['variacion_estudio'][clave]), 2),
+        }
+        if 'tolerancia' in resultado:
+            fila['tolerancia'] = round(float(resultado['tolerancia'][clave]), 2)
+        filas.append(fila)
+    columnas = [('fuente', 'Fuente'), ('varianza', 'Varianza'), ('contribucion', '% Contribución'), ('estudio', '% Var. estudio')]
+    if 'tolerancia' in resultado:
+        columnas.append(('tolerancia', '% Tolerancia'))
 
-            # Botón generar
-            html.Button('Generar Análisis', id='generate-button', n_clicks=0, style={
-                'marginTop': '35px',
-                'width': '100%',
-                'background': f'linear-gradient(135deg, {colors["accent_gold"]} 0%, {colors["accent_gold_light"]} 100%)',
+    porcentaje_grr = float(resultado['variacion_estudio']['grr'])
+    veredicto = str(resultado['veredicto'])
+    color = colors['success'] if porcentaje_grr < 10 else colors['warning'] if porcentaje_grr <= 30 else colors['danger']
+    interaccion = resultado['anova']['interaccion']
+    return html.Div([
+        html.Div(style={'display': 'flex', 'gap': '30px', 'alignItems': 'center', 'marginBottom': '20px'}, children=[
+            html.Div([
+                html.Div("% GRR", style={'fontSize': '11px', 'color': colors['text_secondary']}),
+                html.Div(f"{porcentaje_grr:.2f}%", style={'fontSize': '32px', 'fontWeight': '700', 'color': color})
+            ]),
+            html.Div([
+                html.Div("ndc", style={'fontSize': '11px', 'color': colors['text_secondary']}),
+                html.Div(f"{int(resultado['ndc'])}", style={'fontSize': '32px', 'fontWeight': '700', 'color': colors['text_primary']})
+            ]),
+            html.Div(veredicto, style={'padding': '8px 16px', 'background': color, 'borderRadius': '6px', 'fontSize': '12px',
+                                       'fontWeight': '700', 'color': 'white', 'textTransform': 'uppercase'})
+        ]),
+        html.P(f"{len(partes)} partes × {len(operadores)} operadores × {resultado['ensayos']} ensayos • "
+               f"Interacción operador × parte: p = {float(interaccion['p']):.4f}"
+               f"{' (combinada con el error)' if resultado['interaccion_combinada'] else ''}",
+               style={'fontSize': '13px', 'color': colors['text_secondary']}),
+        dash_table.DataTable(
+            columns=[{'name': nombre, 'id': id_} for id_, nombre in columnas],
+            data=filas,
+            style_table={'overflowX': 'auto', 'borderRadius': '8px', 'border': f'1px solid {colors["border"]}'},
+            style_cell={
+                'textAlign': 'center',
+                'padding': '12px',
+                'backgroundColor': colors['bg_card'],
                 'color': colors['text_primary'],
-                'border': 'none',
-                'padding': '18px',
-                'borderRadius': '8px',
-                'fontSize': '16px',
+                'border': f'1px solid {colors["border"]}',
+                'fontWeight': '500',
+                'fontSize': '14px',
+                'whiteSpace': 'pre'
+            },
+            style_header={
+                'backgroundColor': colors['bg_primary'],
+                'color': colors['text_light'],
                 'fontWeight': '700',
-                'cursor': 'pointer',
-                'boxShadow': f'0 6px 20px {colors["shadow"]}',
-                'transition': 'transform 0.2s ease',
+                'border': 'none',
+                'fontSize': '14px',
                 'textTransform': 'uppercase',
-                'letterSpacing': '1.5px'
-            }),
-        ]),
+                'letterSpacing': '0.5px'
+            },
+            style_data_conditional=[
+                {'if': {'filter_query': '{fuente} = "Gage R&R total"'}, 'fontWeight': '700', 'backgroundColor': '#FFF8E1'}
+            ]
+        )
+    ])
 
-        # Área de resultados
-        html.Div(id='results-area', style={'display': 'none'}, children=[
-            html.Div(id='alerta-principal'),
-            html.Div(id='estadisticas-proceso'),
-            dcc.Graph(id='chart-xbar', config={'displayModeBar': False}),
-            dcc.Graph(id='chart-rs', config={'displayModeBar': False}),
-            html.Div(id='analisis-avanzado'),
-            html.Div(id='recomendaciones')
+def grafico_multivariado(contents, tamano, filename):
+    """Gráfico T² de Hotelling y tabla de los subgrupos que lo superan con sus características dominantes"""
+    if contents is None:
+        return ""
+    try:
+        df = leer_formato_largo(base64.b64decode(contents.split(',')[1]), filename)
+        if df is None:
+            raise ValueError("Formato de archivo no soportado")
+        datos, nombres = arreglo_multivariado(df, tamano or 1)
+        resultado = hotelling_t2(datos)
+    except ValueError as e:
+        return html.P(f"⚠️ {e}", style={'color': colors['danger'], 'fontWeight': '600'})
+
+    punto = 'Subgrupo' if resultado['n'] > 1 else 'Observación'
+    x_pos = np.arange(1, len(resultado['t2']) + 1)
+    figura = figura_control(
+        x_pos, resultado['t2'], resultado['CL'], resultado['UCL'], resultado['LCL'],
+        titulo="<b>Gráfico T² de Hotelling</b>", eje_x=f"Número de {punto}", eje_y="T²",
+        nombre='T²', punto=punto, color_linea=colors['chart_line1'], fuera_control=resultado['fuera_control']
+    )
+    fuera_control = resultado['fuera_control']
+    # Las tres características con mayor contribución univariada en cada señal
+    principales = np.argsort(-resultado['contribuciones'][fuera_control], axis=1)[:, :3]
+    filas = [{
+        'punto': int(i) + 1,
+        't2': round(float(resultado['t2'][i]), 3),
+        'caracteristicas': ', '.join(nombres[j] for j in principales[k])
+    } for k, i in enumerate(fuera_control[:100])]
+    color = colors['danger'] if len(fuera_control) else colors['success']
+    return html.Div([
+        html.P(f"{resultado['p']} características • {len(x_pos)} {'subgrupos' if resultado['n'] > 1 else 'observaciones'} de n = {resultado['n']} • "
+               f"UCL = {resultado['UCL']:.3f} (fase I, α = 0.0027) • {len(fuera_control)} fuera de control",
+               style={'fontSize': '14px', 'fontWeight': '600', 'color': color}),
+        dcc.Graph(figure=figura, config={'displayModeBar': False}),
+        dash_table.DataTable(
+            columns=[{'name': punto, 'id': 'punto'}, {'name': 'T²', 'id': 't2'},
+                     {'name': 'Características con mayor contribución', 'id': 'caracteristicas'}],
+            data=filas,
+            page_size=10,
+            style_table={'overflowX': 'auto', 'marginTop': '20px'},
+            style_cell={'textAlign': 'center', 'padding': '8px', 'fontSize': '13px', 'border': f'1px solid {colors["border"]}'},
+            style_header={'backgroundColor': colors['bg_primary'], 'color': colors['text_light'], 'fontWeight': '700', 'border': 'none'}
+        ) if filas else ""
+    ])
+
+def simulador_arl(n_clicks, chart_type, n, desplazamientos, series, reglas):
+    """Curvas ARL/OC y tabla de la simulación Monte Carlo para la configuración elegida"""
+    if not n_clicks:
+        return ""
+    try:
+        desplazamientos = [float(d) for d in (desplazamientos or '').replace(';', ',').split(',') if d.strip()]
+    except ValueError:
+        return html.P("⚠️ Los desplazamientos deben ser números separados por comas", style={'color': colors['danger'], 'fontWeight': '600'})
+    if not desplazamientos:
+        return ""
+    # Z̄-W usa los mismos límites que X̄-R en unidades estandarizadas
+    chart_type = 'XR' if chart_type == 'ZW' else chart_type
+    simulacion = simular_arl(chart_type, int(n or 5), reglas or (), desplazamientos,
+                             min(max(int(series or SERIES_POR_DESPLAZAMIENTO), 100), 200000))
+
+    filas = [{
+        'desplazamiento': f"{d:g}σ",
+        'arl': round(float(arl), 2),
+        'error': round(float(1.96 * error), 2),
+        'mediana': float(mediana),
+        'p90': float(p90),
+        'beta': round(float(beta), 4)
+    } for d, arl, error, mediana, p90, beta in zip(simulacion['desplazamientos'], simulacion['arl'], simulacion['error_estandar'],
+                                                   simulacion['mediana'], simulacion['percentil_90'], simulacion['oc'])]
+    columnas = [('desplazamiento', 'Desplazamiento'), ('arl', 'ARL'), ('error', '± IC 95%'), ('mediana', 'Mediana'),
+                ('p90', 'Percentil 90'), ('beta', 'β (OC)')]
+    return html.Div([
+        html.P(f"{simulacion['subgrupos_simulados']:,} subgrupos simulados ({simulacion['series']:,} series por desplazamiento). "
+               "El gráfico de dispersión (R, S o MR) también cuenta como señal.",
+               style={'fontSize': '13px', 'color': colors['text_secondary']}),
+        dcc.Graph(figure=figura_arl(simulacion), config={'displayModeBar': False}),
+        dash_table.DataTable(
+            columns=[{'name': nombre, 'id': id_} for id_, nombre in columnas],
+            data=filas,
+            style_table={'overflowX': 'auto', 'marginTop': '20px'},
+            style_cell={'textAlign': 'center', 'padding': '8px', 'fontSize': '13px', 'border': f'1px solid {colors["border"]}'},
+            style_header={'backgroundColor': colors['bg_primary'], 'color': colors['text_light'], 'fontWeight': '700', 'border': 'none'}
+        )
+    ])
+
+def comparar_archivos(contents_list, filenames, chart_type, USL, LSL):
+    """Vista de comparación: cada archivo se analiza en paralelo y se superpone"""
+    archivos = [(nombre, base64.b64decode(contents.split(',')[1])) for contents, nombre in zip(contents_list, filenames)]
+    analizados = analizar_archivos(archivos, chart_type, USL, LSL)
+    validos = [(nombre, resultado) for nombre, resultado in analizados if resultado is not None]
+    if not validos:
+        return resultados_vacios()
+
+    fig_x = figura_comparacion(validos, 'x', USL, LSL)
+    fig_rs = figura_comparacion(validos, 'rs')
+
+    fuera_control = [nombre for nombre, r in validos if r['num_fuera_control'] > 0 or r['violaciones']]
+    color_alerta = colors['danger'] if fuera_control else colors['success']
+    alerta_texto = html.Div([
+        html.Div(style={'display': 'flex', 'alignItems': 'center', 'gap': '20px'}, children=[
+            html.Div("⚠️" if fuera_control else "✓", style={'fontSize': '60px', 'color': color_alerta, 'fontWeight': 'bold'}),
+            html.Div([
+                html.Div(f"Comparación de {len(validos)} archivos", style={'fontSize': '28px', 'fontWeight': '700', 'marginBottom': '8px'}),
+                html.Div(f"{len(fuera_control)} fuera de control • {len(analizados) - len(validos)} sin datos válidos",
+                        style={'fontSize': '16px', 'fontWeight': '500', 'opacity': '0.9'})
+            ])
         ])
     ])
-])
+    alerta_style = {
+        'padding': '30px 40px',
+        'borderRadius': '8px',
+        'marginBottom': '30px',
+        'backgroundColor': '#FFEBEE' if fuera_control else '#E8F5E9',
+        'border': f'1px solid {color_alerta}',
+        'borderLeft': f'5px solid {color_alerta}',
+        'boxShadow': f'0 4px 12px {colors["shadow"]}',
+        'color': colors['text_primary']
+    }
 
-# Callbacks
-@app.callback(
-    Output('manual-table', 'columns'),
-    Output('manual-table', 'data'),
-    Input('update-table', 'n_clicks'),
-    State('num-mediciones', 'value')
-)
-def update_manual_table(n_clicks, num_mediciones):
-    if num_mediciones < 2:
-        num_mediciones = 2
-    if num_mediciones > 25:
-        num_mediciones = 25
-    
-    cols = [{'name': 'Subgrupo', 'id': 'Subgrupo', 'editable': True, 'type': 'text'}] + \
-           [{'name': f'x{i+1}', 'id': f'x{i+1}', 'editable': True, 'type': 'numeric'} for i in range(num_mediciones)]
-    data = [{'Subgrupo': i+1, **{f'x{j+1}': None for j in range(num_mediciones)}} for i in range(10)]
-    return cols, data
+    def indice(capacidad, clave):
+        return round(capacidad[clave], 3) if capacidad and clave in capacidad else None
 
-@app.callback(
-    Output('manual-table', 'data', allow_duplicate=True),
-    Input('add-row', 'n_clicks'),
-    State('manual-table', 'data'),
-    prevent_initial_call='initial_duplicate'
-)
-def add_row(n_clicks, rows):
-    if n_clicks > 0 and rows:
-        new_row = {'Subgrupo': len(rows)+1}
-        for k in rows[0].keys():
-            if k != 'Subgrupo':
-                new_row[k] = None
-        rows.append(new_row)
-    return rows
+    filas = [{
+        'archivo': nombre,
+        'grafico': r['chart_type'],
+        'subgrupos': len(r['x']),
+        'CL': round(r['CLx'], 4),
+        'UCL': round(r['UCLx'], 4),
+        'LCL': round(r['LCLx'], 4),
+        'Cp': indice(r['capacidad'], 'Cp'),
+        'Cpk': indice(r['capacidad'], 'Cpk'),
+        'fuera': r['num_fuera_control'],
+        'patrones': len(r['violaciones'])
+    } for nombre, r in validos]
+    columnas = [('archivo', 'Archivo'), ('grafico', 'Gráfico'), ('subgrupos', 'Subgrupos'), ('CL', 'CL'),
+                ('UCL', 'UCL'), ('LCL', 'LCL'), ('Cp', 'Cp'), ('Cpk', 'Cpk'),
+                ('fuera', 'Fuera de control'), ('patrones', 'Patrones')]
+    tabla = dash_table.DataTable(
+        columns=[{'name': nombre, 'id': id_} for id_, nombre in columnas],
+        data=filas,
+        sort_action='native',
+        style_table={'overflowX': 'auto', 'borderRadius': '8px', 'border': f'1px solid {colors["border"]}', 'marginBottom': '30px'},
+        style_cell={
+            'textAlign': 'center',
+            'padding': '14px',
+            'backgroundColor': colors['bg_card'],
+            'color': colors['text_primary'],
+            'border': f'1px solid {colors["border"]}',
+            'fontWeight': '500',
+            'fontSize': '14px'
+        },
+        style_header={
+            'backgroundColor': colors['bg_primary'],
+            'color': colors['text_light'],
+            'fontWeight': '700',
+            'border': 'none',
+            'fontSize': '14px',
+            'textTransform': 'uppercase',
+            'letterSpacing': '0.5px'
+        },
+        style_data_conditional=[
+            {'if': {'filter_query': '{Cpk} < 1', 'column_id': 'Cpk'}, 'color': colors['danger'], 'fontWeight': '700'},
+            {'if': {'filter_query': '{Cpk} >= 1.33', 'column_id': 'Cpk'}, 'color': colors['success'], 'fontWeight': '700'},
+            {'if': {'filter_query': '{fuera} > 0', 'column_id': 'fuera'}, 'color': colors['danger'], 'fontWeight': '700'}
+        ]
+    )
 
-@app.callback(
-    [Output('upload-div', 'style'),
-     Output('manual-div', 'style')],
-    Input('input-method', 'value')
-)
-def toggle_input_method(method):
-    if method == 'upload':
-        return {'display': 'block'}, {'display': 'none'}
+    recomendaciones_html = html.Div(style={
+        'backgroundColor': colors['bg_card'],
+        'borderRadius': '8px',
+        'padding': '35px',
+        'border': f'1px solid {colors["border"]}',
+        'borderLeft': f'5px solid {colors["accent_gold"]}',
+        'boxShadow': f'0 4px 12px {colors["shadow"]}'
+    }, children=[
+        html.H4("Recomendaciones por archivo", style={
+            'color': colors['text_primary'],
+            'margin': '0 0 25px 0',
+            'fontSize': '24px',
+            'fontWeight': '700'
+        }),
+        *[html.Div([
+            html.Div(nombre, style={'fontWeight': '700', 'marginBottom': '8px', 'fontSize': '15px'}),
+            html.Ul([html.Li(rec, style={'color': colors['text_primary'], 'marginBottom': '6px', 'fontSize': '14px'})
+                     for rec in r['recomendaciones']], style={'paddingLeft': '25px'})
+        ]) for nombre, r in validos]
+    ])
+
+    # Sin clave: la comparación se envía completa y las pestañas no piden nada más
+    return (fig_x, fig_rs, alerta_texto, alerta_style, tabla, "", recomendaciones_html, {'display': 'block'}, None, None)
+
+def subgrupos_desde_formato_largo(contents, filename, modo, parametro, columna_lote=None, filtro_maquina=None,
+                                  columna_valor=None):
+    content_type, content_string = contents.split(',')
+    df = leer_formato_largo(base64.b64decode(content_string), filename)
+    if df is None or df.empty:
+        return None
+    columna_maquina, maquina = None, None
+    if filtro_maquina and '=' in filtro_maquina:
+        columna_maquina, maquina = (s.strip() for s in filtro_maquina.split('=', 1))
+    subgroups, _ = subgrupos_formato_largo(df, modo or 'conteo', parametro or 5,
+                                           columna_valor=(columna_valor or '').strip() or None,
+                                           columna_lote=columna_lote or None,
+                                           columna_maquina=columna_maquina, maquina=maquina)
+    return subgroups
+
+def historial_revision(resultado, etiquetas):
+    """Límites y puntos excluidos en cada iteración de los límites revisados"""
+    filas = []
+    for it in resultado['iteraciones']:
+        excluidos = ', '.join(str(i) for i in it['excluidos']) or 'ninguno (límites estables)'
+        filas.append(html.Li(
+            f"Iteración {it['iteracion']}: {etiquetas['x']} CL = {it['CLx']:.4f}, UCL = {it['UCLx']:.4f}, "
+            f"LCL = {it['LCLx']:.4f} • {etiquetas['rs']} CL = {it['CLrs']:.4f}, UCL = {it['UCLrs']:.4f} • "
+            f"Excluidos: {excluidos}",
+            style={'color': colors['text_primary'], 'marginBottom': '8px', 'fontSize': '14px'}
+        ))
+    return html.Div([
+        html.Div("LÍMITES REVISADOS", style={'fontSize': '12px', 'fontWeight': '700', 'color': colors['text_secondary'], 'letterSpacing': '1px', 'marginBottom': '15px'}),
+        html.Div([
+            html.P(f"{len(resultado['excluidos_x'])} {etiquetas['punto'].lower()}(s) excluidos del cálculo de límites y capacidad",
+                   style={'fontWeight': '600', 'marginTop': '0'}),
+            html.Ul(filas, style={'paddingLeft': '20px', 'margin': '0'})
+        ], style={'padding': '20px', 'backgroundColor': '#FAFAFA', 'borderRadius': '6px', 'marginBottom': '30px'})
+    ])
+
+def comparacion_limites(resultado, etiquetas):
+    """Límites robustos junto a los clásicos (promedios) de los mismos datos"""
+    clasicos = resultado['limites_clasicos']
+
+    def fila(nombre, clasico, robusto):
+        return {'limite': nombre, 'clasico': round(float(clasico), 4), 'robusto': round(float(robusto), 4),
+                'diferencia': f"{(robusto - clasico) / abs(clasico):+.1%}" if clasico else '—'}
+
+    filas = [fila(f"{etiquetas[serie]} {limite}", clasicos[limite + serie], resultado[limite + serie])
+             for serie in ('x', 'rs') for limite in ('CL', 'UCL', 'LCL')]
+    filas += [fila("σ de las lecturas", resultado['sigma_clasica'], resultado['sigma_robusta']),
+              fila(f"Dispersión de {etiquetas['x']} (desv. est. / 1.4826·MAD)",
+                   resultado['dispersion_x']['clasica'], resultado['dispersion_x']['robusta'])]
+    columnas = [('limite', ''), ('clasico', 'Clásico'), ('robusto', 'Robusto'), ('diferencia', 'Diferencia')]
+    return html.Div([
+        html.Div("LÍMITES ROBUSTOS VS. CLÁSICOS", style={'fontSize': '12px', 'fontWeight': '700', 'color': colors['text_secondary'], 'letterSpacing': '1px', 'marginBottom': '15px'}),
+        html.Div([
+            html.P("Los gráficos usan los límites robustos (medianas). Una diferencia grande indica valores extremos "
+                   "que inflan los promedios de los límites clásicos.", style={'marginTop': '0', 'fontSize': '14px'}),
+            dash_table.DataTable(
+                columns=[{'name': nombre, 'id': id_} for id_, nombre in columnas],
+                data=filas,
+                style_table={'overflowX': 'auto'},
+                style_cell={'textAlign': 'center', 'padding': '8px', 'fontSize': '13px', 'border': f'1px solid {colors["border"]}'},
+                style_header={'backgroundColor': colors['bg_primary'], 'color': colors['text_light'], 'fontWeight': '700', 'border': 'none'}
+            )
+        ], style={'padding': '20px', 'backgroundColor': '#FAFAFA', 'borderRadius': '6px', 'marginBottom': '30px'})
+    ])
+
+def descarga_subgrupos(id_analisis):
+    """Enlaces a la tabla por subgrupo de un análisis guardado en el historial"""
+    estilo = {'color': colors['accent_gold'], 'fontWeight': '600', 'textDecoration': 'none', 'marginRight': '20px'}
+    return html.Div([
+        html.Div("TABLA POR SUBGRUPO", style={'fontSize': '12px', 'fontWeight': '700', 'color': colors['text_secondary'], 'letterSpacing': '1px', 'marginBottom': '15px'}),
+        html.Div([
+            html.A("⬇ CSV", href=f"/exportar/subgrupos/{id_analisis}?formato=csv", style=estilo),
+            html.A("⬇ Parquet", href=f"/exportar/subgrupos/{id_analisis}?formato=parquet", style=estilo),
+            html.Span("Estadísticos, puntos fuera de control y reglas 2-5 de cada subgrupo",
+                      style={'fontSize': '13px', 'color': colors['text_secondary']})
+        ], style={'padding': '20px', 'backgroundColor': '#FAFAFA', 'borderRadius': '6px', 'marginTop': '30px'})
+    ])
+
+def resumen_corrida_corta(resultado):
+    """Objetivo y dispersión media con que se estandarizó cada número de parte"""
+    resumen = resultado['resumen_partes']
+    dispersion = 'MR̄' if resultado['chart_type'] == 'ZMR' else 'R̄'
+    filas = [{'parte': str(parte), 'subgrupos': int(subgrupos), 'objetivo': round(float(objetivo), 4),
+              'dispersion': round(float(valor), 4)}
+             for parte, subgrupos, objetivo, valor in zip(resumen['parte'], resumen['subgrupos'],
+                                                          resumen['objetivo'], resumen['dispersion'])]
+    omitidas = resultado['partes_omitidas']
+    return html.Div([
+        html.Div("CORRIDA CORTA", style={'fontSize': '12px', 'fontWeight': '700', 'color': colors['text_secondary'], 'letterSpacing': '1px', 'marginBottom': '15px'}),
+        html.P(f"{len(filas)} números de parte en un solo gráfico"
+               f"{f' • {omitidas} omitidos por no tener dispersión propia (una sola lectura o lecturas iguales)' if omitidas else ''}",
+               style={'fontWeight': '600', 'marginTop': '0'}),
+        dash_table.DataTable(
+            columns=[{'name': 'Parte', 'id': 'parte'}, {'name': 'Subgrupos', 'id': 'subgrupos'},
+                     {'name': 'Objetivo', 'id': 'objetivo'}, {'name': dispersion, 'id': 'dispersion'}],
+            data=filas,
+            page_size=10,
+            sort_action='native',
+            style_table={'overflowX': 'auto', 'marginBottom': '30px'},
+            style_cell={'textAlign': 'center', 'padding': '8px', 'fontSize': '13px', 'border': f'1px solid {colors["border"]}'},
+            style_header={'backgroundColor': colors['bg_primary'], 'color': colors['text_light'], 'fontWeight': '700', 'border': 'none'}
+        )
+    ])
+
+def panel_autocorrelacion(resultado, etiquetas):
+    """ACF/PACF de la serie graficada y, si hay autocorrelación, gráfico I-MR de los residuos del AR ajustado"""
+    diagnostico = resultado['autocorrelacion']
+    significativos = diagnostico['rezagos_significativos']
+    hijos = [
+        html.Div("AUTOCORRELACIÓN", style={'fontSize': '12px', 'fontWeight': '700', 'color': colors['text_secondary'], 'letterSpacing': '1px', 'marginBottom': '15px'})
+    ]
+    if len(significativos) == 0:
+        hijos.append(html.P("✓ Sin autocorrelación significativa: el supuesto de independencia de los límites es razonable",
+                            style={'color': colors['success'], 'fontWeight': '600'}))
     else:
-        return {'display': 'none'}, {'display': 'block'}
+        rezagos = ', '.join(str(r) for r in significativos[:10])
+        if len(significativos) > 10:
+            rezagos += f" y {len(significativos) - 10} más"
+        hijos.append(html.P(f"⚠️ Autocorrelación significativa en los rezagos {rezagos}. Los límites y las reglas "
+                            "Western Electric suponen puntos independientes, así que pueden aparecer falsas alarmas.",
+                            style={'color': colors['danger'], 'fontWeight': '600'}))
+    hijos.append(dcc.Graph(figure=figura_autocorrelacion(diagnostico), config={'displayModeBar': False}))
 
-def parse_contents(contents, filename):
-    if contents is None:
+    orden = diagnostico['orden_ar']
+    if len(significativos) and orden > 0:
+        residuos = residuos_ar(resultado['x'], diagnostico['media'], diagnostico['coeficientes_ar'])
+        limites = calcular_limites_imr(residuos)
+        x_pos = np.arange(orden + 1, orden + 1 + len(residuos))
+        fuera_control = np.flatnonzero((residuos > limites['UCL']) | (residuos < limites['LCL']))
+        coeficientes = ', '.join(f"{c:.3f}" for c in diagnostico['coeficientes_ar'])
+        hijos += [
+            html.P(f"Modelo AR({orden}) ajustado (φ = {coeficientes}, orden por AIC). Sus residuos son aproximadamente "
+                   f"independientes: {len(fuera_control)} fuera de los límites I-MR de los residuos.",
+                   style={'fontSize': '14px', 'color': colors['text_primary']}),
+            dcc.Graph(figure=figura_control(
+                x_pos, residuos, limites['CL'], limites['UCL'], limites['LCL'],
+                titulo=f"<b>Residuos del AR({orden})</b>", eje_x=etiquetas['eje_x'], eje_y="Residuo",
+                nombre='Residuo', punto=etiquetas['punto'], color_linea=colors['chart_line1'],
+                fuera_control=fuera_control, zonas=True
+            ), config={'displayModeBar': False})
+        ]
+    return html.Div(hijos, style={'marginTop': '30px'})
+
+# Monitores del seguimiento de archivos (por worker), con la misma clave que su resultado
+MONITORES_EN_MEMORIA = 4
+_monitores = OrderedDict()
+
+def clave_seguimiento(ruta, inodo, base, chart_type, USL, LSL, opciones):
+    """Clave del análisis seguido: la misma en todos los workers para el mismo archivo, fase base y parámetros"""
+    texto = repr((ruta, inodo, base, chart_type, USL, LSL, sorted(opciones)))
+    return 'seguimiento-' + hashlib.sha256(texto.encode()).hexdigest()[:16]
+
+def monitor_seguimiento(clave, subgroups, chart_type, USL, LSL, opciones):
+    """Monitor de la clave; si este worker no lo tiene, lo crea con `subgroups` como fase base"""
+    with _bloqueo_resultados:
+        monitor = _monitores.get(clave)
+        if monitor is not None:
+            _monitores.move_to_end(clave)
+            return monitor
+    monitor = iniciar_monitor(subgroups, chart_type, USL, LSL, 'revisados' in opciones, 'robustos' in opciones)
+    if monitor is None:
         return None
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
+    with _bloqueo_resultados:
+        monitor = _monitores.setdefault(clave, monitor)
+        while len(_monitores) > MONITORES_EN_MEMORIA:
+            _monitores.popitem(last=False)
+    return monitor
+
+def puntos_nuevos(x, y, fuera_control, inicio):
+    """extendData para la serie y la traza de fuera de control con los puntos desde `inicio`"""
+    fuera_control = fuera_control[np.searchsorted(fuera_control, inicio):]
+    return [{'x': [x[inicio:], x[fuera_control]], 'y': [y[inicio:], y[fuera_control]]}, [0, 1]]
+
+def actualizar_seguimiento(n_intervals, nombre, seguimiento, chart_type, USL, LSL, limites_revisados=None,
+                           pestana='grafico-x', clave_mostrada=None):
+    """
+    Relee el archivo seguido. La primera vez (o si cambian el archivo, los parámetros
+    o el análisis mostrado) analiza todo lo leído como fase base; después solo evalúa
+    los subgrupos nuevos (`avanzar_monitor`) y los agrega al gráfico abierto con
+    extendData, así que cada consulta cuesta según lo nuevo y no según el archivo.
+    """
+    ruta = ruta_seguimiento(nombre)
+    if ruta is None:
+        return (dash.no_update,) * 13
+    subgroups, version = seguir_archivo(ruta)
+    disparo = dash.callback_context.triggered_id
+    seguimiento = seguimiento or {}
+    if version == seguimiento.get('version') and disparo == 'intervalo-seguimiento':
+        return (dash.no_update,) * 13
+    if chart_type == 'ZW':
+        USL = LSL = None
+    opciones = limites_revisados or []
+    inodo = version.split(':')[0]
+    # La fase base se conserva mientras sigan el mismo archivo y el mismo análisis en pantalla
+    continuar = (disparo == 'intervalo-seguimiento' and seguimiento.get('inodo') == inodo
+                 and seguimiento.get('clave') == clave_mostrada and seguimiento['base'] <= len(subgroups))
+    base = seguimiento['base'] if continuar else len(subgroups)
+    clave = clave_seguimiento(ruta, inodo, base, chart_type, USL, LSL, opciones)
+    monitor = monitor_seguimiento(clave, subgroups[:base], chart_type, USL, LSL, opciones) if base else None
+    if monitor is None:
+        return (*resultados_vacios(), dash.no_update, dash.no_update, None)
+    if monitor['filas'] > len(subgroups):
+        # Truncado y vuelto a crecer con el mismo inodo: el monitor ya no corresponde al archivo
+        with _bloqueo_resultados:
+            _monitores.pop(clave, None)
+        return actualizar_seguimiento(n_intervals, nombre, None, chart_type, USL, LSL, limites_revisados, pestana)
+    with monitor['bloqueo']:
+        avanzar_monitor(monitor, subgroups)
+        resultado = monitor['resultado']
+        recordar_resultado(resultado, USL, LSL, clave=clave)
+        nuevo = {'version': version, 'inodo': inodo, 'base': base, 'clave': clave,
+                 'puntos_x': len(resultado['x']), 'puntos_rs': len(resultado['rs'])}
+        if not continuar or clave != seguimiento['clave']:
+            return (*resultados_analisis(resultado, USL, LSL, pestana=pestana, clave=clave),
+                    dash.no_update, dash.no_update, nuevo)
+
+        # Misma fase base: solo los puntos nuevos para el gráfico abierto; las demás
+        # pestañas se recalculan al abrirlas
+        extension_x = extension_rs = dash.no_update
+        if pestana == 'grafico-x':
+            extension_x = puntos_nuevos(resultado['x_pos'], resultado['x'], resultado['fuera_control_x'],
+                                        seguimiento['puntos_x'])
+        elif pestana == 'grafico-rs':
+            extension_rs = puntos_nuevos(resultado['x_rs'], resultado['rs'], resultado['fuera_control_rs'],
+                                         seguimiento['puntos_rs'])
+        contenido = dict.fromkeys(PESTANAS_RESULTADOS[2:], dash.no_update)
+        if pestana in contenido:
+            contenido[pestana] = seccion_resultados(pestana, resultado, USL, LSL)
+        alerta_texto, alerta_style = alerta_analisis(resultado)
+    return (dash.no_update, dash.no_update, alerta_texto, alerta_style, contenido['estadisticas'],
+            contenido['patrones'], contenido['recomendaciones'], dash.no_update, dash.no_update,
+            {'clave': clave, 'pestanas': [pestana]}, extension_x, extension_rs, nuevo)
+
+def analizar_con_historial(subgroups, chart_type, USL, LSL, limites_revisados, proceso, partes=None,
+                           estadisticas=None):
+    """
+    Reutiliza el análisis guardado de los mismos datos y parámetros, o lo calcula y lo guarda.
+    Devuelve (resultado, id en el historial o None si no se pudo guardar).
+    estadisticas: las de `a_subgrupos`, si se tienen, para no recorrer otra vez la matriz.
+    """
+    revisados, robustos = 'revisados' in (limites_revisados or []), 'robustos' in (limites_revisados or [])
+    huella = huella_datos(subgroups, chart_type, USL, LSL, revisados, partes, robustos)
     try:
-        if 'csv' in filename.lower():
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')), header=None)
-        elif 'xls' in filename.lower():
-            df = pd.read_excel(io.BytesIO(decoded), header=None)
-        else:
-            return None
-    except Exception as e:
-        print(f"Error: {e}")
-        return None
-    return df
+        guardado = cargar_analisis(huella)
+        if guardado is not None:
+            return guardado[0], guardado[3]
+    except sqlite3.Error:
+        pass
+    resultado = analizar_subgrupos(subgroups, chart_type, USL, LSL, revisados=revisados, partes=partes, robustos=robustos,
+                                   estadisticas=estadisticas)
+    id_analisis = None
+    if resultado is not None:
+        try:
+            id_analisis = guardar_analisis(resultado, huella, proceso, USL, LSL)
+        except sqlite3.Error:
+            pass  # El historial es opcional; el análisis se muestra igual
+    return resultado, id_analisis
 
-def detectar_patrones_western_electric(datos, UCL, LCL, CL):
-    """Detecta patrones Western Electric (Reglas 1-5)"""
-    n = len(datos)
-    violaciones = []
-    violaciones_detectadas = set()
-    
-    sigma_1 = (UCL - CL) / 3
-    limite_2sigma_superior = CL + 2 * sigma_1
-    limite_2sigma_inferior = CL - 2 * sigma_1
-    limite_1sigma_superior = CL + sigma_1
-    limite_1sigma_inferior = CL - sigma_1
-    
-    # Regla 1: Un punto fuera de 3σ
-    for i in range(n):
-        if datos[i] > UCL or datos[i] < LCL:
-            key = f"R1-{i}"
-            if key not in violaciones_detectadas:
-                violaciones.append(f"Regla 1: Punto {i+1} fuera de límites (3σ) - Valor: {datos[i]:.4f}")
-                violaciones_detectadas.add(key)
-    
-    # Regla 2: 2 de 3 puntos fuera de 2σ
-    for i in range(n-2):
-        ventana = datos[i:i+3]
-        fuera_2sigma_sup = sum(1 for x in ventana if x > limite_2sigma_superior)
-        fuera_2sigma_inf = sum(1 for x in ventana if x < limite_2sigma_inferior)
-        
-        if fuera_2sigma_sup >= 2:
-            key = f"R2-{i}-sup"
-            if key not in violaciones_detectadas:
-                violaciones.append(f"Regla 2: Puntos {i+1}-{i+3} - 2/3 fuera de 2σ (superior)")
-                violaciones_detectadas.add(key)
-        
-        if fuera_2sigma_inf >= 2:
-            key = f"R2-{i}-inf"
-            if key not in violaciones_detectadas:
-                violaciones.append(f"Regla 2: Puntos {i+1}-{i+3} - 2/3 fuera de 2σ (inferior)")
-                violaciones_detectadas.add(key)
-    
-    # Regla 3: 4 de 5 puntos fuera de 1σ
-    for i in range(n-4):
-        ventana = datos[i:i+5]
-        fuera_1sigma_sup = sum(1 for x in ventana if x > limite_1sigma_superior)
-        fuera_1sigma_inf = sum(1 for x in ventana if x < limite_1sigma_inferior)
-        
-        if fuera_1sigma_sup >= 4:
-            key = f"R3-{i}-sup"
-            if key not in violaciones_detectadas:
-                violaciones.append(f"Regla 3: Puntos {i+1}-{i+5} - 4/5 fuera de 1σ (superior)")
-                violaciones_detectadas.add(key)
-        
-        if fuera_1sigma_inf >= 4:
-            key = f"R3-{i}-inf"
-            if key not in violaciones_detectadas:
-                violaciones.append(f"Regla 3: Puntos {i+1}-{i+5} - 4/5 fuera de 1σ (inferior)")
-                violaciones_detectadas.add(key)
-    
-    # Regla 4: 8 puntos consecutivos en un lado
-    for i in range(n-7):
-        ventana = datos[i:i+8]
-        if all(x > CL for x in ventana):
-            key = f"R4-{i}-sup"
-            if key not in violaciones_detectadas:
-                violaciones.append(f"Regla 4: Puntos {i+1}-{i+8} - 8 consecutivos arriba de CL")
-                violaciones_detectadas.add(key)
-        elif all(x < CL for x in ventana):
-            key = f"R4-{i}-inf"
-            if key not in violaciones_detectadas:
-                violaciones.append(f"Regla 4: Puntos {i+1}-{i+8} - 8 consecutivos debajo de CL")
-                violaciones_detectadas.add(key)
-    
-    # Regla 5: 6 puntos en tendencia
-    for i in range(n-5):
-        ventana = datos[i:i+6]
-        if all(ventana[j] < ventana[j+1] for j in range(5)):
-            key = f"R5-{i}-asc"
-            if key not in violaciones_detectadas:
-                violaciones.append(f"Regla 5: Puntos {i+1}-{i+6} - Tendencia ascendente continua")
-                violaciones_detectadas.add(key)
-        elif all(ventana[j] > ventana[j+1] for j in range(5)):
-            key = f"R5-{i}-desc"
-            if key not in violaciones_detectadas:
-                violaciones.append(f"Regla 5: Puntos {i+1}-{i+6} - Tendencia descendente continua")
-                violaciones_detectadas.add(key)
-    
-    return violaciones
+def buscar_historial_analisis(n_clicks, proceso, desde, hasta, estado):
+    """Filas de la tabla de historial según proceso, rango de fechas y estado"""
+    fuera_control = {'fuera': True, 'control': False}.get(estado)
+    try:
+        filas = buscar_analisis((proceso or '').strip() or None, desde, hasta, fuera_control)
+        recorte = recortes_historial()
+    except sqlite3.Error:
+        return [], [], ''
+    aviso = ''
+    if recorte:
+        aviso = (f"Historial recortado por el límite BRAINYSTATS_MAX_ANALISIS: se borraron {recorte['borrados']} "
+                 f"análisis antiguos, el más reciente del {recorte['hasta'].replace('T', ' ')}.")
+    for fila in filas:
+        fila['fecha'] = fila['fecha'].replace('T', ' ')
+        fila['CLx'] = round(fila['CLx'], 4)
+        fila['Cp'] = round(fila['Cp'], 3) if fila['Cp'] is not None else None
+        fila['Cpk'] = round(fila['Cpk'], 3) if fila['Cpk'] is not None else None
+        fila['estado'] = 'Fuera de control' if fila['fuera_control'] else 'En control'
+    return filas, [], aviso
+
+def abrir_analisis_guardado(filas_seleccionadas, filas, pestana='grafico-x'):
+    """Muestra un análisis del historial con los resultados guardados, sin recalcular"""
+    if not filas_seleccionadas:
+        return (dash.no_update,) * 10
+    guardado = cargar_analisis(id_analisis=filas[filas_seleccionadas[0]]['id'])
+    if guardado is None:
+        return (dash.no_update,) * 10
+    resultado, USL, LSL, id_analisis = guardado
+    return resultados_analisis(resultado, USL, LSL, id_analisis, pestana)
+
+def vista_previa_analisis(n_clicks, contents, filename, method, chart_type, USL, LSL):
+    """Límites y Cp/Cpk aproximados de un CSV grande mientras termina el análisis completo"""
+    if not n_clicks or method != 'upload' or not contents or chart_type == 'ZW':
+        return ""
+    if isinstance(contents, list):
+        if len(contents) > 1:
+            return ""
+        contents, filename = contents[0], filename[0]
+    if 'csv' not in filename.lower():
+        return ""
+    content_type, content_string = contents.split(',')
+    # Base64 ocupa 4/3 del archivo: si es pequeño se descarta sin decodificar
+    if len(content_string) * 3 // 4 < BYTES_MINIMOS_VISTA_PREVIA:
+        return ""
+    estimacion = estimar_vista_previa(base64.b64decode(content_string), chart_type, USL, LSL)
+    if estimacion is None:
+        return ""
+
+    etiquetas = etiquetas_grafico(estimacion['chart_type'])
+    nombres = {'CLx': f"CL {etiquetas['x']}", 'UCLx': f"UCL {etiquetas['x']}", 'LCLx': f"LCL {etiquetas['x']}",
+               'CLrs': f"CL {etiquetas['rs']}", 'UCLrs': f"UCL {etiquetas['rs']}"}
+    tarjetas = [html.Div([
+        html.Div(nombre, style={'fontSize': '11px', 'color': colors['text_secondary'], 'marginBottom': '4px'}),
+        html.Div(f"{estimacion['limites'][clave][0]:.4f}", style={'fontSize': '20px', 'fontWeight': '700', 'color': colors['text_primary']}),
+        html.Div(f"± {estimacion['limites'][clave][1]:.4f}", style={'fontSize': '12px', 'color': colors['text_secondary']})
+    ]) for clave, nombre in nombres.items()]
+    if estimacion['capacidad']:
+        tarjetas += [html.Div([
+            html.Div(indice, style={'fontSize': '11px', 'color': colors['text_secondary'], 'marginBottom': '4px'}),
+            html.Div(f"{estimado:.3f}", style={'fontSize': '20px', 'fontWeight': '700', 'color': colors['text_primary']}),
+            html.Div(f"{minimo:.3f} a {maximo:.3f}", style={'fontSize': '12px', 'color': colors['text_secondary']})
+        ]) for indice, (estimado, minimo, maximo) in estimacion['capacidad'].items()]
 
-def analizar_capacidad(subgroups, UCL, LCL, USL=None, LSL=None, chart_type='XR'):
+    return html.Div(style={
+        'padding': '25px 35px',
+        'borderRadius': '8px',
+        'marginBottom': '30px',
+        'backgroundColor': '#FFF8E1',
+        'border': f'1px solid {colors["warning"]}',
+        'borderLeft': f'5px solid {colors["warning"]}'
+    }, children=[
+        html.Div("⏳ Vista previa aproximada", style={'fontSize': '20px', 'fontWeight': '700', 'marginBottom': '6px'}),
+        html.Div(f"Muestra estratificada de {estimacion['muestras']} de ~{estimacion['total']:,} líneas • "
+                 f"márgenes con {estimacion['nivel']:.0%} de confianza. Se reemplaza por el resultado exacto al terminar el análisis completo.",
+                 style={'fontSize': '13px', 'color': colors['text_secondary'], 'marginBottom': '15px'}),
+        html.Div(tarjetas, style={'display': 'grid', 'gridTemplateColumns': 'repeat(auto-fit, minmax(120px, 1fr))', 'gap': '15px'})
+    ])
+
+def update_graph(n_clicks, contents, filename, manual_data, method, chart_type, USL, LSL,
+                 modo_subgrupo='conteo', parametro_subgrupo='5', columna_lote=None, filtro_maquina=None,
+                 columna_valor=None, limites_revisados=None, archivo_seguido=None, pestana='grafico-x', solicitud=None):
     """
-    Calcula índices Cp, Cpk, Pp, Ppk
-    - Cp/Cpk: Capacidad potencial/real (usa sigma estimada de subgrupos)
-    - Pp/Ppk: Performance (usa desviación estándar total)
+    Analiza los datos del método de entrada elegido. `solicitud` viene del modo
+    automático; si mientras tanto se registró otra más nueva de la sesión, el
+    análisis se abandona entre etapas sin tocar los resultados.
     """
-    medias = np.nanmean(subgroups, axis=1)
-    media_proceso = np.mean(medias)
-    
-    # Sigma estimada (dentro de subgrupos) para Cp/Cpk
-    if chart_type == 'XR':
-        rangos = np.ptp(subgroups, axis=1)
-        n = subgroups.shape[1]
-        if n not in CONTROL_CHART_CONSTANTS:
-            n_keys = sorted(CONTROL_CHART_CONSTANTS.keys())
-            n = min(n_keys, key=lambda x: abs(x - n))
-        d2 = CONTROL_CHART_CONSTANTS[n]['d2']
-        sigma_within = np.mean(rangos) / d2
-    else:
-        stds = np.nanstd(subgroups, axis=1, ddof=1)
-        n = subgroups.shape[1]
-        if n not in CONTROL_CHART_CONSTANTS:
-            n_keys = sorted(CONTROL_CHART_CONSTANTS.keys())
-            n = min(n_keys, key=lambda x: abs(x - n))
-        c4 = CONTROL_CHART_CONSTANTS[n]['c4']
-        sigma_within = np.mean(stds) / c4
-    
-    # Sigma total (todas las observaciones) para Pp/Ppk
-    todos_datos = subgroups.flatten()
-    todos_datos = todos_datos[~np.isnan(todos_datos)]
-    sigma_total = np.std(todos_datos, ddof=1)
-    
-    if sigma_within == 0 or sigma_total == 0:
-        return None
-    
-    # Con límites de especificación
-    if USL is not None and LSL is not None:
-        rango_especificacion = USL - LSL
-        
-        # Cp y Cpk (capacidad)
-        Cp = rango_especificacion / (6 * sigma_within)
-        Cpu = (USL - media_proceso) / (3 * sigma_within)
-        Cpl = (media_proceso - LSL) / (3 * sigma_within)
-        Cpk = min(Cpu, Cpl)
-        
-        # Pp y Ppk (performance)
-        Pp = rango_especificacion / (6 * sigma_total)
-        Ppu = (USL - media_proceso) / (3 * sigma_total)
-        Ppl = (media_proceso - LSL) / (3 * sigma_total)
-        Ppk = min(Ppu, Ppl)
-        
-        # Interpretaciones
-        def interpretar(valor):
-            if valor >= 2.0:
-                return 'Excelente (Clase Mundial)'
-            elif valor >= 1.33:
-                return 'Adecuado'
-            elif valor >= 1.0:
-                return 'Marginal (Requiere mejora)'
-            else:
-                return 'Inadecuado (Acción inmediata)'
-        
-        return {
-            'sigma_within': sigma_within,
-            'sigma_total': sigma_total,
-            'media': media_proceso,
-            'Cp': Cp,
-            'Cpk': Cpk,
-            'Cpu': Cpu,
-            'Cpl': Cpl,
-            'Pp': Pp,
-            'Ppk': Ppk,
-            'Ppu': Ppu,
-            'Ppl': Ppl,
-            'interpretacion_cp': interpretar(Cp),
-            'interpretacion_cpk': interpretar(Cpk),
-            'interpretacion_pp': interpretar(Pp),
-            'interpretacion_ppk': interpretar(Ppk),
-            'tiene_limites': True
-        }
-    else:
-        # Sin límites de especificación
-        rango_control = UCL - LCL
-        Cp = rango_control / (6 * sigma_within)
-        
-        return {
-            'sigma_within': sigma_within,
-            'sigma_total': sigma_total,
-            'media': media_proceso,
-            'Cp': Cp,
-            'interpretacion_cp': 'Excelente' if Cp >= 2.0 else 'Adecuado' if Cp >= 1.33 else 'Marginal' if Cp >= 1.0 else 'Inadecuado',
-            'tiene_limites': False
-        }
+    empty_results = resultados_vacios()
+    descartada = (dash.no_update,) * len(empty_results)
 
-@app.callback(
-    [Output('chart-xbar', 'figure'),
-     Output('chart-rs', 'figure'),
-     Output('alerta-principal', 'children'),
-     Output('alerta-principal', 'style'),
-     Output('estadisticas-proceso', 'children'),
-     Output('analisis-avanzado', 'children'),
-     Output('recomendaciones', 'children'),
-     Output('results-area', 'style')],
-    Input('generate-button', 'n_clicks'),
-    State('upload-data', 'contents'),
-    State('upload-data', 'filename'),
-    State('manual-table', 'data'),
-    State('input-method', 'value'),
-    State('chart-type', 'value'),
-    State('usl-input', 'value'),
-    State('lsl-input', 'value')
-)
-def update_graph(n_clicks, contents, filename, manual_data, method, chart_type, USL, LSL):
-    empty_results = (go.Figure(), go.Figure(), "", {}, "", "", "", {'display': 'none'})
-    
-    if n_clicks == 0:
+    if not n_clicks and not solicitud:
         return empty_results
+    if not solicitud_vigente(solicitud):
+        return descartada
     
-    if method == 'upload':
-        df = parse_contents(contents, filename)
-        if df is None:
-            return empty_results
-    else:
-        df = pd.DataFrame(manual_data)
-        df = df.drop(columns=['Subgrupo'], errors='ignore').dropna(how='all')
-
-    if df is None or df.empty:
-        return empty_results
+    if method in ('upload', 'long') and isinstance(contents, list):
+        if method == 'upload' and len(contents) > 1:
+            return comparar_archivos(contents, filename, chart_type, USL, LSL)
+        contents, filename = contents[0], filename[0]
 
+    proceso = os.path.splitext(filename)[0] if isinstance(filename, str) and filename else 'manual'
+    # Sin columna de parte (tabla manual, formato largo, seguimiento) todo es una sola parte
+    partes = estadisticas = None
     try:
-        subgroups = df.to_numpy(dtype=float)
-        subgroups = subgroups[~np.isnan(subgroups).all(axis=1)]
+        if method == 'long':
+            if contents is None:
+                return empty_results
+            try:
+                subgroups = subgrupos_desde_formato_largo(contents, filename, modo_subgrupo, parametro_subgrupo,
+                                                          columna_lote, filtro_maquina, columna_valor)
+            except ValueError as e:
+                return resultados_error(e)
+            if subgroups is None:
+                return empty_results
+        elif method == 'follow':
+            ruta = ruta_seguimiento(archivo_seguido)
+            if ruta is None:
+                return empty_results
+            subgroups, _ = seguir_archivo(ruta)
+            proceso = os.path.splitext(archivo_seguido.strip())[0]
+        elif method == 'upload':
+            df = parse_contents(contents, filename)
+            if df is None or df.empty:
+                return empty_results
+            if chart_type == 'ZW':
+                subgroups, partes = subgrupos_corrida_corta(df)
+            else:
+                subgroups, estadisticas = a_subgrupos(df, con_estadisticas=True)
+        else:
+            subgroups = filas_a_subgrupos(manual_data or [])
         if len(subgroups) == 0:
             return empty_results
     except:
         return empty_results
+    if not solicitud_vigente(solicitud):
+        return descartada
+
+    if chart_type == 'ZW':
+        # Las especificaciones cambian de parte a parte; no se dibujan sobre el gráfico estandarizado
+        USL = LSL = None
+    resultado, id_analisis = analizar_con_historial(subgroups, chart_type, USL, LSL, limites_revisados, proceso, partes,
+                                                    estadisticas)
+    if resultado is None:
+        return empty_results
+    if not solicitud_vigente(solicitud):
+        return descartada
+    return resultados_analisis(resultado, USL, LSL, id_analisis, pestana)
 
-    means = np.nanmean(subgroups, axis=1)
-    ranges = np.ptp(subgroups, axis=1)
-    stds = np.nanstd(subgroups, axis=1, ddof=1)
-    n = subgroups.shape[1]
+def asignar_sesion(_, sesion):
+    """Identificador de la pestaña del navegador para el registro de solicitudes automáticas"""
+    return dash.no_update if sesion else uuid.uuid4().hex
 
-    if n not in CONTROL_CHART_CONSTANTS:
-        n_keys = sorted(CONTROL_CHART_CONSTANTS.keys())
-        n_use = min(n_keys, key=lambda x: abs(x - n))
-    else:
-        n_use = n
-    
-    constants = CONTROL_CHART_CONSTANTS[n_use]
-    A2, A3 = constants['A2'], constants['A3']
-    D3, D4 = constants['D3'], constants['D4']
-    B3, B4 = constants['B3'], constants['B4']
-
-    CLx = np.mean(means)
-    CLr = np.mean(ranges)
-    CLs = np.mean(stds)
-    
-    if chart_type == 'XR':
-        UCLx = CLx + A2 * CLr
-        LCLx = CLx - A2 * CLr
-        UCLr = D4 * CLr
-        LCLr = D3 * CLr
-    else:
-        UCLx = CLx + A3 * CLs
-        LCLx = CLx - A3 * CLs
-        UCLs = B4 * CLs
-        LCLs = B3 * CLs
+def programar_recalculo(chart_type, USL, LSL, automatico, sesion, solicitud):
+    """Con el modo automático numera el nuevo juego de parámetros y lo registra como el vigente"""
+    if not automatico or not sesion:
+        return dash.no_update
+    numero = (solicitud or {}).get('numero', 0) + 1
+    registrar_solicitud(sesion, numero)
+    return {'sesion': sesion, 'numero': numero}
 
-    # Gráfico X̄
-    num_subgrupos = np.arange(1, len(means) + 1)
-    
-    fig_xbar = go.Figure()
-    
-    fig_xbar.add_trace(go.Scatter(
-        x=num_subgrupos, y=means,
-        mode='lines+markers',
-        name='X̄',
-        line=dict(color=colors['chart_line1'], width=3),
-        marker=dict(size=10, color=colors['chart_line1'], line=dict(color='white', width=2)),
-        hovertemplate='<b>Subgrupo %{x}</b><br>X̄ = %{y:.4f}<extra></extra>'
-    ))
-    
-    # Límites de control
-    fig_xbar.add_hline(y=UCLx, line_dash='dash', line_color=colors['danger'], line_width=2.5,
-                       annotation_text=f"UCL {UCLx:.4f}", annotation_position="right",
-                       annotation=dict(font=dict(size=11, color=colors['danger'])))
-    fig_xbar.add_hline(y=LCLx, line_dash='dash', line_color=colors['danger'], line_width=2.5,
-                       annotation_text=f"LCL {LCLx:.4f}", annotation_position="right",
-                       annotation=dict(font=dict(size=11, color=colors['danger'])))
-    fig_xbar.add_hline(y=CLx, line_dash='solid', line_color=colors['success'], line_width=3,
-                       annotation_text=f"CL {CLx:.4f}", annotation_position="right",
-                       annotation=dict(font=dict(size=11, color=colors['success'])))
-    
-    # Límites de especificación USL/LSL
-    if USL is not None:
-        fig_xbar.add_hline(y=USL, line_dash='dot', line_color='purple', line_width=2.5,
-                           annotation_text=f"USL {USL:.4f}", annotation_position="left",
-                           annotation=dict(font=dict(size=11, color='purple')))
-    
-    if LSL is not None:
-        fig_xbar.add_hline(y=LSL, line_dash='dot', line_color='purple', line_width=2.5,
-                           annotation_text=f"LSL {LSL:.4f}", annotation_position="left",
-                           annotation=dict(font=dict(size=11, color='purple')))
-    
-    # Zonas sigma
-    sigma_1 = (UCLx - CLx) / 3
-    fig_xbar.add_hrect(y0=CLx + sigma_1, y1=CLx + 2*sigma_1, fillcolor=colors['warning'], opacity=0.1, line_width=0)
-    fig_xbar.add_hrect(y0=CLx - sigma_1, y1=CLx - 2*sigma_1, fillcolor=colors['warning'], opacity=0.1, line_width=0)
-    fig_xbar.add_hrect(y0=CLx + 2*sigma_1, y1=UCLx, fillcolor=colors['danger'], opacity=0.08, line_width=0)
-    fig_xbar.add_hrect(y0=LCLx, y1=CLx - 2*sigma_1, fillcolor=colors['danger'], opacity=0.08, line_width=0)
-    
-    fuera_control_x = np.where((means > UCLx) | (means < LCLx))[0]
-    if len(fuera_control_x) > 0:
-        fig_xbar.add_trace(go.Scatter(
-            x=num_subgrupos[fuera_control_x], y=means[fuera_control_x],
-            mode='markers', name='Fuera de control',
-            marker=dict(size=14, color=colors['danger'], symbol='x', line=dict(width=3, color='white')),
-            hovertemplate='⚠️ Fuera de control<br>Subgrupo %{x}<br>X̄ = %{y:.4f}<extra></extra>'
-        ))
-    
-    fig_xbar.update_layout(
-        title={'text': f"<b>Gráfico X̄ - Promedios</b>", 'x': 0.5, 'xanchor': 'center', 'font': {'size': 22, 'color': colors['text_primary']}},
-        xaxis_title="Número de Subgrupo",
-        yaxis_title="Media (X̄)",
-        template="plotly_white",
-        paper_bgcolor='white',
-        plot_bgcolor='#FAFAFA',
-        font=dict(size=13, color=colors['text_primary'], family="Inter"),
-        hovermode='x unified',
-        showlegend=True,
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        margin=dict(l=70, r=70, t=90, b=70)
-    )
+PESTANAS_RESULTADOS = ('grafico-x', 'grafico-rs', 'estadisticas', 'patrones', 'recomendaciones')
+# Análisis recientes que las pestañas reutilizan al abrirse (por worker)
+RESULTADOS_EN_MEMORIA = 16
+_resultados_recientes = OrderedDict()
+_bloqueo_resultados = threading.Lock()
 
-    # Gráfico R/S
-    fig_rs = go.Figure()
-    
-    if chart_type == 'XR':
-        fig_rs.add_trace(go.Scatter(
-            x=num_subgrupos, y=ranges,
-            mode='lines+markers', name='R',
-            line=dict(color=colors['chart_line2'], width=3),
-            marker=dict(size=10, color=colors['chart_line2'], line=dict(color='white', width=2)),
-            hovertemplate='<b>Subgrupo %{x}</b><br>R = %{y:.4f}<extra></extra>'
-        ))
-        
-        fig_rs.add_hline(y=UCLr, line_dash='dash', line_color=colors['danger'], line_width=2.5,
-                         annotation_text=f"UCL {UCLr:.4f}", annotation_position="right",
-                         annotation=dict(font=dict(size=11, color=colors['danger'])))
-        fig_rs.add_hline(y=LCLr, line_dash='dash', line_color=colors['danger'], line_width=2.5,
-                         annotation_text=f"LCL {LCLr:.4f}", annotation_position="right",
-                         annotation=dict(font=dict(size=11, color=colors['danger'])))
-        fig_rs.add_hline(y=CLr, line_dash='solid', line_color=colors['success'], line_width=3,
-                         annotation_text=f"CL {CLr:.4f}", annotation_position="right",
-                         annotation=dict(font=dict(size=11, color=colors['success'])))
-        
-        fuera_control_r = np.where((ranges > UCLr) | (ranges < LCLr))[0]
-        if len(fuera_control_r) > 0:
-            fig_rs.add_trace(go.Scatter(
-                x=num_subgrupos[fuera_control_r], y=ranges[fuera_control_r],
-                mode='markers', name='Fuera de control',
-                marker=dict(size=14, color=colors['danger'], symbol='x', line=dict(width=3, color='white')),
-                hovertemplate='⚠️ Fuera de control<br>Subgrupo %{x}<br>R = %{y:.4f}<extra></extra>'
-            ))
-        
-        fig_rs.update_layout(
-            title={'text': "<b>Gráfico R - Rangos</b>", 'x': 0.5, 'xanchor': 'center', 'font': {'size': 22, 'color': colors['text_primary']}},
-            xaxis_title="Número de Subgrupo", yaxis_title="Rango (R)"
-        )
-    else:
-        fig_rs.add_trace(go.Scatter(
-            x=num_subgrupos, y=stds,
-            mode='lines+markers', name='S',
-            line=dict(color=colors['chart_line2'], width=3),
-            marker=dict(size=10, color=colors['chart_line2'], line=dict(color='white', width=2)),
-            hovertemplate='<b>Subgrupo %{x}</b><br>S = %{y:.4f}<extra></extra>'
-        ))
-        
-        fig_rs.add_hline(y=UCLs, line_dash='dash', line_color=colors['danger'], line_width=2.5,
-                         annotation_text=f"UCL {UCLs:.4f}", annotation_position="right",
-                         annotation=dict(font=dict(size=11, color=colors['danger'])))
-        fig_rs.add_hline(y=LCLs, line_dash='dash', line_color=colors['danger'], line_width=2.5,
-                         annotation_text=f"LCL {LCLs:.4f}", annotation_position="right",
-                         annotation=dict(font=dict(size=11, color=colors['danger'])))
-        fig_rs.add_hline(y=CLs, line_dash='solid', line_color=colors['success'], line_width=3,
-                         annotation_text=f"CL {CLs:.4f}", annotation_position="right",
-                         annotation=dict(font=dict(size=11, color=colors['success'])))
-        
-        fuera_control_s = np.where((stds > UCLs) | (stds < LCLs))[0]
-        if len(fuera_control_s) > 0:
-            fig_rs.add_trace(go.Scatter(
-                x=num_subgrupos[fuera_control_s], y=stds[fuera_control_s],
-                mode='markers', name='Fuera de control',
-                marker=dict(size=14, color=colors['danger'], symbol='x', line=dict(width=3, color='white')),
-                hovertemplate='⚠️ Fuera de control<br>Subgrupo %{x}<br>S = %{y:.4f}<extra></extra>'
-            ))
-        
-        fig_rs.update_layout(
-            title={'text': "<b>Gráfico S - Desviación Estándar</b>", 'x': 0.5, 'xanchor': 'center', 'font': {'size': 22, 'color': colors['text_primary']}},
-            xaxis_title="Número de Subgrupo", yaxis_title="Desviación (S)"
-        )
-    
-    fig_rs.update_layout(
-        template="plotly_white",
-        paper_bgcolor='white',
-        plot_bgcolor='#FAFAFA',
-        font=dict(size=13, color=colors['text_primary'], family="Inter"),
-        hovermode='x unified',
-        showlegend=True,
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        margin=dict(l=70, r=70, t=90, b=70)
-    )
+def recordar_resultado(resultado, USL, LSL, id_analisis=None, clave=None):
+    """Guarda un resultado para las pestañas y devuelve su clave ('historial-<id>' si está en el historial)"""
+    if clave is None:
+        clave = f'historial-{id_analisis}' if id_analisis is not None else uuid.uuid4().hex
+    with _bloqueo_resultados:
+        _resultados_recientes[clave] = (resultado, USL, LSL, id_analisis)
+        _resultados_recientes.move_to_end(clave)
+        while len(_resultados_recientes) > RESULTADOS_EN_MEMORIA:
+            _resultados_recientes.popitem(last=False)
+    return clave
+
+def resultado_recordado(clave):
+    """
+    (resultado, USL, LSL, id) de una clave, o None. Los análisis del historial se
+    recargan de SQLite si los calculó otro worker o ya salieron de la memoria.
+    """
+    with _bloqueo_resultados:
+        guardado = _resultados_recientes.get(clave)
+        if guardado is not None:
+            _resultados_recientes.move_to_end(clave)
+            return guardado
+    if not clave.startswith('historial-'):
+        return None
+    try:
+        guardado = cargar_analisis(id_analisis=int(clave[len('historial-'):]))
+    except sqlite3.Error:
+        return None
+    if guardado is not None:
+        recordar_resultado(*guardado)
+    return guardado
+
+def seccion_resultados(pestana, resultado, USL, LSL, id_analisis=None):
+    """Contenido de una pestaña de resultados"""
+    if pestana == 'grafico-x':
+        return figura_grafico_x(resultado, USL, LSL)
+    if pestana == 'grafico-rs':
+        return figura_grafico_rs(resultado)
+    if pestana == 'estadisticas':
+        return estadisticas_analisis(resultado, USL, LSL)
+    if pestana == 'patrones':
+        return patrones_analisis(resultado, id_analisis)
+    return recomendaciones_analisis(resultado)
+
+def resultados_vacios():
+    return (figura_vacia(), figura_vacia(), "", {}, "", "", "", {'display': 'none'}, None, None)
+
+def resultados_error(mensaje):
+    """Resultados vacíos con el motivo en la alerta (p. ej. una columna de valor ambigua)"""
+    alerta = html.P(f"⚠️ {mensaje}", style={'color': colors['danger'], 'fontWeight': '600', 'margin': '0'})
+    alerta_style = {
+        'padding': '20px 30px',
+        'borderRadius': '8px',
+        'marginBottom': '30px',
+        'backgroundColor': '#FFEBEE',
+        'border': f'1px solid {colors["danger"]}',
+        'borderLeft': f'5px solid {colors["danger"]}'
+    }
+    return (figura_vacia(), figura_vacia(), alerta, alerta_style, "", "", "", {'display': 'block'}, None, None)
+
+def resultados_analisis(resultado, USL, LSL, id_analisis=None, pestana='grafico-x', clave=None):
+    """
+    Respuesta inicial de un análisis: la alerta y solo la pestaña abierta. Las
+    demás quedan vacías hasta que se abren (`contenido_pestana`), con el
+    resultado guardado en memoria bajo la clave que se devuelve.
+    """
+    clave = recordar_resultado(resultado, USL, LSL, id_analisis, clave)
+    contenido = dict.fromkeys(PESTANAS_RESULTADOS, "")
+    contenido['grafico-x'] = contenido['grafico-rs'] = figura_vacia()
+    if pestana in PESTANAS_RESULTADOS:
+        contenido[pestana] = seccion_resultados(pestana, resultado, USL, LSL, id_analisis)
+    alerta_texto, alerta_style = alerta_analisis(resultado)
+    return (contenido['grafico-x'], contenido['grafico-rs'], alerta_texto, alerta_style, contenido['estadisticas'],
+            contenido['patrones'], contenido['recomendaciones'], {'display': 'block'},
+            clave, {'clave': clave, 'pestanas': [pestana]})
+
+def contenido_pestana(pestana, clave, cargadas):
+    """Calcula y envía la pestaña abierta si todavía no se envió para el análisis mostrado"""
+    salida = [dash.no_update] * len(PESTANAS_RESULTADOS)
+    if not clave or pestana not in PESTANAS_RESULTADOS or (
+            cargadas and cargadas['clave'] == clave and pestana in cargadas['pestanas']):
+        return (*salida, dash.no_update)
+    indice = PESTANAS_RESULTADOS.index(pestana)
+    guardado = resultado_recordado(clave)
+    if guardado is None:
+        salida[indice] = figura_vacia() if indice < 2 else html.P(
+            "El análisis ya no está disponible; vuelva a generarlo.",
+            style={'color': colors['text_secondary'], 'fontSize': '14px'})
+        return (*salida, dash.no_update)
+    resultado, USL, LSL, id_analisis = guardado
+    salida[indice] = seccion_resultados(pestana, resultado, USL, LSL, id_analisis)
+    enviadas = cargadas['pestanas'] if cargadas and cargadas['clave'] == clave else []
+    return (*salida, {'clave': clave, 'pestanas': [*enviadas, pestana]})
+
+def mapa_escenarios(pestana, clave, metrica, puntos):
+    """Mapa what-if de capacidad del análisis mostrado; solo se calcula con la pestaña abierta"""
+    if pestana != 'escenarios':
+        return dash.no_update
+    guardado = resultado_recordado(clave) if clave else None
+    capacidad = guardado[0]['capacidad'] if guardado else None
+    if not capacidad or not capacidad['sigma_within'] > 0 or not capacidad['sigma_total'] > 0:
+        return html.P("Los escenarios necesitan un análisis con capacidad calculada (no disponible para Z̄-W).",
+                      style={'color': colors['text_secondary'], 'fontSize': '14px'})
+    _, USL, LSL, _ = guardado
+    barrido = barrido_capacidad(capacidad, USL, LSL, int(puntos or 100))
+    nota = ("Tolerancia centrada en el nominal, de 0.5 a 1.5 veces la actual (✕ = proceso actual)."
+            if barrido['tolerancia'] is not None else
+            "Sin especificaciones: tolerancia de 4 a 12 σ within centrada en la media del proceso.")
+    return html.Div([
+        html.P(nota + " Las líneas marcan índice 1.0 y 1.33.", style={'fontSize': '13px', 'color': colors['text_secondary']}),
+        dcc.Graph(figure=figura_escenarios_capacidad(barrido, metrica), style={'height': '600px'})
+    ])
+
+def alerta_analisis(resultado):
+    """Alerta principal (contenido y estilo) de un resultado de `analizar_subgrupos`"""
+    num_fuera_control = resultado['num_fuera_control']
+    violaciones_patrones = resultado['violaciones']
 
-    # Análisis
-    if chart_type == 'XR':
-        num_fuera_control = len(fuera_control_x) + len(fuera_control_r)
-    else:
-        num_fuera_control = len(fuera_control_x) + len(fuera_control_s)
-    
-    violaciones_patrones = detectar_patrones_western_electric(means, UCLx, LCLx, CLx)
-    
     # Alerta principal
     if num_fuera_control > 0 or len(violaciones_patrones) > 0:
         alerta_texto = html.Div([
@@ -1001,9 +1970,17 @@ def update_graph(n_clicks, contents, filename, manual_data, method, chart_type,
             'color': colors['text_primary']
         }
 
-    # Análisis de capacidad con Pp y Ppk
-    capacidad = analizar_capacidad(subgroups, UCLx, LCLx, USL, LSL, chart_type)
-    
+    return alerta_texto, alerta_style
+
+def estadisticas_analisis(resultado, USL, LSL):
+    """Tarjetas de límites y capacidad y, si hay especificaciones, la distribución de capacidad"""
+    chart_type, n = resultado['chart_type'], resultado['n']
+    CLx, UCLx, LCLx = resultado['CLx'], resultado['UCLx'], resultado['LCLx']
+    CLrs, UCLrs = resultado['CLrs'], resultado['UCLrs']
+    capacidad = resultado['capacidad']
+    etiquetas = etiquetas_grafico(chart_type)
+    etiqueta_rs = etiquetas['rs']
+
     # Cards de estadísticas
     estadisticas_cards = [
         # Card X̄
@@ -1015,8 +1992,8 @@ def update_graph(n_clicks, contents, filename, manual_data, method, chart_type,
             'padding': '30px',
             'boxShadow': f'0 4px 12px {colors["shadow"]}'
         }, children=[
-            html.Div("GRÁFICO X̄", style={'fontSize': '13px', 'fontWeight': '700', 'color': colors['text_secondary'], 'marginBottom': '10px', 'letterSpacing': '1px'}),
-            html.Div("Promedios del Proceso", style={'fontSize': '18px', 'fontWeight': '700', 'color': colors['text_primary'], 'marginBottom': '20px'}),
+            html.Div(f"GRÁFICO {etiquetas['grafico_x']}", style={'fontSize': '13px', 'fontWeight': '700', 'color': colors['text_secondary'], 'marginBottom': '10px', 'letterSpacing': '1px'}),
+            html.Div(etiquetas['descripcion_x'], style={'fontSize': '18px', 'fontWeight': '700', 'color': colors['text_primary'], 'marginBottom': '20px'}),
             html.Div([
                 html.Div("Línea Central", style={'fontSize': '11px', 'color': colors['text_secondary'], 'marginBottom': '5px'}),
                 html.Div(f"{CLx:.4f}", style={'fontSize': '28px', 'fontWeight': '700', 'color': colors['text_primary'], 'marginBottom': '15px'})
@@ -1042,16 +2019,16 @@ def update_graph(n_clicks, contents, filename, manual_data, method, chart_type,
             'padding': '30px',
             'boxShadow': f'0 4px 12px {colors["shadow"]}'
         }, children=[
-            html.Div(f"GRÁFICO {'R' if chart_type == 'XR' else 'S'}", style={'fontSize': '13px', 'fontWeight': '700', 'color': colors['text_secondary'], 'marginBottom': '10px', 'letterSpacing': '1px'}),
-            html.Div(f"{'Rangos' if chart_type == 'XR' else 'Desviación Estándar'}", style={'fontSize': '18px', 'fontWeight': '700', 'color': colors['text_primary'], 'marginBottom': '20px'}),
+            html.Div(f"GRÁFICO {etiqueta_rs}", style={'fontSize': '13px', 'fontWeight': '700', 'color': colors['text_secondary'], 'marginBottom': '10px', 'letterSpacing': '1px'}),
+            html.Div(etiquetas['descripcion_rs'], style={'fontSize': '18px', 'fontWeight': '700', 'color': colors['text_primary'], 'marginBottom': '20px'}),
             html.Div([
                 html.Div("Línea Central", style={'fontSize': '11px', 'color': colors['text_secondary'], 'marginBottom': '5px'}),
-                html.Div(f"{CLr if chart_type == 'XR' else CLs:.4f}", style={'fontSize': '28px', 'fontWeight': '700', 'color': colors['text_primary'], 'marginBottom': '15px'})
+                html.Div(f"{CLrs:.4f}", style={'fontSize': '28px', 'fontWeight': '700', 'color': colors['text_primary'], 'marginBottom': '15px'})
             ], style={'padding': '15px', 'backgroundColor': '#FAFAFA', 'borderRadius': '6px', 'marginBottom': '15px'}),
             html.Div(style={'display': 'grid', 'gridTemplateColumns': '1fr 1fr', 'gap': '10px'}, children=[
                 html.Div([
                     html.Div("UCL", style={'fontSize': '10px', 'color': colors['text_secondary'], 'marginBottom': '3px'}),
-                    html.Div(f"{UCLr if chart_type == 'XR' else UCLs:.4f}", style={'fontSize': '16px', 'fontWeight': '700', 'color': colors['danger']})
+                    html.Div(f"{UCLrs:.4f}", style={'fontSize': '16px', 'fontWeight': '700', 'color': colors['danger']})
                 ]),
                 html.Div([
                     html.Div("n", style={'fontSize': '10px', 'color': colors['text_secondary'], 'marginBottom': '3px'}),
@@ -1207,6 +2184,30 @@ def update_graph(n_clicks, contents, filename, manual_data, method, chart_type,
         'marginBottom': '30px'
     }, children=estadisticas_cards)
 
+    # Distribución de capacidad: solo viajan las barras y los cuantiles resumidos
+    if resultado.get('distribucion'):
+        estadisticas_html = html.Div([
+            estadisticas_html,
+            dcc.Graph(figure=figura_distribucion(resultado['distribucion'], USL, LSL), config={'displayModeBar': False},
+                      style={'marginBottom': '30px'})
+        ])
+
+    return estadisticas_html
+
+def patrones_analisis(resultado, id_analisis=None):
+    """
+    Puntos fuera de control, patrones Western Electric y diagnósticos del resultado.
+    Con `id_analisis` (guardado en el historial) se agregan los enlaces de descarga de la tabla por subgrupo.
+    """
+    means, valores_rs = resultado['x'], resultado['rs']
+    x_rs = resultado['x_rs']
+    fuera_control_x, fuera_control_rs = resultado['fuera_control_x'], resultado['fuera_control_rs']
+    num_fuera_control = resultado['num_fuera_control']
+    violaciones_patrones = resultado['violaciones']
+    etiquetas = etiquetas_grafico(resultado['chart_type'])
+    etiqueta_x, etiqueta_rs, punto = etiquetas['x'], etiquetas['rs'], etiquetas['punto']
+
+
     # Análisis avanzado
     analisis_html = html.Div(style={
         'backgroundColor': colors['bg_card'],
@@ -1243,21 +2244,21 @@ def update_graph(n_clicks, contents, filename, manual_data, method, chart_type,
             
             html.Div([
                 html.Div([
-                    html.Div("Gráfico X̄:", style={'fontWeight': '700', 'marginBottom': '10px', 'color': colors['chart_line1'], 'fontSize': '15px'}),
+                    html.Div(f"Gráfico {etiquetas['grafico_x']}:", style={'fontWeight': '700', 'marginBottom': '10px', 'color': colors['chart_line1'], 'fontSize': '15px'}),
                     html.Ul([
-                        html.Li(f"Subgrupo {i+1}: X̄ = {means[i]:.4f}", 
+                        html.Li(f"{punto} {i+1}: {etiqueta_x} = {means[i]:.4f}", 
                                style={'color': colors['text_primary'], 'marginBottom': '5px', 'fontSize': '14px'}) 
                         for i in fuera_control_x
                     ], style={'paddingLeft': '20px'}) if len(fuera_control_x) > 0 
                     else html.P("✓ Todos los puntos bajo control", style={'color': colors['success'], 'fontWeight': '600', 'paddingLeft': '20px'})
                 ], style={'marginBottom': '15px'}),
                 html.Div([
-                    html.Div(f"Gráfico {'R' if chart_type == 'XR' else 'S'}:", style={'fontWeight': '700', 'marginBottom': '10px', 'color': colors['chart_line2'], 'fontSize': '15px'}),
+                    html.Div(f"Gráfico {etiqueta_rs}:", style={'fontWeight': '700', 'marginBottom': '10px', 'color': colors['chart_line2'], 'fontSize': '15px'}),
                     html.Ul([
-                        html.Li(f"Subgrupo {i+1}: {'R' if chart_type == 'XR' else 'S'} = {(ranges[i] if chart_type == 'XR' else stds[i]):.4f}", 
+                        html.Li(f"{punto} {x_rs[i]}: {etiqueta_rs} = {valores_rs[i]:.4f}", 
                                style={'color': colors['text_primary'], 'marginBottom': '5px', 'fontSize': '14px'}) 
-                        for i in (fuera_control_r if chart_type == 'XR' else fuera_control_s)
-                    ], style={'paddingLeft': '20px'}) if len(fuera_control_r if chart_type == 'XR' else fuera_control_s) > 0 
+                        for i in fuera_control_rs
+                    ], style={'paddingLeft': '20px'}) if len(fuera_control_rs) > 0 
                     else html.P("✓ Todos los puntos bajo control", style={'color': colors['success'], 'fontWeight': '600', 'paddingLeft': '20px'})
                 ])
             ], style={'padding': '20px', 'backgroundColor': '#FAFAFA', 'borderRadius': '6px', 'marginBottom': '30px'})
@@ -1289,59 +2290,21 @@ def update_graph(n_clicks, contents, filename, manual_data, method, chart_type,
         ])
     ])
 
-    # Recomendaciones mejoradas
-    recomendaciones_lista = []
-    
-    if num_fuera_control > 0:
-        recomendaciones_lista.extend([
-            "🔍 Investigar causas especiales en puntos fuera de límites",
-            "⚙️ Verificar calibración de equipos de medición",
-            "👤 Revisar cambios en operadores o métodos",
-            "📦 Inspeccionar calidad de materia prima",
-            "🌡️ Evaluar condiciones ambientales"
-        ])
-    
-    if len(violaciones_patrones) > 0:
-        tiene_r1 = any("Regla 1" in v for v in violaciones_patrones)
-        tiene_r2 = any("Regla 2" in v for v in violaciones_patrones)
-        tiene_r3 = any("Regla 3" in v for v in violaciones_patrones)
-        tiene_r4 = any("Regla 4" in v for v in violaciones_patrones)
-        tiene_r5 = any("Regla 5" in v for v in violaciones_patrones)
-        
-        if tiene_r1:
-            recomendaciones_lista.append("⚡ Regla 1: Evento extremo - Buscar causa asignable inmediata")
-        if tiene_r2:
-            recomendaciones_lista.append("📊 Regla 2: Variación excesiva - Revisar estabilidad")
-        if tiene_r3:
-            recomendaciones_lista.append("🎯 Regla 3: Desviación sostenida - Verificar ajustes")
-        if tiene_r4:
-            recomendaciones_lista.append("↕️ Regla 4: Sesgo detectado - Verificar centrado")
-        if tiene_r5:
-            recomendaciones_lista.append("📈 Regla 5: Tendencia continua - Verificar desgaste de herramientas")
-    
-    if capacidad and capacidad['tiene_limites']:
-        if capacidad['Cpk'] < 1.0:
-            recomendaciones_lista.extend([
-                "🚨 Cpk < 1.0: Proceso inadecuado - Acción urgente",
-                "🔧 Reducir variación o ampliar especificaciones"
-            ])
-        elif capacidad['Cpk'] < 1.33:
-            recomendaciones_lista.append("⚠️ Cpk marginal: Implementar mejora continua")
-        
-        if capacidad['Ppk'] < capacidad['Cpk']:
-            recomendaciones_lista.append("📉 Ppk < Cpk: Variación entre subgrupos alta - Revisar consistencia del proceso")
-        
-        if abs(capacidad['Cpu'] - capacidad['Cpl']) > 0.2:
-            recomendaciones_lista.append("⚖️ Proceso descentrado - Ajustar hacia valor nominal")
-    
-    if len(recomendaciones_lista) == 0:
-        recomendaciones_lista.extend([
-            "✅ Proceso estable y bajo control",
-            "📊 Mantener monitoreo continuo",
-            "📝 Documentar condiciones como estándar",
-            "🔄 Auditorías periódicas preventivas"
-        ])
-    
+    if 'iteraciones' in resultado:
+        analisis_html.children.insert(1, historial_revision(resultado, etiquetas))
+    if 'limites_clasicos' in resultado:
+        analisis_html.children.insert(1, comparacion_limites(resultado, etiquetas))
+    if 'resumen_partes' in resultado:
+        analisis_html.children.insert(1, resumen_corrida_corta(resultado))
+    if resultado.get('autocorrelacion'):
+        analisis_html.children.append(panel_autocorrelacion(resultado, etiquetas))
+    if id_analisis is not None:
+        analisis_html.children.append(descarga_subgrupos(id_analisis))
+
+    return analisis_html
+
+def recomendaciones_analisis(resultado):
+    recomendaciones_lista = resultado['recomendaciones']
     recomendaciones_html = html.Div(style={
         'backgroundColor': colors['bg_card'],
         'borderRadius': '8px',
@@ -1367,9 +2330,234 @@ def update_graph(n_clicks, contents, filename, manual_data, method, chart_type,
         ], style={'paddingLeft': '25px'})
     ])
 
-    return (fig_xbar, fig_rs, alerta_texto, alerta_style, estadisticas_html, 
-            analisis_html, recomendaciones_html, {'display': 'block'})
+    return recomendaciones_html
+
+
+def register_callbacks(app):
+    app.callback(
+        Output('manual-table', 'columns'),
+        Output('manual-table', 'data'),
+        Input('update-table', 'n_clicks'),
+        State('num-mediciones', 'value')
+    )(update_manual_table)
+
+    app.callback(
+        Output('manual-table', 'data', allow_duplicate=True),
+        Input('add-row', 'n_clicks'),
+        State('manual-table', 'data'),
+        prevent_initial_call='initial_duplicate'
+    )(add_row)
+
+    app.callback(
+        [Output('upload-div', 'style'),
+         Output('manual-div', 'style'),
+         Output('long-div', 'style'),
+         Output('follow-div', 'style'),
+         Output('intervalo-seguimiento', 'disabled')],
+        Input('input-method', 'value')
+    )(toggle_input_method)
+
+    app.callback(
+        [Output('chart-xbar', 'figure'),
+         Output('chart-rs', 'figure'),
+         Output('alerta-principal', 'children'),
+         Output('alerta-principal', 'style'),
+         Output('estadisticas-proceso', 'children'),
+         Output('analisis-avanzado', 'children'),
+         Output('recomendaciones', 'children'),
+         Output('results-area', 'style'),
+         Output('clave-resultados', 'data'),
+         Output('pestanas-cargadas', 'data')],
+        Input('generate-button', 'n_clicks'),
+        State('upload-data', 'contents'),
+        State('upload-data', 'filename'),
+        State('manual-table', 'data'),
+        State('input-method', 'value'),
+        State('chart-type', 'value'),
+        State('usl-input', 'value'),
+        State('lsl-input', 'value'),
+        State('modo-subgrupo', 'value'),
+        State('parametro-subgrupo', 'value'),
+        State('columna-lote', 'value'),
+        State('filtro-maquina', 'value'),
+        State('columna-valor', 'value'),
+        State('limites-revisados', 'value'),
+        State('archivo-seguido', 'value'),
+        State('pestanas-resultados', 'value'),
+        Input('solicitud-automatica', 'data'),
+        running=[(Output('vista-previa', 'style'), {'display': 'block'}, {'display': 'none'})]
+    )(update_graph)
+
+    app.callback(
+        Output('id-sesion', 'data'),
+        Input('id-sesion', 'modified_timestamp'),
+        State('id-sesion', 'data')
+    )(asignar_sesion)
+
+    app.callback(
+        Output('solicitud-automatica', 'data'),
+        Input('chart-type', 'value'),
+        Input('usl-input', 'value'),
+        Input('lsl-input', 'value'),
+        State('recalculo-automatico', 'value'),
+        State('id-sesion', 'data'),
+        State('solicitud-automatica', 'data'),
+        prevent_initial_call=True
+    )(programar_recalculo)
+
+    app.callback(
+        Output('vista-previa', 'children'),
+        Input('generate-button', 'n_clicks'),
+        State('upload-data', 'contents'),
+        State('upload-data', 'filename'),
+        State('input-method', 'value'),
+        State('chart-type', 'value'),
+        State('usl-input', 'value'),
+        State('lsl-input', 'value'),
+        prevent_initial_call=True
+    )(vista_previa_analisis)
+
+    app.callback(
+        [Output('chart-xbar', 'figure', allow_duplicate=True),
+         Output('chart-rs', 'figure', allow_duplicate=True),
+         Output('alerta-principal', 'children', allow_duplicate=True),
+         Output('alerta-principal', 'style', allow_duplicate=True),
+         Output('estadisticas-proceso', 'children', allow_duplicate=True),
+         Output('analisis-avanzado', 'children', allow_duplicate=True),
+         Output('recomendaciones', 'children', allow_duplicate=True),
+         Output('results-area', 'style', allow_duplicate=True),
+         Output('clave-resultados', 'data', allow_duplicate=True),
+         Output('pestanas-cargadas', 'data', allow_duplicate=True),
+         Output('chart-xbar', 'extendData'),
+         Output('chart-rs', 'extendData'),
+         Output('version-seguimiento', 'data')],
+        Input('intervalo-seguimiento', 'n_intervals'),
+        Input('archivo-seguido', 'value'),
+        State('version-seguimiento', 'data'),
+        State('chart-type', 'value'),
+        State('usl-input', 'value'),
+        State('lsl-input', 'value'),
+        State('limites-revisados', 'value'),
+        State('pestanas-resultados', 'value'),
+        State('clave-resultados', 'data'),
+        prevent_initial_call=True
+    )(actualizar_seguimiento)
+
+    app.callback(
+        Output('resultado-gage', 'children'),
+        Input('upload-gage', 'contents'),
+        Input('tolerancia-gage', 'value'),
+        State('upload-gage', 'filename')
+    )(estudio_gage)
+
+    app.callback(
+        Output('tabla-historial', 'data'),
+        Output('tabla-historial', 'selected_rows'),
+        Output('aviso-historial', 'children'),
+        Input('buscar-historial', 'n_clicks'),
+        State('proceso-historial', 'value'),
+        State('fechas-historial', 'start_date'),
+        State('fechas-historial', 'end_date'),
+        State('estado-historial', 'value')
+    )(buscar_historial_analisis)
+
+    app.callback(
+        [Output('chart-xbar', 'figure', allow_duplicate=True),
+         Output('chart-rs', 'figure', allow_duplicate=True),
+         Output('alerta-principal', 'children', allow_duplicate=True),
+         Output('alerta-principal', 'style', allow_duplicate=True),
+         Output('estadisticas-proceso', 'children', allow_duplicate=True),
+         Output('analisis-avanzado', 'children', allow_duplicate=True),
+         Output('recomendaciones', 'children', allow_duplicate=True),
+         Output('results-area', 'style', allow_duplicate=True),
+         Output('clave-resultados', 'data', allow_duplicate=True),
+         Output('pestanas-cargadas', 'data', allow_duplicate=True)],
+        Input('tabla-historial', 'selected_rows'),
+        State('tabla-historial', 'data'),
+        State('pestanas-resultados', 'value'),
+        prevent_initial_call=True
+    )(abrir_analisis_guardado)
+
+    app.callback(
+        [Output('chart-xbar', 'figure', allow_duplicate=True),
+         Output('chart-rs', 'figure', allow_duplicate=True),
+         Output('estadisticas-proceso', 'children', allow_duplicate=True),
+         Output('analisis-avanzado', 'children', allow_duplicate=True),
+         Output('recomendaciones', 'children', allow_duplicate=True),
+         Output('pestanas-cargadas', 'data', allow_duplicate=True)],
+        Input('pestanas-resultados', 'value'),
+        Input('clave-resultados', 'data'),
+        State('pestanas-cargadas', 'data'),
+        prevent_initial_call=True
+    )(contenido_pestana)
+
+    app.callback(
+        Output('mapa-escenarios', 'children'),
+        Input('pestanas-resultados', 'value'),
+        Input('clave-resultados', 'data'),
+        Input('metrica-escenarios', 'value'),
+        Input('puntos-escenarios', 'value'),
+        prevent_initial_call=True
+    )(mapa_escenarios)
+
+    app.callback(
+        Output('resultado-multivariado', 'children'),
+        Input('upload-multivariado', 'contents'),
+        Input('tamano-multivariado', 'value'),
+        State('upload-multivariado', 'filename')
+    )(grafico_multivariado)
+
+    app.callback(
+        Output('resultado-arl', 'children'),
+        Input('simular-arl', 'n_clicks'),
+        State('chart-type', 'value'),
+        State('n-arl', 'value'),
+        State('desplazamientos-arl', 'value'),
+        State('series-arl', 'value'),
+        State('reglas-arl', 'value')
+    )(simulador_arl)
+
+    app.callback(
+        Output('enlace-lote', 'children'),
+        Input('upload-lote', 'contents'),
+        State('upload-lote', 'filename'),
+        State('chart-type', 'value'),
+        State('usl-input', 'value'),
+        State('lsl-input', 'value')
+    )(preparar_lote)
+
+def register_routes(app):
+    app.server.add_url_rule('/exportar/reportes/<lote>', view_func=exportar_lote)
+    app.server.add_url_rule('/exportar/reportes', view_func=exportar_reportes, methods=['POST'])
+    app.server.add_url_rule('/exportar/subgrupos/<int:id_analisis>', view_func=exportar_subgrupos)
+    app.server.add_url_rule('/historial/<caracteristica>', view_func=guardar_historial, methods=['POST'])
+    app.server.add_url_rule('/historial/<caracteristica>', view_func=consultar_historial)
+
+def create_app():
+    """
+    Crea la aplicación Dash (layout y callbacks).
+    Con `gunicorn --preload "APPCONTROL:create_app()"` se construye una sola vez
+    en el proceso maestro y los workers la comparten al hacer fork.
+    """
+    app = dash.Dash(__name__)
+    app.title = "BrainyStats - Gráficos de Control"
+    app.layout = build_layout()
+    register_callbacks(app)
+    register_routes(app)
+    precargar_plantillas()
+    return app
+
+_app = None
+
+def __getattr__(name):
+    # Compatibilidad con `gunicorn APPCONTROL:app` y `APPCONTROL.server`
+    global _app
+    if name in ('app', 'server'):
+        if _app is None:
+            _app = create_app()
+        return _app if name == 'app' else _app.server
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -0,0 +1,106 @@
+"""Diagnóstico de autocorrelación de la serie graficada (medias o individuales).
+
+La ACF se calcula con FFT (teorema de Wiener-Khinchin) en O(n log n), así que
+sirve para historiales de millones de puntos; la PACF y el modelo AR salen de
+la recursión de Durbin-Levinson sobre esos mismos coeficientes, sin volver a
+recorrer la serie. Los residuos del AR son aproximadamente independientes y se
+pueden graficar con límites I-MR cuando la serie original no lo es.
+"""
+from statistics import NormalDist
+import numpy as np
+
+MAX_REZAGOS = 40
+MAX_ORDEN_AR = 10
+
+# Largo de cada FFT de `acf_fft`: la serie se recorre por bloques de este tamaño
+_LARGO_FFT = 1 << 16
+
+def acf_fft(serie, max_rezago=MAX_REZAGOS):
+    """
+    Autocorrelaciones de los rezagos 0..max_rezago con FFT, por bloques: cada bloque
+    se correlaciona con sí mismo más los max_rezago puntos siguientes, así la memoria
+    no crece con la serie y el costo sigue siendo O(n log n).
+    """
+    serie = np.asarray(serie, dtype=float)
+    media = serie.mean()
+    # Con este largo de FFT los rezagos negativos no se solapan con los 0..max_rezago
+    n_fft = max(_LARGO_FFT, 1 << (2 * max_rezago + 1).bit_length())
+    largo = n_fft - max_rezago
+    autocovarianza = np.zeros(max_rezago + 1)
+    for inicio in range(0, len(serie), largo):
+        extendido = serie[inicio:inicio + largo + max_rezago] - media
+        bloque = np.fft.rfft(extendido[:largo], n_fft)
+        cruzado = np.fft.irfft(np.conj(bloque) * np.fft.rfft(extendido, n_fft), n_fft)
+        autocovarianza += cruzado[:max_rezago + 1]
+    if autocovarianza[0] <= 0:
+        return np.zeros(max_rezago + 1)
+    return autocovarianza / autocovarianza[0]
+
+def durbin_levinson(acf, max_orden):
+    """
+    (pacf, coeficientes, varianzas) de los AR de orden 1..max_orden a partir de la ACF.
+    coeficientes[k] son los φ del AR(k); varianzas[k] es la varianza de innovación relativa.
+    """
+    pacf = np.zeros(max_orden + 1)
+    varianzas = np.ones(max_orden + 1)
+    coeficientes = [np.zeros(0)]
+    pacf[0] = 1.0
+    phi = np.zeros(0)
+    for k in range(1, max_orden + 1):
+        if varianzas[k - 1] <= 0:
+            break
+        phi_kk = (acf[k] - phi @ acf[k - 1:0:-1]) / varianzas[k - 1]
+        phi = np.append(phi - phi_kk * phi[::-1], phi_kk)
+        pacf[k] = phi_kk
+        varianzas[k] = varianzas[k - 1] * (1 - phi_kk ** 2)
+        coeficientes.append(phi)
+    return pacf, coeficientes, varianzas
+
+def residuos_ar(serie, media, coeficientes):
+    """Residuos e_t = d_t - Σ φ_j d_(t-j) con d = serie - media (empiezan en el punto p+1)"""
+    d = np.asarray(serie, dtype=float) - media
+    orden = len(coeficientes)
+    residuos = d[orden:].copy()
+    for j, phi in enumerate(coeficientes, start=1):
+        residuos -= phi * d[orden - j:len(d) - j]
+    return residuos
+
+def diagnostico_autocorrelacion(serie, max_rezago=MAX_REZAGOS, alfa=0.05):
+    """
+    ACF, PACF, rezagos significativos y AR ajustado (orden por AIC) de una serie.
+    - limite: banda ±z/√n de cada rezago (la que se dibuja)
+    - rezagos_significativos: rezagos fuera de la banda con corrección de Bonferroni
+      sobre todos los rezagos, para no alertar por azar en series independientes
+    Devuelve None si la serie es demasiado corta.
+    """
+    serie = np.asarray(serie, dtype=float)
+    validos = ~np.isnan(serie)
+    if not validos.all():
+        serie = serie[validos]
+    n = len(serie)
+    max_rezago = min(max_rezago, n // 4)
+    if max_rezago < 2:
+        return None
+
+    acf = acf_fft(serie, max_rezago)
+    max_orden = min(MAX_ORDEN_AR, max_rezago)
+    pacf, coeficientes, varianzas = durbin_levinson(acf, max_rezago)
+    normal = NormalDist()
+    limite = normal.inv_cdf(1 - alfa / 2) / np.sqrt(n)
+    limite_conjunto = normal.inv_cdf(1 - alfa / (2 * max_rezago)) / np.sqrt(n)
+    rezagos = np.arange(1, max_rezago + 1)
+
+    # AIC con la varianza de innovación de Durbin-Levinson (orden 0 = sin modelo)
+    aic = n * np.log(np.maximum(varianzas[:max_orden + 1], 1e-300)) + 2 * np.arange(max_orden + 1)
+    orden = int(np.argmin(aic))
+    return {
+        'n': n,
+        'rezagos': rezagos,
+        'acf': acf[1:],
+        'pacf': pacf[1:],
+        'limite': limite,
+        'rezagos_significativos': rezagos[np.abs(acf[1:]) > limite_conjunto],
+        'media': float(serie.mean()),
+        'orden_ar': orden,
+        'coeficientes_ar': coeficientes[orden],
+    }
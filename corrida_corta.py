@@ -0,0 +1,153 @@
+"""Gráficos de corrida corta (Z̄-W y Z-MR) para lotes pequeños de varios números de parte.
+
+Cada subgrupo se estandariza con el objetivo y la dispersión media de su parte
+(Z̄ = (X̄ - objetivo) / R̄, W = R / R̄), así que todas las partes comparten un
+solo gráfico con límites fijos. Los estadísticos por parte se acumulan con
+bincount sobre los códigos de parte: una sola pasada sin importar cuántas
+partes haya.
+"""
+import numpy as np
+
+from spc_core import (
+    CONTROL_CHART_CONSTANTS,
+    DTYPE_SUBGRUPOS,
+    constantes_para,
+    detectar_patrones_western_electric,
+    estadisticas_por_fila,
+    generar_recomendaciones,
+)
+
+def subgrupos_corrida_corta(df):
+    """
+    (subgrupos, partes) a partir de un archivo sin encabezados cuya primera
+    columna es el número de parte y el resto las mediciones del subgrupo.
+    Se omiten las filas sin parte o sin mediciones (p. ej. una fila de encabezados).
+    """
+    import pandas as pd
+
+    partes = df.iloc[:, 0].to_numpy(dtype=object)
+    subgroups = df.iloc[:, 1:].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=DTYPE_SUBGRUPOS)
+    validas = (estadisticas_por_fila(subgroups)['n'] > 0) & pd.notna(partes)
+    return subgroups[validas], partes[validas]
+
+def _por_parte(codigos, valores, partes):
+    """Media de `valores` por código de parte (NaN no cuenta) y cantidad de valores usados"""
+    validos = ~np.isnan(valores)
+    conteo = np.bincount(codigos[validos], minlength=partes)
+    suma = np.bincount(codigos[validos], weights=valores[validos], minlength=partes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return suma / conteo, conteo
+
+def estandarizar_por_parte(subgroups, partes=None, objetivos=None):
+    """
+    Estandariza cada subgrupo con el objetivo y la dispersión de su parte.
+    - subgrupos de n >= 2: Z̄ = (X̄ - objetivo) / R̄ y W = R / R̄
+    - individuales (n = 1): Z = (X - objetivo) / MR̄ y W = MR / MR̄, con los rangos
+      móviles entre lecturas consecutivas de la misma parte
+    - partes: número de parte de cada fila (None = todas de la misma parte)
+    - objetivos: {parte: nominal}; sin nominal el objetivo es la media de la parte
+    Devuelve un diccionario con z, w, los códigos de parte y el resumen por parte.
+    """
+    import pandas as pd
+
+    subgroups = np.asarray(subgroups)
+    if partes is None:
+        codigos, nombres = np.zeros(len(subgroups), dtype=np.int64), np.array(['(única)'], dtype=object)
+    else:
+        codigos, nombres = pd.factorize(np.asarray(partes, dtype=object))
+        codigos = codigos.astype(np.int64)
+    total_partes = len(nombres)
+
+    if subgroups.shape[1] == 1:
+        valores = subgroups[:, 0].astype(float)
+        # Rango móvil con la lectura anterior de la misma parte
+        orden = np.argsort(codigos, kind='stable')
+        misma_parte = codigos[orden][1:] == codigos[orden][:-1]
+        dispersion = np.full(len(valores), np.nan)
+        dispersion[orden[1:][misma_parte]] = np.abs(np.diff(valores[orden]))[misma_parte]
+        centro = valores
+    else:
+        estadisticas = estadisticas_por_fila(subgroups)
+        centro = estadisticas['media']
+        dispersion = estadisticas['maximo'] - estadisticas['minimo']
+
+    media_parte, subgrupos_parte = _por_parte(codigos, centro, total_partes)
+    dispersion_parte, _ = _por_parte(codigos, dispersion, total_partes)
+    objetivo_parte = media_parte
+    if objetivos:
+        nominales = pd.Series(nombres).map(objetivos).to_numpy(dtype=float)
+        objetivo_parte = np.where(np.isnan(nominales), media_parte, nominales)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (centro - objetivo_parte[codigos]) / dispersion_parte[codigos]
+        w = dispersion / dispersion_parte[codigos]
+    # Sin dispersión propia (una sola lectura o todas iguales) la parte no se puede estandarizar
+    parte_valida = np.isfinite(dispersion_parte) & (dispersion_parte > 0)
+    return {
+        'z': z,
+        'w': w,
+        'codigos': codigos,
+        'validos': parte_valida[codigos] & ~np.isnan(centro),
+        'resumen': {
+            'parte': nombres,
+            'subgrupos': subgrupos_parte,
+            'objetivo': objetivo_parte,
+            'dispersion': dispersion_parte,
+            'valida': parte_valida,
+        },
+    }
+
+def analizar_corrida_corta(subgroups, partes=None, objetivos=None):
+    """
+    Análisis de corrida corta con la misma forma que `analizar_subgrupos`
+    (chart_type 'ZW' o 'ZMR'). No hay capacidad: las especificaciones cambian de
+    parte a parte. Devuelve None si no quedan datos suficientes.
+    """
+    estandarizado = estandarizar_por_parte(subgroups, partes, objetivos)
+    validos = estandarizado['validos']
+    if validos.sum() < 2:
+        return None
+
+    n = subgroups.shape[1]
+    z, w = estandarizado['z'][validos], estandarizado['w'][validos]
+    x_pos = np.arange(1, len(z) + 1)
+    if n == 1:
+        constantes = CONTROL_CHART_CONSTANTS[2]
+        # Límites de individuales con MR̄ = 1: ±3/d2
+        A, D3, D4 = 3 / constantes['d2'], constantes['D3'], constantes['D4']
+        # La primera lectura de cada parte no tiene rango móvil
+        con_rango = ~np.isnan(w)
+        w, x_rs = w[con_rango], x_pos[con_rango]
+    else:
+        constantes = constantes_para(n)
+        A, D3, D4 = constantes['A2'], constantes['D3'], constantes['D4']
+        x_rs = x_pos
+
+    resultado = {
+        'chart_type': 'ZMR' if n == 1 else 'ZW',
+        'n': n,
+        'x': z,
+        'rs': w,
+        'CLx': 0.0, 'UCLx': A, 'LCLx': -A,
+        'CLrs': 1.0, 'UCLrs': D4, 'LCLrs': D3,
+    }
+    fuera_control_x = np.where((z > A) | (z < -A))[0]
+    fuera_control_rs = np.where((w > D4) | (w < D3))[0]
+    num_fuera_control = len(fuera_control_x) + len(fuera_control_rs)
+    violaciones = detectar_patrones_western_electric(z, A, -A, 0.0)
+    resumen = estandarizado['resumen']
+    resultado.update({
+        'x_pos': x_pos,
+        'x_rs': x_rs,
+        'fuera_control_x': fuera_control_x,
+        'fuera_control_rs': fuera_control_rs,
+        'num_fuera_control': num_fuera_control,
+        'violaciones': violaciones,
+        'capacidad': None,
+        'distribucion': None,
+        'recomendaciones': generar_recomendaciones(num_fuera_control, violaciones, None),
+        'partes': resumen['parte'][estandarizado['codigos'][validos]],
+        'resumen_partes': {k: v[resumen['valida']] for k, v in resumen.items() if k != 'valida'},
+        'partes_omitidas': int((~resumen['valida']).sum()),
+    })
+    return resultado
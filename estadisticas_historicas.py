@@ -0,0 +1,302 @@
+"""Historial compacto de estadísticos suficientes por subgrupo.
+
+Por cada subgrupo se guarda solo (inicio, n, suma, suma de cuadrados, mínimo,
+máximo, rango y desviación), en archivos binarios de solo agregado. Al guardar
+se actualizan también los resúmenes por hora, turno, día y semana, así que los
+límites y gráficos de cualquier periodo salen de agregados sin releer las
+mediciones originales.
+
+Varios workers pueden escribir la misma característica: cada escritura toma un
+bloqueo exclusivo del directorio (flock) mientras agrega los subgrupos y
+reescribe los resúmenes, y las lecturas uno compartido.
+"""
+import json
+import os
+import re
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin workers concurrentes, no hace falta bloquear
+    fcntl = None
+
+from ingestion import _claves_turno, _codigos_consecutivos
+from spc_core import (calcular_limites_imr, constantes_para, detectar_patrones_western_electric,
+                      generar_recomendaciones, _indices_capacidad)
+
+DIRECTORIO_HISTORIAL = os.environ.get('BRAINYSTATS_HISTORIAL', 'historial')
+
+# Un registro por subgrupo o por periodo resumido; los campos suma_* acumulan
+# los estadísticos de los subgrupos que caen en el periodo
+DTYPE_ESTADISTICAS = np.dtype([
+    ('inicio', 'i8'),
+    ('subgrupos', 'i8'),
+    ('n', 'i8'),
+    ('suma', 'f8'),
+    ('suma_cuadrados', 'f8'),
+    ('minimo', 'f8'),
+    ('maximo', 'f8'),
+    ('suma_medias', 'f8'),
+    ('suma_rangos', 'f8'),
+    ('suma_desviaciones', 'f8'),
+])
+
+NIVELES = ('subgrupo', 'hora', 'turno', 'dia', 'semana')
+
+INICIOS_TURNO = (6, 14, 22)
+
+_HORA_NS = 3_600_000_000_000
+_DIA_NS = 24 * _HORA_NS
+
+def _directorio(directorio, caracteristica):
+    if not re.fullmatch(r'[\w\-.]+', caracteristica or '') or caracteristica.strip('.') == '':
+        raise ValueError(f"Nombre de característica no válido: {caracteristica!r}")
+    return os.path.join(directorio, caracteristica)
+
+@contextmanager
+def _bloqueo(ruta, exclusivo):
+    """flock sobre el archivo .bloqueo de la característica durante el `with`"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(ruta, '.bloqueo'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _leer_meta(ruta):
+    archivo = os.path.join(ruta, 'meta.json')
+    if not os.path.exists(archivo):
+        return None
+    with open(archivo) as f:
+        return json.load(f)
+
+def _leer_nivel(ruta, nivel):
+    """Registros de un nivel como memmap de solo lectura (arreglo vacío si no existe)"""
+    archivo = os.path.join(ruta, f'{nivel}.bin')
+    if not os.path.exists(archivo) or os.path.getsize(archivo) == 0:
+        return np.empty(0, dtype=DTYPE_ESTADISTICAS)
+    return np.memmap(archivo, dtype=DTYPE_ESTADISTICAS, mode='r')
+
+def estadisticas_subgrupos(inicios, subgroups):
+    """Registros de estadísticos suficientes para una matriz de subgrupos (con relleno NaN)"""
+    subgroups = np.asarray(subgroups, dtype=float)
+    validos = ~np.isnan(subgroups)
+    n = validos.sum(axis=1)
+    conservar = n > 0
+    subgroups, validos, n = subgroups[conservar], validos[conservar], n[conservar]
+    ceros = np.where(validos, subgroups, 0.0)
+
+    registros = np.zeros(len(n), dtype=DTYPE_ESTADISTICAS)
+    registros['inicio'] = np.asarray(inicios, dtype='datetime64[ns]')[conservar].view(np.int64)
+    registros['subgrupos'] = 1
+    registros['n'] = n
+    registros['suma'] = ceros.sum(axis=1)
+    registros['suma_cuadrados'] = (ceros * ceros).sum(axis=1)
+    registros['minimo'] = np.nanmin(subgroups, axis=1)
+    registros['maximo'] = np.nanmax(subgroups, axis=1)
+    registros['suma_medias'] = registros['suma'] / n
+    registros['suma_rangos'] = registros['maximo'] - registros['minimo']
+    # Desviación con ddof=1; un subgrupo de una sola lectura aporta 0
+    varianza = (registros['suma_cuadrados'] - registros['suma'] * registros['suma_medias']) / np.maximum(n - 1, 1)
+    registros['suma_desviaciones'] = np.sqrt(np.maximum(varianza, 0))
+    return registros
+
+def _claves_nivel(inicios_ns, nivel, inicios_turno):
+    """(clave del periodo, inicio del periodo en ns) de cada registro para un nivel de resumen"""
+    if nivel == 'hora':
+        claves = inicios_ns // _HORA_NS
+        return claves, claves * _HORA_NS
+    if nivel == 'dia':
+        claves = inicios_ns // _DIA_NS
+        return claves, claves * _DIA_NS
+    if nivel == 'semana':
+        # El 1970-01-01 fue jueves: +3 días para que las semanas empiecen en lunes
+        claves = (inicios_ns // _DIA_NS + 3) // 7
+        return claves, (claves * 7 - 3) * _DIA_NS
+    if nivel == 'turno':
+        turnos = np.sort(np.asarray(inicios_turno, dtype=float))
+        claves = _claves_turno(inicios_ns, turnos)
+        dias, turno = np.divmod(claves, len(turnos))
+        return claves, dias * _DIA_NS + (turnos[turno] * _HORA_NS).astype(np.int64)
+    raise ValueError(f"Nivel de resumen desconocido: {nivel}")
+
+def agregar_registros(registros, codigos, inicios_periodo=None):
+    """Combina registros consecutivos con el mismo código en un registro por periodo"""
+    if len(registros) == 0:
+        return registros.copy()
+    cortes = np.flatnonzero(np.concatenate(([True], codigos[1:] != codigos[:-1])))
+    agregados = np.empty(len(cortes), dtype=DTYPE_ESTADISTICAS)
+    agregados['inicio'] = (registros['inicio'] if inicios_periodo is None else inicios_periodo)[cortes]
+    for campo in ('subgrupos', 'n', 'suma', 'suma_cuadrados', 'suma_medias', 'suma_rangos', 'suma_desviaciones'):
+        agregados[campo] = np.add.reduceat(registros[campo], cortes)
+    agregados['minimo'] = np.minimum.reduceat(registros['minimo'], cortes)
+    agregados['maximo'] = np.maximum.reduceat(registros['maximo'], cortes)
+    return agregados
+
+def total_registros(registros):
+    """Un solo registro con el agregado de todos"""
+    return agregar_registros(registros, np.zeros(len(registros), dtype=np.int64))
+
+def guardar_estadisticas(inicios, subgroups, caracteristica, directorio=DIRECTORIO_HISTORIAL,
+                         inicios_turno=INICIOS_TURNO):
+    """
+    Agrega subgrupos al historial de una característica y actualiza sus resúmenes.
+    - inicios: marca de tiempo de cada subgrupo (no decreciente y posterior a lo ya guardado)
+    - inicios_turno: horas de inicio de turno; quedan fijas al crear el historial
+    Devuelve la cantidad de subgrupos agregados.
+    """
+    ruta = _directorio(directorio, caracteristica)
+    os.makedirs(ruta, exist_ok=True)
+    with _bloqueo(ruta, exclusivo=True):
+        return _guardar_estadisticas(inicios, subgroups, ruta, inicios_turno)
+
+def _guardar_estadisticas(inicios, subgroups, ruta, inicios_turno):
+    meta = _leer_meta(ruta)
+    if meta is None:
+        meta = {'inicios_turno': sorted(float(h) for h in inicios_turno)}
+        with open(os.path.join(ruta, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    nuevos = estadisticas_subgrupos(inicios, subgroups)
+    if len(nuevos) == 0:
+        return 0
+    if np.any(nuevos['inicio'][1:] < nuevos['inicio'][:-1]):
+        raise ValueError("Los subgrupos deben venir en orden de tiempo")
+    guardados = _leer_nivel(ruta, 'subgrupo')
+    if len(guardados) and nuevos['inicio'][0] < guardados['inicio'][-1]:
+        raise ValueError("El historial es de solo agregado: hay subgrupos anteriores al último guardado")
+
+    with open(os.path.join(ruta, 'subgrupo.bin'), 'ab') as f:
+        nuevos.tofile(f)
+
+    for nivel in NIVELES[1:]:
+        claves, inicios_periodo = _claves_nivel(nuevos['inicio'], nivel, meta['inicios_turno'])
+        agregados = agregar_registros(nuevos, _codigos_consecutivos(claves), inicios_periodo)
+        archivo = os.path.join(ruta, f'{nivel}.bin')
+        existentes = _leer_nivel(ruta, nivel)
+        if len(existentes):
+            ultimo = existentes[-1:]
+            clave_ultima = _claves_nivel(ultimo['inicio'], nivel, meta['inicios_turno'])[0][0]
+            if clave_ultima == claves[0]:
+                # El primer periodo nuevo continúa el último guardado: se reescribe ese registro
+                agregados[:1] = total_registros(np.concatenate((ultimo, agregados[:1])))
+                with open(archivo, 'r+b') as f:
+                    f.seek((len(existentes) - 1) * DTYPE_ESTADISTICAS.itemsize)
+                    agregados.tofile(f)
+                continue
+        with open(archivo, 'ab') as f:
+            agregados.tofile(f)
+    return len(nuevos)
+
+def leer_estadisticas(caracteristica, desde=None, hasta=None, nivel=None, max_puntos=500,
+                      directorio=DIRECTORIO_HISTORIAL):
+    """
+    Registros de los periodos que empiezan en [desde, hasta) en el nivel pedido.
+    Sin nivel se usa el más detallado que no supere `max_puntos` registros.
+    Devuelve (nivel, registros).
+    """
+    ruta = _directorio(directorio, caracteristica)
+    if _leer_meta(ruta) is None:
+        return None, None
+    with _bloqueo(ruta, exclusivo=False):
+        return _leer_estadisticas(ruta, desde, hasta, nivel, max_puntos)
+
+def _leer_estadisticas(ruta, desde, hasta, nivel, max_puntos):
+    def recortar(registros):
+        inicios = registros['inicio']
+        i = 0 if desde is None else np.searchsorted(inicios, np.datetime64(desde, 'ns').astype(np.int64))
+        j = len(inicios) if hasta is None else np.searchsorted(inicios, np.datetime64(hasta, 'ns').astype(np.int64))
+        return np.array(registros[i:j])
+
+    if nivel is not None:
+        if nivel not in NIVELES:
+            raise ValueError(f"Nivel de resumen desconocido: {nivel}")
+        return nivel, recortar(_leer_nivel(ruta, nivel))
+    for nivel in NIVELES:
+        registros = recortar(_leer_nivel(ruta, nivel))
+        if len(registros) <= max_puntos:
+            return nivel, registros
+    return nivel, registros
+
+def analizar_estadisticas(registros, chart_type='XR', USL=None, LSL=None):
+    """
+    Análisis con la misma forma que `analizar_subgrupos`, calculado solo con agregados.
+    Cada punto es la media de las medias (y de los rangos o desviaciones) de los
+    k subgrupos del periodo, con X̄̄, R̄ y S̄ del periodo completo. Sus límites se
+    angostan con √k: X̄̄ ± 3σ/√(n·k) y R̄ (o S̄) ± 3σ_R/√k, así que en el nivel
+    'subgrupo' coinciden con los de las mediciones originales. Si k cambia entre
+    puntos, UCL/LCL son arreglos con un valor por punto.
+    En I-MR los puntos resumidos se tratan como individuales con su propio rango móvil.
+    """
+    if len(registros) == 0:
+        return None
+    total = total_registros(registros)[0]
+    k, N = int(total['subgrupos']), int(total['n'])
+    n = int(round(N / k))
+    if n == 1:
+        chart_type = 'IMR'
+
+    x = registros['suma_medias'] / registros['subgrupos']
+    media = total['suma'] / N
+    varianza_total = (total['suma_cuadrados'] - total['suma'] * media) / (N - 1) if N > 1 else 0.0
+    sigma_total = np.sqrt(max(varianza_total, 0.0))
+
+    if chart_type == 'IMR':
+        if len(x) < 2:
+            return None
+        limites = calcular_limites_imr(x)
+        CLx, UCLx, LCLx = limites['CL'], limites['UCL'], limites['LCL']
+        rs = limites['rangos_moviles']
+        CLrs, UCLrs, LCLrs = limites['CLmr'], limites['UCLmr'], limites['LCLmr']
+        sigma_within = limites['sigma']
+        UCL_subgrupo, LCL_subgrupo = UCLx, LCLx
+    else:
+        constants = constantes_para(n)
+        CLx = total['suma_medias'] / k
+        if chart_type == 'XR':
+            CLrs = total['suma_rangos'] / k
+            A, D4 = constants['A2'], constants['D4']
+            rs = registros['suma_rangos'] / registros['subgrupos']
+            sigma_within = CLrs / constants['d2']
+        else:
+            CLrs = total['suma_desviaciones'] / k
+            A, D4 = constants['A3'], constants['B4']
+            rs = registros['suma_desviaciones'] / registros['subgrupos']
+            sigma_within = CLrs / constants['c4']
+        UCL_subgrupo, LCL_subgrupo = CLx + A * CLrs, CLx - A * CLrs
+
+        # Un punto promedia k subgrupos: su error estándar es el de un subgrupo / √k.
+        # (D4 - 1)·R̄ = 3σ_R, y D3 = max(0, 2 - D4) es el caso k = 1
+        subgrupos_punto = registros['subgrupos']
+        raiz_k = np.sqrt(subgrupos_punto if np.ptp(subgrupos_punto) else subgrupos_punto[0])
+        UCLx, LCLx = CLx + A * CLrs / raiz_k, CLx - A * CLrs / raiz_k
+        UCLrs = CLrs * (1 + (D4 - 1) / raiz_k)
+        LCLrs = CLrs * np.maximum(1 - (D4 - 1) / raiz_k, 0.0)
+
+    x_pos = registros['inicio'].view('datetime64[ns]')
+    fuera_control_x = np.where((x > UCLx) | (x < LCLx))[0]
+    fuera_control_rs = np.where((rs > UCLrs) | (rs < LCLrs))[0]
+    num_fuera_control = len(fuera_control_x) + len(fuera_control_rs)
+    violaciones = detectar_patrones_western_electric(x, UCLx, LCLx, CLx)
+    capacidad = _indices_capacidad(CLx, sigma_within, sigma_total, UCL_subgrupo, LCL_subgrupo, USL, LSL)
+
+    return {
+        'chart_type': chart_type,
+        'n': n,
+        'x': x,
+        'CLx': CLx, 'UCLx': UCLx, 'LCLx': LCLx,
+        'rs': rs,
+        'CLrs': CLrs, 'UCLrs': UCLrs, 'LCLrs': LCLrs,
+        'x_pos': x_pos,
+        'x_rs': x_pos[1:] if chart_type == 'IMR' else x_pos,
+        'fuera_control_x': fuera_control_x,
+        'fuera_control_rs': fuera_control_rs,
+        'num_fuera_control': num_fuera_control,
+        'violaciones': violaciones,
+        'capacidad': capacidad,
+        'recomendaciones': generar_recomendaciones(num_fuera_control, violaciones, capacidad)
+    }
@@ -0,0 +1,471 @@
+"""Figuras de los gráficos de control como diccionarios planos de Plotly.
+
+Las figuras se arman con plantillas cacheadas de layout, líneas y zonas en
+lugar de `go.Figure`, así se evita la validación de propiedades de Plotly en
+cada solicitud. Dash las serializa directamente (con orjson si está instalado).
+"""
+from functools import lru_cache
+import numpy as np
+
+# 🎨 Paleta de colores profesional
+colors = {
+    'bg_primary': '#0A2540',
+    'bg_secondary': '#0D3A5F',
+    'bg_card': '#FFFFFF',
+    'accent_gold': '#D4AF37',
+    'accent_gold_light': '#F4E5C3',
+    'green_primary': '#1B5E20',
+    'green_secondary': '#2E7D32',
+    'text_primary': '#1A1A1A',
+    'text_secondary': '#546E7A',
+    'text_light': '#FFFFFF',
+    'success': '#4CAF50',
+    'warning': '#FF9800',
+    'danger': '#E53935',
+    'chart_line1': '#2196F3',
+    'chart_line2': '#FF6F00',
+    'border': '#E0E0E0',
+    'shadow': 'rgba(0, 0, 0, 0.15)'
+}
+
+@lru_cache(maxsize=None)
+def _plantilla_plotly_white():
+    """Plantilla 'plotly_white' expandida (se resuelve una sola vez por proceso)"""
+    import plotly.io as pio
+    return pio.templates['plotly_white'].to_plotly_json()
+
+def precargar_plantillas():
+    """Resuelve las plantillas cacheadas; con `--preload` se heredan ya listas en los workers"""
+    _plantilla_plotly_white()
+
+def _layout_base():
+    return {
+        'template': _plantilla_plotly_white(),
+        'paper_bgcolor': 'white',
+        'plot_bgcolor': '#FAFAFA',
+        'font': {'size': 13, 'color': colors['text_primary'], 'family': 'Inter'},
+        'hovermode': 'x unified',
+        'showlegend': True,
+        'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
+        'margin': {'l': 70, 'r': 70, 't': 90, 'b': 70}
+    }
+
+def _linea_horizontal(y, color, dash, width):
+    """Equivalente a `add_hline`: línea de lado a lado del área de trazado"""
+    return {'type': 'line', 'xref': 'x domain', 'x0': 0, 'x1': 1, 'yref': 'y', 'y0': y, 'y1': y,
+            'line': {'color': color, 'dash': dash, 'width': width}}
+
+def _anotacion(y, texto, color, posicion='right'):
+    return {'text': texto, 'showarrow': False, 'xref': 'x domain', 'yref': 'y', 'y': y, 'yanchor': 'middle',
+            'x': 1 if posicion == 'right' else 0, 'xanchor': 'left' if posicion == 'right' else 'right',
+            'font': {'size': 11, 'color': color}}
+
+def _zona(y0, y1, color, opacity):
+    """Equivalente a `add_hrect`: franja horizontal de lado a lado"""
+    return {'type': 'rect', 'xref': 'x domain', 'x0': 0, 'x1': 1, 'yref': 'y', 'y0': y0, 'y1': y1,
+            'fillcolor': color, 'opacity': opacity, 'line': {'width': 0}}
+
+def figura_vacia():
+    return {'data': [], 'layout': {}}
+
+def figura_control(x, y, CL, UCL, LCL, titulo, eje_x, eje_y, nombre, punto,
+                   color_linea, fuera_control=(), USL=None, LSL=None, zonas=False, excluidos=(),
+                   traza_fuera_control=False):
+    """
+    Gráfico de control con su serie, límites CL/UCL/LCL y puntos fuera de control.
+    - USL/LSL: límites de especificación (línea punteada a la izquierda)
+    - zonas: sombrea las zonas de 1σ-2σ y 2σ-3σ alrededor de CL
+    - excluidos: puntos que no entran en los límites revisados (en gris)
+    - traza_fuera_control: incluye la traza de fuera de control (la segunda) aunque
+      esté vacía, para que el seguimiento de archivos le agregue puntos con extendData
+    UCL/LCL pueden ser arreglos con un límite por punto (resúmenes de distinto
+    tamaño); entonces se dibujan como escalones y sin zonas.
+    """
+    data = [{
+        'type': 'scatter',
+        'x': x, 'y': y,
+        'mode': 'lines+markers',
+        'name': nombre,
+        'line': {'color': color_linea, 'width': 3},
+        'marker': {'size': 10, 'color': color_linea, 'line': {'color': 'white', 'width': 2}},
+        'hovertemplate': f'<b>{punto} %{{x}}</b><br>{nombre} = %{{y:.4f}}<extra></extra>'
+    }]
+    if len(fuera_control) > 0 or traza_fuera_control:
+        data.append({
+            'type': 'scatter',
+            'x': x[fuera_control], 'y': y[fuera_control],
+            'mode': 'markers', 'name': 'Fuera de control',
+            'marker': {'size': 14, 'color': colors['danger'], 'symbol': 'x', 'line': {'width': 3, 'color': 'white'}},
+            'hovertemplate': f'⚠️ Fuera de control<br>{punto} %{{x}}<br>{nombre} = %{{y:.4f}}<extra></extra>'
+        })
+    if len(excluidos) > 0:
+        data.append({
+            'type': 'scatter',
+            'x': x[excluidos], 'y': y[excluidos],
+            'mode': 'markers', 'name': 'Excluido (límites revisados)',
+            'marker': {'size': 12, 'color': '#BDBDBD', 'line': {'color': '#757575', 'width': 2}},
+            'hovertemplate': f'Excluido de los límites<br>{punto} %{{x}}<br>{nombre} = %{{y:.4f}}<extra></extra>'
+        })
+
+    # Límites de control
+    shapes, annotations = [], []
+    if np.ndim(UCL):
+        for nombre_limite, valores in (('UCL', UCL), ('LCL', LCL)):
+            data.append({
+                'type': 'scatter', 'x': x, 'y': valores, 'mode': 'lines', 'name': nombre_limite,
+                'line': {'color': colors['danger'], 'dash': 'dash', 'width': 2.5, 'shape': 'hvh'},
+                'hovertemplate': f'{nombre_limite} = %{{y:.4f}}<extra></extra>', 'showlegend': False
+            })
+            annotations.append(_anotacion(valores[-1], nombre_limite, colors['danger']))
+        zonas = False
+    else:
+        shapes += [_linea_horizontal(UCL, colors['danger'], 'dash', 2.5),
+                   _linea_horizontal(LCL, colors['danger'], 'dash', 2.5)]
+        annotations += [_anotacion(UCL, f"UCL {UCL:.4f}", colors['danger']),
+                        _anotacion(LCL, f"LCL {LCL:.4f}", colors['danger'])]
+    shapes.append(_linea_horizontal(CL, colors['success'], 'solid', 3))
+    annotations.append(_anotacion(CL, f"CL {CL:.4f}", colors['success']))
+
+    # Límites de especificación USL/LSL
+    for nombre_limite, valor in (('USL', USL), ('LSL', LSL)):
+        if valor is not None:
+            shapes.append(_linea_horizontal(valor, 'purple', 'dot', 2.5))
+            annotations.append(_anotacion(valor, f"{nombre_limite} {valor:.4f}", 'purple', 'left'))
+
+    # Zonas sigma
+    if zonas:
+        sigma_1 = (UCL - CL) / 3
+        shapes += [
+            _zona(CL + sigma_1, CL + 2*sigma_1, colors['warning'], 0.1),
+            _zona(CL - sigma_1, CL - 2*sigma_1, colors['warning'], 0.1),
+            _zona(CL + 2*sigma_1, UCL, colors['danger'], 0.08),
+            _zona(LCL, CL - 2*sigma_1, colors['danger'], 0.08),
+        ]
+
+    layout = _layout_base()
+    layout.update({
+        'title': {'text': titulo, 'x': 0.5, 'xanchor': 'center', 'font': {'size': 22, 'color': colors['text_primary']}},
+        'xaxis': {'title': {'text': eje_x}},
+        'yaxis': {'title': {'text': eje_y}},
+        'shapes': shapes,
+        'annotations': annotations
+    })
+    return {'data': data, 'layout': layout}
+
+def etiquetas_grafico(chart_type):
+    """Nombres, títulos y ejes que dependen del tipo de gráfico (XR, XS, IMR o los de corrida corta ZW y ZMR)"""
+    imr = chart_type in ('IMR', 'ZMR')
+    if chart_type in ('ZW', 'ZMR'):
+        return {
+            'x': 'Z' if imr else 'Z̄',
+            'rs': 'W',
+            'grafico_x': 'Z' if imr else 'Z̄',
+            'descripcion_x': "Individuales Estandarizados por Parte" if imr else "Promedios Estandarizados por Parte",
+            'descripcion_rs': 'Rango Móvil Estandarizado' if imr else 'Rangos Estandarizados',
+            'punto': 'Observación' if imr else 'Subgrupo',
+            'eje_x': "Número de Observación" if imr else "Número de Subgrupo",
+            'titulo_x': "<b>Gráfico Z - Corrida Corta</b>" if imr else "<b>Gráfico Z̄ - Corrida Corta</b>",
+            'eje_y_x': "(X - objetivo) / MR̄ de la parte" if imr else "(X̄ - objetivo) / R̄ de la parte",
+            'titulo_rs': "<b>Gráfico W - Rango Móvil Estandarizado</b>" if imr else "<b>Gráfico W - Rangos Estandarizados</b>",
+            'eje_y_rs': "MR / MR̄ de la parte" if imr else "R / R̄ de la parte"
+        }
+    return {
+        'x': 'X' if imr else 'X̄',
+        'rs': {'XR': 'R', 'XS': 'S', 'IMR': 'MR'}[chart_type],
+        'grafico_x': 'I' if imr else 'X̄',
+        'descripcion_x': "Individuales del Proceso" if imr else "Promedios del Proceso",
+        'descripcion_rs': {'XR': 'Rangos', 'XS': 'Desviación Estándar', 'IMR': 'Rango Móvil'}[chart_type],
+        'punto': 'Observación' if imr else 'Subgrupo',
+        'eje_x': "Número de Observación" if imr else "Número de Subgrupo",
+        'titulo_x': "<b>Gráfico I - Individuales</b>" if imr else "<b>Gráfico X̄ - Promedios</b>",
+        'eje_y_x': "Valor individual (X)" if imr else "Media (X̄)",
+        'titulo_rs': {
+            'XR': "<b>Gráfico R - Rangos</b>",
+            'XS': "<b>Gráfico S - Desviación Estándar</b>",
+            'IMR': "<b>Gráfico MR - Rango Móvil</b>"
+        }[chart_type],
+        'eje_y_rs': {'XR': "Rango (R)", 'XS': "Desviación (S)", 'IMR': "Rango Móvil (MR)"}[chart_type]
+    }
+
+def figura_grafico_x(resultado, USL=None, LSL=None):
+    """Gráfico X̄ (o I) de un resultado de `analizar_subgrupos`"""
+    etiquetas = etiquetas_grafico(resultado['chart_type'])
+    excluidos_x = resultado.get('excluidos_x', ())
+    return figura_control(
+        resultado['x_pos'], resultado['x'], resultado['CLx'], resultado['UCLx'], resultado['LCLx'],
+        titulo=etiquetas['titulo_x'], eje_x=etiquetas['eje_x'], eje_y=etiquetas['eje_y_x'],
+        nombre=etiquetas['x'], punto=etiquetas['punto'], color_linea=colors['chart_line1'],
+        fuera_control=np.setdiff1d(resultado['fuera_control_x'], excluidos_x), USL=USL, LSL=LSL, zonas=True,
+        excluidos=excluidos_x, traza_fuera_control='base_seguimiento' in resultado
+    )
+
+def figura_grafico_rs(resultado):
+    """Gráfico R/S/MR de un resultado de `analizar_subgrupos`"""
+    etiquetas = etiquetas_grafico(resultado['chart_type'])
+    excluidos_rs = resultado.get('excluidos_rs', ())
+    return figura_control(
+        resultado['x_rs'], resultado['rs'], resultado['CLrs'], resultado['UCLrs'], resultado['LCLrs'],
+        titulo=etiquetas['titulo_rs'], eje_x=etiquetas['eje_x'], eje_y=etiquetas['eje_y_rs'],
+        nombre=etiquetas['rs'], punto=etiquetas['punto'], color_linea=colors['chart_line2'],
+        fuera_control=np.setdiff1d(resultado['fuera_control_rs'], excluidos_rs), excluidos=excluidos_rs,
+        traza_fuera_control='base_seguimiento' in resultado
+    )
+
+def figuras_analisis(resultado, USL=None, LSL=None):
+    """Gráfico X̄ (o I) y gráfico R/S/MR de un resultado de `analizar_subgrupos`"""
+    return figura_grafico_x(resultado, USL, LSL), figura_grafico_rs(resultado)
+
+# Colores por archivo en la vista de comparación
+PALETA_COMPARACION = ['#2196F3', '#FF6F00', '#2E7D32', '#9C27B0', '#E53935',
+                      '#00897B', '#6D4C41', '#3949AB', '#C0CA33', '#D81B60']
+
+def figura_comparacion(resultados, serie='x', USL=None, LSL=None):
+    """
+    Superpone la serie X̄ ('x') o R/S ('rs') de varios análisis [(nombre, resultado)],
+    cada uno con sus propios CL/UCL/LCL en el mismo color.
+    """
+    etiquetas = etiquetas_grafico(resultados[0][1]['chart_type'])
+    data = []
+    for k, (nombre, resultado) in enumerate(resultados):
+        color = PALETA_COMPARACION[k % len(PALETA_COMPARACION)]
+        x = resultado['x_pos'] if serie == 'x' else resultado['x_rs']
+        data.append({
+            'type': 'scatter',
+            'x': x, 'y': resultado[serie],
+            'mode': 'lines+markers',
+            'name': nombre,
+            'legendgroup': nombre,
+            'line': {'color': color, 'width': 2},
+            'marker': {'size': 6, 'color': color},
+            'hovertemplate': f'<b>{nombre}</b><br>%{{x}}: %{{y:.4f}}<extra></extra>'
+        })
+        for limite, dash in (('UCL', 'dash'), ('CL', 'solid'), ('LCL', 'dash')):
+            valor = resultado[f'{limite}{serie}']
+            data.append({
+                'type': 'scatter',
+                'x': [x[0], x[-1]], 'y': [valor, valor],
+                'mode': 'lines',
+                'legendgroup': nombre,
+                'showlegend': False,
+                'line': {'color': color, 'dash': dash, 'width': 1.5},
+                'hovertemplate': f'{limite} {nombre}: {valor:.4f}<extra></extra>'
+            })
+
+    shapes, annotations = [], []
+    if serie == 'x':
+        for nombre_limite, valor in (('USL', USL), ('LSL', LSL)):
+            if valor is not None:
+                shapes.append(_linea_horizontal(valor, 'purple', 'dot', 2.5))
+                annotations.append(_anotacion(valor, f"{nombre_limite} {valor:.4f}", 'purple', 'left'))
+
+    layout = _layout_base()
+    layout.update({
+        'title': {'text': f"<b>Comparación - Gráfico {etiquetas['grafico_x'] if serie == 'x' else etiquetas['rs']}</b>",
+                  'x': 0.5, 'xanchor': 'center', 'font': {'size': 22, 'color': colors['text_primary']}},
+        'xaxis': {'title': {'text': etiquetas['eje_x']}},
+        'yaxis': {'title': {'text': etiquetas['eje_y_x'] if serie == 'x' else etiquetas['eje_y_rs']}},
+        'hovermode': 'closest',
+        'shapes': shapes,
+        'annotations': annotations
+    })
+    return {'data': data, 'layout': layout}
+
+def _linea_vertical(x, color, dash, width):
+    return {'type': 'line', 'xref': 'x', 'x0': x, 'x1': x, 'yref': 'y domain', 'y0': 0, 'y1': 1,
+            'line': {'color': color, 'dash': dash, 'width': width}}
+
+def figura_distribucion(distribucion, USL=None, LSL=None):
+    """
+    Histograma con curva normal ajustada (izquierda) y gráfico de probabilidad normal
+    (derecha) a partir del resumen de `distribucion_capacidad`.
+    """
+    bordes = distribucion['bordes']
+    centros = (bordes[:-1] + bordes[1:]) / 2
+    z = distribucion['z']
+    referencia = distribucion['media'] + distribucion['sigma'] * z[[0, -1]]
+    data = [
+        {
+            'type': 'bar',
+            'x': centros, 'y': distribucion['conteos'], 'width': bordes[1] - bordes[0],
+            'name': 'Frecuencia',
+            'marker': {'color': colors['chart_line1'], 'opacity': 0.75, 'line': {'color': 'white', 'width': 1}},
+            'hovertemplate': '%{x:.4f}: %{y} observaciones<extra></extra>'
+        },
+        {
+            'type': 'scatter',
+            'x': distribucion['x_curva'], 'y': distribucion['y_curva'],
+            'mode': 'lines', 'name': 'Normal ajustada',
+            'line': {'color': colors['chart_line2'], 'width': 3},
+            'hoverinfo': 'skip'
+        },
+        {
+            'type': 'scatter',
+            'x': z, 'y': distribucion['cuantiles'],
+            'xaxis': 'x2', 'yaxis': 'y2',
+            'mode': 'markers', 'name': 'Cuantiles observados',
+            'marker': {'size': 6, 'color': colors['chart_line1']},
+            'hovertemplate': 'z = %{x:.3f}<br>Valor = %{y:.4f}<extra></extra>'
+        },
+        {
+            'type': 'scatter',
+            'x': z[[0, -1]], 'y': referencia,
+            'xaxis': 'x2', 'yaxis': 'y2',
+            'mode': 'lines', 'name': 'Referencia normal',
+            'line': {'color': colors['danger'], 'dash': 'dash', 'width': 2},
+            'hoverinfo': 'skip'
+        }
+    ]
+
+    shapes, annotations = [], []
+    for nombre_limite, valor in (('USL', USL), ('LSL', LSL)):
+        if valor is not None:
+            shapes.append(_linea_vertical(valor, 'purple', 'dot', 2.5))
+            annotations.append({'text': f"{nombre_limite} {valor:.4f}", 'showarrow': False, 'xref': 'x', 'yref': 'y domain',
+                                'x': valor, 'y': 1, 'yanchor': 'bottom', 'font': {'size': 11, 'color': 'purple'}})
+
+    layout = _layout_base()
+    layout.update({
+        'title': {'text': f"<b>Distribución del Proceso</b> (n = {distribucion['n']})", 'x': 0.5, 'xanchor': 'center',
+                  'font': {'size': 22, 'color': colors['text_primary']}},
+        'hovermode': 'closest',
+        'bargap': 0,
+        'xaxis': {'domain': [0, 0.55], 'title': {'text': 'Valor'}},
+        'yaxis': {'title': {'text': 'Frecuencia'}},
+        'xaxis2': {'domain': [0.65, 1], 'anchor': 'y2', 'title': {'text': 'Cuantil normal teórico (z)'}},
+        'yaxis2': {'anchor': 'x2', 'title': {'text': 'Valor observado'}},
+        'shapes': shapes,
+        'annotations': annotations
+    })
+    return {'data': data, 'layout': layout}
+
+def figura_autocorrelacion(diagnostico):
+    """ACF (izquierda) y PACF (derecha) con la banda de significancia de `diagnostico_autocorrelacion`"""
+    rezagos, limite = diagnostico['rezagos'], diagnostico['limite']
+    data = []
+    for serie, nombre, ejes in (('acf', 'ACF', ('x', 'y')), ('pacf', 'PACF', ('x2', 'y2'))):
+        valores = diagnostico[serie]
+        data.append({
+            'type': 'bar',
+            'x': rezagos, 'y': valores,
+            'xaxis': ejes[0], 'yaxis': ejes[1],
+            'name': nombre,
+            'marker': {'color': np.where(np.abs(valores) > limite, colors['danger'], colors['chart_line1']).tolist()},
+            'hovertemplate': f'Rezago %{{x}}<br>{nombre} = %{{y:.4f}}<extra></extra>'
+        })
+
+    shapes = []
+    for eje_x, eje_y in (('x', 'y'), ('x2', 'y2')):
+        for y in (limite, -limite):
+            shapes.append({'type': 'line', 'xref': f'{eje_x} domain', 'x0': 0, 'x1': 1, 'yref': eje_y, 'y0': y, 'y1': y,
+                           'line': {'color': colors['danger'], 'dash': 'dash', 'width': 1.5}})
+
+    layout = _layout_base()
+    layout.update({
+        'title': {'text': f"<b>Autocorrelación</b> (n = {diagnostico['n']})", 'x': 0.5, 'xanchor': 'center',
+                  'font': {'size': 22, 'color': colors['text_primary']}},
+        'hovermode': 'closest',
+        'showlegend': False,
+        'xaxis': {'domain': [0, 0.45], 'title': {'text': 'Rezago'}},
+        'yaxis': {'title': {'text': 'ACF'}, 'range': [-1, 1]},
+        'xaxis2': {'domain': [0.55, 1], 'anchor': 'y2', 'title': {'text': 'Rezago'}},
+        'yaxis2': {'anchor': 'x2', 'title': {'text': 'PACF'}, 'range': [-1, 1]},
+        'shapes': shapes
+    })
+    return {'data': data, 'layout': layout}
+
+def figura_arl(simulacion):
+    """ARL (escala logarítmica, izquierda) y curva OC (derecha) de `simular_arl` contra el desplazamiento de la media"""
+    desplazamientos = simulacion['desplazamientos']
+    data = [
+        {
+            'type': 'scatter',
+            'x': desplazamientos, 'y': simulacion['arl'],
+            'error_y': {'type': 'data', 'array': 1.96 * simulacion['error_estandar'], 'visible': True},
+            'mode': 'lines+markers', 'name': 'ARL',
+            'line': {'color': colors['chart_line1'], 'width': 3},
+            'marker': {'size': 9},
+            'hovertemplate': 'δ = %{x}σ<br>ARL = %{y:.2f}<extra></extra>'
+        },
+        {
+            'type': 'scatter',
+            'x': desplazamientos, 'y': simulacion['oc'],
+            'xaxis': 'x2', 'yaxis': 'y2',
+            'mode': 'lines+markers', 'name': 'β (no detectar en el primer subgrupo)',
+            'line': {'color': colors['chart_line2'], 'width': 3},
+            'marker': {'size': 9},
+            'hovertemplate': 'δ = %{x}σ<br>β = %{y:.4f}<extra></extra>'
+        }
+    ]
+    layout = _layout_base()
+    layout.update({
+        'title': {'text': f"<b>ARL y Curva OC</b> ({simulacion['chart_type']}, n = {simulacion['n']}, "
+                          f"reglas {', '.join(map(str, simulacion['reglas']))})",
+                  'x': 0.5, 'xanchor': 'center', 'font': {'size': 20, 'color': colors['text_primary']}},
+        'hovermode': 'closest',
+        'xaxis': {'domain': [0, 0.45], 'title': {'text': 'Desplazamiento de la media (σ)'}},
+        'yaxis': {'type': 'log', 'title': {'text': 'ARL (subgrupos)'}},
+        'xaxis2': {'domain': [0.55, 1], 'anchor': 'y2', 'title': {'text': 'Desplazamiento de la media (σ)'}},
+        'yaxis2': {'anchor': 'x2', 'title': {'text': 'β'}, 'range': [0, 1.05]}
+    })
+    return {'data': data, 'layout': layout}
+
+# Índices de capacidad de referencia para las líneas del mapa de escenarios
+_UMBRALES_CAPACIDAD = ((1.0, colors['warning']), (1.33, colors['success']))
+
+def figura_escenarios_capacidad(barrido, metrica='Cpk'):
+    """
+    Mapa de calor de `barrido_capacidad`: desplazamiento de la media (x) contra
+    ancho de tolerancia (y). `metrica` es 'Cpk', 'Ppk', 'ppm_within' o 'ppm_total';
+    los PPM se muestran en escala log10.
+    """
+    x, y = barrido['desplazamientos'], barrido['anchos']
+    if metrica in ('Cpk', 'Ppk'):
+        heatmap = {
+            'z': np.round(barrido[metrica], 4), 'zmin': 0, 'zmax': 2,
+            'colorscale': [[0, colors['danger']], [0.5, colors['warning']], [0.665, colors['success']], [1, colors['green_primary']]],
+            'colorbar': {'title': {'text': metrica}},
+            'hovertemplate': f'Desplazamiento %{{x:.4f}}<br>Tolerancia %{{y:.4f}}<br>{metrica} = %{{z:.3f}}<extra></extra>'
+        }
+    else:
+        # De 0.001 a 10⁶ PPM; fuera de ese rango el color satura
+        heatmap = {
+            'z': np.round(np.log10(np.clip(barrido[metrica], 1e-3, 1e6)), 3), 'zmin': -3, 'zmax': 6,
+            'colorscale': [[0, colors['green_primary']], [0.4, colors['success']], [0.6, colors['warning']], [1, colors['danger']]],
+            'colorbar': {'title': {'text': 'PPM'}, 'tickvals': list(range(-3, 7)),
+                         'ticktext': ['0.001', '0.01', '0.1', '1', '10', '100', '1k', '10k', '100k', '1M']},
+            'hovertemplate': 'Desplazamiento %{x:.4f}<br>Tolerancia %{y:.4f}<br>PPM ≈ 10^%{z:.2f}<extra></extra>'
+        }
+    data = [dict(heatmap, type='heatmap', x=x, y=y, name=metrica, showlegend=False)]
+
+    # Las curvas de Cpk (o Ppk) constante son rectas: ancho = 2·(3·c·σ + |media + d − centro|)
+    indice, sigma = ('Ppk', barrido['sigma_total']) if metrica in ('Ppk', 'ppm_total') else ('Cpk', barrido['sigma_within'])
+    descentrado = np.abs(barrido['media'] + x - barrido['centro'])
+    for umbral, color in _UMBRALES_CAPACIDAD:
+        data.append({
+            'type': 'scatter', 'x': x, 'y': 2 * (3 * umbral * sigma + descentrado),
+            'mode': 'lines', 'name': f'{indice} = {umbral}',
+            'line': {'color': color, 'width': 2.5, 'dash': 'dash'},
+            'hoverinfo': 'skip'
+        })
+    if barrido['tolerancia'] is not None:
+        data.append({
+            'type': 'scatter', 'x': [0], 'y': [barrido['tolerancia']],
+            'mode': 'markers', 'name': 'Proceso actual',
+            'marker': {'size': 14, 'color': 'white', 'symbol': 'x', 'line': {'width': 2, 'color': colors['text_primary']}},
+            'hovertemplate': 'Proceso actual<br>Tolerancia %{y:.4f}<extra></extra>'
+        })
+
+    layout = _layout_base()
+    layout.update({
+        'title': {'text': f"<b>Escenarios de Capacidad</b> (σ within = {barrido['sigma_within']:.4f}, "
+                          f"σ total = {barrido['sigma_total']:.4f})",
+                  'x': 0.5, 'xanchor': 'center', 'font': {'size': 20, 'color': colors['text_primary']}},
+        'hovermode': 'closest',
+        'xaxis': {'title': {'text': 'Desplazamiento de la media'}, 'range': [x[0], x[-1]]},
+        'yaxis': {'title': {'text': 'Ancho de tolerancia (USL − LSL)'}, 'range': [y[0], y[-1]]},
+        'shapes': [_linea_vertical(barrido['centro'] - barrido['media'], colors['text_secondary'], 'dot', 2)],
+        'annotations': [{'text': 'Centrado', 'showarrow': False, 'xref': 'x', 'yref': 'y domain',
+                         'x': barrido['centro'] - barrido['media'], 'y': 1, 'yanchor': 'bottom',
+                         'font': {'size': 11, 'color': colors['text_secondary']}}]
+    })
+    return {'data': data, 'layout': layout}
@@ -0,0 +1,131 @@
+"""Estudio Gage R&R (MSA) por ANOVA cruzado parte × operador × ensayo.
+
+Las sumas de cuadrados se calculan con medias sobre los ejes del arreglo, así
+que un arreglo (..., partes, operadores, ensayos) con ejes iniciales extra
+analiza un lote de instrumentos de una vez.
+"""
+import numpy as np
+
+from spc_core import probabilidad_f
+
+# Criterio AIAG: se combina la interacción con el error si su valor p supera 0.25
+ALFA_INTERACCION = 0.25
+
+def arreglo_gage(df, columna_parte=None, columna_operador=None, columna_valor=None):
+    """
+    Arreglo (partes, operadores, ensayos) a partir de un DataFrame en formato largo
+    (una fila por medición). Sin nombres de columna se usan las tres primeras
+    (parte, operador, valor). Las celdas con menos ensayos quedan en NaN.
+    Devuelve (arreglo, nombres de partes, nombres de operadores).
+    """
+    import pandas as pd
+
+    columnas = list(df.columns)
+    columna_parte = columna_parte or columnas[0]
+    columna_operador = columna_operador or columnas[1]
+    columna_valor = columna_valor or columnas[-1]
+
+    valores = pd.to_numeric(df[columna_valor], errors='coerce').to_numpy(dtype=float)
+    validos = ~np.isnan(valores)
+    partes, nombres_partes = pd.factorize(df[columna_parte][validos], sort=True)
+    operadores, nombres_operadores = pd.factorize(df[columna_operador][validos], sort=True)
+    valores = valores[validos]
+
+    # Ensayo = orden de la medición dentro de su celda parte × operador
+    celda = partes * len(nombres_operadores) + operadores
+    orden = np.argsort(celda, kind='stable')
+    celda_ordenada = celda[orden]
+    inicio_celda = np.flatnonzero(np.concatenate(([True], celda_ordenada[1:] != celda_ordenada[:-1])))
+    conteos = np.diff(np.append(inicio_celda, len(celda_ordenada)))
+    ensayos = np.empty(len(celda), dtype=np.int64)
+    ensayos[orden] = np.arange(len(celda)) - np.repeat(inicio_celda, conteos)
+
+    arreglo = np.full((len(nombres_partes), len(nombres_operadores), ensayos.max(initial=-1) + 1), np.nan)
+    arreglo[partes, operadores, ensayos] = valores
+    return arreglo, list(nombres_partes), list(nombres_operadores)
+
+def anova_gage_rr(datos, tolerancia=None):
+    """
+    ANOVA cruzado de Gage R&R sobre datos (..., partes, operadores, ensayos) balanceados.
+    Devuelve un diccionario de arreglos con forma igual a los ejes iniciales:
+    tabla ANOVA (SS, gl, MS, F, valor p), componentes de varianza, %contribución,
+    %variación del estudio, %tolerancia (si hay tolerancia) y ndc.
+    """
+    datos = np.asarray(datos, dtype=float)
+    if np.isnan(datos).any():
+        raise ValueError("El estudio debe estar balanceado: todas las partes y operadores con los mismos ensayos")
+    p, o, r = datos.shape[-3:]
+    if p < 2 or o < 2 or r < 2:
+        raise ValueError("Se necesitan al menos 2 partes, 2 operadores y 2 ensayos")
+
+    media_celda = datos.mean(axis=-1)
+    media_parte = media_celda.mean(axis=-1)
+    media_operador = media_celda.mean(axis=-2)
+    media_total = media_parte.mean(axis=-1)
+
+    efecto_parte = media_parte - media_total[..., None]
+    efecto_operador = media_operador - media_total[..., None]
+    residuo_celda = media_celda - media_parte[..., :, None] - media_operador[..., None, :] + media_total[..., None, None]
+
+    ss_parte = o * r * np.sum(efecto_parte ** 2, axis=-1)
+    ss_operador = p * r * np.sum(efecto_operador ** 2, axis=-1)
+    ss_interaccion = r * np.sum(residuo_celda ** 2, axis=(-2, -1))
+    ss_error = np.sum((datos - media_celda[..., None]) ** 2, axis=(-3, -2, -1))
+
+    gl_parte, gl_operador = p - 1, o - 1
+    gl_interaccion, gl_error = gl_parte * gl_operador, p * o * (r - 1)
+    ms_parte, ms_operador = ss_parte / gl_parte, ss_operador / gl_operador
+    ms_interaccion, ms_error = ss_interaccion / gl_interaccion, ss_error / gl_error
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_interaccion = ms_interaccion / ms_error
+    p_interaccion = np.asarray(np.frompyfunc(lambda f: probabilidad_f(f, gl_interaccion, gl_error), 1, 1)(f_interaccion),
+                               dtype=float)
+
+    # Sin interacción significativa se combina con el error (modelo reducido)
+    combinar = p_interaccion > ALFA_INTERACCION
+    ms_combinado = (ss_interaccion + ss_error) / (gl_interaccion + gl_error)
+    ms_residual = np.where(combinar, ms_combinado, ms_interaccion)
+
+    repetibilidad = np.where(combinar, ms_combinado, ms_error)
+    interaccion = np.where(combinar, 0.0, np.maximum((ms_interaccion - ms_error) / r, 0))
+    operador = np.maximum((ms_operador - ms_residual) / (p * r), 0)
+    parte = np.maximum((ms_parte - ms_residual) / (o * r), 0)
+    reproducibilidad = operador + interaccion
+    grr = repetibilidad + reproducibilidad
+    total = grr + parte
+
+    componentes = {
+        'repetibilidad': repetibilidad,
+        'reproducibilidad': reproducibilidad,
+        'operador': operador,
+        'interaccion': interaccion,
+        'grr': grr,
+        'parte': parte,
+        'total': total,
+    }
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resultado = {
+            'partes': p, 'operadores': o, 'ensayos': r,
+            'anova': {
+                'parte': {'ss': ss_parte, 'gl': gl_parte, 'ms': ms_parte, 'f': ms_parte / ms_residual},
+                'operador': {'ss': ss_operador, 'gl': gl_operador, 'ms': ms_operador, 'f': ms_operador / ms_residual},
+                'interaccion': {'ss': ss_interaccion, 'gl': gl_interaccion, 'ms': ms_interaccion,
+                                'f': f_interaccion, 'p': p_interaccion},
+                'error': {'ss': ss_error, 'gl': gl_error, 'ms': ms_error},
+            },
+            'interaccion_combinada': combinar,
+            'varianzas': componentes,
+            'contribucion': {k: 100 * v / total for k, v in componentes.items()},
+            'variacion_estudio': {k: 100 * np.sqrt(v / total) for k, v in componentes.items()},
+            'ndc': np.floor(np.sqrt(2) * np.sqrt(parte / grr)),
+        }
+        if tolerancia:
+            resultado['tolerancia'] = {k: 100 * 6 * np.sqrt(v) / tolerancia for k, v in componentes.items()}
+    resultado['veredicto'] = veredicto_grr(resultado['variacion_estudio']['grr'])
+    return resultado
+
+def veredicto_grr(porcentaje_grr):
+    """Criterio AIAG sobre %GRR (variación del estudio)"""
+    return np.where(porcentaje_grr < 10, 'Aceptable',
+                    np.where(porcentaje_grr <= 30, 'Condicional (según aplicación y costo)', 'Inaceptable'))
@@ -0,0 +1,323 @@
+"""Historial local de análisis en SQLite.
+
+Cada análisis guarda sus límites, capacidad y resumen de violaciones en
+columnas indexadas (proceso, fecha, estado y huella de los datos), más un
+resumen JSON con el resto de lo que no crece con los datos. Las series por
+punto (X̄, R/S/MR, índices fuera de control...) van aparte como BLOB binarios
+identificados por su contenido: los análisis de los mismos datos con otras
+especificaciones las comparten, y se pueden leer por tramos (`series_guardadas`).
+Las búsquedas no leen las series y reabrir un análisis no lo vuelve a calcular.
+Con BRAINYSTATS_MAX_ANALISIS se conservan solo los últimos análisis; cada recorte
+queda registrado para avisarlo en la búsqueda (`recortes_historial`).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+RUTA_HISTORIAL = os.environ.get('BRAINYSTATS_DB', 'historial_analisis.sqlite3')
+# Sin límite por defecto: comparar con meses anteriores es para lo que sirve el historial
+MAX_ANALISIS = int(os.environ['BRAINYSTATS_MAX_ANALISIS']) if os.environ.get('BRAINYSTATS_MAX_ANALISIS') else None
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS analisis (
+    id INTEGER PRIMARY KEY,
+    proceso TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    huella TEXT NOT NULL,
+    chart_type TEXT NOT NULL,
+    n INTEGER,
+    subgrupos INTEGER,
+    CLx REAL, UCLx REAL, LCLx REAL,
+    CLrs REAL, UCLrs REAL, LCLrs REAL,
+    Cp REAL, Cpk REAL, Pp REAL, Ppk REAL,
+    USL REAL, LSL REAL,
+    fuera_control INTEGER NOT NULL,
+    puntos_fuera_control INTEGER NOT NULL,
+    patrones INTEGER NOT NULL,
+    resumen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analisis_proceso_fecha ON analisis (proceso, fecha);
+CREATE INDEX IF NOT EXISTS analisis_estado_fecha ON analisis (fuera_control, fecha);
+CREATE INDEX IF NOT EXISTS analisis_fecha ON analisis (fecha);
+CREATE UNIQUE INDEX IF NOT EXISTS analisis_huella ON analisis (huella);
+CREATE TABLE IF NOT EXISTS series_analisis (
+    analisis_id INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    arreglo TEXT NOT NULL,
+    PRIMARY KEY (analisis_id, nombre)
+);
+CREATE INDEX IF NOT EXISTS series_analisis_arreglo ON series_analisis (arreglo);
+CREATE TABLE IF NOT EXISTS arreglos (
+    huella TEXT PRIMARY KEY,
+    dtype TEXT NOT NULL,
+    datos BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recortes (
+    fecha TEXT NOT NULL,
+    borrados INTEGER NOT NULL,
+    hasta TEXT NOT NULL
+);
+"""
+
+# Columnas que devuelven las búsquedas (sin el resultado completo)
+COLUMNAS_RESUMEN = ('id', 'proceso', 'fecha', 'chart_type', 'n', 'subgrupos', 'CLx', 'UCLx', 'LCLx',
+                    'Cp', 'Cpk', 'Pp', 'Ppk', 'fuera_control', 'puntos_fuera_control', 'patrones')
+
+# Rutas cuyo esquema ya se creó en este proceso
+_preparadas = set()
+_bloqueo_esquema = threading.Lock()
+
+def _preparar(conexion, ruta):
+    """WAL y esquema, una vez por base y por proceso"""
+    with _bloqueo_esquema:
+        if ruta in _preparadas:
+            return
+        # WAL: los workers de gunicorn pueden leer mientras otro escribe
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.executescript(_ESQUEMA)
+        _preparadas.add(ruta)
+
+@contextmanager
+def conectar(ruta=RUTA_HISTORIAL):
+    """Conexión con el esquema creado; confirma al salir sin errores y siempre se cierra"""
+    if not os.path.exists(ruta):
+        _preparadas.discard(ruta)
+    conexion = sqlite3.connect(ruta, timeout=10)
+    try:
+        conexion.row_factory = sqlite3.Row
+        _preparar(conexion, ruta)
+        with conexion:
+            yield conexion
+    finally:
+        conexion.close()
+
+# Filas por bloque al calcular la huella: los mismos bytes que la matriz entera en
+# orden de filas, sin copiarla (las de pandas vienen en orden de columnas)
+_FILAS_HUELLA = 65536
+
+def huella_datos(subgroups, chart_type, USL=None, LSL=None, revisados=False, partes=None, robustos=False):
+    """Huella SHA-256 de los datos y de los parámetros que cambian el resultado"""
+    subgroups = np.asarray(subgroups)
+    h = hashlib.sha256()
+    h.update(repr((subgroups.shape, chart_type, USL, LSL, bool(revisados), bool(robustos))).encode())
+    for inicio in range(0, len(subgroups), _FILAS_HUELLA):
+        h.update(np.ascontiguousarray(subgroups[inicio:inicio + _FILAS_HUELLA], dtype=np.float64))
+    if partes is not None:
+        h.update('\x1f'.join(map(str, partes)).encode())
+    return h.hexdigest()
+
+def _codificar(valor):
+    if isinstance(valor, np.ndarray):
+        return {'__ndarray__': valor.tolist(), 'dtype': str(valor.dtype)}
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"No se puede guardar {type(valor).__name__}")
+
+def _decodificar(objeto):
+    if '__rango__' in objeto:
+        return np.arange(*objeto['__rango__'], dtype=objeto['dtype'])
+    if '__ndarray__' in objeto:
+        return np.array(objeto['__ndarray__'], dtype=objeto['dtype'])
+    return objeto
+
+# Lo que se guarda como serie además de los arreglos del resultado
+_LISTAS = ('violaciones',)
+
+def _guardar_serie(conexion, valor):
+    """Guarda un arreglo (o una lista de textos) en `arreglos` si no está y devuelve su huella"""
+    if isinstance(valor, list) or valor.dtype == object:
+        # Textos (violaciones, partes): comprimidos, se leen siempre enteros
+        dtype = 'lista' if isinstance(valor, list) else 'object'
+        datos = zlib.compress(json.dumps(list(valor), default=_codificar).encode())
+    else:
+        dtype, datos = valor.dtype.str, np.ascontiguousarray(valor)
+    h = hashlib.sha256(dtype.encode() + b'\0')
+    h.update(datos)
+    huella = h.hexdigest()
+    conexion.execute('INSERT OR IGNORE INTO arreglos (huella, dtype, datos) VALUES (?, ?, ?)',
+                     (huella, dtype, memoryview(datos).cast('B')))
+    return huella
+
+def _leer_serie(dtype, datos):
+    if dtype in ('lista', 'object'):
+        textos = json.loads(zlib.decompress(datos))
+        return textos if dtype == 'lista' else np.array(textos, dtype=object)
+    return np.frombuffer(datos, dtype=dtype)
+
+def _rango(valor):
+    """Codificación de `valor` si es un np.arange (x_pos, x_rs), que no hace falta guardar entero"""
+    if valor.dtype.kind in 'iu' and valor.ndim == 1 and len(valor):
+        inicio = int(valor[0])
+        if np.array_equal(valor, np.arange(inicio, inicio + len(valor))):
+            return {'__rango__': [inicio, inicio + len(valor)], 'dtype': str(valor.dtype)}
+    return None
+
+def _insertar(conexion, fila, resultado):
+    """Inserta el resumen (`fila`) y las series de `resultado`; devuelve el id"""
+    resumen, series = {}, {}
+    for nombre, valor in resultado.items():
+        rango = _rango(valor) if isinstance(valor, np.ndarray) else None
+        if rango is not None:
+            resumen[nombre] = rango
+        elif isinstance(valor, np.ndarray) or nombre in _LISTAS:
+            series[nombre] = valor
+        else:
+            resumen[nombre] = valor
+    fila['resumen'] = json.dumps(resumen, default=_codificar)
+    cursor = conexion.execute(
+        f"INSERT INTO analisis ({', '.join(fila)}) VALUES ({', '.join('?' * len(fila))})", tuple(fila.values()))
+    conexion.executemany('INSERT INTO series_analisis (analisis_id, nombre, arreglo) VALUES (?, ?, ?)',
+                         [(cursor.lastrowid, nombre, _guardar_serie(conexion, valor)) for nombre, valor in series.items()])
+    return cursor.lastrowid
+
+def _recortar(conexion, maximo=MAX_ANALISIS):
+    """Borra los análisis más antiguos por encima de `maximo` (None: sin límite) y las series que ya nadie usa"""
+    if maximo is None:
+        return
+    viejos = conexion.execute('SELECT COUNT(*), MAX(fecha) FROM analisis WHERE id NOT IN '
+                              '(SELECT id FROM analisis ORDER BY fecha DESC, id DESC LIMIT ?)', (maximo,)).fetchone()
+    if not viejos[0]:
+        return
+    conexion.execute('DELETE FROM analisis WHERE id NOT IN '
+                     '(SELECT id FROM analisis ORDER BY fecha DESC, id DESC LIMIT ?)', (maximo,))
+    conexion.execute('DELETE FROM series_analisis WHERE analisis_id NOT IN (SELECT id FROM analisis)')
+    conexion.execute('DELETE FROM arreglos WHERE huella NOT IN (SELECT arreglo FROM series_analisis)')
+    conexion.execute('INSERT INTO recortes (fecha, borrados, hasta) VALUES (?, ?, ?)',
+                     (datetime.now().isoformat(timespec='seconds'), viejos[0], viejos[1]))
+
+def recortes_historial(ruta=RUTA_HISTORIAL):
+    """Análisis borrados por el límite: {'borrados': total, 'hasta': fecha del más reciente}, o None"""
+    if not os.path.exists(ruta):
+        return None
+    with conectar(ruta) as conexion:
+        fila = conexion.execute('SELECT SUM(borrados) AS borrados, MAX(hasta) AS hasta FROM recortes').fetchone()
+    return dict(fila) if fila['borrados'] else None
+
+def guardar_analisis(resultado, huella, proceso, USL=None, LSL=None, ruta=RUTA_HISTORIAL, fecha=None):
+    """Guarda un resultado de `analizar_subgrupos`; si la huella ya existe no lo duplica. Devuelve el id."""
+    capacidad = resultado.get('capacidad') or {}
+    fila = {
+        'proceso': proceso,
+        'fecha': (fecha or datetime.now()).isoformat(timespec='seconds'),
+        'huella': huella,
+        'chart_type': resultado['chart_type'],
+        'n': int(resultado['n']),
+        'subgrupos': len(resultado['x']),
+        **{k: float(resultado[k]) for k in ('CLx', 'UCLx', 'LCLx', 'CLrs', 'UCLrs', 'LCLrs')},
+        **{k: float(capacidad[k]) if k in capacidad else None for k in ('Cp', 'Cpk', 'Pp', 'Ppk')},
+        'USL': USL, 'LSL': LSL,
+        'fuera_control': int(resultado['num_fuera_control'] > 0 or len(resultado['violaciones']) > 0),
+        'puntos_fuera_control': int(resultado['num_fuera_control']),
+        'patrones': len(resultado['violaciones']),
+    }
+    with conectar(ruta) as conexion:
+        existente = conexion.execute('SELECT id FROM analisis WHERE huella = ?', (huella,)).fetchone()
+        if existente:
+            return existente['id']
+        id_analisis = _insertar(conexion, fila, resultado)
+        _recortar(conexion)
+        return id_analisis
+
+def cargar_analisis(huella=None, id_analisis=None, ruta=RUTA_HISTORIAL):
+    """(resultado, USL, LSL, id) guardado por huella o por id, o None si no existe"""
+    if not os.path.exists(ruta):
+        return None
+    campo, valor = ('huella', huella) if huella is not None else ('id', id_analisis)
+    with conectar(ruta) as conexion:
+        fila = conexion.execute(f'SELECT id, resumen, USL, LSL FROM analisis WHERE {campo} = ?', (valor,)).fetchone()
+        if fila is None:
+            return None
+        series = conexion.execute('SELECT s.nombre, a.dtype, a.datos FROM series_analisis s '
+                                  'JOIN arreglos a ON a.huella = s.arreglo WHERE s.analisis_id = ?', (fila['id'],))
+        resultado = json.loads(fila['resumen'], object_hook=_decodificar)
+        resultado.update({nombre: _leer_serie(dtype, datos) for nombre, dtype, datos in series})
+    return resultado, fila['USL'], fila['LSL'], fila['id']
+
+class SerieGuardada:
+    """Serie numérica de un análisis guardado que lee del BLOB solo los tramos que se piden"""
+
+    def __init__(self, conexion, fila, dtype):
+        self.dtype = np.dtype(dtype)
+        self._blob = conexion.blobopen('arreglos', 'datos', fila, readonly=True)
+        self._largo = len(self._blob) // self.dtype.itemsize
+
+    def __len__(self):
+        return self._largo
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            inicio, fin, paso = indice.indices(self._largo)
+            if paso != 1:
+                raise ValueError("SerieGuardada solo admite tramos contiguos")
+            fin = max(fin, inicio)
+        else:
+            inicio = indice + self._largo if indice < 0 else indice
+            if not 0 <= inicio < self._largo:
+                raise IndexError(indice)
+            fin = inicio + 1
+        self._blob.seek(inicio * self.dtype.itemsize)
+        tramo = np.frombuffer(self._blob.read((fin - inicio) * self.dtype.itemsize), dtype=self.dtype)
+        return tramo if isinstance(indice, slice) else tramo[0]
+
+def _decodificar_rango(objeto):
+    if '__rango__' in objeto:
+        return range(*objeto['__rango__'])
+    return _decodificar(objeto)
+
+@contextmanager
+def series_guardadas(id_analisis, ruta=RUTA_HISTORIAL):
+    """
+    Como `cargar_analisis(id_analisis=...)[0]`, pero las series numéricas son
+    `SerieGuardada` (y las posiciones, `range`), así que la memoria no depende
+    del número de subgrupos mientras se recorren por tramos dentro del `with`.
+    No incluye las listas de texto (violaciones, partes). None si no existe.
+    """
+    if not os.path.exists(ruta):
+        yield None
+        return
+    with conectar(ruta) as conexion:
+        fila = conexion.execute('SELECT resumen FROM analisis WHERE id = ?', (id_analisis,)).fetchone()
+        if fila is None:
+            yield None
+            return
+        resultado = json.loads(fila['resumen'], object_hook=_decodificar_rango)
+        series = conexion.execute('SELECT s.nombre, a.rowid, a.dtype FROM series_analisis s '
+                                  'JOIN arreglos a ON a.huella = s.arreglo WHERE s.analisis_id = ?', (id_analisis,))
+        resultado.update({nombre: SerieGuardada(conexion, rowid, dtype)
+                          for nombre, rowid, dtype in series.fetchall() if dtype not in ('lista', 'object')})
+        yield resultado
+
+def buscar_analisis(proceso=None, desde=None, hasta=None, fuera_control=None, limite=200, ruta=RUTA_HISTORIAL):
+    """
+    Resúmenes de los análisis guardados, del más reciente al más antiguo.
+    - proceso: coincidencia por prefijo
+    - desde/hasta: fechas ISO ('2026-01-31' incluye todo ese día en hasta)
+    - fuera_control: True/False para filtrar por estado
+    """
+    if not os.path.exists(ruta):
+        return []
+    condiciones, parametros = [], []
+    if proceso:
+        condiciones.append("proceso >= ? AND proceso < ?")
+        parametros += [proceso, proceso + '\uffff']
+    if desde:
+        condiciones.append("fecha >= ?")
+        parametros.append(desde)
+    if hasta:
+        condiciones.append("fecha < ?")
+        parametros.append(hasta + ('T99' if len(hasta) == 10 else ''))
+    if fuera_control is not None:
+        condiciones.append("fuera_control = ?")
+        parametros.append(int(fuera_control))
+    consulta = f"SELECT {', '.join(COLUMNAS_RESUMEN)} FROM analisis"
+    if condiciones:
+        consulta += " WHERE " + " AND ".join(condiciones)
+    consulta += " ORDER BY fecha DESC, id DESC LIMIT ?"
+    with conectar(ruta) as conexion:
+        return [dict(fila) for fila in conexion.execute(consulta, (*parametros, limite))]
@@ -0,0 +1,167 @@
+"""Lectura de archivos en formato largo (timestamp, máquina, valor) y subgrupos racionales.
+
+Los subgrupos se forman con operaciones vectorizadas sobre códigos enteros
+(diferencias, sumas acumuladas y bincount), sin agrupar fila por fila, y el
+resultado es la misma matriz de subgrupos que usa `analizar_subgrupos`.
+"""
+import io
+import numpy as np
+
+MODOS_SUBGRUPO = {
+    'conteo': 'Cantidad fija de lecturas',
+    'ventana': 'Ventana de tiempo',
+    'lote': 'Lote',
+    'turno': 'Turno'
+}
+
+NOMBRES_TIEMPO = ('timestamp', 'fecha', 'hora', 'tiempo', 'time', 'date', 'datetime')
+NOMBRES_VALOR = ('valor', 'value', 'medicion', 'medición', 'measurement', 'lectura')
+# La matriz tiene una columna por lectura del subgrupo más grande; un lote o una
+# ventana mal elegidos no deben reservar millones de columnas
+MAX_LECTURAS_SUBGRUPO = 1000
+
+def leer_formato_largo(decoded, filename):
+    """DataFrame con encabezados a partir de los bytes de un CSV o Excel"""
+    import pandas as pd
+
+    if 'csv' in filename.lower():
+        return pd.read_csv(io.BytesIO(decoded))
+    if 'xls' in filename.lower():
+        return pd.read_excel(io.BytesIO(decoded))
+    return None
+
+def detectar_columnas(df, columna_valor=None, excluir=()):
+    """
+    (columna de tiempo o None, columna de valor). La de tiempo se reconoce por su
+    nombre; el valor es `columna_valor`, la única columna numérica que no es de
+    tiempo ni está en `excluir` (lote, máquina) o, entre varias, la única con
+    nombre de valor. ValueError si no hay ninguna o si la elección es ambigua.
+    """
+    columna_tiempo = next((c for c in df.columns if str(c).strip().lower() in NOMBRES_TIEMPO), None)
+    if columna_valor is not None:
+        if columna_valor not in df.columns:
+            raise ValueError(f"El archivo no tiene la columna '{columna_valor}'")
+        return columna_tiempo, columna_valor
+    numericas = [c for c in df.select_dtypes(include='number').columns
+                 if c != columna_tiempo and c not in excluir]
+    if len(numericas) > 1:
+        numericas = [c for c in numericas if str(c).strip().lower() in NOMBRES_VALOR] or numericas
+    if not numericas:
+        raise ValueError("El archivo no tiene columnas numéricas")
+    if len(numericas) > 1:
+        raise ValueError(f"Hay varias columnas numéricas ({', '.join(map(str, numericas))}); "
+                         "indique cuál es la columna de valor")
+    return columna_tiempo, numericas[0]
+
+def _codigos_consecutivos(claves):
+    """Códigos 0..G-1 para claves no decrecientes (un código nuevo cada vez que cambia la clave)"""
+    codigos = np.empty(len(claves), dtype=np.int64)
+    if len(claves):
+        codigos[0] = 0
+        np.cumsum(claves[1:] != claves[:-1], out=codigos[1:])
+    return codigos
+
+def _claves_turno(tiempos_ns, inicios_turno):
+    """Clave (día, turno) para cada lectura; antes del primer turno del día cuenta el último del día anterior"""
+    dia_ns = 86_400_000_000_000
+    dias = tiempos_ns // dia_ns
+    horas = (tiempos_ns - dias * dia_ns) / 3_600_000_000_000
+    turno = np.searchsorted(np.sort(inicios_turno), horas, side='right') - 1
+    dias = np.where(turno < 0, dias - 1, dias)
+    turno = np.where(turno < 0, len(inicios_turno) - 1, turno)
+    return dias * len(inicios_turno) + turno
+
+def _primer_tiempo(codigos, tiempos_ns):
+    """Marca de tiempo de la primera lectura de cada subgrupo (tiempos ya ordenados)"""
+    if len(codigos) and np.any(codigos[1:] < codigos[:-1]):
+        orden = np.argsort(codigos, kind='stable')
+        codigos, tiempos_ns = codigos[orden], tiempos_ns[orden]
+    primeros = np.flatnonzero(np.concatenate(([True], codigos[1:] != codigos[:-1])))
+    return tiempos_ns[primeros].view('datetime64[ns]')
+
+def matriz_subgrupos(valores, codigos, max_lecturas=MAX_LECTURAS_SUBGRUPO):
+    """
+    Matriz (subgrupos × tamaño máximo) a partir de valores y su código de subgrupo.
+    Los subgrupos más cortos se completan con NaN.
+    ValueError si algún subgrupo tiene más de `max_lecturas` lecturas.
+    """
+    if len(codigos) and np.any(codigos[1:] < codigos[:-1]):
+        orden = np.argsort(codigos, kind='stable')
+        valores, codigos = valores[orden], codigos[orden]
+    conteos = np.bincount(codigos)
+    conteos_no_vacios = conteos > 0
+    if not conteos_no_vacios.all():
+        # Compacta los códigos para que no queden filas vacías
+        codigos = (np.cumsum(conteos_no_vacios) - 1)[codigos]
+        conteos = conteos[conteos_no_vacios]
+    if conteos.max(initial=0) > max_lecturas:
+        raise ValueError(f"Un subgrupo tiene {conteos.max()} lecturas (máximo {max_lecturas}); "
+                         "revise la columna de lote o el tamaño de la ventana")
+    inicios = np.concatenate(([0], np.cumsum(conteos)[:-1]))
+    posiciones = np.arange(len(codigos)) - inicios[codigos]
+
+    matriz = np.full((len(conteos), conteos.max(initial=0)), np.nan)
+    matriz[codigos, posiciones] = valores
+    return matriz
+
+def subgrupos_formato_largo(df, modo='conteo', parametro=5, columna_valor=None, columna_tiempo=None,
+                            columna_lote=None, columna_maquina=None, maquina=None):
+    """
+    Forma subgrupos racionales a partir de un DataFrame en formato largo.
+    - modo 'conteo': `parametro` lecturas consecutivas por subgrupo
+    - modo 'ventana': lecturas dentro de la misma ventana de tiempo (`parametro` como '1h', '15min')
+    - modo 'lote': lecturas con el mismo valor en `columna_lote`
+    - modo 'turno': lecturas del mismo turno; `parametro` son las horas de inicio ('6,14,22')
+    - columna_maquina/maquina: filtra las lecturas de una sola máquina
+    - columna_valor: columna de las mediciones (por defecto, ver `detectar_columnas`)
+    Devuelve (matriz de subgrupos, inicio de cada subgrupo o None si no hay columna de tiempo).
+    """
+    import pandas as pd
+
+    tiempo_detectado, columna_valor = detectar_columnas(df, columna_valor, excluir=(columna_lote, columna_maquina))
+    columna_tiempo = columna_tiempo or tiempo_detectado
+
+    for columna in (columna_lote if modo == 'lote' else None, columna_maquina):
+        if columna is not None and columna not in df.columns:
+            raise ValueError(f"El archivo no tiene la columna '{columna}'")
+    if modo == 'lote' and columna_lote is None:
+        raise ValueError("El modo 'lote' requiere una columna de lote")
+
+    if columna_maquina is not None and maquina is not None:
+        df = df[df[columna_maquina].astype(str) == str(maquina)]
+
+    valores = pd.to_numeric(df[columna_valor], errors='coerce').to_numpy(dtype=float)
+    validos = ~np.isnan(valores)
+    tiempos_ns = None
+    if columna_tiempo is not None:
+        tiempos = pd.to_datetime(df[columna_tiempo], errors='coerce')
+        validos &= tiempos.notna().to_numpy()
+        tiempos_ns = tiempos.to_numpy(dtype='datetime64[ns]').view(np.int64)[validos]
+    valores = valores[validos]
+
+    orden = None
+    if tiempos_ns is not None and np.any(tiempos_ns[1:] < tiempos_ns[:-1]):
+        orden = np.argsort(tiempos_ns, kind='stable')
+        tiempos_ns, valores = tiempos_ns[orden], valores[orden]
+
+    if modo == 'conteo':
+        codigos = np.arange(len(valores)) // max(int(parametro), 1)
+    elif modo == 'lote':
+        lotes = df[columna_lote].to_numpy()[validos]
+        if orden is not None:
+            lotes = lotes[orden]
+        codigos = pd.factorize(lotes)[0].astype(np.int64)
+    elif tiempos_ns is None:
+        raise ValueError(f"El modo '{modo}' requiere una columna de tiempo")
+    elif modo == 'ventana':
+        ancho_ns = pd.Timedelta(parametro).value
+        codigos = _codigos_consecutivos((tiempos_ns - tiempos_ns[:1]) // ancho_ns)
+    elif modo == 'turno':
+        inicios_turno = np.array([float(h) for h in str(parametro).split(',')])
+        codigos = _codigos_consecutivos(_claves_turno(tiempos_ns, inicios_turno))
+    else:
+        raise ValueError(f"Modo de subgrupo desconocido: {modo}")
+
+    matriz = matriz_subgrupos(valores, codigos)
+    inicio = _primer_tiempo(codigos, tiempos_ns) if tiempos_ns is not None else None
+    return matriz, inicio
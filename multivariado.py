@@ -0,0 +1,89 @@
+"""Gráfico T² de Hotelling para varias características correlacionadas.
+
+La covarianza combinada se acumula con productos matriciales sobre todo el
+arreglo y el T² de todos los subgrupos sale de una sola factorización de
+Cholesky resuelta contra todas las desviaciones a la vez, sin invertir una
+matriz por subgrupo. Los límites son los de la fase I (Montgomery), con la
+distribución F.
+"""
+import numpy as np
+
+from spc_core import cuantil_f
+
+# Equivalente a los límites de 3σ de un gráfico univariado
+ALFA_T2 = 0.0027
+
+def arreglo_multivariado(df, tamano_subgrupo=1):
+    """
+    Arreglo (subgrupos, n, p) a partir de un DataFrame con encabezados: una
+    columna numérica por característica y una fila por pieza medida; las filas
+    consecutivas forman subgrupos de `tamano_subgrupo`. Se descartan las filas
+    incompletas y el último subgrupo si queda incompleto.
+    Devuelve (arreglo, nombres de las características).
+    """
+    numericas = df.select_dtypes(include='number')
+    if numericas.shape[1] < 2:
+        raise ValueError("Se necesitan al menos 2 características numéricas")
+    valores = numericas.to_numpy(dtype=float)
+    valores = valores[~np.isnan(valores).any(axis=1)]
+    n = max(int(tamano_subgrupo), 1)
+    m = len(valores) // n
+    return valores[:m * n].reshape(m, n, valores.shape[1]), [str(c) for c in numericas.columns]
+
+def hotelling_t2(datos, alfa=ALFA_T2):
+    """
+    Estadístico T² de cada subgrupo de un arreglo (subgrupos, n, p) y sus límites de fase I.
+    - n > 1: covarianza combinada de los subgrupos, T² = n (x̄ᵢ - x̿)' S̄⁻¹ (x̄ᵢ - x̿)
+    - n = 1: covarianza de todas las observaciones
+    UCL con la distribución F; CL es la mediana (mismo cálculo con alfa = 0.5).
+    Devuelve además las contribuciones univariadas de cada característica.
+    """
+    datos = np.asarray(datos, dtype=float)
+    m, n, p = datos.shape
+    gl = m * (n - 1) if n > 1 else m - 1
+    if m < 2:
+        raise ValueError("Se necesitan al menos 2 subgrupos completos")
+    if gl < p + 1:
+        raise ValueError(f"Datos insuficientes: con {p} características se necesitan más de {p + 1} grados de libertad")
+
+    medias = datos.mean(axis=1)
+    media_total = medias.mean(axis=0)
+    if n > 1:
+        centrados = (datos - medias[:, None, :]).reshape(m * n, p)
+    else:
+        centrados = medias - media_total
+    covarianza = np.einsum('ip,iq->pq', centrados, centrados, optimize=True) / gl
+
+    try:
+        cholesky = np.linalg.cholesky(covarianza)
+    except np.linalg.LinAlgError:
+        raise ValueError("La matriz de covarianza es singular (características redundantes o constantes)") from None
+    desviaciones = medias - media_total
+    # L y = d para todos los subgrupos a la vez: T² = n |y|²
+    y = np.linalg.solve(cholesky, desviaciones.T)
+    t2 = n * np.einsum('pi,pi->i', y, y)
+
+    gl2 = m * n - m - p + 1 if n > 1 else m - p - 1
+
+    def limite(a):
+        f = cuantil_f(a, p, gl2)
+        if n > 1:
+            return p * (m - 1) * (n - 1) / gl2 * f
+        # Individuales: (m-1)²/m · Beta(p/2, (m-p-1)/2), con el cuantil beta escrito con F(p, m-p-1)
+        return (m - 1) ** 2 / m * p * f / (p * f + gl2)
+
+    UCL = limite(alfa)
+    fuera_control = np.flatnonzero(t2 > UCL)
+    return {
+        'n': n,
+        'p': p,
+        't2': t2,
+        'UCL': UCL,
+        'CL': limite(0.5),
+        'LCL': 0.0,
+        'fuera_control': fuera_control,
+        'medias': media_total,
+        'covarianza': covarianza,
+        # t² univariado de cada característica: ayuda a ver cuál dispara la señal
+        'contribuciones': n * desviaciones ** 2 / np.diag(covarianza),
+    }
@@ -0,0 +1,265 @@
+"""Prueba de carga local del endpoint de callbacks de Dash.
+
+Levanta gunicorn con la configuración pedida (o usa un servidor que ya está
+corriendo), arma los payloads de `/_dash-update-component` a partir de
+`/_dash-dependencies` y los reproduce con varios clientes concurrentes.
+Reporta rendimiento y percentiles de latencia por escenario y la memoria
+residente (actual y pico) de cada worker, leída de /proc.
+
+    python prueba_carga.py --workers 4 --threads 2 --concurrencia 16 --solicitudes 400
+    python prueba_carga.py --url http://127.0.0.1:8050 --escenarios update_graph,add_row
+
+Cada análisis usa una USL distinta en el último decimal para que la huella
+de los datos cambie y el historial de análisis no responda desde SQLite.
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import numpy as np
+
+ESCENARIOS = ('add_row', 'update_graph', 'upload')
+TAMANOS_CARGA = (1000, 20000, 100000)
+MEDICIONES_POR_SUBGRUPO = 5
+FILAS_TABLA_MANUAL = 30
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def iniciar_servidor(workers, threads, puerto, directorio_db):
+    """Proceso maestro de gunicorn con la app de este directorio y un historial temporal"""
+    entorno = dict(os.environ, BRAINYSTATS_DB=os.path.join(directorio_db, 'historial.sqlite3'))
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--preload', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{puerto}', '--timeout', '600', 'APPCONTROL:create_app()'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=entorno,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def esperar_servidor(url, proceso=None, espera=120):
+    partes = urlsplit(url)
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if proceso is not None and proceso.poll() is not None:
+            raise RuntimeError("gunicorn terminó antes de aceptar conexiones")
+        conexion = http.client.HTTPConnection(partes.hostname, partes.port, timeout=5)
+        try:
+            conexion.request('GET', '/_dash-dependencies')
+            if conexion.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            conexion.close()
+        time.sleep(0.5)
+    raise RuntimeError(f"El servidor no respondió en {espera} s")
+
+def pids_workers(pid_maestro):
+    """Procesos hijos directos del maestro (Linux)"""
+    pids = []
+    for entrada in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as f:
+                # El nombre del proceso va entre paréntesis y puede tener espacios
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid_maestro:
+            pids.append(int(entrada))
+    return sorted(pids)
+
+def memoria_proceso(pid):
+    """(RSS, pico de RSS) en MB de un proceso, o None si no se puede leer"""
+    valores = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for linea in f:
+                if linea.startswith(('VmRSS:', 'VmHWM:')):
+                    clave, kb = linea.split()[:2]
+                    valores[clave] = int(kb) / 1024
+    except OSError:
+        return None
+    return valores.get('VmRSS:'), valores.get('VmHWM:')
+
+def _csv_subgrupos(subgrupos, semilla):
+    datos = np.random.default_rng(semilla).normal(100, 2, (subgrupos, MEDICIONES_POR_SUBGRUPO))
+    texto = '\n'.join(','.join(f'{v:.4f}' for v in fila) for fila in datos)
+    return 'data:text/csv;base64,' + base64.b64encode(texto.encode()).decode()
+
+def _salidas(cadena):
+    """Formato de `outputs` que envía el renderer de Dash para una cadena de salida"""
+    def una(texto):
+        id_, propiedad = texto.split('@')[0].rsplit('.', 1)
+        return {'id': id_, 'property': propiedad}
+    if cadena.startswith('..'):
+        return [una(t) for t in cadena[2:-2].split('...')]
+    return una(cadena)
+
+def _payload(dependencia, valores, disparo):
+    def leer(lista):
+        return [{'id': d['id'], 'property': d['property'], 'value': valores.get(f"{d['id']}.{d['property']}")}
+                for d in lista]
+    return {'output': dependencia['output'], 'outputs': _salidas(dependencia['output']),
+            'inputs': leer(dependencia['inputs']), 'state': leer(dependencia['state']),
+            'changedPropIds': [disparo]}
+
+def construir_escenarios(dependencias, nombres, tamanos):
+    """{nombre: función(i) -> payload} para los escenarios pedidos"""
+    def buscar(entrada, salida):
+        for d in dependencias:
+            if any(i['id'] == entrada for i in d['inputs']) and salida in d['output']:
+                return d
+        raise RuntimeError(f"No se encontró el callback {entrada} -> {salida}")
+
+    filas = [{'Subgrupo': i + 1, **{f'M{j + 1}': round(100 + float(np.sin(i + j)), 4) for j in range(MEDICIONES_POR_SUBGRUPO)}}
+             for i in range(FILAS_TABLA_MANUAL)]
+    base = {'generate-button.n_clicks': 1, 'add-row.n_clicks': 1, 'chart-type.value': 'XR',
+            'lsl-input.value': 90.0, 'modo-subgrupo.value': 'conteo', 'parametro-subgrupo.value': '5',
+            'limites-revisados.value': [], 'pestanas-resultados.value': 'grafico-x', 'manual-table.data': filas}
+    analisis = buscar('generate-button', 'chart-xbar.figure')
+
+    def analizar(valores):
+        # Cada solicitud cambia la USL en el último decimal: otra huella, análisis completo
+        return lambda i: _payload(analisis, dict(valores, **{'usl-input.value': 110 + i * 1e-9}), 'generate-button.n_clicks')
+
+    escenarios = {}
+    if 'add_row' in nombres:
+        dependencia = buscar('add-row', 'manual-table.data')
+        escenarios['add_row'] = lambda i: _payload(dependencia, base, 'add-row.n_clicks')
+    if 'update_graph' in nombres:
+        escenarios['update_graph'] = analizar(dict(base, **{'input-method.value': 'manual'}))
+    if 'upload' in nombres:
+        for tamano in tamanos:
+            escenarios[f'upload_{tamano}'] = analizar(dict(base, **{
+                'input-method.value': 'upload', 'upload-data.contents': _csv_subgrupos(tamano, tamano),
+                'upload-data.filename': f'carga_{tamano}.csv'}))
+    return escenarios
+
+def correr_escenario(url, armar_payload, solicitudes, concurrencia, calentamiento=0):
+    """
+    Envía `solicitudes` payloads con `concurrencia` clientes (después de
+    `calentamiento` solicitudes que no se miden). Devuelve rendimiento,
+    percentiles de latencia, errores y tamaño medio de respuesta.
+    """
+    partes = urlsplit(url)
+    local = threading.local()
+    conexiones = []
+
+    def enviar(i):
+        if not hasattr(local, 'conexion'):
+            local.conexion = http.client.HTTPConnection(partes.hostname, partes.port, timeout=600)
+            conexiones.append(local.conexion)
+        # El cuerpo se serializa antes de medir para no contar el trabajo del cliente
+        cuerpo = json.dumps(armar_payload(i)).encode()
+        inicio = time.perf_counter()
+        try:
+            local.conexion.request('POST', '/_dash-update-component', cuerpo, {'Content-Type': 'application/json'})
+            respuesta = local.conexion.getresponse()
+            datos = respuesta.read()
+            correcta = respuesta.status in (200, 204)
+        except (OSError, http.client.HTTPException):
+            local.conexion.close()
+            datos, correcta = b'', False
+        return time.perf_counter() - inicio, correcta, len(datos)
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        list(pool.map(enviar, range(solicitudes, solicitudes + calentamiento)))
+        inicio = time.perf_counter()
+        resultados = list(pool.map(enviar, range(solicitudes)))
+        duracion = time.perf_counter() - inicio
+    # Las conexiones keep-alive abiertas demorarían el apagado ordenado de los workers
+    for conexion in conexiones:
+        conexion.close()
+    latencias = np.array([r[0] for r in resultados if r[1]])
+    return {
+        'solicitudes': solicitudes,
+        'errores': sum(not r[1] for r in resultados),
+        'rendimiento': len(latencias) / duracion if duracion else 0.0,
+        'p50_ms': float(np.percentile(latencias, 50) * 1000) if len(latencias) else None,
+        'p95_ms': float(np.percentile(latencias, 95) * 1000) if len(latencias) else None,
+        'p99_ms': float(np.percentile(latencias, 99) * 1000) if len(latencias) else None,
+        'bytes_respuesta': float(np.mean([r[2] for r in resultados])) if resultados else 0.0,
+        'duracion_s': duracion,
+    }
+
+def _imprimir(resultados, memoria):
+    print(f"{'escenario':<16}{'solic.':>8}{'errores':>9}{'sol/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'KB resp.':>10}")
+    for nombre, r in resultados.items():
+        p = [f"{r[k]:.1f}" if r[k] is not None else '-' for k in ('p50_ms', 'p95_ms', 'p99_ms')]
+        print(f"{nombre:<16}{r['solicitudes']:>8}{r['errores']:>9}{r['rendimiento']:>9.1f}"
+              f"{p[0]:>10}{p[1]:>10}{p[2]:>10}{r['bytes_respuesta'] / 1024:>10.1f}")
+    if memoria:
+        print(f"\n{'worker':<10}{'RSS MB':>10}{'pico MB':>10}")
+        for pid, (rss, pico) in memoria.items():
+            print(f"{pid:<10}{rss:>10.1f}{pico:>10.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', help="servidor ya iniciado (si no, se levanta gunicorn local)")
+    parser.add_argument('--pid-maestro', type=int, help="pid del maestro de gunicorn de --url, para medir sus workers")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--solicitudes', type=int, default=100, help="por escenario")
+    parser.add_argument('--escenarios', default=','.join(ESCENARIOS))
+    parser.add_argument('--tamanos', default=','.join(map(str, TAMANOS_CARGA)), help="subgrupos de cada archivo subido")
+    parser.add_argument('--json', help="guarda los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    proceso = directorio_db = None
+    url, pid_maestro = args.url, args.pid_maestro
+    if url is None:
+        directorio_db = tempfile.mkdtemp(prefix='spc_carga_')
+        url = f'http://127.0.0.1:{_puerto_libre()}'
+        proceso = iniciar_servidor(args.workers, args.threads, urlsplit(url).port, directorio_db)
+        pid_maestro = proceso.pid
+    try:
+        esperar_servidor(url, proceso)
+        partes = urlsplit(url)
+        conexion = http.client.HTTPConnection(partes.hostname, partes.port, timeout=30)
+        conexion.request('GET', '/_dash-dependencies')
+        dependencias = json.loads(conexion.getresponse().read())
+        conexion.close()
+        escenarios = construir_escenarios(dependencias, args.escenarios.split(','),
+                                          [int(t) for t in args.tamanos.split(',') if t])
+
+        resultados = {}
+        for nombre, armar_payload in escenarios.items():
+            resultados[nombre] = correr_escenario(url, armar_payload, args.solicitudes, args.concurrencia,
+                                                  calentamiento=args.concurrencia)
+        memoria = {}
+        if pid_maestro:
+            for pid in pids_workers(pid_maestro):
+                valores = memoria_proceso(pid)
+                if valores and None not in valores:
+                    memoria[pid] = valores
+
+        _imprimir(resultados, memoria)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'configuracion': vars(args), 'escenarios': resultados,
+                           'memoria_workers_mb': {str(k): v for k, v in memoria.items()}}, f, indent=2)
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            try:
+                proceso.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+            shutil.rmtree(directorio_db, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
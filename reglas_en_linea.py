@@ -0,0 +1,174 @@
+"""Reglas Western Electric en línea, un punto a la vez.
+
+Es la versión incremental de `detectar_patrones_western_electric`: por cada
+serie se guardan registros de bits con los últimos puntos de cada zona (2 de 3,
+4 de 5), las rachas de lado y de tendencia y el último valor. Cada punto nuevo
+se evalúa en tiempo constante, y el estado de miles de series se actualiza en
+un solo paso vectorizado. El estado es un diccionario de arreglos NumPy que se
+serializa con `guardar_estado` para sobrevivir a reinicios de los workers.
+"""
+import io
+import numpy as np
+
+# Bits de las reglas que dispara cada punto
+REGLA_1 = 1 << 0
+REGLA_2_SUPERIOR = 1 << 1
+REGLA_2_INFERIOR = 1 << 2
+REGLA_3_SUPERIOR = 1 << 3
+REGLA_3_INFERIOR = 1 << 4
+REGLA_4_SUPERIOR = 1 << 5
+REGLA_4_INFERIOR = 1 << 6
+REGLA_5_ASCENDENTE = 1 << 7
+REGLA_5_DESCENDENTE = 1 << 8
+
+# Bits en 1 de cada valor de un registro (uint8); equivale a np.bitwise_count sin exigir NumPy 2
+_BITS_EN_UNO = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+_CAMPOS_ENTEROS = ('puntos', 'racha_superior', 'racha_inferior', 'racha_ascendente', 'racha_descendente')
+_REGISTROS = ('zona_2s_superior', 'zona_2s_inferior', 'zona_1s_superior', 'zona_1s_inferior')
+
+def crear_estado(CL, UCL, LCL, series=None):
+    """
+    Estado inicial para una o más series.
+    CL/UCL/LCL pueden ser escalares (mismos límites para todas) o arreglos por serie.
+    """
+    CL, UCL, LCL = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (CL, UCL, LCL)))
+    if series is not None and len(CL) == 1:
+        CL, UCL, LCL = (np.full(series, v[0]) for v in (CL, UCL, LCL))
+    total = len(CL)
+    estado = {'CL': CL.copy(), 'UCL': UCL.copy(), 'LCL': LCL.copy(), 'ultimo': np.full(total, np.nan)}
+    estado.update({campo: np.zeros(total, dtype=np.int64) for campo in _CAMPOS_ENTEROS})
+    estado.update({campo: np.zeros(total, dtype=np.uint8) for campo in _REGISTROS})
+    return estado
+
+def estado_tras_serie(datos, CL, UCL, LCL):
+    """
+    Estado de una sola serie después de recorrer `datos`, calculado de una vez con
+    operaciones vectorizadas (lo mismo que pasar los puntos uno a uno por
+    `actualizar_estado`, sin el costo por punto). Los NaN se omiten.
+    """
+    datos = np.asarray(datos, dtype=float)
+    datos = datos[~np.isnan(datos)]
+    estado = crear_estado(CL, UCL, LCL)
+    if len(datos) == 0:
+        return estado
+    CL, UCL = estado['CL'][0], estado['UCL'][0]
+    sigma_1 = (UCL - CL) / 3
+
+    def registro(mascara, ancho):
+        # El bit 0 es el último punto, como al desplazar en `actualizar_estado`
+        return sum(int(bit) << i for i, bit in enumerate(mascara[::-1][:ancho]))
+
+    def racha(mascara):
+        falsos = np.flatnonzero(~mascara)
+        return len(mascara) - 1 - falsos[-1] if len(falsos) else len(mascara)
+
+    diferencias = np.diff(datos)
+    estado.update({
+        'puntos': np.array([len(datos)]), 'ultimo': datos[-1:].copy(),
+        'zona_2s_superior': np.array([registro(datos > CL + 2 * sigma_1, 3)], dtype=np.uint8),
+        'zona_2s_inferior': np.array([registro(datos < CL - 2 * sigma_1, 3)], dtype=np.uint8),
+        'zona_1s_superior': np.array([registro(datos > CL + sigma_1, 5)], dtype=np.uint8),
+        'zona_1s_inferior': np.array([registro(datos < CL - sigma_1, 5)], dtype=np.uint8),
+        'racha_superior': np.array([racha(datos > CL)]), 'racha_inferior': np.array([racha(datos < CL)]),
+        'racha_ascendente': np.array([racha(diferencias > 0)]), 'racha_descendente': np.array([racha(diferencias < 0)]),
+    })
+    return estado
+
+def actualizar_estado(estado, valores):
+    """
+    Agrega un punto a cada serie y devuelve las reglas que se cumplen en él
+    (arreglo de bits REGLA_*). Las series con valor NaN no avanzan en este paso.
+    """
+    valores = np.broadcast_to(np.asarray(valores, dtype=float), estado['CL'].shape)
+    activos = ~np.isnan(valores)
+    CL, UCL, LCL = estado['CL'], estado['UCL'], estado['LCL']
+    sigma_1 = (UCL - CL) / 3
+
+    puntos = estado['puntos'] + activos
+
+    def desplazar(registro, condicion, mascara):
+        return ((registro << np.uint8(1)) | condicion.astype(np.uint8)) & np.uint8(mascara)
+
+    zona_2s_superior = desplazar(estado['zona_2s_superior'], valores > CL + 2 * sigma_1, 0b111)
+    zona_2s_inferior = desplazar(estado['zona_2s_inferior'], valores < CL - 2 * sigma_1, 0b111)
+    zona_1s_superior = desplazar(estado['zona_1s_superior'], valores > CL + sigma_1, 0b11111)
+    zona_1s_inferior = desplazar(estado['zona_1s_inferior'], valores < CL - sigma_1, 0b11111)
+
+    racha_superior = np.where(valores > CL, estado['racha_superior'] + 1, 0)
+    racha_inferior = np.where(valores < CL, estado['racha_inferior'] + 1, 0)
+    # En el primer punto `ultimo` es NaN y ninguna de las dos comparaciones se cumple
+    diferencia = valores - estado['ultimo']
+    racha_ascendente = np.where(diferencia > 0, estado['racha_ascendente'] + 1, 0)
+    racha_descendente = np.where(diferencia < 0, estado['racha_descendente'] + 1, 0)
+
+    # Las ventanas de 2/3 y 4/5 solo cuentan cuando ya están completas
+    tres, cinco = puntos >= 3, puntos >= 5
+    reglas = [
+        (REGLA_1, (valores > UCL) | (valores < LCL)),
+        (REGLA_2_SUPERIOR, tres & (_BITS_EN_UNO[zona_2s_superior] >= 2)),
+        (REGLA_2_INFERIOR, tres & (_BITS_EN_UNO[zona_2s_inferior] >= 2)),
+        (REGLA_3_SUPERIOR, cinco & (_BITS_EN_UNO[zona_1s_superior] >= 4)),
+        (REGLA_3_INFERIOR, cinco & (_BITS_EN_UNO[zona_1s_inferior] >= 4)),
+        (REGLA_4_SUPERIOR, racha_superior >= 8),
+        (REGLA_4_INFERIOR, racha_inferior >= 8),
+        (REGLA_5_ASCENDENTE, racha_ascendente >= 5),
+        (REGLA_5_DESCENDENTE, racha_descendente >= 5),
+    ]
+    banderas = np.zeros(len(valores), dtype=np.uint16)
+    for bit, condicion in reglas:
+        banderas |= np.where(activos & condicion, bit, 0).astype(np.uint16)
+
+    nuevos = {
+        'puntos': puntos, 'ultimo': valores,
+        'zona_2s_superior': zona_2s_superior, 'zona_2s_inferior': zona_2s_inferior,
+        'zona_1s_superior': zona_1s_superior, 'zona_1s_inferior': zona_1s_inferior,
+        'racha_superior': racha_superior, 'racha_inferior': racha_inferior,
+        'racha_ascendente': racha_ascendente, 'racha_descendente': racha_descendente,
+    }
+    for campo, valor in nuevos.items():
+        estado[campo] = np.where(activos, valor, estado[campo]).astype(estado[campo].dtype)
+    return banderas
+
+def mensajes_reglas(banderas, punto, valor):
+    """Textos de las reglas de un punto (1-based), con el formato de `detectar_patrones_western_electric`"""
+    mensajes = []
+    if banderas & REGLA_1:
+        mensajes.append(f"Regla 1: Punto {punto} fuera de límites (3σ) - Valor: {valor:.4f}")
+    if banderas & REGLA_2_SUPERIOR:
+        mensajes.append(f"Regla 2: Puntos {punto-2}-{punto} - 2/3 fuera de 2σ (superior)")
+    if banderas & REGLA_2_INFERIOR:
+        mensajes.append(f"Regla 2: Puntos {punto-2}-{punto} - 2/3 fuera de 2σ (inferior)")
+    if banderas & REGLA_3_SUPERIOR:
+        mensajes.append(f"Regla 3: Puntos {punto-4}-{punto} - 4/5 fuera de 1σ (superior)")
+    if banderas & REGLA_3_INFERIOR:
+        mensajes.append(f"Regla 3: Puntos {punto-4}-{punto} - 4/5 fuera de 1σ (inferior)")
+    if banderas & REGLA_4_SUPERIOR:
+        mensajes.append(f"Regla 4: Puntos {punto-7}-{punto} - 8 consecutivos arriba de CL")
+    if banderas & REGLA_4_INFERIOR:
+        mensajes.append(f"Regla 4: Puntos {punto-7}-{punto} - 8 consecutivos debajo de CL")
+    if banderas & REGLA_5_ASCENDENTE:
+        mensajes.append(f"Regla 5: Puntos {punto-5}-{punto} - Tendencia ascendente continua")
+    if banderas & REGLA_5_DESCENDENTE:
+        mensajes.append(f"Regla 5: Puntos {punto-5}-{punto} - Tendencia descendente continua")
+    return mensajes
+
+def evaluar_serie(estado, valores, serie=0):
+    """Pasa los valores de una serie por el autómata y devuelve los mensajes en orden de llegada"""
+    mensajes = []
+    for valor in np.asarray(valores, dtype=float):
+        entrada = np.full(len(estado['CL']), np.nan)
+        entrada[serie] = valor
+        banderas = actualizar_estado(estado, entrada)
+        mensajes += mensajes_reglas(banderas[serie], int(estado['puntos'][serie]), valor)
+    return mensajes
+
+def guardar_estado(estado):
+    """Estado serializado como bytes (formato .npz)"""
+    salida = io.BytesIO()
+    np.savez(salida, **estado)
+    return salida.getvalue()
+
+def cargar_estado(datos):
+    with np.load(io.BytesIO(datos)) as archivo:
+        return {campo: archivo[campo].copy() for campo in archivo.files}
@@ -0,0 +1,341 @@
+"""Exportación masiva de reportes de control (HTML autocontenido + CSV).
+
+Cada característica se analiza y se renderiza en el pool de procesos compartido;
+el paquete zip se va entregando en trozos a medida que terminan los reportes,
+sin armar el archivo completo en memoria. La tabla por subgrupo de un análisis
+también se entrega sola (CSV o Parquet) en bloques de filas de tamaño fijo.
+"""
+import csv
+import html
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from bisect import bisect_left
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
+from figures import colors, etiquetas_grafico, figuras_analisis
+from spc_core import (BYTES_MINIMOS_POOL, _descartar_pool, _pool_compartido, analizar_archivo, analizar_subgrupos,
+                      reglas_por_punto)
+
+COLUMNAS_RESUMEN = [
+    'caracteristica', 'estado', 'grafico', 'n', 'subgrupos',
+    'CLx', 'UCLx', 'LCLx', 'CLrs', 'UCLrs', 'LCLrs',
+    'Cp', 'Cpk', 'Pp', 'Ppk', 'puntos_fuera_control', 'patrones'
+]
+
+PREFIJO_LOTE = 'spc_lote_'
+# Un lote se puede descargar varias veces (reintentos) hasta que vence; los vencidos
+# se borran al guardar el siguiente
+VIGENCIA_LOTE_SEGUNDOS = 3600
+FILAS_POR_BLOQUE = 16384
+# Puntos del bloque anterior que necesitan las ventanas de las reglas 2-5 (la más larga es de 8)
+_HISTORIA_REGLAS = 7
+
+def _nombre_archivo(nombre):
+    base = os.path.splitext(os.path.basename(nombre))[0]
+    return re.sub(r'[^\w\-.]+', '_', base).strip('._') or 'caracteristica'
+
+def _tarjeta(titulo, filas):
+    celdas = ''.join(f'<div><span>{html.escape(k)}</span><b>{html.escape(v)}</b></div>' for k, v in filas)
+    return f'<div class="card"><h3>{html.escape(titulo)}</h3>{celdas}</div>'
+
+def _lista(items, vacio):
+    if not items:
+        return f'<p class="ok">{html.escape(vacio)}</p>'
+    return '<ul>' + ''.join(f'<li>{html.escape(i)}</li>' for i in items) + '</ul>'
+
+def reporte_html(nombre, resultado, USL=None, LSL=None):
+    """Reporte autocontenido de una característica (usa plotly.min.js del mismo directorio)"""
+    from plotly.io.json import to_json_plotly
+
+    etiquetas = etiquetas_grafico(resultado['chart_type'])
+    fig_x, fig_rs = figuras_analisis(resultado, USL, LSL)
+    capacidad = resultado['capacidad']
+    fuera_control = resultado['num_fuera_control'] > 0 or len(resultado['violaciones']) > 0
+
+    tarjetas = [
+        _tarjeta(f"Gráfico {etiquetas['grafico_x']}", [
+            ('Línea Central', f"{resultado['CLx']:.4f}"),
+            ('UCL', f"{resultado['UCLx']:.4f}"),
+            ('LCL', f"{resultado['LCLx']:.4f}"),
+        ]),
+        _tarjeta(f"Gráfico {etiquetas['rs']}", [
+            ('Línea Central', f"{resultado['CLrs']:.4f}"),
+            ('UCL', f"{resultado['UCLrs']:.4f}"),
+            ('n', f"{resultado['n']}"),
+        ]),
+    ]
+    if capacidad:
+        filas = [('Cp', f"{capacidad['Cp']:.3f}"), ('Interpretación', capacidad['interpretacion_cp'])]
+        if capacidad['tiene_limites']:
+            filas += [('Cpk', f"{capacidad['Cpk']:.3f}"), ('Pp', f"{capacidad['Pp']:.3f}"),
+                      ('Ppk', f"{capacidad['Ppk']:.3f}")]
+        tarjetas.append(_tarjeta('Capacidad', filas))
+
+    puntos = [f"{etiquetas['punto']} {i+1}: {etiquetas['x']} = {resultado['x'][i]:.4f}"
+              for i in resultado['fuera_control_x']]
+    puntos += [f"{etiquetas['punto']} {resultado['x_rs'][i]}: {etiquetas['rs']} = {resultado['rs'][i]:.4f}"
+               for i in resultado['fuera_control_rs']]
+
+    return f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8">
+<title>{html.escape(nombre)} - BrainyStats</title>
+<script src="plotly.min.js"></script>
+<style>
+body {{ font-family: 'Inter', 'Segoe UI', 'Roboto', sans-serif; color: {colors['text_primary']}; max-width: 1200px; margin: 0 auto; padding: 30px; }}
+h1 {{ border-left: 5px solid {colors['accent_gold']}; padding-left: 15px; }}
+.alerta {{ padding: 20px; border-radius: 8px; margin-bottom: 20px; font-size: 20px; font-weight: 700;
+          background: {'#FFEBEE' if fuera_control else '#E8F5E9'}; border-left: 5px solid {colors['danger'] if fuera_control else colors['success']}; }}
+.cards {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); gap: 15px; margin-bottom: 20px; }}
+.card {{ border: 1px solid {colors['border']}; border-top: 4px solid {colors['accent_gold']}; border-radius: 8px; padding: 15px; }}
+.card div {{ display: flex; justify-content: space-between; margin: 4px 0; }}
+.ok {{ color: {colors['success']}; font-weight: 600; }}
+</style></head><body>
+<h1>{html.escape(nombre)}</h1>
+<div class="alerta">{'Proceso Fuera de Control' if fuera_control else 'Proceso Bajo Control Estadístico'} —
+{resultado['num_fuera_control']} puntos fuera de límites • {len(resultado['violaciones'])} patrones anormales</div>
+<div class="cards">{''.join(tarjetas)}</div>
+<div id="grafico-x"></div>
+<div id="grafico-rs"></div>
+<h2>Puntos fuera de control</h2>
+{_lista(puntos, '✓ Todos los puntos bajo control')}
+<h2>Análisis de Patrones Western Electric</h2>
+{_lista(resultado['violaciones'], '✓ No se detectaron patrones anormales')}
+<h2>Recomendaciones</h2>
+{_lista(resultado['recomendaciones'], '')}
+<script>
+Plotly.newPlot('grafico-x', {to_json_plotly(fig_x)});
+Plotly.newPlot('grafico-rs', {to_json_plotly(fig_rs)});
+</script>
+</body></html>
+"""
+
+def columnas_subgrupos(chart_type):
+    """Encabezados de la tabla por subgrupo (los mismos en CSV y Parquet)"""
+    etiquetas = etiquetas_grafico(chart_type)
+    return [etiquetas['punto'].lower(), etiquetas['x'], etiquetas['rs'], 'fuera_control_x', 'fuera_control_rs',
+            *(f'regla_{k}' for k in (2, 3, 4, 5))]
+
+def bloques_subgrupos(resultado, filas=FILAS_POR_BLOQUE):
+    """
+    Tabla por subgrupo de un resultado en bloques de `filas` filas (listas de
+    columnas en el orden de `columnas_subgrupos`). Las reglas 2-5 se evalúan en
+    cada bloque con los últimos puntos del anterior, así que la memoria extra no
+    depende del número de subgrupos. El estadístico R/S/MR queda vacío (NaN) en
+    los puntos que no lo tienen (primer punto de I-MR, primera lectura de cada parte en Z-MR).
+    """
+    # Las series solo se leen por tramos, así que pueden ser arreglos o `SerieGuardada`
+    x, rs, x_rs = resultado['x'], resultado['rs'], resultado['x_rs']
+    UCL, LCL, CL = resultado['UCLx'], resultado['LCLx'], resultado['CLx']
+    for inicio in range(0, len(x), filas):
+        fin = min(inicio + filas, len(x))
+        previo = max(inicio - _HISTORIA_REGLAS, 0)
+        tramo = np.asarray(x[previo:fin], dtype=float)
+        reglas = reglas_por_punto(tramo, UCL, LCL, CL)
+        # x_rs son las posiciones (desde 1) de los puntos con estadístico de dispersión
+        desde, hasta = bisect_left(x_rs, inicio + 1), bisect_left(x_rs, fin + 1)
+        dispersion = np.full(fin - inicio, np.nan)
+        dispersion[np.asarray(x_rs[desde:hasta]) - 1 - inicio] = rs[desde:hasta]
+        yield [
+            np.arange(inicio + 1, fin + 1),
+            tramo[inicio - previo:],
+            dispersion,
+            reglas[1][inicio - previo:],
+            (dispersion > resultado['UCLrs']) | (dispersion < resultado['LCLrs']),
+            *(reglas[k][inicio - previo:] for k in (2, 3, 4, 5)),
+        ]
+
+def csv_subgrupos(resultado, filas=FILAS_POR_BLOQUE):
+    """Tabla por subgrupo como trozos de texto CSV, uno por bloque"""
+    import pandas as pd
+
+    columnas = columnas_subgrupos(resultado['chart_type'])
+    encabezado = True
+    for bloque in bloques_subgrupos(resultado, filas):
+        tabla = pd.DataFrame({c: v.astype(np.int8) if v.dtype == bool else v for c, v in zip(columnas, bloque)})
+        yield tabla.to_csv(index=False, header=encabezado, na_rep='', lineterminator='\r\n')
+        encabezado = False
+    if encabezado:
+        yield ','.join(columnas) + '\r\n'
+
+def parquet_subgrupos(resultado, filas=FILAS_POR_BLOQUE):
+    """
+    Tabla por subgrupo como trozos de bytes de un archivo Parquet (un grupo de
+    filas por bloque). Requiere pyarrow; sin él lanza ImportError antes del primer trozo.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columnas = columnas_subgrupos(resultado['chart_type'])
+    esquema = pa.schema([(columnas[0], pa.int64()), (columnas[1], pa.float64()), (columnas[2], pa.float64()),
+                         *((c, pa.bool_()) for c in columnas[3:])])
+
+    def generar():
+        salida = _SalidaEnTrozos()
+        with pq.ParquetWriter(salida, esquema) as writer:
+            for bloque in bloques_subgrupos(resultado, filas):
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(v, type=t, from_pandas=True) for v, t in zip(bloque, esquema.types)], schema=esquema))
+                yield salida.vaciar()
+        yield salida.vaciar()
+
+    return generar()
+
+def _csv_subgrupos(resultado):
+    return ''.join(csv_subgrupos(resultado))
+
+def renderizar_reporte(tarea):
+    """
+    Analiza y renderiza una característica; se ejecuta en un proceso del pool.
+    tarea: (nombre, datos, chart_type, USL, LSL), donde datos es una matriz de
+    subgrupos, los bytes de un archivo CSV/Excel o la ruta de ese archivo (se lee aquí).
+    Devuelve (nombre, html o None, csv de subgrupos o None, fila del resumen).
+    """
+    nombre, datos, chart_type, USL, LSL = tarea
+    fila = dict.fromkeys(COLUMNAS_RESUMEN, '')
+    fila.update({'caracteristica': nombre, 'grafico': chart_type})
+
+    if isinstance(datos, str):
+        with open(datos, 'rb') as f:
+            datos = f.read()
+    if isinstance(datos, bytes):
+        resultado = analizar_archivo(nombre, datos, chart_type, USL, LSL)
+    else:
+        resultado = analizar_subgrupos(datos, chart_type, USL, LSL) if len(datos) else None
+    if resultado is None:
+        fila['estado'] = 'Datos insuficientes'
+        return nombre, None, None, fila
+
+    capacidad = resultado['capacidad'] or {}
+    fila.update({
+        'estado': 'Fuera de control' if resultado['num_fuera_control'] or resultado['violaciones'] else 'Bajo control',
+        'grafico': resultado['chart_type'],
+        'n': resultado['n'],
+        'subgrupos': len(resultado['x']),
+        **{k: f"{resultado[k]:.6g}" for k in ('CLx', 'UCLx', 'LCLx', 'CLrs', 'UCLrs', 'LCLrs')},
+        **{k: f"{capacidad[k]:.4f}" for k in ('Cp', 'Cpk', 'Pp', 'Ppk') if k in capacidad},
+        'puntos_fuera_control': resultado['num_fuera_control'],
+        'patrones': len(resultado['violaciones'])
+    })
+    return nombre, reporte_html(nombre, resultado, USL, LSL), _csv_subgrupos(resultado), fila
+
+class _SalidaEnTrozos(io.RawIOBase):
+    """Destino no posicionable (zip, Parquet): acumula bytes hasta que se vacían"""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._partes.append(bytes(b))
+        return len(b)
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+def _tamano(tarea):
+    datos = tarea[1]
+    return os.path.getsize(datos) if isinstance(datos, str) else len(datos) if isinstance(datos, bytes) else datos.nbytes
+
+def _reportes(tareas, max_workers=None):
+    """
+    `renderizar_reporte` de cada tarea, en orden, con el pool de procesos compartido
+    de spc_core. Con una sola tarea, lotes chicos o `max_workers=1` se renderiza en
+    el mismo proceso, y también lo que falte si un proceso del pool muere.
+    """
+    hechas = 0
+    if len(tareas) > 1 and max_workers != 1 and sum(map(_tamano, tareas)) >= BYTES_MINIMOS_POOL:
+        pool = _pool_compartido()
+        chunksize = max(1, len(tareas) // (4 * (os.cpu_count() or 1)))
+        try:
+            for reporte in pool.map(renderizar_reporte, tareas, chunksize=chunksize):
+                hechas += 1
+                yield reporte
+        except BrokenProcessPool:
+            _descartar_pool(pool)
+    yield from map(renderizar_reporte, tareas[hechas:])
+
+def generar_paquete_zip(datasets, chart_type='XR', USL=None, LSL=None, max_workers=None):
+    """
+    Genera el paquete de reportes como trozos de bytes de un zip.
+    - datasets: iterable de (nombre, datos) con datos como en `renderizar_reporte`
+    - max_workers=1 renderiza todo en el mismo proceso
+    - El zip contiene un HTML y un CSV de subgrupos por característica,
+      `resumen.csv` con una fila por característica y `plotly.min.js` compartido
+    """
+    from plotly.offline import get_plotlyjs
+
+    salida = _SalidaEnTrozos()
+    resumen = io.StringIO()
+    writer = csv.DictWriter(resumen, fieldnames=COLUMNAS_RESUMEN)
+    writer.writeheader()
+    usados = set()
+
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('plotly.min.js', get_plotlyjs())
+        yield salida.vaciar()
+
+        tareas = [(nombre, datos, chart_type, USL, LSL) for nombre, datos in datasets]
+        for nombre, reporte, subgrupos_csv, fila in _reportes(tareas, max_workers):
+            writer.writerow(fila)
+            if reporte is None:
+                continue
+            base = _nombre_archivo(nombre)
+            archivo, k = base, 2
+            while archivo in usados:
+                archivo, k = f"{base}_{k}", k + 1
+            usados.add(archivo)
+            zf.writestr(f"{archivo}.html", reporte)
+            zf.writestr(f"{archivo}_subgrupos.csv", subgrupos_csv)
+            yield salida.vaciar()
+
+        zf.writestr('resumen.csv', resumen.getvalue())
+    yield salida.vaciar()
+
+def _directorio_lote(lote):
+    if not re.fullmatch(r'[\w]+', lote or ''):
+        return None
+    return os.path.join(tempfile.gettempdir(), PREFIJO_LOTE + lote)
+
+def _vencido(directorio):
+    try:
+        return os.path.getmtime(directorio) < time.time() - VIGENCIA_LOTE_SEGUNDOS
+    except OSError:
+        return True
+
+def borrar_lotes_vencidos():
+    """Borra los lotes guardados hace más de VIGENCIA_LOTE_SEGUNDOS"""
+    directorio = tempfile.gettempdir()
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        if nombre.startswith(PREFIJO_LOTE) and os.path.isdir(ruta) and _vencido(ruta):
+            shutil.rmtree(ruta, ignore_errors=True)
+
+def guardar_lote(archivos):
+    """Guarda un iterable de (nombre, bytes) en un directorio temporal y devuelve su identificador"""
+    borrar_lotes_vencidos()
+    directorio = tempfile.mkdtemp(prefix=PREFIJO_LOTE)
+    for i, (nombre, datos) in enumerate(archivos):
+        # El índice conserva el orden y evita choques entre nombres repetidos
+        with open(os.path.join(directorio, f"{i:06d}_{os.path.basename(nombre)}"), 'wb') as f:
+            f.write(datos)
+    return os.path.basename(directorio)[len(PREFIJO_LOTE):]
+
+def leer_lote(lote):
+    """
+    Lista de (nombre, ruta) de los archivos de un lote guardado, o None si no existe
+    o ya venció. Cada archivo se lee recién en la tarea que lo renderiza.
+    """
+    directorio = _directorio_lote(lote)
+    if directorio is None or not os.path.isdir(directorio) or _vencido(directorio):
+        return None
+    return [(archivo.split('_', 1)[1], os.path.join(directorio, archivo)) for archivo in sorted(os.listdir(directorio))]
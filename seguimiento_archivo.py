@@ -0,0 +1,198 @@
+"""Seguimiento de archivos CSV a los que una máquina agrega un subgrupo por línea.
+
+En cada consulta se lee solo lo que se agregó desde el último desplazamiento
+conocido (hasta el último salto de línea completo), así que el costo depende de
+los datos nuevos y no del tamaño del archivo. Si el archivo se rota (cambia el
+inodo) o se trunca, se vuelve a leer desde el principio.
+
+El análisis también avanza por partes: `iniciar_monitor` analiza lo que el archivo
+tiene al empezar (fase base, que fija los límites) y `avanzar_monitor` evalúa solo
+los subgrupos nuevos contra esos límites y las reglas en línea (`reglas_en_linea`).
+"""
+import os
+import re
+import threading
+import numpy as np
+
+from reglas_en_linea import estado_tras_serie, evaluar_serie
+from spc_core import _desviaciones, analizar_subgrupos, estadisticas_por_fila, generar_recomendaciones
+
+DIRECTORIO_SEGUIMIENTO = os.environ.get('BRAINYSTATS_SEGUIMIENTO', 'datos_maquinas')
+
+# Archivos seguidos por este proceso; el archivo en disco es la fuente de verdad,
+# así que cada worker puede reconstruir su propia copia sin coordinarse
+_SEGUIDOS = {}
+# Un worker con hilos puede atender dos consultas a la vez: sin el bloqueo ambas
+# leerían desde el mismo desplazamiento y agregarían las mismas filas dos veces
+_bloqueo_seguidos = threading.Lock()
+
+def ruta_seguimiento(nombre, directorio=DIRECTORIO_SEGUIMIENTO):
+    """Ruta de un archivo dentro del directorio de seguimiento, o None si el nombre no es válido"""
+    nombre = (nombre or '').strip()
+    if not re.fullmatch(r'[\w\-. ]+', nombre) or nombre.strip('.') == '':
+        return None
+    return os.path.join(directorio, nombre)
+
+def crear_estado_archivo(ruta):
+    return {'ruta': ruta, 'inodo': None, 'desplazamiento': 0, 'pendiente': b''}
+
+def leer_lineas_nuevas(estado):
+    """
+    Líneas completas agregadas desde la última lectura (bytes, sin el salto de línea).
+    La línea que todavía no termina en '\\n' queda pendiente para la próxima consulta.
+    Devuelve (lineas, reiniciado), donde reiniciado indica rotación o truncamiento.
+    """
+    try:
+        info = os.stat(estado['ruta'])
+    except FileNotFoundError:
+        return [], False
+
+    reiniciado = False
+    if estado['inodo'] != info.st_ino or info.st_size < estado['desplazamiento']:
+        reiniciado = estado['inodo'] is not None
+        estado.update({'inodo': info.st_ino, 'desplazamiento': 0, 'pendiente': b''})
+    if info.st_size == estado['desplazamiento']:
+        return [], reiniciado
+
+    with open(estado['ruta'], 'rb') as f:
+        f.seek(estado['desplazamiento'])
+        datos = f.read(info.st_size - estado['desplazamiento'])
+    estado['desplazamiento'] += len(datos)
+
+    datos = estado['pendiente'] + datos
+    fin = datos.rfind(b'\n') + 1
+    estado['pendiente'] = datos[fin:]
+    return datos[:fin].splitlines(), reiniciado
+
+def lineas_a_subgrupos(lineas):
+    """Matriz de subgrupos a partir de líneas CSV; las líneas sin ningún número (encabezados) se omiten"""
+    filas = []
+    for linea in lineas:
+        fila = []
+        for campo in linea.decode('utf-8', errors='replace').split(','):
+            try:
+                fila.append(float(campo))
+            except ValueError:
+                fila.append(np.nan)
+        if not all(np.isnan(fila)):
+            filas.append(fila)
+    if not filas:
+        return np.empty((0, 0))
+    matriz = np.full((len(filas), max(len(f) for f in filas)), np.nan)
+    for i, fila in enumerate(filas):
+        matriz[i, :len(fila)] = fila
+    return matriz
+
+def _agregar_filas(seguido, nuevas):
+    """Copia las filas nuevas al búfer, que crece al doble para que agregar cueste O(nuevas)"""
+    buffer, filas = seguido['buffer'], seguido['filas']
+    alto = max(buffer.shape[0], 16)
+    while alto < filas + len(nuevas):
+        alto *= 2
+    ancho = max(buffer.shape[1], nuevas.shape[1])
+    if (alto, ancho) != buffer.shape:
+        ampliado = np.full((alto, ancho), np.nan)
+        ampliado[:filas, :buffer.shape[1]] = buffer[:filas]
+        buffer = seguido['buffer'] = ampliado
+    buffer[filas:filas + len(nuevas), :nuevas.shape[1]] = nuevas
+    seguido['filas'] = filas + len(nuevas)
+
+def seguir_archivo(ruta):
+    """
+    Lee lo nuevo de un archivo seguido y devuelve (subgrupos acumulados, versión).
+    La versión (inodo y bytes de líneas completas leídos) cambia cuando cambian los
+    subgrupos y coincide entre procesos; tras una rotación o truncamiento los
+    subgrupos se reinician con el contenido actual del archivo.
+    """
+    with _bloqueo_seguidos:
+        seguido = _SEGUIDOS.get(ruta)
+        if seguido is None:
+            seguido = _SEGUIDOS[ruta] = {'archivo': crear_estado_archivo(ruta), 'buffer': np.empty((0, 0)), 'filas': 0}
+
+        lineas, reiniciado = leer_lineas_nuevas(seguido['archivo'])
+        if reiniciado:
+            seguido.update({'buffer': np.empty((0, 0)), 'filas': 0})
+        nuevas = lineas_a_subgrupos(lineas)
+        if len(nuevas):
+            _agregar_filas(seguido, nuevas)
+        archivo = seguido['archivo']
+        version = f"{archivo['inodo']}:{archivo['desplazamiento'] - len(archivo['pendiente'])}"
+        # Las filas ya escritas no cambian: la vista sigue siendo válida aunque luego se agreguen más
+        return seguido['buffer'][:seguido['filas']], version
+
+def dejar_de_seguir(ruta):
+    with _bloqueo_seguidos:
+        _SEGUIDOS.pop(ruta, None)
+
+def _agregar_serie(monitor, nombre, valores):
+    """Agrega valores al final de una serie del resultado; el búfer crece al doble como en `_agregar_filas`"""
+    buffer, usados = monitor['buffers'][nombre], len(monitor['resultado'][nombre])
+    if usados + len(valores) > len(buffer):
+        ampliado = np.empty(max(2 * len(buffer), usados + len(valores), 16), dtype=buffer.dtype)
+        ampliado[:usados] = buffer[:usados]
+        buffer = monitor['buffers'][nombre] = ampliado
+    buffer[usados:usados + len(valores)] = valores
+    monitor['resultado'][nombre] = buffer[:usados + len(valores)]
+
+def iniciar_monitor(subgroups, chart_type='XR', USL=None, LSL=None, revisados=False, robustos=False):
+    """
+    Fase base del seguimiento: `analizar_subgrupos` sobre los subgrupos que ya tiene
+    el archivo. Devuelve el monitor (con el resultado en 'resultado'), o None si no
+    hay datos suficientes. Los límites, la capacidad y la distribución quedan los de
+    esta fase; `avanzar_monitor` solo agrega puntos.
+    """
+    resultado = analizar_subgrupos(subgroups, chart_type, USL, LSL, revisados=revisados, robustos=robustos)
+    if resultado is None:
+        return None
+    resultado['base_seguimiento'] = len(subgroups)
+    resultado['violaciones'] = list(resultado['violaciones'])
+    monitor = {
+        'resultado': resultado, 'filas': len(subgroups), 'bloqueo': threading.Lock(),
+        'reglas': estado_tras_serie(resultado['x'], resultado['CLx'], resultado['UCLx'], resultado['LCLx']),
+        'buffers': {nombre: resultado[nombre] for nombre in ('x', 'rs', 'x_pos', 'fuera_control_x', 'fuera_control_rs')}
+    }
+    return monitor
+
+def avanzar_monitor(monitor, subgroups):
+    """
+    Evalúa las filas de `subgroups` que el monitor todavía no vio (las del final)
+    contra los límites de la fase base. El costo depende solo de las filas nuevas.
+    Devuelve el número de puntos del gráfico X̄ (o I) y del R/S/MR antes de agregarlas.
+    """
+    resultado = monitor['resultado']
+    inicio_x, inicio_rs = len(resultado['x']), len(resultado['rs'])
+    nuevas = subgroups[monitor['filas']:]
+    if len(nuevas) == 0:
+        return inicio_x, inicio_rs
+    monitor['filas'] += len(nuevas)
+
+    imr = resultado['chart_type'] in ('IMR', 'ZMR')
+    if imr:
+        x = nuevas[~np.isnan(nuevas)]
+    else:
+        estadisticas = estadisticas_por_fila(nuevas)
+        x = estadisticas['media']
+        rs = (estadisticas['maximo'] - estadisticas['minimo'] if resultado['chart_type'] in ('XR', 'ZW')
+              else _desviaciones(estadisticas))
+    if 'resumen_partes' in resultado:
+        # Sin columna de parte todo el archivo es una sola parte (corrida corta): se
+        # estandariza con el objetivo y la dispersión de la fase base
+        objetivo, dispersion = resultado['resumen_partes']['objetivo'][0], resultado['resumen_partes']['dispersion'][0]
+        x = (x - objetivo) / dispersion
+        if not imr:
+            rs = rs / dispersion
+    if imr:
+        rs = np.abs(np.diff(np.concatenate((resultado['x'][-1:], x))))
+    _agregar_serie(monitor, 'x', x)
+    _agregar_serie(monitor, 'rs', rs)
+    _agregar_serie(monitor, 'x_pos', np.arange(inicio_x + 1, inicio_x + len(x) + 1))
+    resultado['x_rs'] = resultado['x_pos'][1:] if imr else resultado['x_pos']
+    _agregar_serie(monitor, 'fuera_control_x', inicio_x + np.flatnonzero((x > resultado['UCLx']) | (x < resultado['LCLx'])))
+    _agregar_serie(monitor, 'fuera_control_rs',
+                   inicio_rs + np.flatnonzero((rs > resultado['UCLrs']) | (rs < resultado['LCLrs'])))
+
+    resultado['num_fuera_control'] = len(resultado['fuera_control_x']) + len(resultado['fuera_control_rs'])
+    resultado['violaciones'] += evaluar_serie(monitor['reglas'], x)
+    resultado['recomendaciones'] = generar_recomendaciones(resultado['num_fuera_control'], resultado['violaciones'],
+                                                           resultado['capacidad'])
+    return inicio_x, inicio_rs
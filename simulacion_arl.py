@@ -0,0 +1,155 @@
+"""Simulación Monte Carlo de la longitud media de racha (ARL) y curvas OC.
+
+Se simulan miles de series a la vez en bloques (series × subgrupos) con el
+proceso en N(δ, 1) desde el primer subgrupo y límites con parámetros
+conocidos. Las reglas Western Electric se evalúan sobre cada bloque con sumas
+acumuladas, arrastrando los últimos 7 puntos del bloque anterior (la ventana
+más larga es la de 8 puntos), y solo las series que todavía no dan señal pasan
+al bloque siguiente. Los desplazamientos y lotes de series se reparten en el
+pool de procesos compartido de spc_core.
+"""
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
+from spc_core import CONTROL_CHART_CONSTANTS, _descartar_pool, _pool_compartido, constantes_para
+
+REGLAS = (1, 2, 3, 4, 5)
+DESPLAZAMIENTOS = (0.0, 0.5, 1.0, 1.5, 2.0, 3.0)
+SERIES_POR_DESPLAZAMIENTO = 20000
+# Puntos del bloque anterior que necesitan las ventanas de las reglas 2-5
+_HISTORIA = 7
+# Subgrupos simulados por serie y bloque
+_SUBGRUPOS_POR_BLOQUE = 64
+# Series por tarea del pool
+_SERIES_POR_TAREA = 5000
+# Las series sin señal se cortan aquí (racha censurada)
+MAX_SUBGRUPOS = 100_000
+
+def limites_teoricos(chart_type='XR', n=5):
+    """Límites de ambos gráficos para un proceso N(0, 1) con los parámetros conocidos"""
+    if chart_type == 'IMR' or n == 1:
+        constantes = CONTROL_CHART_CONSTANTS[2]
+        MR = constantes['d2']
+        return {'CLx': 0.0, 'UCLx': 3.0, 'LCLx': -3.0,
+                'UCLrs': constantes['D4'] * MR, 'LCLrs': constantes['D3'] * MR}
+    constantes = constantes_para(n)
+    if chart_type == 'XR':
+        R = constantes['d2']
+        return {'CLx': 0.0, 'UCLx': constantes['A2'] * R, 'LCLx': -constantes['A2'] * R,
+                'UCLrs': constantes['D4'] * R, 'LCLrs': constantes['D3'] * R}
+    S = constantes['c4']
+    return {'CLx': 0.0, 'UCLx': constantes['A3'] * S, 'LCLx': -constantes['A3'] * S,
+            'UCLrs': constantes['B4'] * S, 'LCLrs': constantes['B3'] * S}
+
+def _conteo_ventanas_filas(mascara, ancho):
+    """Aciertos de cada fila en la ventana de `ancho` puntos que termina en cada columna (0 si no está completa)"""
+    acumulado = np.cumsum(mascara, axis=1, dtype=np.int16)
+    conteo = acumulado.copy()
+    conteo[:, ancho:] -= acumulado[:, :-ancho]
+    conteo[:, :ancho - 1] = 0
+    return conteo
+
+def senales_bloque(x, rs, limites, reglas=REGLAS):
+    """
+    Puntos con señal de un bloque (series × puntos) de estadísticos X̄ (o X) y R/S/MR.
+    Las primeras columnas de `x` pueden ser historia del bloque anterior (NaN al inicio).
+    El gráfico R/S/MR siempre se evalúa con su regla 1.
+    """
+    CL, UCL, LCL = limites['CLx'], limites['UCLx'], limites['LCLx']
+    sigma_1 = (UCL - CL) / 3
+    senal = (rs > limites['UCLrs']) | (rs < limites['LCLrs'])
+    if 1 in reglas:
+        senal |= (x > UCL) | (x < LCL)
+    if 2 in reglas:
+        senal |= (_conteo_ventanas_filas(x > CL + 2 * sigma_1, 3) >= 2) | (_conteo_ventanas_filas(x < CL - 2 * sigma_1, 3) >= 2)
+    if 3 in reglas:
+        senal |= (_conteo_ventanas_filas(x > CL + sigma_1, 5) >= 4) | (_conteo_ventanas_filas(x < CL - sigma_1, 5) >= 4)
+    if 4 in reglas:
+        senal |= (_conteo_ventanas_filas(x > CL, 8) == 8) | (_conteo_ventanas_filas(x < CL, 8) == 8)
+    if 5 in reglas:
+        diferencias = np.diff(x, axis=1, prepend=np.nan)
+        senal |= (_conteo_ventanas_filas(diferencias > 0, 5) == 5) | (_conteo_ventanas_filas(diferencias < 0, 5) == 5)
+    return senal
+
+def simular_rachas(chart_type, n, desplazamiento, series, reglas=REGLAS, semilla=None, max_subgrupos=MAX_SUBGRUPOS):
+    """
+    Longitud de racha (subgrupos hasta la primera señal) de cada serie con la media
+    desplazada `desplazamiento` sigmas desde el primer subgrupo.
+    Las series sin señal en `max_subgrupos` quedan con ese valor (censuradas).
+    """
+    rng = np.random.default_rng(semilla)
+    individuales = chart_type == 'IMR' or n == 1
+    limites = limites_teoricos(chart_type, n)
+    rachas = np.full(series, max_subgrupos, dtype=np.int64)
+    activas = np.arange(series)
+    historia = np.full((series, _HISTORIA), np.nan)
+    recorridos = 0
+    while len(activas) and recorridos < max_subgrupos:
+        if individuales:
+            nuevos = rng.standard_normal((len(activas), _SUBGRUPOS_POR_BLOQUE)) + desplazamiento
+            x = np.concatenate((historia, nuevos), axis=1)
+            rs = np.abs(np.diff(x, axis=1, prepend=np.nan))
+        else:
+            datos = rng.standard_normal((len(activas), _SUBGRUPOS_POR_BLOQUE, n))
+            if chart_type == 'XR':
+                dispersion = datos.max(axis=2) - datos.min(axis=2)
+            else:
+                dispersion = datos.std(axis=2, ddof=1)
+            x = np.concatenate((historia, datos.mean(axis=2) + desplazamiento), axis=1)
+            rs = np.concatenate((np.full_like(historia, np.nan), dispersion), axis=1)
+        senal = senales_bloque(x, rs, limites, reglas)[:, _HISTORIA:]
+
+        con_senal = senal.any(axis=1)
+        rachas[activas[con_senal]] = recorridos + senal[con_senal].argmax(axis=1) + 1
+        activas = activas[~con_senal]
+        historia = x[~con_senal, -_HISTORIA:]
+        recorridos += _SUBGRUPOS_POR_BLOQUE
+    return rachas
+
+def _simular_tarea(tarea):
+    return simular_rachas(*tarea)
+
+def simular_arl(chart_type='XR', n=5, reglas=REGLAS, desplazamientos=DESPLAZAMIENTOS,
+                series=SERIES_POR_DESPLAZAMIENTO, semilla=None, max_workers=None, max_subgrupos=MAX_SUBGRUPOS):
+    """
+    ARL, su error estándar, la curva OC (probabilidad de no detectar el
+    desplazamiento en el primer subgrupo) y percentiles de la racha para cada
+    desplazamiento de la media (en sigmas de las observaciones individuales).
+    Con una sola tarea o `max_workers=1` se simula en el mismo proceso.
+    """
+    if chart_type == 'IMR':
+        n = 1
+    reglas = tuple(sorted(set(reglas)))
+    lotes = [min(_SERIES_POR_TAREA, series - i) for i in range(0, series, _SERIES_POR_TAREA)]
+    semillas = iter(np.random.SeedSequence(semilla).spawn(len(desplazamientos) * len(lotes)))
+    tareas = [(chart_type, n, float(d), lote, reglas, next(semillas), max_subgrupos)
+              for d in desplazamientos for lote in lotes]
+
+    resultados = None
+    if len(tareas) > 1 and max_workers != 1:
+        pool = _pool_compartido()
+        try:
+            resultados = list(pool.map(_simular_tarea, tareas))
+        except BrokenProcessPool:
+            # Cada tarea tiene su semilla: repetirlas aquí da las mismas rachas
+            _descartar_pool(pool)
+    if resultados is None:
+        resultados = list(map(_simular_tarea, tareas))
+
+    por_desplazamiento = [np.concatenate(resultados[i * len(lotes):(i + 1) * len(lotes)])
+                          for i in range(len(desplazamientos))]
+    return {
+        'chart_type': chart_type,
+        'n': n,
+        'reglas': reglas,
+        'series': series,
+        'desplazamientos': np.asarray(desplazamientos, dtype=float),
+        'arl': np.array([r.mean() for r in por_desplazamiento]),
+        'error_estandar': np.array([r.std(ddof=1) / np.sqrt(len(r)) for r in por_desplazamiento]),
+        'oc': np.array([np.mean(r > 1) for r in por_desplazamiento]),
+        'mediana': np.array([np.median(r) for r in por_desplazamiento]),
+        'percentil_90': np.array([np.percentile(r, 90) for r in por_desplazamiento]),
+        'max_subgrupos': max_subgrupos,
+        'censuradas': np.array([int(np.sum(r >= max_subgrupos)) for r in por_desplazamiento]),
+        'subgrupos_simulados': int(sum(r.sum() for r in por_desplazamiento)),
+    }
@@ -0,0 +1,60 @@
+"""Solicitudes de recálculo automático por sesión del navegador.
+
+Con el modo automático cada cambio de parámetros (ya filtrado por el debounce
+de los campos) recibe un número creciente que se registra como el vigente de
+la sesión antes de que empiece el análisis. El análisis consulta el registro
+entre etapas y abandona si llegó un número mayor, así que una solicitud vieja
+deja de usar CPU en cuanto termina la etapa en curso. El registro es un
+archivo por sesión en el directorio temporal para que lo vean todos los
+workers de gunicorn.
+"""
+import os
+import re
+import tempfile
+import time
+
+PREFIJO_SOLICITUD = 'spc_solicitud_'
+# Los registros de sesiones sin actividad se borran después de este tiempo
+VIGENCIA_REGISTRO_SEGUNDOS = 24 * 3600
+
+def _ruta(sesion):
+    if not re.fullmatch(r'\w+', sesion or ''):
+        return None
+    return os.path.join(tempfile.gettempdir(), PREFIJO_SOLICITUD + sesion)
+
+def _limpiar_registros():
+    limite = time.time() - VIGENCIA_REGISTRO_SEGUNDOS
+    directorio = tempfile.gettempdir()
+    for archivo in os.listdir(directorio):
+        if archivo.startswith(PREFIJO_SOLICITUD):
+            try:
+                if os.path.getmtime(os.path.join(directorio, archivo)) < limite:
+                    os.remove(os.path.join(directorio, archivo))
+            except OSError:
+                pass
+
+def registrar_solicitud(sesion, numero):
+    """Marca `numero` como la última solicitud de la sesión"""
+    ruta = _ruta(sesion)
+    if ruta is None:
+        return
+    if numero == 1:
+        _limpiar_registros()
+    temporal = f"{ruta}.{os.getpid()}"
+    with open(temporal, 'w') as f:
+        f.write(str(numero))
+    os.replace(temporal, ruta)
+
+def solicitud_vigente(solicitud):
+    """
+    False si después de `solicitud` ({'sesion', 'numero'}) se registró otra más
+    nueva de la misma sesión. Sin solicitud (análisis manual) siempre es vigente.
+    """
+    if not solicitud:
+        return True
+    ruta = _ruta(solicitud.get('sesion'))
+    try:
+        with open(ruta) as f:
+            return int(f.read() or 0) <= solicitud['numero']
+    except (OSError, TypeError, ValueError):
+        return True
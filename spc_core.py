@@ -0,0 +1,983 @@
+"""Núcleo estadístico de BrainyStats: límites de control, capacidad y reglas.
+
+Solo depende de NumPy para que los workers y los procesos por lotes lo
+importen rápido; pandas se importa de forma diferida al leer archivos.
+"""
+import base64
+import io
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from statistics import NormalDist
+import numpy as np
+
+from autocorrelacion import diagnostico_autocorrelacion
+
+# 📊 Constantes de gráficos de control
+CONTROL_CHART_CONSTANTS = {
+    2: {'A2': 1.880, 'D3': 0, 'D4': 3.267, 'd2': 1.128, 'A3': 2.659, 'B3': 0, 'B4': 3.267, 'c4': 0.7979},
+    3: {'A2': 1.023, 'D3': 0, 'D4': 2.574, 'd2': 1.693, 'A3': 1.954, 'B3': 0, 'B4': 2.568, 'c4': 0.8862},
+    4: {'A2': 0.729, 'D3': 0, 'D4': 2.282, 'd2': 2.059, 'A3': 1.628, 'B3': 0, 'B4': 2.266, 'c4': 0.9213},
+    5: {'A2': 0.577, 'D3': 0, 'D4': 2.114, 'd2': 2.326, 'A3': 1.427, 'B3': 0, 'B4': 2.089, 'c4': 0.9400},
+    6: {'A2': 0.483, 'D3': 0, 'D4': 2.004, 'd2': 2.534, 'A3': 1.287, 'B3': 0.030, 'B4': 1.970, 'c4': 0.9515},
+    7: {'A2': 0.419, 'D3': 0.076, 'D4': 1.924, 'd2': 2.704, 'A3': 1.182, 'B3': 0.118, 'B4': 1.882, 'c4': 0.9594},
+    8: {'A2': 0.373, 'D3': 0.136, 'D4': 1.864, 'd2': 2.847, 'A3': 1.099, 'B3': 0.185, 'B4': 1.815, 'c4': 0.9650},
+    9: {'A2': 0.337, 'D3': 0.184, 'D4': 1.816, 'd2': 2.970, 'A3': 1.032, 'B3': 0.239, 'B4': 1.761, 'c4': 0.9693},
+    10: {'A2': 0.308, 'D3': 0.223, 'D4': 1.777, 'd2': 3.078, 'A3': 0.975, 'B3': 0.284, 'B4': 1.716, 'c4': 0.9727},
+    11: {'A2': 0.285, 'D3': 0.256, 'D4': 1.744, 'd2': 3.173, 'A3': 0.927, 'B3': 0.321, 'B4': 1.679, 'c4': 0.9754},
+    12: {'A2': 0.266, 'D3': 0.283, 'D4': 1.717, 'd2': 3.258, 'A3': 0.886, 'B3': 0.354, 'B4': 1.646, 'c4': 0.9776},
+    15: {'A2': 0.223, 'D3': 0.348, 'D4': 1.652, 'd2': 3.472, 'A3': 0.789, 'B3': 0.428, 'B4': 1.572, 'c4': 0.9823},
+    20: {'A2': 0.180, 'D3': 0.414, 'D4': 1.586, 'd2': 3.735, 'A3': 0.680, 'B3': 0.510, 'B4': 1.490, 'c4': 0.9869},
+    25: {'A2': 0.153, 'D3': 0.459, 'D4': 1.541, 'd2': 3.931, 'A3': 0.606, 'B3': 0.565, 'B4': 1.435, 'c4': 0.9896}
+}
+
+# Con BRAINYSTATS_FLOAT32=1 los subgrupos se guardan en float32 (la mitad de memoria)
+DTYPE_SUBGRUPOS = np.float32 if os.environ.get('BRAINYSTATS_FLOAT32') else np.float64
+
+# Filas por bloque en `estadisticas_por_fila`: el bloque cabe en caché mientras se recorren sus columnas
+_FILAS_POR_BLOQUE = 16384
+
+def estadisticas_por_fila(subgroups):
+    """
+    n, media, mínimo, máximo y suma de cuadrados centrada (m2) de cada fila, ignorando NaN.
+    Recorre la matriz una sola vez, por bloques de filas y columna a columna (Welford),
+    acumulando en float64 sin crear copias del tamaño de la matriz.
+    """
+    filas = subgroups.shape[0]
+    n = np.zeros(filas, dtype=np.int64)
+    media = np.zeros(filas)
+    m2 = np.zeros(filas)
+    minimo = np.full(filas, np.nan)
+    maximo = np.full(filas, np.nan)
+
+    for inicio in range(0, filas, _FILAS_POR_BLOQUE):
+        bloque = slice(inicio, inicio + _FILAS_POR_BLOQUE)
+        n_b, media_b, m2_b = n[bloque], media[bloque], m2[bloque]
+        for columna in subgroups[bloque].T:
+            valores = columna.astype(np.float64)
+            validos = ~np.isnan(valores)
+            n_b += validos
+            delta = np.where(validos, valores - media_b, 0.0)
+            media_b += delta / np.maximum(n_b, 1)
+            m2_b += np.where(validos, delta * (valores - media_b), 0.0)
+            np.fmin(minimo[bloque], valores, out=minimo[bloque])
+            np.fmax(maximo[bloque], valores, out=maximo[bloque])
+
+    media[n == 0] = np.nan
+    return {'n': n, 'media': media, 'minimo': minimo, 'maximo': maximo, 'm2': m2}
+
+def _desviaciones(estadisticas):
+    """Desviación estándar muestral (ddof=1) por fila; NaN si la fila tiene menos de 2 valores"""
+    n = estadisticas['n']
+    # Un solo arreglo del tamaño de las filas: n - 1, luego m2 / (n - 1) y su raíz en el lugar
+    desviaciones = n.astype(float)
+    desviaciones -= 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        np.divide(estadisticas['m2'], desviaciones, out=desviaciones)
+    np.sqrt(desviaciones, out=desviaciones)
+    desviaciones[n < 2] = np.nan
+    return desviaciones
+
+def _promedio_s(desviaciones, estadisticas):
+    """S̄ de las filas con al menos 2 valores (como np.nanmean, sin copiar el arreglo)"""
+    con_s = estadisticas['n'] > 1
+    return np.sum(desviaciones, where=con_s) / con_s.sum()
+
+def _beta_regularizada(a, b, x):
+    """Función beta incompleta regularizada I_x(a, b) (fracción continua de Lentz)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - _beta_regularizada(b, a, 1 - x)
+    ln_frente = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    pequeno = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > pequeno else pequeno)
+    f = d
+    for m in range(1, 300):
+        for numerador in (m * (b - m) * x / ((a + 2*m - 1) * (a + 2*m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2*m) * (a + 2*m + 1))):
+            d = 1.0 + numerador * d
+            d = 1.0 / (d if abs(d) > pequeno else pequeno)
+            c = 1.0 + numerador / c
+            c = c if abs(c) > pequeno else pequeno
+            f *= c * d
+        if abs(c * d - 1.0) < 1e-14:
+            break
+    return math.exp(ln_frente) * f / a
+
+def probabilidad_f(valor, gl1, gl2):
+    """P(F > valor) para una F con (gl1, gl2) grados de libertad (valor p de un ANOVA)"""
+    if not valor > 0:
+        return 1.0
+    return _beta_regularizada(gl2 / 2, gl1 / 2, gl2 / (gl2 + gl1 * valor))
+
+def cuantil_f(alfa, gl1, gl2):
+    """Valor f con P(F > f) = alfa para una F con (gl1, gl2) grados de libertad (bisección)"""
+    # P(F > f) = I_x(gl2/2, gl1/2) con x = gl2 / (gl2 + gl1 f), creciente en x
+    bajo, alto = 0.0, 1.0
+    for _ in range(200):
+        medio = (bajo + alto) / 2
+        if _beta_regularizada(gl2 / 2, gl1 / 2, medio) < alfa:
+            bajo = medio
+        else:
+            alto = medio
+        if alto - bajo < 1e-15:
+            break
+    x = (bajo + alto) / 2
+    return gl2 * (1 - x) / (gl1 * x)
+
+def constantes_para(n):
+    """Constantes de la tabla para n, o las del tamaño tabulado más cercano"""
+    if n not in CONTROL_CHART_CONSTANTS:
+        n_keys = sorted(CONTROL_CHART_CONSTANTS.keys())
+        n = min(n_keys, key=lambda x: abs(x - n))
+    return CONTROL_CHART_CONSTANTS[n]
+
+def parse_contents(contents, filename):
+    if contents is None:
+        return None
+    content_type, content_string = contents.split(',')
+    return leer_archivo(base64.b64decode(content_string), filename)
+
+def leer_archivo(decoded, filename):
+    """DataFrame sin encabezados a partir de los bytes de un CSV o Excel"""
+    import pandas as pd
+
+    try:
+        if 'csv' in filename.lower():
+            df = pd.read_csv(io.BytesIO(decoded), header=None)
+        elif 'xls' in filename.lower():
+            df = pd.read_excel(io.BytesIO(decoded), header=None)
+        else:
+            return None
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+    return df
+
+def a_subgrupos(df, dtype=None, con_estadisticas=False):
+    """
+    Matriz de subgrupos (filas) sin las filas completamente vacías.
+    dtype: tipo de almacenamiento (por defecto DTYPE_SUBGRUPOS); los estadísticos
+    se acumulan siempre en float64.
+    con_estadisticas: devuelve (subgrupos, estadisticas_por_fila) para pasarlas a
+    `analizar_subgrupos` sin volver a recorrer la matriz.
+    """
+    subgroups = df.to_numpy(dtype=dtype or DTYPE_SUBGRUPOS)
+    estadisticas = estadisticas_por_fila(subgroups)
+    vacias = estadisticas['n'] == 0
+    # Solo se copia la matriz si de verdad hay filas vacías
+    if vacias.any():
+        subgroups = subgroups[~vacias]
+        estadisticas = {k: v[~vacias] for k, v in estadisticas.items()}
+    return (subgroups, estadisticas) if con_estadisticas else subgroups
+
+def filas_a_subgrupos(filas):
+    """Matriz de subgrupos a partir de las filas de la tabla manual"""
+    columnas = [k for k in filas[0].keys() if k != 'Subgrupo'] if filas else []
+    subgroups = np.array([[np.nan if fila.get(k) in (None, '') else fila.get(k) for k in columnas]
+                          for fila in filas], dtype=float).reshape(len(filas), len(columnas))
+    return subgroups[~np.isnan(subgroups).all(axis=1)]
+
+def _conteo_ventanas(mascara, ancho):
+    """Número de aciertos de `mascara` en cada ventana completa de `ancho` puntos"""
+    if len(mascara) < ancho:
+        return np.zeros(0, dtype=np.int8)
+    # Con ventanas cortas (a lo sumo 8) sumar las máscaras desplazadas en int8 ocupa
+    # un byte por punto, en lugar de las sumas acumuladas en int64
+    total = len(mascara) - ancho + 1
+    conteo = mascara[:total].astype(np.int8)
+    for desplazamiento in range(1, ancho):
+        conteo += mascara[desplazamiento:desplazamiento + total]
+    return conteo
+
+def detectar_patrones_western_electric(datos, UCL, LCL, CL):
+    """Detecta patrones Western Electric (Reglas 1-5)
+
+    Las ventanas se evalúan con sumas de máscaras desplazadas, así que el costo es
+    lineal en la longitud de la serie y sirve para historiales largos de individuales.
+    Cada regla reutiliza `superior`/`inferior` para que sus máscaras no se acumulen.
+    """
+    datos = np.asarray(datos, dtype=float)
+    violaciones = []
+    
+    sigma_1 = (UCL - CL) / 3
+    limite_2sigma_superior = CL + 2 * sigma_1
+    limite_2sigma_inferior = CL - 2 * sigma_1
+    limite_1sigma_superior = CL + sigma_1
+    limite_1sigma_inferior = CL - sigma_1
+    
+    # Regla 1: Un punto fuera de 3σ
+    for i in np.flatnonzero((datos > UCL) | (datos < LCL)):
+        violaciones.append(f"Regla 1: Punto {i+1} fuera de límites (3σ) - Valor: {datos[i]:.4f}")
+    
+    # Regla 2: 2 de 3 puntos fuera de 2σ
+    superior = _conteo_ventanas(datos > limite_2sigma_superior, 3) >= 2
+    inferior = _conteo_ventanas(datos < limite_2sigma_inferior, 3) >= 2
+    for i in np.flatnonzero(superior | inferior):
+        if superior[i]:
+            violaciones.append(f"Regla 2: Puntos {i+1}-{i+3} - 2/3 fuera de 2σ (superior)")
+        if inferior[i]:
+            violaciones.append(f"Regla 2: Puntos {i+1}-{i+3} - 2/3 fuera de 2σ (inferior)")
+    
+    # Regla 3: 4 de 5 puntos fuera de 1σ
+    superior = _conteo_ventanas(datos > limite_1sigma_superior, 5) >= 4
+    inferior = _conteo_ventanas(datos < limite_1sigma_inferior, 5) >= 4
+    for i in np.flatnonzero(superior | inferior):
+        if superior[i]:
+            violaciones.append(f"Regla 3: Puntos {i+1}-{i+5} - 4/5 fuera de 1σ (superior)")
+        if inferior[i]:
+            violaciones.append(f"Regla 3: Puntos {i+1}-{i+5} - 4/5 fuera de 1σ (inferior)")
+    
+    # Regla 4: 8 puntos consecutivos en un lado
+    superior = _conteo_ventanas(datos > CL, 8) == 8
+    inferior = _conteo_ventanas(datos < CL, 8) == 8
+    for i in np.flatnonzero(superior | inferior):
+        if superior[i]:
+            violaciones.append(f"Regla 4: Puntos {i+1}-{i+8} - 8 consecutivos arriba de CL")
+        else:
+            violaciones.append(f"Regla 4: Puntos {i+1}-{i+8} - 8 consecutivos debajo de CL")
+    
+    # Regla 5: 6 puntos en tendencia
+    superior = _conteo_ventanas(datos[1:] > datos[:-1], 5) == 5
+    inferior = _conteo_ventanas(datos[1:] < datos[:-1], 5) == 5
+    for i in np.flatnonzero(superior | inferior):
+        if superior[i]:
+            violaciones.append(f"Regla 5: Puntos {i+1}-{i+6} - Tendencia ascendente continua")
+        else:
+            violaciones.append(f"Regla 5: Puntos {i+1}-{i+6} - Tendencia descendente continua")
+    
+    return violaciones
+
+def reglas_por_punto(datos, UCL, LCL, CL):
+    """
+    Máscara de cada regla Western Electric (1-5) por punto: True en el último
+    punto de cada ventana que cumple la regla (en cualquiera de los dos lados).
+    """
+    datos = np.asarray(datos, dtype=float)
+    sigma_1 = (UCL - CL) / 3
+
+    def al_final(conteo, desfase):
+        mascara = np.zeros(len(datos), dtype=bool)
+        mascara[desfase:desfase + len(conteo)] = conteo
+        return mascara
+
+    diferencias = np.diff(datos)
+    return {
+        1: (datos > UCL) | (datos < LCL),
+        2: al_final((_conteo_ventanas(datos > CL + 2 * sigma_1, 3) >= 2) | (_conteo_ventanas(datos < CL - 2 * sigma_1, 3) >= 2), 2),
+        3: al_final((_conteo_ventanas(datos > CL + sigma_1, 5) >= 4) | (_conteo_ventanas(datos < CL - sigma_1, 5) >= 4), 4),
+        4: al_final((_conteo_ventanas(datos > CL, 8) == 8) | (_conteo_ventanas(datos < CL, 8) == 8), 7),
+        5: al_final((_conteo_ventanas(diferencias > 0, 5) == 5) | (_conteo_ventanas(diferencias < 0, 5) == 5), 5),
+    }
+
+def _sin_nan(valores):
+    """`valores` sin los NaN; el mismo arreglo (sin copia) si no tiene ninguno"""
+    validos = ~np.isnan(valores)
+    return valores if validos.all() else valores[validos]
+
+def calcular_limites_imr(valores):
+    """Límites del gráfico I-MR (individuales y rango móvil de 2 observaciones)"""
+    valores = np.asarray(valores, dtype=float)
+    rangos_moviles = np.diff(valores)
+    np.abs(rangos_moviles, out=rangos_moviles)
+    constantes = CONTROL_CHART_CONSTANTS[2]
+    
+    CL = np.mean(valores)
+    CLmr = np.mean(rangos_moviles)
+    sigma = CLmr / constantes['d2']
+    
+    return {
+        'rangos_moviles': rangos_moviles,
+        'sigma': sigma,
+        'CL': CL,
+        'UCL': CL + 3 * sigma,
+        'LCL': CL - 3 * sigma,
+        'CLmr': CLmr,
+        'UCLmr': constantes['D4'] * CLmr,
+        'LCLmr': constantes['D3'] * CLmr
+    }
+
+def calcular_limites_control(subgroups, chart_type='XR', estadisticas=None):
+    """
+    Estadísticos por subgrupo y límites de los dos gráficos de control.
+    - 'x': medias (o individuales en I-MR) con CL/UCL/LCL
+    - 'rs': rangos, desviaciones o rangos móviles con CL/UCL/LCL
+    Devuelve None si no hay datos suficientes.
+    estadisticas: resultado ya calculado de `estadisticas_por_fila`, si se tiene.
+    """
+    if subgroups.shape[1] == 1:
+        chart_type = 'IMR'
+
+    if chart_type == 'IMR':
+        # Individuales: se toman las lecturas en orden, sin agrupar en subgrupos (sin
+        # copiarlas si no hay NaN que quitar)
+        valores = _sin_nan(subgroups.ravel())
+        if len(valores) < 2:
+            return None
+        limites = calcular_limites_imr(valores)
+        return {
+            'chart_type': 'IMR',
+            'n': 1,
+            'x': valores,
+            'CLx': limites['CL'], 'UCLx': limites['UCL'], 'LCLx': limites['LCL'],
+            'rs': limites['rangos_moviles'],
+            'CLrs': limites['CLmr'], 'UCLrs': limites['UCLmr'], 'LCLrs': limites['LCLmr']
+        }
+
+    # Los subgrupos incompletos vienen rellenos con NaN
+    if estadisticas is None:
+        estadisticas = estadisticas_por_fila(subgroups)
+    means = estadisticas['media']
+    n = subgroups.shape[1]
+
+    CLx = np.mean(means)
+    if chart_type == 'XR':
+        valores_rs = estadisticas['maximo'] - estadisticas['minimo']
+        CLrs = np.mean(valores_rs)
+    else:
+        valores_rs = _desviaciones(estadisticas)
+        CLrs = _promedio_s(valores_rs, estadisticas)
+
+    return {
+        'chart_type': chart_type,
+        'n': n,
+        'x': means,
+        'rs': valores_rs,
+        **_limites_desde_centrales(chart_type, n, CLx, CLrs)
+    }
+
+def _limites_desde_centrales(chart_type, n, CLx, CLrs):
+    """UCL/LCL de ambos gráficos a partir de X̄̄ (o X̄) y de R̄, S̄ o MR̄"""
+    if chart_type == 'IMR':
+        constants = CONTROL_CHART_CONSTANTS[2]
+        sigma = CLrs / constants['d2']
+        return {'CLx': CLx, 'UCLx': CLx + 3 * sigma, 'LCLx': CLx - 3 * sigma,
+                'CLrs': CLrs, 'UCLrs': constants['D4'] * CLrs, 'LCLrs': constants['D3'] * CLrs}
+
+    constants = constantes_para(n)
+    if chart_type == 'XR':
+        A, D3, D4 = constants['A2'], constants['D3'], constants['D4']
+    else:
+        A, D3, D4 = constants['A3'], constants['B3'], constants['B4']
+    return {'CLx': CLx, 'UCLx': CLx + A * CLrs, 'LCLx': CLx - A * CLrs,
+            'CLrs': CLrs, 'UCLrs': D4 * CLrs, 'LCLrs': D3 * CLrs}
+
+def calcular_limites_revisados(subgroups, chart_type='XR', max_iteraciones=25, estadisticas=None):
+    """
+    Límites revisados de Fase I: excluye los puntos fuera de control y recalcula
+    hasta que no quede ninguno (o se alcance `max_iteraciones`).
+    Las sumas de X̄ y de R/S/MR se mantienen como totales acumulados a los que se
+    restan los puntos excluidos en cada ronda, sin recalcular desde cero.
+    Agrega al resultado de `calcular_limites_control`:
+    - excluidos_x / excluidos_rs: índices excluidos en cada gráfico
+    - iteraciones: límites y puntos excluidos (1-based) de cada ronda
+    """
+    resultado = calcular_limites_control(subgroups, chart_type, estadisticas)
+    if resultado is None:
+        return None
+    chart_type, n = resultado['chart_type'], resultado['n']
+    x, rs = resultado['x'], resultado['rs']
+    imr = chart_type == 'IMR'
+
+    activos_x = np.ones(len(x), dtype=bool)
+    # Una S de un subgrupo con una sola lectura es NaN y no cuenta en S̄
+    activos_rs = ~np.isnan(rs)
+    suma_x, suma_rs = x.sum(), rs[activos_rs].sum()
+    cuenta_x, cuenta_rs = len(x), int(activos_rs.sum())
+
+    iteraciones = []
+    for iteracion in range(1, max_iteraciones + 1):
+        limites = _limites_desde_centrales(chart_type, n, suma_x / cuenta_x, suma_rs / cuenta_rs)
+        fuera_rs = activos_rs & ((rs > limites['UCLrs']) | (rs < limites['LCLrs']))
+        nuevos = activos_x & ((x > limites['UCLx']) | (x < limites['LCLx']))
+        # El rango móvil i compara las observaciones i e i+1: se atribuye a la segunda
+        if imr:
+            # ...salvo que una de las dos ya quede excluida por su valor individual
+            explicado = nuevos[:-1] | nuevos[1:]
+            nuevos[1:] |= activos_x[1:] & fuera_rs & ~explicado
+        else:
+            nuevos |= activos_x & fuera_rs
+        if imr:
+            quitar_rs = activos_rs & (nuevos[:-1] | nuevos[1:])
+        else:
+            quitar_rs = activos_rs & nuevos
+
+        # Se detiene si ya no hay puntos fuera o si excluirlos dejaría el gráfico sin datos
+        if not nuevos.any() or cuenta_x - nuevos.sum() < 2 or cuenta_rs - quitar_rs.sum() < 1:
+            iteraciones.append({'iteracion': iteracion, **limites, 'excluidos': []})
+            break
+        iteraciones.append({'iteracion': iteracion, **limites,
+                            'excluidos': (np.flatnonzero(nuevos) + 1).tolist()})
+
+        activos_x &= ~nuevos
+        suma_x -= x[nuevos].sum()
+        cuenta_x -= int(nuevos.sum())
+        activos_rs &= ~quitar_rs
+        suma_rs -= rs[quitar_rs].sum()
+        cuenta_rs -= int(quitar_rs.sum())
+    else:
+        limites = _limites_desde_centrales(chart_type, n, suma_x / cuenta_x, suma_rs / cuenta_rs)
+
+    resultado.update(limites)
+    resultado.update({
+        'excluidos_x': np.flatnonzero(~activos_x),
+        'excluidos_rs': np.flatnonzero(~activos_rs & ~np.isnan(rs)),
+        'iteraciones': iteraciones
+    })
+    return resultado
+
+def _mediana(valores):
+    """
+    Mediana ignorando NaN. Solo se copian los valores válidos y la mediana se
+    toma con selección parcial (`np.partition`, O(n)) en lugar de ordenar.
+    """
+    valores = np.asarray(valores, dtype=float)
+    valores = valores[~np.isnan(valores)]
+    k = len(valores)
+    if k == 0:
+        return np.nan
+    medio = np.partition(valores, [(k - 1) // 2, k // 2])
+    return (medio[(k - 1) // 2] + medio[k // 2]) / 2
+
+def _biseccion(funcion, objetivo, bajo, alto, iteraciones=60):
+    """Raíz de funcion(x) = objetivo para una función creciente en [bajo, alto]"""
+    for _ in range(iteraciones):
+        medio = (bajo + alto) / 2
+        if funcion(medio) < objetivo:
+            bajo = medio
+        else:
+            alto = medio
+    return (bajo + alto) / 2
+
+@lru_cache(maxsize=None)
+def mediana_rango_relativo(n):
+    """Mediana de R/σ en subgrupos normales de tamaño n (0.954 para el rango móvil, n = 2)"""
+    x = np.linspace(-8, 8, 4001)
+    anchos = np.diff(x)
+    densidad = np.exp(-x ** 2 / 2) / math.sqrt(2 * math.pi)
+    acumulada = 1 - cola_normal(x)
+
+    def distribucion(w):
+        # P(R <= w) = n ∫ φ(x) [Φ(x + w) - Φ(x)]^(n-1) dx, por trapecios (np.trapezoid exige NumPy 2)
+        y = densidad * (1 - cola_normal(x + w) - acumulada) ** (n - 1)
+        return n * ((y[1:] + y[:-1]) * anchos).sum() / 2
+
+    return _biseccion(distribucion, 0.5, 0.0, 10.0)
+
+@lru_cache(maxsize=None)
+def mediana_s_relativa(n):
+    """Mediana de S/σ en subgrupos normales de tamaño n, con (n-1)S²/σ² ~ χ²(n-1)"""
+    a = (n - 1) / 2
+
+    def chi2(q):
+        # Gamma incompleta inferior regularizada P(a, q/2) por su serie
+        x = q / 2
+        termino = suma = 1 / a
+        for k in range(1, 500):
+            termino *= x / (a + k)
+            suma += termino
+            if termino < suma * 1e-15:
+                break
+        return suma * math.exp(a * math.log(x) - x - math.lgamma(a))
+
+    return math.sqrt(_biseccion(chi2, 0.5, 1e-12, 4 * n + 20) / (n - 1))
+
+def calcular_limites_robustos(subgroups, chart_type='XR', estadisticas=None):
+    """
+    Límites con medianas de los estadísticos por subgrupo en lugar de promedios,
+    para que unos pocos valores extremos no corran el centro ni ensanchen los límites:
+    - centro: mediana de X̄ (o de las lecturas en I-MR)
+    - sigma: mediana de R, S o MR divididos por su mediana para σ = 1 y el tamaño
+      real de cada subgrupo (la misma idea que el 1.4826 de la MAD), así los
+      subgrupos incompletos no la sesgan; los límites salen de R̄ = d2·σ o S̄ = c4·σ
+    Agrega al resultado de `calcular_limites_control`:
+    - limites_clasicos: los límites con promedios, para comparar
+    - sigma_robusta / sigma_clasica: sigma de las lecturas con cada estimación
+    - dispersion_x: desviación estándar de los puntos X̄ (o X) y su versión robusta 1.4826·MAD
+    """
+    if estadisticas is None and subgroups.shape[1] > 1 and chart_type != 'IMR':
+        estadisticas = estadisticas_por_fila(subgroups)
+    resultado = calcular_limites_control(subgroups, chart_type, estadisticas)
+    if resultado is None:
+        return None
+    chart_type, n = resultado['chart_type'], resultado['n']
+    x, rs = resultado['x'], resultado['rs']
+    clasicos = {k: resultado[k] for k in ('CLx', 'UCLx', 'LCLx', 'CLrs', 'UCLrs', 'LCLrs')}
+
+    if chart_type == 'IMR':
+        d2 = CONTROL_CHART_CONSTANTS[2]['d2']
+        sigma_clasica = resultado['CLrs'] / d2
+        sigma = _mediana(rs) / mediana_rango_relativo(2)
+        CLrs = d2 * sigma
+    else:
+        # Mediana de R o S para σ = 1 según las lecturas válidas de cada subgrupo (NaN con menos de 2)
+        relativa = mediana_s_relativa if chart_type == 'XS' else mediana_rango_relativo
+        medianas = np.array([np.nan, np.nan] + [relativa(k) for k in range(2, n + 1)])
+        sigma = _mediana(rs / medianas[estadisticas['n']])
+        constante = constantes_para(n)['c4' if chart_type == 'XS' else 'd2']
+        sigma_clasica = resultado['CLrs'] / constante
+        CLrs = constante * sigma
+
+    CLx = _mediana(x)
+    resultado.update(_limites_desde_centrales(chart_type, n, CLx, CLrs))
+    resultado.update({
+        'limites_clasicos': clasicos,
+        'sigma_robusta': sigma,
+        'sigma_clasica': sigma_clasica,
+        'dispersion_x': {'clasica': float(np.nanstd(x, ddof=1)), 'robusta': 1.4826 * _mediana(np.abs(x - CLx))}
+    })
+    return resultado
+
+def analizar_capacidad(subgroups, UCL, LCL, USL=None, LSL=None, chart_type='XR', estadisticas=None):
+    """
+    Calcula índices Cp, Cpk, Pp, Ppk
+    - Cp/Cpk: Capacidad potencial/real (usa sigma estimada de subgrupos)
+    - Pp/Ppk: Performance (usa desviación estándar total)
+    """
+    if chart_type == 'IMR':
+        # Individuales: sigma estimada con el rango móvil promedio (MR̄/d2)
+        todos_datos = _sin_nan(np.asarray(subgroups, dtype=float).ravel())
+        media_proceso = np.mean(todos_datos)
+        sigma_within = calcular_limites_imr(todos_datos)['sigma']
+        sigma_total = np.std(todos_datos, ddof=1)
+        return _indices_capacidad(media_proceso, sigma_within, sigma_total, UCL, LCL, USL, LSL)
+
+    if estadisticas is None:
+        estadisticas = estadisticas_por_fila(subgroups)
+    medias = estadisticas['media']
+    media_proceso = np.mean(medias)
+    
+    # Sigma estimada (dentro de subgrupos) para Cp/Cpk
+    if chart_type == 'XR':
+        # R̄ como diferencia de promedios: no crea el arreglo de rangos
+        d2 = constantes_para(subgroups.shape[1])['d2']
+        sigma_within = (np.mean(estadisticas['maximo']) - np.mean(estadisticas['minimo'])) / d2
+    else:
+        c4 = constantes_para(subgroups.shape[1])['c4']
+        sigma_within = _promedio_s(_desviaciones(estadisticas), estadisticas) / c4
+    
+    # Sigma total (todas las observaciones) para Pp/Ppk, combinando las filas sin aplanar la matriz
+    # (un solo temporal por fila; einsum no convierte n a float con una copia como np.dot)
+    n = estadisticas['n']
+    N = n.sum()
+    desvio = np.nan_to_num(medias)
+    media_total = np.einsum('i,i->', n, desvio) / N
+    desvio -= media_total
+    desvio *= desvio
+    m2_total = np.sum(estadisticas['m2']) + np.einsum('i,i->', n, desvio)
+    sigma_total = np.sqrt(m2_total / (N - 1))
+    
+    return _indices_capacidad(media_proceso, sigma_within, sigma_total, UCL, LCL, USL, LSL)
+
+def _indices_capacidad(media_proceso, sigma_within, sigma_total, UCL, LCL, USL=None, LSL=None):
+    """Cp, Cpk, Pp y Ppk a partir de la media y las dos estimaciones de sigma"""
+    if sigma_within == 0 or sigma_total == 0:
+        return None
+    
+    # Con límites de especificación
+    if USL is not None and LSL is not None:
+        rango_especificacion = USL - LSL
+        
+        # Cp y Cpk (capacidad)
+        Cp = rango_especificacion / (6 * sigma_within)
+        Cpu = (USL - media_proceso) / (3 * sigma_within)
+        Cpl = (media_proceso - LSL) / (3 * sigma_within)
+        Cpk = min(Cpu, Cpl)
+        
+        # Pp y Ppk (performance)
+        Pp = rango_especificacion / (6 * sigma_total)
+        Ppu = (USL - media_proceso) / (3 * sigma_total)
+        Ppl = (media_proceso - LSL) / (3 * sigma_total)
+        Ppk = min(Ppu, Ppl)
+        
+        # Interpretaciones
+        def interpretar(valor):
+            if valor >= 2.0:
+                return 'Excelente (Clase Mundial)'
+            elif valor >= 1.33:
+                return 'Adecuado'
+            elif valor >= 1.0:
+                return 'Marginal (Requiere mejora)'
+            else:
+                return 'Inadecuado (Acción inmediata)'
+        
+        return {
+            'sigma_within': sigma_within,
+            'sigma_total': sigma_total,
+            'media': media_proceso,
+            'Cp': Cp,
+            'Cpk': Cpk,
+            'Cpu': Cpu,
+            'Cpl': Cpl,
+            'Pp': Pp,
+            'Ppk': Ppk,
+            'Ppu': Ppu,
+            'Ppl': Ppl,
+            'interpretacion_cp': interpretar(Cp),
+            'interpretacion_cpk': interpretar(Cpk),
+            'interpretacion_pp': interpretar(Pp),
+            'interpretacion_ppk': interpretar(Ppk),
+            'tiene_limites': True
+        }
+    else:
+        # Sin límites de especificación
+        rango_control = UCL - LCL
+        Cp = rango_control / (6 * sigma_within)
+        
+        return {
+            'sigma_within': sigma_within,
+            'sigma_total': sigma_total,
+            'media': media_proceso,
+            'Cp': Cp,
+            'interpretacion_cp': 'Excelente' if Cp >= 2.0 else 'Adecuado' if Cp >= 1.33 else 'Marginal' if Cp >= 1.0 else 'Inadecuado',
+            'tiene_limites': False
+        }
+
+def cola_normal(z):
+    """
+    P(Z > z) de la normal estándar, vectorizada (erfc de Numerical Recipes,
+    error relativo < 1.2e-7 también en las colas, que es donde se leen las PPM).
+    """
+    x = np.abs(np.asarray(z, dtype=float)) / math.sqrt(2)
+    t = 1 / (1 + 0.5 * x)
+    polinomio = -1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (-0.82215223 + t * 0.17087277))))))))
+    erfc = t * np.exp(-x * x + polinomio)
+    return np.where(np.asarray(z) >= 0, erfc / 2, 1 - erfc / 2)
+
+def barrido_capacidad(capacidad, USL=None, LSL=None, puntos=100):
+    """
+    Cp/Cpk/Pp/Ppk y fracción no conforme esperada (PPM) en una malla de
+    anchos de tolerancia (filas) y desplazamientos de la media (columnas),
+    con las sigmas within y total de `analizar_capacidad`.
+    - Con especificaciones: tolerancia centrada en el nominal, de 0.5 a 1.5 veces
+      la actual; los desplazamientos cubren el recentrado al nominal ± 2 sigmas
+    - Sin especificaciones: tolerancia de 4 a 12 sigmas centrada en la media
+    Todo se calcula por broadcasting, sin recorrer la malla.
+    """
+    media, sigma_within, sigma_total = capacidad['media'], capacidad['sigma_within'], capacidad['sigma_total']
+    tiene_limites = USL is not None and LSL is not None
+    if tiene_limites:
+        centro, tolerancia = (USL + LSL) / 2, USL - LSL
+        anchos = np.linspace(0.5, 1.5, puntos) * tolerancia
+    else:
+        centro, tolerancia = media, None
+        anchos = np.linspace(4, 12, puntos) * sigma_within
+    recentrado = centro - media
+    desplazamientos = np.linspace(min(0.0, recentrado) - 2 * sigma_within, max(0.0, recentrado) + 2 * sigma_within, puntos)
+
+    semiancho = anchos[:, None] / 2
+    # Distancia de la media desplazada al nominal (la misma para todas las filas)
+    descentrado = np.abs(media + desplazamientos - centro)[None, :]
+
+    def ppm(sigma):
+        # Las dos colas, (semiancho ∓ descentrado) / sigma, por bloques de filas que caben en caché
+        resultado = np.empty((len(anchos), len(desplazamientos)))
+        filas = max(1, _FILAS_POR_BLOQUE // len(desplazamientos))
+        for inicio in range(0, len(anchos), filas):
+            bloque = semiancho[inicio:inicio + filas]
+            resultado[inicio:inicio + filas] = cola_normal((bloque - descentrado) / sigma) + cola_normal((bloque + descentrado) / sigma)
+        return resultado * 1e6
+
+    return {
+        'anchos': anchos,
+        'desplazamientos': desplazamientos,
+        'centro': centro,
+        'media': media,
+        'tolerancia': tolerancia,
+        'sigma_within': sigma_within,
+        'sigma_total': sigma_total,
+        'Cp': anchos / (6 * sigma_within),
+        'Pp': anchos / (6 * sigma_total),
+        'Cpk': (semiancho - descentrado) / (3 * sigma_within),
+        'Ppk': (semiancho - descentrado) / (3 * sigma_total),
+        'ppm_within': ppm(sigma_within),
+        'ppm_total': ppm(sigma_total),
+    }
+
+# Valores por bloque al recorrer todas las observaciones sin copiarlas de una vez
+_VALORES_POR_BLOQUE = 1 << 16
+# Barras del histograma fino con el que se ubican los estadísticos de orden
+_BARRAS_ORDEN = 1 << 16
+
+def _bloques_validos(valores):
+    """Bloques de `valores` sin NaN, de a `_VALORES_POR_BLOQUE`"""
+    for inicio in range(0, len(valores), _VALORES_POR_BLOQUE):
+        bloque = valores[inicio:inicio + _VALORES_POR_BLOQUE]
+        yield bloque[~np.isnan(bloque)]
+
+def _estadisticos_de_orden(valores, rangos, minimo, maximo):
+    """
+    Valores de orden `rangos` (0-based, crecientes) de los datos no NaN, sin ordenar
+    una copia de los datos: un histograma fino ubica cada rango en una barra y una
+    segunda pasada junta solo los valores de esas barras (como pares valor-conteo,
+    así los datos con pocos valores distintos tampoco ocupan más memoria).
+    """
+    escala = _BARRAS_ORDEN / (maximo - minimo)
+
+    def barras(bloque):
+        return np.minimum(((bloque - minimo) * escala).astype(np.int64), _BARRAS_ORDEN - 1)
+
+    conteos = np.zeros(_BARRAS_ORDEN, dtype=np.int64)
+    for bloque in _bloques_validos(valores):
+        conteos += np.bincount(barras(bloque), minlength=_BARRAS_ORDEN)
+    acumulado = np.cumsum(conteos)
+    barra_rango = np.searchsorted(acumulado, rangos, side='right')
+    necesarias = np.unique(barra_rango)
+
+    candidatos, repeticiones = [], []
+    for bloque in _bloques_validos(valores):
+        unicos, veces = np.unique(bloque[np.isin(barras(bloque), necesarias)], return_counts=True)
+        candidatos.append(unicos)
+        repeticiones.append(veces)
+    candidatos, inverso = np.unique(np.concatenate(candidatos), return_inverse=True)
+    repeticiones = np.bincount(inverso, weights=np.concatenate(repeticiones)).astype(np.int64)
+
+    # Los candidatos de cada barra quedan juntos y en orden: el rango dentro de los
+    # candidatos es el rango global menos los datos de las barras no juntadas
+    previas = acumulado[necesarias] - conteos[necesarias]
+    juntadas_antes = np.cumsum(conteos[necesarias]) - conteos[necesarias]
+    posicion = np.searchsorted(necesarias, barra_rango)
+    rango_candidatos = rangos - previas[posicion] + juntadas_antes[posicion]
+    return candidatos[np.searchsorted(np.cumsum(repeticiones), rango_candidatos, side='right')]
+
+def distribucion_capacidad(datos, media, sigma, max_barras=100, max_cuantiles=200):
+    """
+    Resumen de tamaño fijo de la distribución de los datos para el panel de capacidad:
+    - histograma (bordes y conteos, regla de Rice con un máximo de `max_barras`)
+    - curva normal ajustada (media, sigma total) escalada a los conteos
+    - gráfico de probabilidad normal con a lo sumo `max_cuantiles` estadísticos de orden
+    Así lo que viaja al navegador no crece con la cantidad de observaciones.
+    """
+    # order='K' no copia las matrices en orden de columnas (las que devuelve pandas)
+    valores = np.asarray(datos).ravel(order='K')
+    N = sum(len(bloque) for bloque in _bloques_validos(valores))
+    if N < 2:
+        return None
+    minimo, maximo = float(np.nanmin(valores)), float(np.nanmax(valores))
+    if minimo == maximo:
+        maximo = minimo + 1.0
+
+    # np.histogram con rango explícito descarta los NaN sin copiar los datos
+    barras = int(min(max(np.ceil(2 * N ** (1 / 3)), 5), max_barras))
+    conteos, bordes = np.histogram(valores, bins=barras, range=(minimo, maximo))
+
+    margen = 0.05 * (maximo - minimo)
+    x_curva = np.linspace(minimo - margen, maximo + margen, 100)
+    densidad = np.exp(-0.5 * ((x_curva - media) / sigma) ** 2) / (sigma * np.sqrt(2 * np.pi))
+    y_curva = densidad * N * (bordes[1] - bordes[0])
+
+    # Estadísticos de orden equiespaciados (incluye mínimo y máximo) con posiciones de Blom
+    rangos = np.unique(np.linspace(0, N - 1, min(N, max_cuantiles)).round().astype(np.int64))
+    cuantiles = _estadisticos_de_orden(valores, rangos, minimo, maximo)
+    probabilidades = (rangos + 1 - 0.375) / (N + 0.25)
+    normal = NormalDist()
+    z = np.array([normal.inv_cdf(p) for p in probabilidades])
+
+    return {
+        'n': N,
+        'bordes': bordes,
+        'conteos': conteos,
+        'x_curva': x_curva,
+        'y_curva': y_curva,
+        'z': z,
+        'cuantiles': cuantiles,
+        'media': media,
+        'sigma': sigma
+    }
+
+def generar_recomendaciones(num_fuera_control, violaciones_patrones, capacidad):
+    """Recomendaciones según puntos fuera de control, patrones y capacidad"""
+    recomendaciones_lista = []
+    
+    if num_fuera_control > 0:
+        recomendaciones_lista.extend([
+            "🔍 Investigar causas especiales en puntos fuera de límites",
+            "⚙️ Verificar calibración de equipos de medición",
+            "👤 Revisar cambios en operadores o métodos",
+            "📦 Inspeccionar calidad de materia prima",
+            "🌡️ Evaluar condiciones ambientales"
+        ])
+    
+    if len(violaciones_patrones) > 0:
+        tiene_r1 = any("Regla 1" in v for v in violaciones_patrones)
+        tiene_r2 = any("Regla 2" in v for v in violaciones_patrones)
+        tiene_r3 = any("Regla 3" in v for v in violaciones_patrones)
+        tiene_r4 = any("Regla 4" in v for v in violaciones_patrones)
+        tiene_r5 = any("Regla 5" in v for v in violaciones_patrones)
+        
+        if tiene_r1:
+            recomendaciones_lista.append("⚡ Regla 1: Evento extremo - Buscar causa asignable inmediata")
+        if tiene_r2:
+            recomendaciones_lista.append("📊 Regla 2: Variación excesiva - Revisar estabilidad")
+        if tiene_r3:
+            recomendaciones_lista.append("🎯 Regla 3: Desviación sostenida - Verificar ajustes")
+        if tiene_r4:
+            recomendaciones_lista.append("↕️ Regla 4: Sesgo detectado - Verificar centrado")
+        if tiene_r5:
+            recomendaciones_lista.append("📈 Regla 5: Tendencia continua - Verificar desgaste de herramientas")
+    
+    if capacidad and capacidad['tiene_limites']:
+        if capacidad['Cpk'] < 1.0:
+            recomendaciones_lista.extend([
+                "🚨 Cpk < 1.0: Proceso inadecuado - Acción urgente",
+                "🔧 Reducir variación o ampliar especificaciones"
+            ])
+        elif capacidad['Cpk'] < 1.33:
+            recomendaciones_lista.append("⚠️ Cpk marginal: Implementar mejora continua")
+        
+        if capacidad['Ppk'] < capacidad['Cpk']:
+            recomendaciones_lista.append("📉 Ppk < Cpk: Variación entre subgrupos alta - Revisar consistencia del proceso")
+        
+        if abs(capacidad['Cpu'] - capacidad['Cpl']) > 0.2:
+            recomendaciones_lista.append("⚖️ Proceso descentrado - Ajustar hacia valor nominal")
+    
+    if len(recomendaciones_lista) == 0:
+        recomendaciones_lista.extend([
+            "✅ Proceso estable y bajo control",
+            "📊 Mantener monitoreo continuo",
+            "📝 Documentar condiciones como estándar",
+            "🔄 Auditorías periódicas preventivas"
+        ])
+    
+    return recomendaciones_lista
+
+def analizar_subgrupos(subgroups, chart_type='XR', USL=None, LSL=None, revisados=False, partes=None, robustos=False,
+                       estadisticas=None):
+    """
+    Análisis completo de una matriz de subgrupos: límites (ver
+    `calcular_limites_control`), puntos fuera de control, patrones Western
+    Electric, capacidad y recomendaciones. Devuelve None si no hay datos suficientes.
+    Con `revisados` los límites y la capacidad salen de los puntos que quedan tras
+    `calcular_limites_revisados`.
+    Con `robustos` los límites son los de `calcular_limites_robustos` (y
+    `revisados` no se aplica: la mediana ya no depende de los puntos extremos).
+    Con chart_type 'ZW' es un gráfico de corrida corta estandarizado por el número
+    de parte de cada fila (`partes`), ver `corrida_corta`.
+    estadisticas: `estadisticas_por_fila` de `subgroups` si ya se calcularon (`a_subgrupos`).
+    """
+    if chart_type == 'ZW':
+        from corrida_corta import analizar_corrida_corta
+        return analizar_corrida_corta(subgroups, partes)
+
+    # Los estadísticos por fila se calculan una sola vez para límites y capacidad
+    if subgroups.shape[1] == 1:
+        estadisticas = None
+    elif estadisticas is None:
+        estadisticas = estadisticas_por_fila(subgroups)
+    revisados = revisados and not robustos
+    if robustos:
+        resultado = calcular_limites_robustos(subgroups, chart_type, estadisticas)
+    elif revisados:
+        resultado = calcular_limites_revisados(subgroups, chart_type, estadisticas=estadisticas)
+    else:
+        resultado = calcular_limites_control(subgroups, chart_type, estadisticas)
+    if resultado is None:
+        return None
+
+    x, rs = resultado['x'], resultado['rs']
+    x_pos = np.arange(1, len(x) + 1)
+    fuera_control_x = np.where((x > resultado['UCLx']) | (x < resultado['LCLx']))[0]
+    fuera_control_rs = np.where((rs > resultado['UCLrs']) | (rs < resultado['LCLrs']))[0]
+    num_fuera_control = len(fuera_control_x) + len(fuera_control_rs)
+    violaciones = detectar_patrones_western_electric(x, resultado['UCLx'], resultado['LCLx'], resultado['CLx'])
+    datos_capacidad = subgroups
+    if revisados and len(resultado['excluidos_x']):
+        retenidos = np.ones(len(x), dtype=bool)
+        retenidos[resultado['excluidos_x']] = False
+        if resultado['chart_type'] == 'IMR':
+            subgroups = datos_capacidad = x[retenidos].reshape(-1, 1)
+        else:
+            estadisticas = {k: v[retenidos] for k, v in estadisticas.items()}
+            datos_capacidad = subgroups[retenidos]
+    capacidad = analizar_capacidad(subgroups, resultado['UCLx'], resultado['LCLx'], USL, LSL, resultado['chart_type'],
+                                   estadisticas)
+    distribucion = None
+    if capacidad:
+        distribucion = distribucion_capacidad(datos_capacidad, capacidad['media'], capacidad['sigma_total'])
+
+    resultado.update({
+        'x_pos': x_pos,
+        # El rango móvil i compara las observaciones i-1 e i, por eso empieza en la segunda
+        'x_rs': x_pos[1:] if resultado['chart_type'] == 'IMR' else x_pos,
+        'fuera_control_x': fuera_control_x,
+        'fuera_control_rs': fuera_control_rs,
+        'num_fuera_control': num_fuera_control,
+        'violaciones': violaciones,
+        'capacidad': capacidad,
+        'distribucion': distribucion,
+        # Los límites y las reglas suponen puntos independientes
+        'autocorrelacion': diagnostico_autocorrelacion(x),
+        'recomendaciones': generar_recomendaciones(num_fuera_control, violaciones, capacidad)
+    })
+    return resultado
+
+def analizar_archivo(nombre, decoded, chart_type='XR', USL=None, LSL=None):
+    """`analizar_subgrupos` sobre los bytes de un CSV/Excel; None si no se puede leer"""
+    try:
+        df = leer_archivo(decoded, nombre)
+        if df is None or df.empty:
+            return None
+        partes = estadisticas = None
+        if chart_type == 'ZW':
+            from corrida_corta import subgrupos_corrida_corta
+            subgroups, partes = subgrupos_corrida_corta(df)
+        else:
+            subgroups, estadisticas = a_subgrupos(df, con_estadisticas=True)
+        if len(subgroups) == 0:
+            return None
+        return analizar_subgrupos(subgroups, chart_type, USL, LSL, partes=partes, estadisticas=estadisticas)
+    except ValueError:
+        return None
+
+def _analizar_archivo_tarea(tarea):
+    return analizar_archivo(*tarea)
+
+# Pool de procesos compartido por las comparaciones de archivos: se crea en el primer
+# uso (ya dentro del worker de gunicorn, no en el proceso que hace `--preload`) y se
+# reutiliza en las solicitudes siguientes en lugar de lanzar procesos cada vez
+_pool_archivos = None
+_bloqueo_pool = threading.Lock()
+# Por debajo de este total los archivos se analizan en el mismo proceso: lanzar las
+# tareas cuesta más que leerlos
+BYTES_MINIMOS_POOL = 2_000_000
+
+def _pool_compartido():
+    global _pool_archivos
+    with _bloqueo_pool:
+        if _pool_archivos is None:
+            _pool_archivos = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _pool_archivos
+
+def _descartar_pool(pool):
+    global _pool_archivos
+    with _bloqueo_pool:
+        if _pool_archivos is pool:
+            _pool_archivos = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def analizar_archivos(archivos, chart_type='XR', USL=None, LSL=None, max_workers=None):
+    """
+    Analiza varios archivos [(nombre, bytes)] en paralelo con el pool de procesos
+    compartido (la lectura de CSV retiene el GIL, así que los hilos no escalan).
+    Con un solo archivo, lotes chicos o `max_workers=1` se analiza en el mismo proceso.
+    Devuelve [(nombre, resultado o None)] en el mismo orden.
+    """
+    tareas = [(nombre, datos, chart_type, USL, LSL) for nombre, datos in archivos]
+    nombres = [nombre for nombre, _ in archivos]
+    if len(tareas) <= 1 or max_workers == 1 or sum(len(datos) for _, datos in archivos) < BYTES_MINIMOS_POOL:
+        return list(zip(nombres, map(_analizar_archivo_tarea, tareas)))
+    pool = _pool_compartido()
+    try:
+        return list(zip(nombres, pool.map(_analizar_archivo_tarea, tareas)))
+    except BrokenProcessPool:
+        # Un proceso del pool murió (p. ej. por memoria): se descarta y se reintenta aquí
+        _descartar_pool(pool)
+        return list(zip(nombres, map(_analizar_archivo_tarea, tareas)))
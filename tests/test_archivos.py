@@ -0,0 +1,43 @@
+"""Análisis de archivos subidos (comparación de archivos y reportes masivos)."""
+import io
+import tempfile
+import zipfile
+
+import numpy as np
+
+import report_export
+from report_export import generar_paquete_zip, guardar_lote, leer_lote
+from spc_core import analizar_archivo, analizar_archivos
+
+def _csv_corrida_corta(semilla):
+    rng = np.random.default_rng(semilla)
+    filas = [f"{parte},{','.join(f'{v:.4f}' for v in rng.normal(objetivo, 0.5, 4))}"
+             for parte, objetivo in zip(np.tile(['A', 'B'], 30), np.tile([10.0, 25.0], 30))]
+    return '\n'.join(filas).encode()
+
+def test_zw_por_archivo():
+    resultado = analizar_archivo('corrida.csv', _csv_corrida_corta(0), 'ZW')
+    assert resultado is not None
+    assert resultado['chart_type'] == 'ZW'
+    assert len(resultado['x']) == 60
+
+def test_zw_varios_archivos():
+    archivos = [(f'corrida_{i}.csv', _csv_corrida_corta(i)) for i in range(3)]
+    resultados = analizar_archivos(archivos, 'ZW')
+    assert [nombre for nombre, _ in resultados] == [nombre for nombre, _ in archivos]
+    assert all(resultado is not None and len(resultado['x']) == 60 for _, resultado in resultados)
+
+def test_paquete_desde_lote(monkeypatch, tmp_path):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    archivos = [(f'linea_{i}.csv', _csv_corrida_corta(i).replace(b'A,', b'').replace(b'B,', b'')) for i in range(3)]
+    datasets = leer_lote(guardar_lote(iter(archivos)))
+    # El lote entrega rutas: cada archivo se lee en la tarea que lo renderiza
+    assert [nombre for nombre, _ in datasets] == [nombre for nombre, _ in archivos]
+    assert all(isinstance(ruta, str) for _, ruta in datasets)
+
+    en_proceso = zipfile.ZipFile(io.BytesIO(b''.join(generar_paquete_zip(datasets, max_workers=1))))
+    monkeypatch.setattr(report_export, 'BYTES_MINIMOS_POOL', 0)
+    con_pool = zipfile.ZipFile(io.BytesIO(b''.join(generar_paquete_zip(datasets))))
+    assert sorted(en_proceso.namelist()) == sorted(con_pool.namelist())
+    assert len(en_proceso.namelist()) == 2 + 2 * len(archivos)
+    assert all(en_proceso.read(nombre) == con_pool.read(nombre) for nombre in en_proceso.namelist())
@@ -0,0 +1,50 @@
+"""ACF por FFT contra la suma directa, y Durbin-Levinson contra ACF teóricas de procesos AR."""
+import numpy as np
+import pytest
+
+import autocorrelacion
+from autocorrelacion import acf_fft, diagnostico_autocorrelacion, durbin_levinson, residuos_ar
+
+def _acf_directa(serie, max_rezago):
+    d = serie - serie.mean()
+    return np.array([d[:len(d) - k] @ d[k:] for k in range(max_rezago + 1)]) / (d @ d)
+
+@pytest.mark.parametrize('largo_fft', [1 << 16, 128])
+def test_acf_fft_igual_a_directa(monkeypatch, largo_fft):
+    # Con FFT de 128 la serie se recorre en muchos bloques y los rezagos cruzan sus bordes
+    monkeypatch.setattr(autocorrelacion, '_LARGO_FFT', largo_fft)
+    serie = np.cumsum(np.random.default_rng(8).normal(size=3001)) * 0.1 + 40
+    np.testing.assert_allclose(acf_fft(serie, 40), _acf_directa(serie, 40), atol=1e-12)
+
+def test_durbin_levinson_ar2():
+    # AR(2) con φ = (0.5, 0.3): ρ1 = φ1/(1-φ2) y ρk = φ1 ρ(k-1) + φ2 ρ(k-2)
+    phi1, phi2 = 0.5, 0.3
+    acf = np.empty(12)
+    acf[0], acf[1] = 1.0, phi1 / (1 - phi2)
+    for k in range(2, 12):
+        acf[k] = phi1 * acf[k - 1] + phi2 * acf[k - 2]
+    pacf, coeficientes, varianzas = durbin_levinson(acf, 6)
+    np.testing.assert_allclose(coeficientes[2], [phi1, phi2], atol=1e-12)
+    assert pacf[2] == pytest.approx(phi2)
+    np.testing.assert_allclose(pacf[3:], 0, atol=1e-12)
+    np.testing.assert_allclose(varianzas[3:], varianzas[2], rtol=1e-12)
+
+def test_residuos_recuperan_innovaciones():
+    rng = np.random.default_rng(9)
+    innovaciones = rng.normal(size=500)
+    d = np.zeros(500)
+    for t in range(2, 500):
+        d[t] = 0.6 * d[t - 1] - 0.2 * d[t - 2] + innovaciones[t]
+    np.testing.assert_allclose(residuos_ar(d + 7, 7, np.array([0.6, -0.2])), innovaciones[2:], atol=1e-12)
+
+def test_diagnostico_ar1():
+    rng = np.random.default_rng(10)
+    serie = np.zeros(20000)
+    for t in range(1, len(serie)):
+        serie[t] = 0.7 * serie[t - 1] + rng.normal()
+    diagnostico = diagnostico_autocorrelacion(serie)
+    assert diagnostico['orden_ar'] >= 1
+    assert diagnostico['coeficientes_ar'][0] == pytest.approx(0.7, abs=0.03)
+    assert 1 in diagnostico['rezagos_significativos']
+    # Ruido blanco: ningún rezago significativo con la corrección de Bonferroni
+    assert len(diagnostico_autocorrelacion(rng.normal(size=20000))['rezagos_significativos']) == 0
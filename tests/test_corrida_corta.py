@@ -0,0 +1,51 @@
+"""Corrida corta: estandarización por parte calculada a mano y límites Z̄-W / Z-MR."""
+import numpy as np
+import pytest
+
+from corrida_corta import analizar_corrida_corta, estandarizar_por_parte
+from spc_core import constantes_para
+
+def test_zw_a_mano():
+    subgroups = np.array([[1.0, 2, 3], [10, 11, 12], [2, 4, 6], [11, 13, 15]])
+    partes = np.array(['A', 'B', 'A', 'B'], dtype=object)
+    # A: X̄ 2 y 4, R 2 y 4 → objetivo 3, R̄ 3. B: nominal 12, R̄ 3
+    estandarizado = estandarizar_por_parte(subgroups, partes, objetivos={'B': 12.0})
+    np.testing.assert_allclose(estandarizado['z'], [-1 / 3, -1 / 3, 1 / 3, 1 / 3])
+    np.testing.assert_allclose(estandarizado['w'], [2 / 3, 2 / 3, 4 / 3, 4 / 3])
+    assert list(estandarizado['resumen']['objetivo']) == [3.0, 12.0]
+
+    resultado = analizar_corrida_corta(subgroups, partes, {'B': 12.0})
+    constantes = constantes_para(3)
+    assert resultado['chart_type'] == 'ZW'
+    assert (resultado['UCLx'], resultado['UCLrs'], resultado['LCLrs']) == (constantes['A2'], constantes['D4'], constantes['D3'])
+    assert list(resultado['partes']) == ['A', 'B', 'A', 'B']
+
+def test_zmr_rango_movil_por_parte():
+    # Lecturas intercaladas: el rango móvil es con la lectura anterior de la misma parte
+    subgroups = np.array([[1.0], [10.0], [3.0], [14.0]])
+    partes = np.array(['A', 'B', 'A', 'B'], dtype=object)
+    estandarizado = estandarizar_por_parte(subgroups, partes)
+    np.testing.assert_allclose(estandarizado['z'], [-0.5, -0.5, 0.5, 0.5])
+    np.testing.assert_allclose(estandarizado['w'], [np.nan, np.nan, 1.0, 1.0])
+
+    resultado = analizar_corrida_corta(subgroups, partes)
+    assert resultado['chart_type'] == 'ZMR'
+    assert resultado['UCLx'] == pytest.approx(3 / 1.128, rel=1e-3)
+    assert list(resultado['x_rs']) == [3, 4]
+
+def test_invariante_a_escala_por_parte():
+    base = np.random.default_rng(5).normal(0, 1, (40, 4))
+    partes = np.array(['A', 'B'] * 20, dtype=object)
+    # Cada parte con otro nominal y otra escala: los Z̄ y W son los de los datos sin transformar
+    escala = np.where(partes == 'A', 1.0, 7.5)[:, None]
+    nominal = np.where(partes == 'A', 0.0, 250.0)[:, None]
+    transformado = analizar_corrida_corta(base * escala + nominal, partes)
+    original = analizar_corrida_corta(base, partes)
+    np.testing.assert_allclose(transformado['x'], original['x'], atol=1e-12)
+    np.testing.assert_allclose(transformado['rs'], original['rs'], atol=1e-12)
+
+def test_parte_sin_dispersion_se_omite():
+    subgroups = np.array([[1.0, 2, 3], [2, 4, 6], [5, 5, 5]])
+    resultado = analizar_corrida_corta(subgroups, np.array(['A', 'A', 'C'], dtype=object))
+    assert resultado['partes_omitidas'] == 1
+    assert len(resultado['x']) == 2
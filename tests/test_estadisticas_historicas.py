@@ -0,0 +1,48 @@
+"""Historial de estadísticos: escrituras concurrentes desde varios procesos (workers de gunicorn)."""
+import multiprocessing
+
+import numpy as np
+
+from estadisticas_historicas import (
+    NIVELES,
+    _claves_nivel,
+    _leer_meta,
+    _leer_nivel,
+    agregar_registros,
+    guardar_estadisticas,
+)
+from ingestion import _codigos_consecutivos
+
+ESCRITURAS, SUBGRUPOS = 40, 25
+HORA = np.datetime64('2026-03-02T08:00', 'ns')
+
+def _escribir(directorio, semilla):
+    rng = np.random.default_rng(semilla)
+    # Todos los subgrupos en la misma hora: cada escritura reescribe el último resumen
+    inicios = np.full(SUBGRUPOS, HORA)
+    for _ in range(ESCRITURAS):
+        guardar_estadisticas(inicios, rng.normal(10, 1, (SUBGRUPOS, 5)), 'linea', directorio=directorio)
+
+def test_escrituras_concurrentes(tmp_path):
+    directorio = str(tmp_path)
+    contexto = multiprocessing.get_context('fork')
+    procesos = [contexto.Process(target=_escribir, args=(directorio, semilla)) for semilla in (1, 2)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join()
+    assert all(proceso.exitcode == 0 for proceso in procesos)
+
+    ruta = str(tmp_path / 'linea')
+    subgrupos = np.array(_leer_nivel(ruta, 'subgrupo'))
+    assert len(subgrupos) == 2 * ESCRITURAS * SUBGRUPOS
+    inicios_turno = _leer_meta(ruta)['inicios_turno']
+    for nivel in NIVELES[1:]:
+        claves, inicios_periodo = _claves_nivel(subgrupos['inicio'], nivel, inicios_turno)
+        esperado = agregar_registros(subgrupos, _codigos_consecutivos(claves), inicios_periodo)
+        guardado = np.array(_leer_nivel(ruta, nivel))
+        assert len(guardado) == len(esperado) == 1
+        for campo in ('subgrupos', 'n', 'minimo', 'maximo'):
+            assert guardado[campo][0] == esperado[campo][0], (nivel, campo)
+        for campo in ('suma', 'suma_cuadrados', 'suma_medias', 'suma_rangos', 'suma_desviaciones'):
+            np.testing.assert_allclose(guardado[campo], esperado[campo], rtol=1e-12)
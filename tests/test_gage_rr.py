@@ -0,0 +1,55 @@
+"""Gage R&R contra el ejemplo del manual MSA de AIAG (10 partes, 3 evaluadores, 3 ensayos)."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from gage_rr import anova_gage_rr, arreglo_gage
+
+# Lecturas por evaluador (A, B, C) y ensayo; cada fila tiene las partes 1-10
+AIAG = np.array([
+    [[0.29, -0.56, 1.34, 0.47, -0.80, 0.02, 0.59, -0.31, 2.26, -1.36],
+     [0.41, -0.68, 1.17, 0.50, -0.92, -0.11, 0.75, -0.20, 1.99, -1.25],
+     [0.64, -0.58, 1.27, 0.64, -0.84, -0.21, 0.66, -0.17, 2.01, -1.31]],
+    [[0.08, -0.47, 1.19, 0.01, -0.56, -0.20, 0.47, -0.63, 1.80, -1.68],
+     [0.25, -1.22, 0.94, 1.03, -1.20, 0.22, 0.55, 0.08, 2.12, -1.62],
+     [0.07, -0.68, 1.34, 0.20, -1.28, 0.06, 0.83, -0.34, 2.19, -1.50]],
+    [[0.04, -1.38, 0.88, 0.14, -1.46, -0.29, 0.02, -0.46, 1.77, -1.49],
+     [-0.11, -1.13, 1.09, 0.20, -1.07, -0.67, 0.01, -0.56, 1.45, -1.77],
+     [-0.15, -0.96, 0.67, 0.11, -1.45, -0.49, 0.21, -0.49, 1.87, -2.16]],
+]).transpose(2, 0, 1)  # (partes, evaluadores, ensayos)
+
+def test_tabla_anova_aiag():
+    resultado = anova_gage_rr(AIAG)
+    anova = resultado['anova']
+    # Tabla ANOVA del manual: SS 88.3619 / 3.1673 / 0.3590 / 2.7589, F de la interacción 0.434
+    assert anova['parte']['ss'] == pytest.approx(88.3619, abs=1e-4)
+    assert anova['operador']['ss'] == pytest.approx(3.1673, abs=1e-4)
+    assert anova['interaccion']['ss'] == pytest.approx(0.3590, abs=1e-4)
+    assert anova['error']['ss'] == pytest.approx(2.7589, abs=1e-4)
+    assert anova['interaccion']['f'] == pytest.approx(0.434, abs=1e-3)
+    # Interacción no significativa: se combina con el error (modelo reducido)
+    assert resultado['interaccion_combinada']
+
+def test_componentes_aiag():
+    resultado = anova_gage_rr(AIAG)
+    varianzas = resultado['varianzas']
+    assert varianzas['repetibilidad'] == pytest.approx(0.039973, abs=1e-6)
+    assert varianzas['reproducibilidad'] == pytest.approx(0.051455, abs=1e-6)
+    assert varianzas['parte'] == pytest.approx(1.086447, abs=1e-6)
+    assert resultado['variacion_estudio']['grr'] == pytest.approx(27.86, abs=0.01)
+    assert resultado['ndc'] == 4
+    assert str(resultado['veredicto']) == 'Condicional (según aplicación y costo)'
+
+def test_formato_largo_y_lote():
+    partes, operadores, ensayos = np.indices(AIAG.shape)
+    df = pd.DataFrame({'parte': partes.ravel() + 1, 'operador': np.array(list('ABC'))[operadores.ravel()],
+                       'valor': AIAG.ravel()}).sample(frac=1, random_state=0).sort_values(['parte', 'operador'], kind='stable')
+    arreglo, nombres_partes, nombres_operadores = arreglo_gage(df)
+    assert nombres_operadores == ['A', 'B', 'C']
+    assert len(nombres_partes) == 10
+    np.testing.assert_allclose(np.sort(arreglo, axis=-1), np.sort(AIAG, axis=-1))
+
+    # Un lote de dos instrumentos da lo mismo que cada uno por separado
+    lote = anova_gage_rr(np.stack([AIAG, AIAG * 2]))
+    assert lote['variacion_estudio']['grr'] == pytest.approx([27.86, 27.86], abs=0.01)
+    assert lote['varianzas']['parte'][1] == pytest.approx(4 * 1.086447, abs=1e-5)
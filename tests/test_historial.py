@@ -0,0 +1,47 @@
+"""Historial de análisis: lo que se reabre o se exporta por tramos es lo que se guardó."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from historial_analisis import (
+    _recortar,
+    buscar_analisis,
+    cargar_analisis,
+    conectar,
+    guardar_analisis,
+    recortes_historial,
+    series_guardadas,
+)
+from report_export import csv_subgrupos
+from spc_core import analizar_subgrupos
+
+@pytest.mark.parametrize('chart_type, columnas', [('XR', 5), ('XS', 4), ('IMR', 1)])
+def test_guardado_por_series(tmp_path, chart_type, columnas):
+    ruta = str(tmp_path / 'historial.sqlite3')
+    resultado = analizar_subgrupos(np.random.default_rng(1).normal(10, 1, (3000, columnas)), chart_type, USL=13, LSL=7)
+    id_analisis = guardar_analisis(resultado, chart_type, 'proceso', 13, 7, ruta=ruta)
+
+    cargado, USL, LSL, _ = cargar_analisis(id_analisis=id_analisis, ruta=ruta)
+    assert (USL, LSL) == (13, 7)
+    assert cargado.keys() == resultado.keys()
+    for nombre in ('x', 'rs', 'x_pos', 'x_rs', 'fuera_control_x', 'fuera_control_rs'):
+        np.testing.assert_array_equal(cargado[nombre], resultado[nombre])
+    assert cargado['violaciones'] == resultado['violaciones']
+
+    with series_guardadas(id_analisis, ruta=ruta) as guardado:
+        assert ''.join(csv_subgrupos(guardado, filas=500)) == ''.join(csv_subgrupos(resultado, filas=500))
+
+def test_recorte_opcional(tmp_path):
+    ruta = str(tmp_path / 'historial.sqlite3')
+    resultado = analizar_subgrupos(np.random.default_rng(2).normal(10, 1, (200, 5)), 'XR')
+    for dia in range(1, 6):
+        guardar_analisis(resultado, f'huella-{dia}', 'proceso', ruta=ruta, fecha=datetime(2026, 1, dia))
+    # Sin BRAINYSTATS_MAX_ANALISIS no se borra nada
+    assert len(buscar_analisis(ruta=ruta)) == 5
+    assert recortes_historial(ruta) is None
+
+    with conectar(ruta) as conexion:
+        _recortar(conexion, 3)
+    assert [fila['fecha'][:10] for fila in buscar_analisis(ruta=ruta)] == ['2026-01-05', '2026-01-04', '2026-01-03']
+    assert recortes_historial(ruta) == {'borrados': 2, 'hasta': '2026-01-02T00:00:00'}
@@ -0,0 +1,36 @@
+"""Formato largo: qué columna se toma como medición."""
+import pandas as pd
+import pytest
+
+from ingestion import detectar_columnas, subgrupos_formato_largo
+
+@pytest.fixture
+def lecturas():
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2026-01-05 06:00', periods=12, freq='10min'),
+        'medida': [10.0, 10.2, 9.9, 10.1, 10.3, 9.8, 10.0, 10.1, 9.7, 10.2, 10.4, 9.9],
+        'lote': [1] * 4 + [2] * 4 + [3] * 4,
+        'maquina': [7] * 12,
+    })
+
+def test_excluye_lote_y_maquina(lecturas):
+    subgroups, _ = subgrupos_formato_largo(lecturas, 'lote', columna_lote='lote', columna_maquina='maquina', maquina=7)
+    assert subgroups.shape == (3, 4)
+    assert subgroups[0].tolist() == pytest.approx([10.0, 10.2, 9.9, 10.1])
+
+def test_ambigua_sin_columna_valor(lecturas):
+    with pytest.raises(ValueError, match='columna de valor'):
+        detectar_columnas(lecturas)
+    with pytest.raises(ValueError, match='columna de valor'):
+        subgrupos_formato_largo(lecturas, 'conteo', 4)
+
+def test_columna_valor_explicita(lecturas):
+    assert detectar_columnas(lecturas, 'medida') == ('timestamp', 'medida')
+    subgroups, inicio = subgrupos_formato_largo(lecturas, 'conteo', 4, columna_valor='medida')
+    assert subgroups.shape == (3, 4)
+    assert len(inicio) == 3
+    with pytest.raises(ValueError, match='no tiene la columna'):
+        detectar_columnas(lecturas, 'peso')
+
+def test_nombre_de_valor(lecturas):
+    assert detectar_columnas(lecturas.rename(columns={'medida': 'valor'})) == ('timestamp', 'valor')
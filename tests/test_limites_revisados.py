@@ -0,0 +1,53 @@
+"""Límites revisados de Fase I frente a recalcular desde cero sin los puntos excluidos."""
+import numpy as np
+import pytest
+
+from spc_core import calcular_limites_control, calcular_limites_revisados, constantes_para
+
+def test_subgrupo_extremo_a_mano():
+    # 20 subgrupos (9, 11): X̄ = 10, R = 2; el 21 es (30, 30) y sale en la primera ronda
+    subgroups = np.vstack([np.tile([9.0, 11.0], (20, 1)), [[30.0, 30.0]]])
+    resultado = calcular_limites_revisados(subgroups, 'XR')
+    constantes = constantes_para(2)
+    assert [ronda['excluidos'] for ronda in resultado['iteraciones']] == [[21], []]
+    assert resultado['iteraciones'][0]['CLx'] == pytest.approx(230 / 21)
+    assert resultado['CLx'] == pytest.approx(10.0)
+    assert resultado['UCLx'] == pytest.approx(10 + constantes['A2'] * 2)
+    assert resultado['UCLrs'] == pytest.approx(constantes['D4'] * 2)
+    np.testing.assert_array_equal(resultado['excluidos_x'], [20])
+    np.testing.assert_array_equal(resultado['excluidos_rs'], [20])
+
+def test_individuales_a_mano():
+    # Individuales alternando 10 y 11 (MR = 1) con un pico de 40: se excluyen el pico y sus dos rangos móviles
+    x = np.tile([10.0, 11.0], 15)
+    x[12] = 40.0
+    resultado = calcular_limites_revisados(x.reshape(-1, 1), 'IMR')
+    retenidos = np.delete(x, 12)
+    np.testing.assert_array_equal(resultado['excluidos_x'], [12])
+    np.testing.assert_array_equal(resultado['excluidos_rs'], [11, 12])
+    assert resultado['CLx'] == pytest.approx(retenidos.mean())
+    assert resultado['CLrs'] == pytest.approx(1.0)
+    assert resultado['UCLx'] == pytest.approx(retenidos.mean() + 3 / constantes_para(2)['d2'])
+
+@pytest.mark.parametrize('chart_type', ['XR', 'XS'])
+def test_igual_a_recalcular_desde_cero(chart_type):
+    rng = np.random.default_rng(11)
+    subgroups = rng.normal(10, 1, (300, 5))
+    subgroups[rng.choice(300, 12, replace=False)] += rng.choice([-1, 1], (12, 1)) * rng.uniform(1.5, 4, (12, 1))
+    subgroups[rng.choice(300, 6, replace=False), 0] += 8
+    resultado = calcular_limites_revisados(subgroups, chart_type)
+
+    # Referencia: límites clásicos sobre los subgrupos retenidos hasta que ninguno quede fuera
+    retenidos = np.arange(len(subgroups))
+    while True:
+        limites = calcular_limites_control(subgroups[retenidos], chart_type)
+        fuera = ((limites['x'] > limites['UCLx']) | (limites['x'] < limites['LCLx'])
+                 | (limites['rs'] > limites['UCLrs']) | (limites['rs'] < limites['LCLrs']))
+        if not fuera.any():
+            break
+        retenidos = retenidos[~fuera]
+
+    assert len(resultado['iteraciones']) > 2
+    np.testing.assert_array_equal(resultado['excluidos_x'], np.setdiff1d(np.arange(len(subgroups)), retenidos))
+    for nombre in ('CLx', 'UCLx', 'LCLx', 'CLrs', 'UCLrs', 'LCLrs'):
+        assert resultado[nombre] == pytest.approx(limites[nombre])
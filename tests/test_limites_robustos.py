@@ -0,0 +1,37 @@
+"""Límites robustos: sigma insesgada con subgrupos incompletos y límites que no se ensanchan por un valor extremo."""
+import math
+
+import numpy as np
+import pytest
+
+from spc_core import calcular_limites_robustos, mediana_rango_relativo, mediana_s_relativa
+
+def test_constantes_de_mediana():
+    # Con n = 2, R = |X1 - X2| ~ √2·|Z| y S = R/√2: medianas √2·0.6745 y 0.6745
+    cuartil = 0.6744897501960817
+    assert mediana_rango_relativo(2) == pytest.approx(math.sqrt(2) * cuartil, rel=1e-6)
+    assert mediana_s_relativa(2) == pytest.approx(cuartil, rel=1e-6)
+
+@pytest.mark.parametrize('chart_type', ['XR', 'XS'])
+def test_sigma_con_muchos_nan(chart_type):
+    rng = np.random.default_rng(20260105)
+    datos = rng.normal(50, 1, (200_000, 5))
+    datos[rng.random(datos.shape) < 0.7] = np.nan
+    resultado = calcular_limites_robustos(datos, chart_type)
+    assert resultado['sigma_robusta'] == pytest.approx(1.0, abs=0.01)
+    assert resultado['CLx'] == pytest.approx(50.0, abs=0.01)
+
+@pytest.mark.parametrize('chart_type, columnas', [('XR', 5), ('XS', 5), ('IMR', 1)])
+def test_un_valor_extremo_no_ensancha(chart_type, columnas):
+    datos = np.random.default_rng(7).normal(10, 1, (100, columnas))
+    contaminados = datos.copy()
+    contaminados[40, 0] = 1000.0
+    limpio = calcular_limites_robustos(datos, chart_type)
+    sucio = calcular_limites_robustos(contaminados, chart_type)
+
+    ancho_limpio = limpio['UCLx'] - limpio['LCLx']
+    assert sucio['UCLx'] - sucio['LCLx'] == pytest.approx(ancho_limpio, rel=0.05)
+    assert sucio['CLx'] == pytest.approx(limpio['CLx'], abs=0.1)
+    # Los límites clásicos sí se ensanchan con el mismo dato
+    clasicos = sucio['limites_clasicos']
+    assert clasicos['UCLx'] - clasicos['LCLx'] > 2 * ancho_limpio
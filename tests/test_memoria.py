@@ -0,0 +1,51 @@
+"""Presupuesto de memoria del análisis: el pico medido con tracemalloc no debe
+crecer más que unas pocas veces la matriz de entrada."""
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import spc_core
+from spc_core import a_subgrupos, analizar_subgrupos
+
+FILAS, COLUMNAS = 1_000_000, 5
+# Estadísticos por fila (5 arreglos de float64, tanto como una matriz de 5 columnas),
+# las series del resultado y los temporales de cada etapa: hoy ~1.8 veces la entrada
+PICO_SUBGRUPOS = 2.0
+# En I-MR la entrada es de una columna y el resultado guarda por lectura el rango
+# móvil y la posición además de la lectura: hoy ~3.5 veces la entrada
+PICO_INDIVIDUALES = 4.0
+
+@pytest.fixture(scope='module')
+def datos():
+    return pd.DataFrame(np.random.default_rng(0).normal(10, 1, (FILAS, COLUMNAS)))
+
+def pico_relativo(funcion, tamano):
+    """Pico de memoria de `funcion()` dividido por `tamano` (bytes)"""
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1] / tamano
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize('chart_type', ['XR', 'XS'])
+def test_pico_subgrupos(datos, chart_type):
+    def analizar():
+        subgroups, estadisticas = a_subgrupos(datos, con_estadisticas=True)
+        assert analizar_subgrupos(subgroups, chart_type, 13, 7, estadisticas=estadisticas) is not None
+
+    assert pico_relativo(analizar, FILAS * COLUMNAS * 8) < PICO_SUBGRUPOS
+
+def test_pico_individuales():
+    valores = np.random.default_rng(1).normal(10, 1, (FILAS, 1))
+    assert pico_relativo(lambda: analizar_subgrupos(valores, 'IMR', 13, 7), valores.nbytes) < PICO_INDIVIDUALES
+
+def test_estadisticas_una_sola_pasada(datos, monkeypatch):
+    llamadas = []
+    original = spc_core.estadisticas_por_fila
+    monkeypatch.setattr(spc_core, 'estadisticas_por_fila', lambda s: llamadas.append(s.shape) or original(s))
+    subgroups, estadisticas = a_subgrupos(datos.head(1000), con_estadisticas=True)
+    analizar_subgrupos(subgroups, 'XR', 13, 7, estadisticas=estadisticas)
+    assert llamadas == [(1000, COLUMNAS)]
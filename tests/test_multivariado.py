@@ -0,0 +1,44 @@
+"""T² de Hotelling: estadístico contra la fórmula directa y UCL de fase I en forma cerrada (p = 2)."""
+import numpy as np
+import pytest
+
+from multivariado import ALFA_T2, hotelling_t2
+
+def _datos(m, n, semilla=4):
+    rng = np.random.default_rng(semilla)
+    covarianza = np.array([[1.0, 0.6], [0.6, 2.0]])
+    return rng.multivariate_normal([5.0, -3.0], covarianza, size=(m, n))
+
+def test_subgrupos_fase_i():
+    m, n, p = 20, 5, 2
+    datos = _datos(m, n)
+    resultado = hotelling_t2(datos)
+    # Con p = 2 el cuantil F(2, d) es cerrado: P(F > f) = (1 + 2f/d)^(-d/2)
+    d = m * n - m - p + 1
+    for alfa, clave in ((ALFA_T2, 'UCL'), (0.5, 'CL')):
+        f = d / 2 * (alfa ** (-2 / d) - 1)
+        assert resultado[clave] == pytest.approx(p * (m - 1) * (n - 1) / d * f, rel=1e-6)
+
+    medias = datos.mean(axis=1)
+    S = sum(np.cov(subgrupo, rowvar=False) for subgrupo in datos) / m
+    desviaciones = medias - medias.mean(axis=0)
+    directo = n * np.einsum('ip,pq,iq->i', desviaciones, np.linalg.inv(S), desviaciones)
+    np.testing.assert_allclose(resultado['t2'], directo, rtol=1e-10)
+
+def test_individuales_fase_i():
+    m, p = 30, 2
+    datos = _datos(m, 1)
+    resultado = hotelling_t2(datos)
+    # Beta(1, b) tiene cuantil cerrado: P(X > x) = (1 - x)^b
+    b = (m - p - 1) / 2
+    assert resultado['UCL'] == pytest.approx((m - 1) ** 2 / m * (1 - ALFA_T2 ** (1 / b)), rel=1e-6)
+
+    x = datos[:, 0, :]
+    desviaciones = x - x.mean(axis=0)
+    directo = np.einsum('ip,pq,iq->i', desviaciones, np.linalg.inv(np.cov(x, rowvar=False)), desviaciones)
+    np.testing.assert_allclose(resultado['t2'], directo, rtol=1e-10)
+
+def test_subgrupo_desplazado_fuera_de_control():
+    datos = _datos(25, 4)
+    datos[12] += [4.0, -4.0]
+    assert 12 in hotelling_t2(datos)['fuera_control']
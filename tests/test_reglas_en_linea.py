@@ -0,0 +1,62 @@
+"""Autómata de reglas Western Electric frente a la detección por lote."""
+import numpy as np
+import pytest
+
+from reglas_en_linea import (
+    REGLA_4_SUPERIOR,
+    actualizar_estado,
+    cargar_estado,
+    crear_estado,
+    estado_tras_serie,
+    evaluar_serie,
+    guardar_estado,
+)
+from spc_core import detectar_patrones_western_electric
+
+def _series(semilla, cantidad=200):
+    # Caminatas aleatorias: disparan todas las reglas, no solo la 1
+    rng = np.random.default_rng(semilla)
+    return [rng.normal(0, 1, rng.integers(1, 80)).cumsum() * 0.4 for _ in range(cantidad)]
+
+def _iguales(a, b):
+    return a.keys() == b.keys() and all(np.array_equal(a[k], b[k], equal_nan=True) for k in a)
+
+@pytest.mark.parametrize('semilla', [0, 1])
+def test_mismos_mensajes_que_el_lote(semilla):
+    for datos in _series(semilla):
+        en_linea = evaluar_serie(crear_estado(0, 3, -3), datos)
+        assert sorted(en_linea) == sorted(detectar_patrones_western_electric(datos, 3, -3, 0))
+
+def test_estado_tras_serie_igual_al_recorrido():
+    rng = np.random.default_rng(5)
+    for datos in _series(5):
+        corte = rng.integers(0, len(datos) + 1)
+        punto_a_punto = crear_estado(0, 3, -3)
+        evaluar_serie(punto_a_punto, datos)
+        # Estado de una vez para el historial y el resto punto a punto: mismo estado y mismos mensajes
+        reanudado = estado_tras_serie(datos[:corte], 0, 3, -3)
+        resto = evaluar_serie(reanudado, datos[corte:])
+        assert _iguales(reanudado, punto_a_punto)
+        assert set(resto) <= set(detectar_patrones_western_electric(datos, 3, -3, 0))
+
+def test_varias_series_en_un_paso():
+    series = [datos[:30] for datos in _series(7, 50) if len(datos) >= 30]
+    matriz = np.array(series)
+    # Un NaN no avanza la serie: los mensajes no cambian
+    matriz_con_huecos = np.insert(matriz, 10, np.nan, axis=1)
+    estado = crear_estado(0, 3, -3, series=len(series))
+    banderas = np.array([actualizar_estado(estado, columna) for columna in matriz_con_huecos.T])
+    for i, datos in enumerate(series):
+        individual = crear_estado(0, 3, -3)
+        esperadas = [actualizar_estado(individual, valor)[0] for valor in datos]
+        np.testing.assert_array_equal(np.delete(banderas[:, i], 10), esperadas)
+        assert _iguales({k: v[i:i + 1] for k, v in estado.items()}, individual)
+
+def test_regla_4_en_el_octavo_punto():
+    estado = crear_estado(0, 3, -3)
+    banderas = [actualizar_estado(estado, 0.5)[0] for _ in range(9)]
+    assert [bool(b & REGLA_4_SUPERIOR) for b in banderas] == [False] * 7 + [True, True]
+
+def test_estado_serializado():
+    estado = estado_tras_serie(_series(9)[0], 0, 3, -3)
+    assert _iguales(cargar_estado(guardar_estado(estado)), estado)
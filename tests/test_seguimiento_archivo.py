@@ -0,0 +1,94 @@
+"""Seguimiento de archivos: desplazamientos, rotación, truncamiento y monitor incremental."""
+import os
+
+import numpy as np
+
+from seguimiento_archivo import (
+    avanzar_monitor,
+    crear_estado_archivo,
+    dejar_de_seguir,
+    iniciar_monitor,
+    leer_lineas_nuevas,
+    seguir_archivo,
+)
+from spc_core import detectar_patrones_western_electric, estadisticas_por_fila
+
+def _lineas(inicio, fin):
+    return b''.join(f'{i},{i + 1},{i + 2}\n'.encode() for i in range(inicio, fin))
+
+def _agregar(ruta, datos):
+    with open(ruta, 'ab') as f:
+        f.write(datos)
+
+def test_linea_incompleta_queda_pendiente(tmp_path):
+    ruta = str(tmp_path / 'maquina.csv')
+    estado = crear_estado_archivo(ruta)
+    assert leer_lineas_nuevas(estado) == ([], False)
+    _agregar(ruta, _lineas(0, 3) + b'3,4')
+    assert leer_lineas_nuevas(estado) == (_lineas(0, 3).splitlines(), False)
+    assert leer_lineas_nuevas(estado) == ([], False)
+    _agregar(ruta, b',5\n' + _lineas(4, 6))
+    assert leer_lineas_nuevas(estado) == (_lineas(3, 6).splitlines(), False)
+    assert estado['desplazamiento'] == os.path.getsize(ruta)
+
+def test_truncamiento(tmp_path):
+    ruta = str(tmp_path / 'maquina.csv')
+    _agregar(ruta, _lineas(0, 10) + b'10,1')
+    estado = crear_estado_archivo(ruta)
+    leer_lineas_nuevas(estado)
+    # La máquina vacía el archivo y vuelve a escribir: se relee desde el principio sin lo pendiente
+    with open(ruta, 'wb') as f:
+        f.write(_lineas(100, 103))
+    assert leer_lineas_nuevas(estado) == (_lineas(100, 103).splitlines(), True)
+    _agregar(ruta, _lineas(103, 104))
+    assert leer_lineas_nuevas(estado) == (_lineas(103, 104).splitlines(), False)
+
+def test_rotacion(tmp_path):
+    ruta = str(tmp_path / 'maquina.csv')
+    _agregar(ruta, _lineas(0, 3))
+    estado = crear_estado_archivo(ruta)
+    leer_lineas_nuevas(estado)
+    # Archivo nuevo más grande que el anterior: solo el inodo delata la rotación
+    nuevo = str(tmp_path / 'maquina.csv.nuevo')
+    _agregar(nuevo, _lineas(50, 60))
+    os.replace(ruta, str(tmp_path / 'maquina.csv.1'))
+    os.replace(nuevo, ruta)
+    assert leer_lineas_nuevas(estado) == (_lineas(50, 60).splitlines(), True)
+    assert estado['desplazamiento'] == os.path.getsize(ruta)
+
+def test_seguir_archivo_reinicia_subgrupos(tmp_path):
+    ruta = str(tmp_path / 'maquina.csv')
+    _agregar(ruta, b'a,b,c\n' + _lineas(0, 5))
+    try:
+        subgroups, version = seguir_archivo(ruta)
+        assert subgroups.shape == (5, 3)
+        assert seguir_archivo(ruta)[1] == version
+        _agregar(ruta, _lineas(5, 40))
+        subgroups, version_nueva = seguir_archivo(ruta)
+        np.testing.assert_array_equal(subgroups[:, 0], np.arange(40))
+        assert version_nueva != version
+
+        nuevo = str(tmp_path / 'maquina.csv.nuevo')
+        _agregar(nuevo, _lineas(200, 202))
+        os.replace(ruta, str(tmp_path / 'maquina.csv.1'))
+        os.replace(nuevo, ruta)
+        subgroups, _ = seguir_archivo(ruta)
+        np.testing.assert_array_equal(subgroups[:, 0], [200, 201])
+    finally:
+        dejar_de_seguir(ruta)
+
+def test_monitor_igual_a_evaluar_todo():
+    subgroups = np.random.default_rng(4).normal(10, 1, (400, 5))
+    subgroups[300:] += np.linspace(0, 2, 100)[:, None]
+    monitor = iniciar_monitor(subgroups[:100], 'XR')
+    for fin in (150, 151, 151, 300, 400):
+        avanzar_monitor(monitor, subgroups[:fin])
+    resultado = monitor['resultado']
+    # Los puntos nuevos se evalúan contra los límites de la fase base
+    x = estadisticas_por_fila(subgroups)['media']
+    np.testing.assert_allclose(resultado['x'], x)
+    np.testing.assert_array_equal(resultado['x_pos'], np.arange(1, 401))
+    np.testing.assert_array_equal(resultado['fuera_control_x'],
+                                  np.flatnonzero((x > resultado['UCLx']) | (x < resultado['LCLx'])))
+    assert sorted(resultado['violaciones']) == sorted(
+        detectar_patrones_western_electric(x, resultado['UCLx'], resultado['LCLx'], resultado['CLx']))
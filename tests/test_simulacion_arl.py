@@ -0,0 +1,51 @@
+"""Simulación de ARL: censura con el máximo pedido, mismo resultado dentro y fuera del pool y ARL de la regla 1 frente a la geométrica."""
+import math
+
+import numpy as np
+import pytest
+
+from simulacion_arl import limites_teoricos, simular_arl, simular_rachas
+
+def test_censuradas_con_max_subgrupos():
+    simulacion = simular_arl('XR', 5, (1,), (0.0, 3.0), series=2000, semilla=3, max_workers=1, max_subgrupos=64)
+    rachas = simular_rachas('XR', 5, 0.0, 2000, (1,), semilla=3, max_subgrupos=64)
+    assert rachas.max() == 64
+    # Sin desplazamiento la mayoría de las series no da señal en 64 subgrupos; con 3σ casi todas sí
+    assert simulacion['censuradas'][0] > 1000
+    assert simulacion['censuradas'][1] == 0
+    assert simulacion['max_subgrupos'] == 64
+
+def test_pool_compartido_igual_que_en_proceso():
+    argumentos = dict(chart_type='XS', n=4, desplazamientos=(0.5, 1.0), series=6000, semilla=11, max_subgrupos=2000)
+    en_proceso = simular_arl(max_workers=1, **argumentos)
+    con_pool = simular_arl(**argumentos)
+    for clave in ('arl', 'oc', 'mediana', 'censuradas'):
+        np.testing.assert_array_equal(en_proceso[clave], con_pool[clave])
+
+def _cdf_normal(x):
+    return 0.5 * (1 + np.vectorize(math.erf)(np.asarray(x) / math.sqrt(2)))
+
+def _cdf_rango(w, n):
+    """P(R ≤ w) de n normales estándar: n∫φ(x)[Φ(x+w) − Φ(x)]^(n−1)dx"""
+    if w <= 0:
+        return 0.0
+    x = np.linspace(-9, 9, 20001)
+    integrando = n * np.exp(-x ** 2 / 2) / math.sqrt(2 * math.pi) * (_cdf_normal(x + w) - _cdf_normal(x)) ** (n - 1)
+    return float(((integrando[1:] + integrando[:-1]) * np.diff(x)).sum() / 2)
+
+@pytest.mark.parametrize('desplazamiento', [0.0, 1.0, 2.0])
+def test_arl_regla_1_igual_a_la_geometrica(desplazamiento):
+    # Con solo la regla 1 cada subgrupo da señal con la misma probabilidad p: la racha es geométrica, ARL = 1/p
+    n, series = 5, 20000
+    limites = limites_teoricos('XR', n)
+    dentro_x = _cdf_normal((limites['UCLx'] - desplazamiento) * math.sqrt(n)) \
+        - _cdf_normal((limites['LCLx'] - desplazamiento) * math.sqrt(n))
+    dentro_r = _cdf_rango(limites['UCLrs'], n) - _cdf_rango(limites['LCLrs'], n)
+    beta = float(dentro_x) * dentro_r
+    simulacion = simular_arl('XR', n, (1,), (desplazamiento,), series=series, semilla=8, max_workers=1)
+
+    assert simulacion['censuradas'][0] == 0
+    arl = 1 / (1 - beta)
+    # Desvío de la geométrica: √β / (1 − β)
+    assert abs(simulacion['arl'][0] - arl) < 4 * math.sqrt(beta) / (1 - beta) / math.sqrt(series)
+    assert abs(simulacion['oc'][0] - beta) < 4 * math.sqrt(beta * (1 - beta) / series) + 1e-9
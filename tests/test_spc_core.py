@@ -0,0 +1,20 @@
+"""spc_core se puede usar sin pandas, Dash ni Plotly (workers del pool, scripts y pruebas)."""
+import os
+import subprocess
+import sys
+
+import spc_core
+
+def test_importar_sin_pandas_dash_plotly():
+    codigo = (
+        'import sys\n'
+        'import numpy as np\n'
+        'import spc_core\n'
+        'cargados = [sys.modules.get(m) is not None for m in ("pandas", "dash", "plotly")]\n'
+        'spc_core.analizar_subgrupos(np.random.default_rng(0).normal(10, 1, (50, 5)), "XR", USL=14, LSL=6)\n'
+        'cargados += [sys.modules.get(m) is not None for m in ("pandas", "dash", "plotly")]\n'
+        'print(cargados)\n'
+    )
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=os.path.dirname(spc_core.__file__),
+                            capture_output=True, text=True, check=True)
+    assert salida.stdout.strip() == str([False] * 6)
@@ -0,0 +1,49 @@
+"""Vista previa por muestreo estratificado frente al análisis completo."""
+import numpy as np
+import pytest
+
+from spc_core import analizar_subgrupos, constantes_para
+from vista_previa import estimar_vista_previa, muestra_estratificada
+
+def _csv(subgroups):
+    return ('\n'.join(','.join(f'{v:.4f}' for v in fila) for fila in subgroups) + '\n').encode()
+
+@pytest.mark.parametrize('final', [b'\n', b''])
+def test_muestra_lineas_completas(final):
+    lineas = [f'{i},{i * 2},{i * 3}'.encode() for i in range(5000)]
+    decoded = b'\n'.join(lineas) + final
+    grupos, total = muestra_estratificada(decoded, muestras=300, lineas=2, semilla=0)
+    assert total == 5000
+    assert len(grupos) >= 295
+    # Cada muestra son dos líneas completas y consecutivas del archivo
+    for primera, segunda in grupos:
+        i = lineas.index(primera)
+        assert lineas[i + 1] == segunda
+
+def test_subgrupos_identicos_exactos():
+    decoded = _csv(np.tile([9.0, 10.0, 11.0, 10.0, 10.0], (20000, 1)))
+    vista = estimar_vista_previa(decoded, 'XR', USL=13, LSL=7, muestras=200, semilla=0)
+    A2, D4 = constantes_para(5)['A2'], constantes_para(5)['D4']
+    esperados = {'CLx': 10.0, 'UCLx': 10 + A2 * 2, 'LCLx': 10 - A2 * 2, 'CLrs': 2.0, 'UCLrs': D4 * 2, 'LCLrs': 0.0}
+    for nombre, esperado in esperados.items():
+        estimado, margen = vista['limites'][nombre]
+        assert estimado == pytest.approx(esperado)
+        assert margen == pytest.approx(0.0, abs=1e-12)
+    sigma = 2 / constantes_para(5)['d2']
+    assert vista['capacidad']['Cp'][0] == pytest.approx(6 / (6 * sigma))
+
+@pytest.mark.parametrize('chart_type, columnas', [('XR', 5), ('XS', 4), ('IMR', 1)])
+def test_intervalos_cubren_analisis_completo(chart_type, columnas):
+    subgroups = np.random.default_rng(3).normal(10, 1, (40000, columnas))
+    vista = estimar_vista_previa(_csv(subgroups), chart_type, USL=14, LSL=7, muestras=2000, nivel=0.999, semilla=1)
+    completo = analizar_subgrupos(subgroups, chart_type, USL=14, LSL=7)
+    assert vista['chart_type'] == chart_type
+    assert vista['total'] == 40000
+    for nombre in ('CLx', 'UCLx', 'LCLx', 'CLrs', 'UCLrs'):
+        estimado, margen = vista['limites'][nombre]
+        assert abs(estimado - completo[nombre]) <= margen
+    _, minimo, maximo = vista['capacidad']['Cpk']
+    assert minimo <= completo['capacidad']['Cpk'] <= maximo
+
+def test_muestra_insuficiente():
+    assert estimar_vista_previa(_csv(np.ones((1000, 5))), 'XR', muestras=8) is None
@@ -0,0 +1,139 @@
+"""Vista previa aproximada de archivos CSV grandes.
+
+En lugar de leer todo el archivo se toma una muestra estratificada: el archivo
+se divide en estratos de bytes del mismo tamaño y de cada uno se lee la
+primera línea completa después de un desplazamiento al azar, así que el costo
+no depende del tamaño. Los límites de control son promedios de cantidades por
+subgrupo (X̄ᵢ + A·Rᵢ, D4·Rᵢ, ...), de modo que su error se acota con el error
+estándar de la muestra y la corrección de población finita; Cp y Cpk se acotan
+evaluando los extremos de los intervalos de la media y de sigma.
+"""
+from statistics import NormalDist
+import numpy as np
+
+from seguimiento_archivo import lineas_a_subgrupos
+from spc_core import CONTROL_CHART_CONSTANTS, constantes_para, estadisticas_por_fila
+
+MUESTRAS_VISTA_PREVIA = 2000
+# Por debajo de este tamaño el análisis completo es casi inmediato y no hace falta vista previa
+BYTES_MINIMOS_VISTA_PREVIA = 5_000_000
+NIVEL_CONFIANZA = 0.95
+
+def muestra_estratificada(decoded, muestras=MUESTRAS_VISTA_PREVIA, lineas=1, semilla=None):
+    """
+    Grupos de `lineas` líneas consecutivas, uno por estrato de bytes del archivo.
+    Devuelve (grupos, total de líneas del archivo).
+    """
+    total_bytes = len(decoded)
+    rng = np.random.default_rng(semilla)
+    bordes = np.linspace(0, total_bytes, muestras + 1)
+    desplazamientos = (bordes[:-1] + rng.random(muestras) * np.diff(bordes)).astype(np.int64)
+    grupos = []
+    for desplazamiento in desplazamientos:
+        # La muestra empieza en la primera línea completa a partir del desplazamiento
+        inicio = 0
+        if desplazamiento > 0:
+            inicio = decoded.find(b'\n', desplazamiento) + 1
+            if inicio == 0:
+                continue
+        grupo = []
+        for _ in range(lineas):
+            fin = decoded.find(b'\n', inicio)
+            fin = total_bytes if fin < 0 else fin
+            if inicio >= fin:
+                break
+            grupo.append(decoded[inicio:fin])
+            inicio = fin + 1
+        if len(grupo) == lineas:
+            grupos.append(grupo)
+    total_lineas = decoded.count(b'\n') + (not decoded.endswith(b'\n'))
+    return grupos, total_lineas
+
+def _intervalo(cantidades, total, z):
+    """(media, margen) de la media poblacional a partir de cantidades por subgrupo muestreadas"""
+    k = len(cantidades)
+    correccion = np.sqrt(max(1 - k / total, 0.0)) if total else 1.0
+    return float(np.mean(cantidades)), float(z * np.std(cantidades, ddof=1) / np.sqrt(k) * correccion)
+
+def estimar_vista_previa(decoded, chart_type='XR', USL=None, LSL=None, muestras=MUESTRAS_VISTA_PREVIA,
+                         nivel=NIVEL_CONFIANZA, semilla=None):
+    """
+    Límites y Cp/Cpk aproximados de un CSV ancho (un subgrupo por línea) a partir
+    de una muestra estratificada. Cada límite es (estimado, margen) y cada índice
+    (estimado, mínimo, máximo) con el nivel de confianza dado.
+    Devuelve None si la muestra no alcanza.
+    """
+    z = NormalDist().inv_cdf(0.5 + nivel / 2)
+    # Dos líneas consecutivas por muestra: la segunda solo se usa para el rango móvil de individuales
+    grupos, total = muestra_estratificada(decoded, muestras, lineas=2, semilla=semilla)
+    subgroups = lineas_a_subgrupos([grupo[0] for grupo in grupos])
+
+    if chart_type == 'IMR' or subgroups.shape[1] == 1:
+        pares = []
+        for grupo in grupos:
+            valores = lineas_a_subgrupos(grupo).ravel()
+            valores = valores[~np.isnan(valores)]
+            if len(valores) >= 2:
+                pares.append(valores[:2])
+        if len(pares) < 10:
+            return None
+        pares = np.array(pares)
+        centro, dispersion = pares[:, 0], np.abs(pares[:, 1] - pares[:, 0])
+        constantes = CONTROL_CHART_CONSTANTS[2]
+        A, D3, D4, divisor = 3 / constantes['d2'], constantes['D3'], constantes['D4'], constantes['d2']
+        chart_type, n = 'IMR', 1
+    else:
+        if len(subgroups) < 10:
+            return None
+        estadisticas = estadisticas_por_fila(subgroups)
+        n = subgroups.shape[1]
+        constantes = constantes_para(n)
+        centro = estadisticas['media']
+        if chart_type == 'XR':
+            dispersion = estadisticas['maximo'] - estadisticas['minimo']
+            A, D3, D4, divisor = constantes['A2'], constantes['D3'], constantes['D4'], constantes['d2']
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                dispersion = np.sqrt(estadisticas['m2'] / (estadisticas['n'] - 1))
+            A, D3, D4, divisor = constantes['A3'], constantes['B3'], constantes['B4'], constantes['c4']
+        validos = ~np.isnan(centro) & ~np.isnan(dispersion)
+        centro, dispersion = centro[validos], dispersion[validos]
+
+    limites = {
+        'CLx': _intervalo(centro, total, z),
+        'UCLx': _intervalo(centro + A * dispersion, total, z),
+        'LCLx': _intervalo(centro - A * dispersion, total, z),
+        'CLrs': _intervalo(dispersion, total, z),
+        'UCLrs': _intervalo(D4 * dispersion, total, z),
+        'LCLrs': _intervalo(D3 * dispersion, total, z),
+    }
+
+    capacidad = None
+    if USL is not None and LSL is not None:
+        media, margen_media = limites['CLx']
+        dispersion_media, margen_dispersion = limites['CLrs']
+        sigma = dispersion_media / divisor
+        sigmas = [max(dispersion_media - margen_dispersion, 1e-12) / divisor, (dispersion_media + margen_dispersion) / divisor]
+
+        def cpk(m, s):
+            return min(USL - m, m - LSL) / (3 * s)
+
+        # Cpk es monótono en sigma pero no en la media: se evalúan los extremos y el centro de especificación
+        medias = [media - margen_media, media + margen_media]
+        if medias[0] < (USL + LSL) / 2 < medias[1]:
+            medias.append((USL + LSL) / 2)
+        esquinas = [cpk(m, s) for m in medias for s in sigmas]
+        capacidad = {
+            'Cp': ((USL - LSL) / (6 * sigma), (USL - LSL) / (6 * sigmas[1]), (USL - LSL) / (6 * sigmas[0])),
+            'Cpk': (cpk(media, sigma), min(esquinas), max(esquinas)),
+        }
+
+    return {
+        'chart_type': chart_type,
+        'n': n,
+        'muestras': len(centro),
+        'total': total,
+        'nivel': nivel,
+        'limites': limites,
+        'capacidad': capacidad,
+    }